@@ -6,20 +6,35 @@ This module provides comprehensive billing and pricing functionality including:
 - Service tier and price management
 - Billing record operations
 - Quote calculations and estimations
+- Batch pricing of instrument jobs and billing record generation for a billing period
+- A versioned in-memory snapshot of the public pricing, rebuilt only when pricing changes
 """
 
+import hashlib
+import logging
+import uuid
 from decimal import Decimal
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Union, Any
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Union, Any
+from django.core.cache import cache
+from django.db import transaction
 from django.db.models import QuerySet, Q
 from django.utils import timezone
 from django.contrib.auth.models import User
 
 from .models import (
-    ServiceTier, ServicePrice, BillingRecord, Instrument, 
+    ServiceTier, ServicePrice, BillingRecord, BillingMonthlyTotal, Instrument, 
     InstrumentJob, LabGroup
 )
 
+logger = logging.getLogger(__name__)
+
+# Cache key of the version of the public pricing snapshot shared by all processes
+PRICING_VERSION_KEY = 'public_pricing_version'
+
+# Snapshots are kept in the cache for a day, they are rebuilt for every new day anyway
+PRICING_SNAPSHOT_TIMEOUT = 60 * 60 * 24
+
 
 class BillingService:
     """Main billing service class for handling all billing operations"""
@@ -64,11 +79,11 @@ class BillingService:
 
 
 class QuoteCalculator:
-    """Service for calculating quotes and estimates"""
+    """Service for calculating quotes and estimates, from the current pricing snapshot"""
     
-    def __init__(self, service_tier: ServiceTier):
+    def __init__(self, service_tier: ServiceTier, snapshot: Optional['PricingSnapshot'] = None):
         self.service_tier = service_tier
-        self.billing_service = BillingService(service_tier.lab_group)
+        self.snapshot = snapshot or PricingSnapshot.current()
     
     def calculate_quote(self, quote_request: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -86,159 +101,11 @@ class QuoteCalculator:
         Returns:
             Dictionary with quote details and total cost
         """
-        try:
-            instrument = Instrument.objects.get(id=quote_request['instrument_id'])
-            pricing = self.billing_service.get_pricing_by_instrument(instrument).filter(
-                service_tier=self.service_tier
-            )
-            
-            quote_details = {
-                'instrument': {
-                    'id': instrument.id,
-                    'name': instrument.instrument_name,
-                    'description': instrument.instrument_description
-                },
-                'service_tier': {
-                    'id': self.service_tier.id,
-                    'name': self.service_tier.name,
-                    'description': self.service_tier.description
-                },
-                'line_items': [],
-                'subtotal': Decimal('0.00'),
-                'total': Decimal('0.00'),
-                'currency': 'USD',
-                'valid_until': (timezone.now() + timedelta(days=30)).date(),
-                'generated_at': timezone.now()
-            }
-            
-            # Calculate sample-based pricing
-            samples = quote_request.get('samples', 0)
-            if samples > 0:
-                sample_pricing = pricing.filter(billing_unit='per_sample').first()
-                if sample_pricing:
-                    cost = sample_pricing.price * samples
-                    quote_details['line_items'].append({
-                        'type': 'per_sample',
-                        'description': f'Sample Analysis ({samples} samples)',
-                        'quantity': samples,
-                        'unit_price': sample_pricing.price,
-                        'total_price': cost,
-                        'billing_unit': 'per_sample'
-                    })
-                    quote_details['subtotal'] += cost
-            
-            # Calculate injection-based pricing
-            injections = quote_request.get('injections_per_sample', 0) * samples
-            if injections > 0:
-                injection_pricing = pricing.filter(billing_unit='per_injection').first()
-                if injection_pricing:
-                    cost = injection_pricing.price * injections
-                    quote_details['line_items'].append({
-                        'type': 'per_injection',
-                        'description': f'Injections ({injections} injections)',
-                        'quantity': injections,
-                        'unit_price': injection_pricing.price,
-                        'total_price': cost,
-                        'billing_unit': 'per_injection'
-                    })
-                    quote_details['subtotal'] += cost
-            
-            # Calculate instrument time pricing
-            instrument_hours = quote_request.get('estimated_instrument_hours', 0)
-            if instrument_hours > 0:
-                instrument_pricing = pricing.filter(billing_unit='per_hour_instrument').first()
-                if instrument_pricing:
-                    cost = instrument_pricing.price * Decimal(str(instrument_hours))
-                    quote_details['line_items'].append({
-                        'type': 'per_hour_instrument',
-                        'description': f'Instrument Time ({instrument_hours} hours)',
-                        'quantity': instrument_hours,
-                        'unit_price': instrument_pricing.price,
-                        'total_price': cost,
-                        'billing_unit': 'per_hour_instrument'
-                    })
-                    quote_details['subtotal'] += cost
-            
-            # Calculate personnel time pricing
-            personnel_hours = quote_request.get('estimated_personnel_hours', 0)
-            if personnel_hours > 0:
-                personnel_pricing = pricing.filter(billing_unit='per_hour_personnel').first()
-                if personnel_pricing:
-                    cost = personnel_pricing.price * Decimal(str(personnel_hours))
-                    quote_details['line_items'].append({
-                        'type': 'per_hour_personnel',
-                        'description': f'Personnel Time ({personnel_hours} hours)',
-                        'quantity': personnel_hours,
-                        'unit_price': personnel_pricing.price,
-                        'total_price': cost,
-                        'billing_unit': 'per_hour_personnel'
-                    })
-                    quote_details['subtotal'] += cost
-            
-            # Add flat rate services
-            flat_rate_pricing = pricing.filter(billing_unit='flat_rate')
-            for flat_rate in flat_rate_pricing:
-                if quote_request.get(f'include_flat_rate_{flat_rate.id}', False):
-                    quote_details['line_items'].append({
-                        'type': 'flat_rate',
-                        'description': f'Flat Rate Service',
-                        'quantity': 1,
-                        'unit_price': flat_rate.price,
-                        'total_price': flat_rate.price,
-                        'billing_unit': 'flat_rate'
-                    })
-                    quote_details['subtotal'] += flat_rate.price
-            
-            quote_details['total'] = quote_details['subtotal']
-            
-            return {
-                'success': True,
-                'quote': quote_details
-            }
-            
-        except Instrument.DoesNotExist:
-            return {
-                'success': False,
-                'error': 'Instrument not found'
-            }
-        except Exception as e:
-            return {
-                'success': False,
-                'error': f'Quote calculation failed: {str(e)}'
-            }
+        return self.snapshot.calculate_quote(self.service_tier.id, quote_request)
     
     def get_pricing_options(self, instrument: Instrument) -> Dict[str, Any]:
         """Get all pricing options for an instrument under this service tier"""
-        pricing = self.billing_service.get_pricing_by_instrument(instrument).filter(
-            service_tier=self.service_tier
-        )
-        
-        options = {
-            'instrument': {
-                'id': instrument.id,
-                'name': instrument.instrument_name,
-                'description': instrument.instrument_description
-            },
-            'service_tier': {
-                'id': self.service_tier.id,
-                'name': self.service_tier.name,
-                'description': self.service_tier.description
-            },
-            'pricing_options': []
-        }
-        
-        for price in pricing:
-            options['pricing_options'].append({
-                'id': price.id,
-                'billing_unit': price.billing_unit,
-                'billing_unit_display': price.get_billing_unit_display(),
-                'price': price.price,
-                'currency': price.currency,
-                'effective_date': price.effective_date,
-                'expiry_date': price.expiry_date
-            })
-        
-        return options
+        return self.snapshot.pricing_options(self.service_tier.id, instrument.id)
 
 
 class PricingManager:
@@ -286,12 +153,13 @@ class PricingManager:
         return price
     
     def bulk_update_prices(self, price_updates: List[Dict[str, Any]]) -> List[ServicePrice]:
-        """Bulk update multiple prices"""
+        """Bulk update multiple prices, the pricing snapshot is rebuilt once they are all saved"""
         updated_prices = []
-        for update in price_updates:
-            price_id = update.pop('id')
-            price = self.update_service_price(price_id, **update)
-            updated_prices.append(price)
+        with transaction.atomic():
+            for update in price_updates:
+                price_id = update.pop('id')
+                price = self.update_service_price(price_id, **update)
+                updated_prices.append(price)
         return updated_prices
     
     def get_pricing_summary(self) -> Dict[str, Any]:
@@ -393,108 +261,328 @@ class BillingRecordManager:
         return record
 
 
-class PublicPricingService:
-    """Service for displaying public pricing information"""
-    
-    def __init__(self, lab_group: Optional[LabGroup] = None):
-        self.lab_group = lab_group
-        self.billing_service = BillingService(lab_group)
-    
-    def get_public_pricing_display(self) -> Dict[str, Any]:
-        """Get pricing information formatted for public display"""
-        service_tiers = self.billing_service.get_active_service_tiers()
-        
+class BillingEngine:
+    """
+    Prices instrument jobs in bulk. The active prices of the service tiers are read with one query
+    into a lookup keyed by (service tier id, instrument id, billing unit), so pricing any number of
+    jobs takes no further queries:
+
+        engine = BillingEngine([service_tier])
+        charges = engine.price_jobs(jobs, service_tier)
+        records = engine.generate_records(service_tier, start_date, end_date)
+
+    Jobs are charged per hour of instrument and personnel time, as calculate_billing always did.
+    """
+
+    CENT = Decimal('0.01')
+
+    def __init__(self, service_tiers: Iterable[ServiceTier], on_date: Optional[date] = None):
+        on_date = on_date or timezone.now().date()
+        prices = ServicePrice.objects.filter(
+            service_tier__in=list(service_tiers),
+            is_active=True,
+            effective_date__lte=on_date
+        ).filter(
+            Q(expiry_date__isnull=True) | Q(expiry_date__gte=on_date)
+        )
+        self.prices = {
+            (price.service_tier_id, price.instrument_id, price.billing_unit): price
+            for price in prices
+        }
+
+    def get_price(self, service_tier_id: int, instrument_id: int, billing_unit: str) -> Optional[ServicePrice]:
+        return self.prices.get((service_tier_id, instrument_id, billing_unit))
+
+    def _charge(self, price: Optional[ServicePrice], quantity) -> Decimal:
+        if not price or not quantity:
+            return Decimal('0.00')
+        return (Decimal(str(quantity)) * price.price).quantize(self.CENT)
+
+    def price_job(self, job: InstrumentJob, service_tier_id: int) -> Dict[str, Any]:
+        """Charges of a job under a service tier"""
+        instrument_price = self.get_price(service_tier_id, job.instrument_id, 'per_hour_instrument')
+        personnel_price = self.get_price(service_tier_id, job.instrument_id, 'per_hour_personnel')
+        instrument_cost = self._charge(instrument_price, job.instrument_hours)
+        personnel_cost = self._charge(personnel_price, job.personnel_hours)
+        currency = next((price.currency for price in (instrument_price, personnel_price) if price), 'USD')
+
+        return {
+            'job_id': job.id,
+            'instrument_hours': job.instrument_hours,
+            'instrument_rate': instrument_price.price if instrument_price else None,
+            'instrument_cost': instrument_cost,
+            'personnel_hours': job.personnel_hours,
+            'personnel_rate': personnel_price.price if personnel_price else None,
+            'personnel_cost': personnel_cost,
+            'total_amount': instrument_cost + personnel_cost,
+            'currency': currency
+        }
+
+    def price_jobs(self, jobs: Iterable[InstrumentJob], service_tier: ServiceTier) -> List[Dict[str, Any]]:
+        """Charges of every job under a service tier"""
+        return [self.price_job(job, service_tier.id) for job in jobs]
+
+    def build_record(self, job: InstrumentJob, service_tier: ServiceTier) -> Optional[BillingRecord]:
+        """Unsaved billing record of a job, or None when no price of the tier applies to it"""
+        charges = self.price_job(job, service_tier.id)
+        if charges['instrument_rate'] is None and charges['personnel_rate'] is None:
+            return None
+        return BillingRecord(
+            user_id=job.user_id,
+            instrument_job=job,
+            service_tier=service_tier,
+            instrument_hours=Decimal(str(charges['instrument_hours'])).quantize(self.CENT),
+            instrument_rate=charges['instrument_rate'],
+            instrument_cost=charges['instrument_cost'],
+            personnel_hours=Decimal(str(charges['personnel_hours'])).quantize(self.CENT),
+            personnel_rate=charges['personnel_rate'],
+            personnel_cost=charges['personnel_cost'],
+            total_amount=charges['total_amount']
+        )
+
+    def billable_jobs(self, service_tier: ServiceTier, start_date: date, end_date: date) -> QuerySet:
+        """
+        Jobs of the lab group of the tier completed within the billing period that have no billing
+        record under the tier yet, other than cancelled ones
+        """
+        billed = BillingRecord.objects.filter(service_tier=service_tier).exclude(
+            status='cancelled'
+        ).values('instrument_job_id')
+        return InstrumentJob.objects.filter(
+            service_lab_group_id=service_tier.lab_group_id,
+            status='completed',
+            completed_at__date__gte=start_date,
+            completed_at__date__lte=end_date,
+            user__isnull=False,
+            instrument__isnull=False
+        ).exclude(id__in=billed).only(
+            'id', 'user_id', 'instrument_id', 'sample_number', 'instrument_start_time', 'instrument_end_time',
+            'personnel_start_time', 'personnel_end_time'
+        ).order_by('id')
+
+    def generate_records(self, service_tier: ServiceTier, start_date: date, end_date: date) -> List[BillingRecord]:
+        """
+        Create the billing records of the billable jobs of a billing period with bulk inserts and refresh
+        the monthly totals of the lab group, see BillingMonthlyTotal
+        """
+        records = []
+        for job in self.billable_jobs(service_tier, start_date, end_date).iterator(chunk_size=1000):
+            record = self.build_record(job, service_tier)
+            if record:
+                records.append(record)
+        if not records:
+            return records
+        with transaction.atomic():
+            BillingRecord.objects.bulk_create(records, batch_size=1000)
+            BillingMonthlyTotal.refresh(service_tier.lab_group_id, records[0].billing_date)
+        return records
+
+
+class PricingSnapshot:
+    """
+    In-memory copy of the public pricing: core facility lab groups, active service tiers, the enabled
+    and the priced instruments and the prices in effect today, read with four queries.
+
+    Snapshots are versioned. The version is kept in the cache and replaced whenever a service tier,
+    price, instrument or lab group is saved or deleted, see invalidate. Each process keeps the snapshot
+    of the current version and only reads the version from the cache on later requests, the first
+    process to see a new version builds its snapshot and shares it through the cache:
+
+        snapshot = PricingSnapshot.current()
+        quote = snapshot.calculate_quote(service_tier_id, quote_request)
+
+    Without a reachable cache every call builds a snapshot of its own.
+    """
+
+    _current: Optional['PricingSnapshot'] = None
+
+    def __init__(self, version: Optional[str] = None, on_date: Optional[date] = None):
+        self.version = version
+        self.on_date = on_date or timezone.now().date()
+        self.built_at = timezone.now()
+        self.lab_groups = {
+            lab_group['id']: lab_group
+            for lab_group in LabGroup.objects.filter(is_core_facility=True).order_by('id').values(
+                'id', 'name', 'description'
+            )
+        }
+        self.service_tiers = {
+            tier['id']: tier
+            for tier in ServiceTier.objects.filter(is_active=True).order_by('name', 'id').values(
+                'id', 'name', 'description', 'lab_group_id'
+            )
+        }
+        units = dict(ServicePrice.BILLING_UNIT_CHOICES)
+        self.prices = []
+        for price in ServicePrice.objects.filter(
+            is_active=True,
+            service_tier__is_active=True,
+            effective_date__lte=self.on_date
+        ).filter(
+            Q(expiry_date__isnull=True) | Q(expiry_date__gte=self.on_date)
+        ).order_by(
+            'service_tier__name', 'instrument__instrument_name', 'billing_unit'
+        ).values(
+            'id', 'service_tier_id', 'instrument_id', 'billing_unit', 'price', 'currency', 'effective_date', 'expiry_date'
+        ):
+            price['billing_unit_display'] = units.get(price['billing_unit'], price['billing_unit'])
+            self.prices.append(price)
+        self.instruments = {
+            instrument['id']: instrument
+            for instrument in Instrument.objects.filter(
+                Q(enabled=True) | Q(id__in={price['instrument_id'] for price in self.prices})
+            ).order_by('id').values('id', 'instrument_name', 'instrument_description', 'enabled')
+        }
+
+    @staticmethod
+    def cached_version() -> Optional[str]:
+        """Version of the pricing shared through the cache, None when the cache cannot be reached"""
+        try:
+            version = cache.get(PRICING_VERSION_KEY)
+            if version is None:
+                cache.add(PRICING_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+                version = cache.get(PRICING_VERSION_KEY)
+            return version
+        except Exception as e:
+            logger.warning(f"Pricing snapshot version unavailable: {e}")
+            return None
+
+    @classmethod
+    def invalidate(cls):
+        """Start a new version of the pricing, snapshots are rebuilt on their next use"""
+        cls._current = None
+        try:
+            cache.set(PRICING_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        except Exception as e:
+            logger.warning(f"Pricing snapshot version not replaced: {e}")
+
+    @classmethod
+    def current(cls) -> 'PricingSnapshot':
+        """Snapshot of the current version, from memory, then from the cache, then built"""
+        version = cls.cached_version()
+        today = timezone.now().date()
+        if version is None:
+            return cls(on_date=today)
+        snapshot = cls._current
+        if snapshot and snapshot.version == version and snapshot.on_date == today:
+            return snapshot
+
+        key = f'public_pricing_snapshot:{version}:{today.isoformat()}'
+        try:
+            snapshot = cache.get(key)
+        except Exception as e:
+            logger.warning(f"Pricing snapshot unavailable: {e}")
+            snapshot = None
+        if snapshot is None:
+            snapshot = cls(version, today)
+            try:
+                cache.set(key, snapshot, timeout=PRICING_SNAPSHOT_TIMEOUT)
+            except Exception as e:
+                logger.warning(f"Pricing snapshot not shared: {e}")
+        cls._current = snapshot
+        return snapshot
+
+    def etag(self, *parts) -> Optional[str]:
+        """Entity tag of a response built from this snapshot, None for snapshots without a version"""
+        if not self.version:
+            return None
+        key = ':'.join([self.version, self.on_date.isoformat(), *map(str, parts)])
+        return '"%s"' % hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+
+    def get_service_tiers(self, lab_group_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        return [
+            tier for tier in self.service_tiers.values()
+            if lab_group_id is None or tier['lab_group_id'] == lab_group_id
+        ]
+
+    def get_prices(self, lab_group_id: Optional[int] = None, service_tier_id: Optional[int] = None,
+                   instrument_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        return [
+            price for price in self.prices
+            if (lab_group_id is None or self.service_tiers[price['service_tier_id']]['lab_group_id'] == lab_group_id)
+            and (service_tier_id is None or price['service_tier_id'] == service_tier_id)
+            and (instrument_id is None or price['instrument_id'] == instrument_id)
+        ]
+
+    def _instrument_info(self, instrument_id: int) -> Dict[str, Any]:
+        instrument = self.instruments[instrument_id]
+        return {
+            'id': instrument['id'],
+            'name': instrument['instrument_name'],
+            'description': instrument['instrument_description']
+        }
+
+    def _tier_info(self, service_tier_id: int) -> Dict[str, Any]:
+        tier = self.service_tiers[service_tier_id]
+        return {
+            'id': tier['id'],
+            'name': tier['name'],
+            'description': tier['description']
+        }
+
+    def pricing_display(self, lab_group_id: Optional[int] = None) -> Dict[str, Any]:
+        """Pricing of the active service tiers of a lab group, or of all of them, for public display"""
+        lab_group = self.lab_groups.get(lab_group_id) if lab_group_id else None
         pricing_display = {
             'lab_group': {
-                'id': self.lab_group.id if self.lab_group else None,
-                'name': self.lab_group.name if self.lab_group else 'All Services',
-                'description': self.lab_group.description if self.lab_group else ''
+                'id': lab_group['id'] if lab_group else None,
+                'name': lab_group['name'] if lab_group else 'All Services',
+                'description': lab_group['description'] if lab_group else ''
             },
             'service_tiers': [],
             'instruments': [],
-            'last_updated': timezone.now()
+            'last_updated': self.built_at
         }
-        
-        # Get all instruments with active pricing
-        instruments_with_pricing = set()
-        all_pricing = self.billing_service.get_active_pricing()
-        
-        for tier in service_tiers:
-            tier_pricing = all_pricing.filter(service_tier=tier)
-            
-            tier_data = {
-                'id': tier.id,
-                'name': tier.name,
-                'description': tier.description,
-                'instruments': []
-            }
-            
+
+        all_pricing = self.get_prices(lab_group_id=lab_group_id)
+        for tier in self.get_service_tiers(lab_group_id):
             # Group pricing by instrument
             tier_instruments = {}
-            for price in tier_pricing:
-                instrument = price.instrument
-                instruments_with_pricing.add(instrument)
-                
-                if instrument.id not in tier_instruments:
-                    tier_instruments[instrument.id] = {
-                        'id': instrument.id,
-                        'name': instrument.instrument_name,
-                        'description': instrument.instrument_description,
+            for price in all_pricing:
+                if price['service_tier_id'] != tier['id']:
+                    continue
+                if price['instrument_id'] not in tier_instruments:
+                    tier_instruments[price['instrument_id']] = {
+                        **self._instrument_info(price['instrument_id']),
                         'pricing': []
                     }
-                
-                tier_instruments[instrument.id]['pricing'].append({
-                    'billing_unit': price.billing_unit,
-                    'billing_unit_display': price.get_billing_unit_display(),
-                    'price': price.price,
-                    'currency': price.currency
+                tier_instruments[price['instrument_id']]['pricing'].append({
+                    'billing_unit': price['billing_unit'],
+                    'billing_unit_display': price['billing_unit_display'],
+                    'price': price['price'],
+                    'currency': price['currency']
                 })
-            
-            tier_data['instruments'] = list(tier_instruments.values())
-            pricing_display['service_tiers'].append(tier_data)
-        
+            pricing_display['service_tiers'].append({
+                **self._tier_info(tier['id']),
+                'instruments': list(tier_instruments.values())
+            })
+
         # Add instruments summary
-        for instrument in instruments_with_pricing:
-            instrument_pricing = all_pricing.filter(instrument=instrument)
-            
-            price_range = {
-                'min_price': min(p.price for p in instrument_pricing),
-                'max_price': max(p.price for p in instrument_pricing),
-                'currency': 'USD'
-            }
-            
+        by_instrument = {}
+        for price in all_pricing:
+            by_instrument.setdefault(price['instrument_id'], []).append(price)
+        for instrument_id in sorted(by_instrument, key=lambda instrument_id: self.instruments[instrument_id]['instrument_name']):
+            instrument_pricing = by_instrument[instrument_id]
             pricing_display['instruments'].append({
-                'id': instrument.id,
-                'name': instrument.instrument_name,
-                'description': instrument.instrument_description,
-                'price_range': price_range,
-                'available_tiers': len(set(p.service_tier.id for p in instrument_pricing))
+                **self._instrument_info(instrument_id),
+                'price_range': {
+                    'min_price': min(price['price'] for price in instrument_pricing),
+                    'max_price': max(price['price'] for price in instrument_pricing),
+                    'currency': 'USD'
+                },
+                'available_tiers': len({price['service_tier_id'] for price in instrument_pricing})
             })
-        
+
         return pricing_display
-    
-    def generate_quote_form_config(self) -> Dict[str, Any]:
-        """Generate configuration for quote request form"""
-        instruments = Instrument.objects.filter(enabled=True)
-        service_tiers = self.billing_service.get_active_service_tiers()
-        
-        form_config = {
+
+    def quote_form_config(self, lab_group_id: Optional[int] = None) -> Dict[str, Any]:
+        """Configuration of the quote request form"""
+        return {
             'instruments': [
-                {
-                    'id': inst.id,
-                    'name': inst.instrument_name,
-                    'description': inst.instrument_description
-                }
-                for inst in instruments
-            ],
-            'service_tiers': [
-                {
-                    'id': tier.id,
-                    'name': tier.name,
-                    'description': tier.description
-                }
-                for tier in service_tiers
+                self._instrument_info(instrument_id)
+                for instrument_id, instrument in self.instruments.items() if instrument['enabled']
             ],
+            'service_tiers': [self._tier_info(tier['id']) for tier in self.get_service_tiers(lab_group_id)],
             'billing_units': [
                 {'value': choice[0], 'display': choice[1]}
                 for choice in ServicePrice.BILLING_UNIT_CHOICES
@@ -507,5 +595,115 @@ class PublicPricingService:
                 ]
             }
         }
-        
-        return form_config
\ No newline at end of file
+
+    def pricing_options(self, service_tier_id: int, instrument_id: int) -> Dict[str, Any]:
+        """All pricing options of an instrument under a service tier"""
+        return {
+            'instrument': self._instrument_info(instrument_id),
+            'service_tier': self._tier_info(service_tier_id),
+            'pricing_options': [
+                {
+                    'id': price['id'],
+                    'billing_unit': price['billing_unit'],
+                    'billing_unit_display': price['billing_unit_display'],
+                    'price': price['price'],
+                    'currency': price['currency'],
+                    'effective_date': price['effective_date'],
+                    'expiry_date': price['expiry_date']
+                }
+                for price in self.get_prices(service_tier_id=service_tier_id, instrument_id=instrument_id)
+            ]
+        }
+
+    def calculate_quote(self, service_tier_id: int, quote_request: Dict[str, Any]) -> Dict[str, Any]:
+        """Quote of a service tier for the request parameters, see QuoteCalculator.calculate_quote"""
+        try:
+            instrument_id = int(quote_request['instrument_id'])
+            if instrument_id not in self.instruments:
+                return {
+                    'success': False,
+                    'error': 'Instrument not found'
+                }
+            pricing = {
+                price['billing_unit']: price
+                for price in self.get_prices(service_tier_id=service_tier_id, instrument_id=instrument_id)
+            }
+            
+            quote_details = {
+                'instrument': self._instrument_info(instrument_id),
+                'service_tier': self._tier_info(service_tier_id),
+                'line_items': [],
+                'subtotal': Decimal('0.00'),
+                'total': Decimal('0.00'),
+                'currency': 'USD',
+                'valid_until': (timezone.now() + timedelta(days=30)).date(),
+                'generated_at': timezone.now()
+            }
+            
+            def add_line_item(billing_unit: str, description: str, quantity):
+                price = pricing.get(billing_unit)
+                if price:
+                    cost = price['price'] * Decimal(str(quantity))
+                    quote_details['line_items'].append({
+                        'type': billing_unit,
+                        'description': description,
+                        'quantity': quantity,
+                        'unit_price': price['price'],
+                        'total_price': cost,
+                        'billing_unit': billing_unit
+                    })
+                    quote_details['subtotal'] += cost
+            
+            # Calculate sample-based pricing
+            samples = quote_request.get('samples', 0)
+            if samples > 0:
+                add_line_item('per_sample', f'Sample Analysis ({samples} samples)', samples)
+            
+            # Calculate injection-based pricing
+            injections = quote_request.get('injections_per_sample', 0) * samples
+            if injections > 0:
+                add_line_item('per_injection', f'Injections ({injections} injections)', injections)
+            
+            # Calculate instrument time pricing
+            instrument_hours = quote_request.get('estimated_instrument_hours', 0)
+            if instrument_hours > 0:
+                add_line_item('per_hour_instrument', f'Instrument Time ({instrument_hours} hours)', instrument_hours)
+            
+            # Calculate personnel time pricing
+            personnel_hours = quote_request.get('estimated_personnel_hours', 0)
+            if personnel_hours > 0:
+                add_line_item('per_hour_personnel', f'Personnel Time ({personnel_hours} hours)', personnel_hours)
+            
+            # Add flat rate services
+            flat_rate = pricing.get('flat_rate')
+            if flat_rate and quote_request.get(f'include_flat_rate_{flat_rate["id"]}', False):
+                add_line_item('flat_rate', 'Flat Rate Service', 1)
+            
+            quote_details['total'] = quote_details['subtotal']
+            
+            return {
+                'success': True,
+                'quote': quote_details
+            }
+            
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Quote calculation failed: {str(e)}'
+            }
+
+
+class PublicPricingService:
+    """Service for displaying public pricing information, from the current pricing snapshot"""
+    
+    def __init__(self, lab_group: Optional[LabGroup] = None, snapshot: Optional[PricingSnapshot] = None):
+        self.lab_group = lab_group
+        self.snapshot = snapshot or PricingSnapshot.current()
+    
+    def get_public_pricing_display(self) -> Dict[str, Any]:
+        """Get pricing information formatted for public display"""
+        return self.snapshot.pricing_display(self.lab_group.id if self.lab_group else None)
+    
+    def generate_quote_form_config(self) -> Dict[str, Any]:
+        """Generate configuration for quote request form"""
+        return self.snapshot.quote_form_config(self.lab_group.id if self.lab_group else None)
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from cc.models import Instrument
+from cc.services.instrument_checks import InstrumentChecker
 
 
 class Command(BaseCommand):
@@ -33,23 +34,15 @@ class Command(BaseCommand):
         days_threshold = options['days']
         maintenance_days = options['maintenance_days']
 
+        instruments = Instrument.objects.filter(enabled=True)
         if options['warranty_only']:
-            warranty_count = 0
-            maintenance_count = 0
-            instruments = Instrument.objects.filter(enabled=True)
-            for instrument in instruments:
-                if instrument.check_warranty_expiration(days_threshold):
-                    warranty_count += 1
+            warranty_count = len(InstrumentChecker(instruments, warranty_days=days_threshold).check_warranties())
 
             self.stdout.write(
                 self.style.SUCCESS(f'Sent {warranty_count} warranty expiration notifications')
             )
         elif options['maintenance_only']:
-            maintenance_count = 0
-            instruments = Instrument.objects.filter(enabled=True)
-            for instrument in instruments:
-                if instrument.check_upcoming_maintenance(maintenance_days):
-                    maintenance_count += 1
+            maintenance_count = len(InstrumentChecker(instruments, maintenance_days=maintenance_days).check_maintenance())
 
             self.stdout.write(
                 self.style.SUCCESS(f'Sent {maintenance_count} maintenance notifications')
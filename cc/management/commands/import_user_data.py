@@ -5,7 +5,7 @@ from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth.models import User
 from django.db import transaction
 from cc.utils.user_data_import_revised import import_user_data_revised, UserDataImportDryRun
-from cc.utils.archive_schema_migrator import ArchiveSchemaMigrator, migrate_archive_if_needed
+from cc.utils.archive_schema_migrator import ArchiveSchemaMigrator
 import os
 import json
 import tempfile
@@ -70,6 +70,11 @@ class Command(BaseCommand):
         )
 
     def handle(self, *args, **options):
+        # A migrated database is written here and removed with the directory however the import ends
+        with tempfile.TemporaryDirectory(prefix='cupcake_migrated_db_') as migration_dir:
+            self._import(migration_dir, **options)
+
+    def _import(self, migration_dir, **options):
         target_username = options['target_username']
         archive_path = options['archive_path']
         merge_strategy = options['merge_strategy']
@@ -94,8 +99,9 @@ class Command(BaseCommand):
             raise CommandError(f'Archive file does not exist: {archive_path}')
         
         # STEP 0: Check and migrate schema if needed (unless skipped)
-        final_archive_path = archive_path
         migration_performed = False
+        # A migrated database is imported together with the original archive
+        migrated_database_path = None
         
         if not skip_migration_check:
             self.stdout.write(self.style.WARNING('STEP 0: CHECKING SCHEMA COMPATIBILITY'))
@@ -104,24 +110,9 @@ class Command(BaseCommand):
                 # Check if migration is needed
                 migrator = ArchiveSchemaMigrator(archive_path)
                 
-                # Quick version check (without full extraction)
-                temp_dir = tempfile.mkdtemp(prefix='cupcake_version_check_')
+                # Quick version check, only the database is extracted
                 try:
-                    # Extract just enough to check version
-                    if archive_path.endswith('.zip'):
-                        import zipfile
-                        with zipfile.ZipFile(archive_path, 'r') as zip_ref:
-                            zip_ref.extractall(temp_dir)
-                    else:
-                        import tarfile
-                        with tarfile.open(archive_path, 'r:gz') as tar_ref:
-                            tar_ref.extractall(temp_dir)
-                    
-                    # Find SQLite database
-                    migrator.temp_dir = temp_dir
-                    migrator.sqlite_path = migrator._find_sqlite_db()
-                    
-                    if migrator.sqlite_path:
+                    if migrator.extract_database():
                         current_version, _ = migrator.detect_schema_version()
                         target_version = "1.7.0"  # Current version
                         
@@ -135,23 +126,16 @@ class Command(BaseCommand):
                                 )
                                 self.stdout.write('Performing automatic migration...')
                                 
-                                # Create migrated archive
-                                base, ext = os.path.splitext(archive_path)
-                                if ext == '.gz':
-                                    base, ext2 = os.path.splitext(base)
-                                    ext = ext2 + ext
-                                
-                                migrated_path = f"{base}_migrated{ext}"
-                                
-                                migration_result = migrate_archive_if_needed(
-                                    archive_path, target_version, migrated_path
+                                # Migrate the database only, the archive is not rewritten
+                                migrated_database_path = os.path.join(migration_dir, 'user_data.sqlite')
+                                migration_result = migrator.migrate_archive(
+                                    database_output_path=migrated_database_path
                                 )
                                 
                                 if migration_result['success']:
-                                    final_archive_path = migrated_path
                                     migration_performed = True
                                     self.stdout.write(
-                                        self.style.SUCCESS(f'✅ Schema migrated successfully to: {migrated_path}')
+                                        self.style.SUCCESS(f'✅ Schema migrated successfully to: {migrated_database_path}')
                                     )
                                 else:
                                     raise CommandError(f'Schema migration failed: {migration_result.get("error", "Unknown error")}')
@@ -181,8 +165,7 @@ class Command(BaseCommand):
                             )
                     
                 finally:
-                    if os.path.exists(temp_dir):
-                        shutil.rmtree(temp_dir)
+                    migrator.cleanup()
                         
             except Exception as e:
                 if auto_migrate:
@@ -215,15 +198,17 @@ class Command(BaseCommand):
 
         # STEP 1: Always perform dry run analysis first
         self.stdout.write(self.style.WARNING('STEP 1: PERFORMING DRY RUN ANALYSIS'))
-        self.stdout.write(f'Archive: {final_archive_path}')
+        self.stdout.write(f'Archive: {archive_path}')
         if migration_performed:
-            self.stdout.write(f'Original archive: {archive_path}')
+            self.stdout.write(f'Migrated database: {migrated_database_path}')
         if import_options:
             self.stdout.write(f'Import options: {import_options}')
         
         try:
-            # Perform dry run analysis using the potentially migrated archive
-            dry_runner = UserDataImportDryRun(target_user, final_archive_path, import_options)
+            # Perform dry run analysis using the potentially migrated database
+            dry_runner = UserDataImportDryRun(
+                target_user, archive_path, import_options, database_path=migrated_database_path
+            )
             analysis_result = dry_runner.analyze_import()
             
             self.stdout.write(
@@ -324,7 +309,9 @@ class Command(BaseCommand):
                     savepoint = transaction.savepoint()
                     
                     try:
-                        result = import_user_data_revised(target_user, final_archive_path)
+                        result = import_user_data_revised(
+                            target_user, archive_path, database_path=migrated_database_path
+                        )
                         
                         if result['success']:
                             # Commit the savepoint
@@ -397,15 +384,15 @@ class Command(BaseCommand):
                 raise CommandError(f'Import process failed: {str(e)}')
         
         finally:
-            # Cleanup migrated archive if it was created
-            if migration_performed and final_archive_path != archive_path:
+            # Cleanup migrated database if it was created
+            if migrated_database_path:
                 try:
-                    if os.path.exists(final_archive_path):
-                        os.remove(final_archive_path)
-                        self.stdout.write(f'Cleaned up temporary migrated archive: {final_archive_path}')
+                    shutil.rmtree(os.path.dirname(migrated_database_path), ignore_errors=True)
+                    if migration_performed:
+                        self.stdout.write(f'Cleaned up temporary migrated database: {migrated_database_path}')
                 except Exception as cleanup_error:
                     self.stdout.write(
-                        self.style.WARNING(f'Warning: Could not clean up migrated archive: {cleanup_error}')
+                        self.style.WARNING(f'Warning: Could not clean up migrated database: {cleanup_error}')
                     )
 
     def _display_dry_run_report(self, analysis_result):
@@ -2,7 +2,8 @@
 Django management command to migrate SQLite export archives between schema versions
 """
 from django.core.management.base import BaseCommand, CommandError
-from cc.utils.archive_schema_migrator import ArchiveSchemaMigrator, migrate_archive_if_needed
+from cc.utils.archive_schema_migrator import ArchiveSchemaMigrator
+from cc.utils.archive_reader import detect_archive_format
 import os
 
 
@@ -13,13 +14,18 @@ class Command(BaseCommand):
         parser.add_argument(
             'archive_path',
             type=str,
-            help='Path to the export archive (ZIP or TAR.GZ)'
+            help='Path to the export archive (ZIP, TAR, TAR.GZ or TAR.ZST)'
         )
         parser.add_argument(
             '--output',
             type=str,
             help='Path for the migrated archive (default: adds _migrated to original name)'
         )
+        parser.add_argument(
+            '--database-output',
+            type=str,
+            help='Only write the migrated database to this path, to import it together with the original archive'
+        )
         parser.add_argument(
             '--target-version',
             type=str,
@@ -40,6 +46,7 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         archive_path = options['archive_path']
         output_path = options.get('output')
+        database_output_path = options.get('database_output')
         target_version = options['target_version']
         check_only = options['check_only']
         force = options['force']
@@ -49,11 +56,13 @@ class Command(BaseCommand):
             raise CommandError(f'Archive file does not exist: {archive_path}')
 
         # Validate archive format
-        if not (archive_path.endswith('.zip') or archive_path.endswith(('.tar.gz', '.tgz'))):
-            raise CommandError('Archive must be ZIP or TAR.GZ format')
+        try:
+            detect_archive_format(archive_path)
+        except ValueError:
+            raise CommandError('Archive must be ZIP, TAR, TAR.GZ or TAR.ZST format')
 
         # Generate output path if not provided
-        if not output_path and not check_only:
+        if not output_path and not database_output_path and not check_only:
             base, ext = os.path.splitext(archive_path)
             if ext == '.gz':
                 base, ext2 = os.path.splitext(base)
@@ -67,24 +76,9 @@ class Command(BaseCommand):
             # Create migrator instance
             migrator = ArchiveSchemaMigrator(archive_path, target_version)
             
-            # Extract archive temporarily to analyze
-            import tempfile
-            migrator.temp_dir = tempfile.mkdtemp(prefix='cupcake_analysis_')
-            
             try:
-                # Extract archive for analysis
-                if archive_path.endswith('.zip'):
-                    import zipfile
-                    with zipfile.ZipFile(archive_path, 'r') as zip_ref:
-                        zip_ref.extractall(migrator.temp_dir)
-                else:
-                    import tarfile
-                    with tarfile.open(archive_path, 'r:gz') as tar_ref:
-                        tar_ref.extractall(migrator.temp_dir)
-                
-                # Find SQLite database
-                migrator.sqlite_path = migrator._find_sqlite_db()
-                if not migrator.sqlite_path:
+                # Extract only the database for analysis, media stays in the archive
+                if not migrator.extract_database():
                     raise CommandError("No SQLite database found in archive")
                 
                 # Detect current version
@@ -134,9 +128,12 @@ class Command(BaseCommand):
                 self.stdout.write('\n' + '='*60)
                 self.stdout.write('PERFORMING MIGRATION')
                 self.stdout.write('='*60)
-                self.stdout.write(f'Output archive: {output_path}')
+                if output_path:
+                    self.stdout.write(f'Output archive: {output_path}')
+                if database_output_path:
+                    self.stdout.write(f'Output database: {database_output_path}')
                 
-                result = migrator.migrate_archive(output_path)
+                result = migrator.migrate_archive(output_path, database_output_path)
                 
                 if result['success']:
                     self.stdout.write(
@@ -149,8 +146,14 @@ class Command(BaseCommand):
                         for log_entry in result['migration_log']:
                             self.stdout.write(f'  • {log_entry}')
                     
+                    if database_output_path and os.path.exists(database_output_path):
+                        self.stdout.write(f'\nMigrated database created: {database_output_path}')
+                        self.stdout.write(
+                            'Import it with the original archive by passing it as database_path to the importer.'
+                        )
+                    
                     # Verify output file
-                    if os.path.exists(output_path):
+                    if output_path and os.path.exists(output_path):
                         file_size = os.path.getsize(output_path) / (1024 * 1024)
                         self.stdout.write(f'\nMigrated archive created: {output_path} ({file_size:.2f} MB)')
                         self.stdout.write('You can now use this migrated archive for import.')
@@ -169,9 +172,7 @@ class Command(BaseCommand):
             
             finally:
                 # Cleanup temporary directory
-                if migrator.temp_dir and os.path.exists(migrator.temp_dir):
-                    import shutil
-                    shutil.rmtree(migrator.temp_dir)
+                migrator.cleanup()
 
         except Exception as e:
             raise CommandError(f'Migration process failed: {str(e)}')
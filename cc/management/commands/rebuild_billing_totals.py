@@ -0,0 +1,13 @@
+"""
+Django management command to rebuild the monthly billing totals from the billing records
+"""
+from django.core.management.base import BaseCommand
+from cc.models import BillingMonthlyTotal
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the monthly billing totals of lab groups from their billing records'
+
+    def handle(self, *args, **options):
+        rows = BillingMonthlyTotal.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} monthly billing totals'))
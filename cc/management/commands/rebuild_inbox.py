@@ -0,0 +1,27 @@
+"""
+Django management command to rebuild the inbox entries and unread counters of users from their threads
+"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from cc.services import inbox
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the inbox entries of users from the threads they can see and reconcile their unread counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            nargs='+',
+            help='IDs of the users to rebuild (default: all users)'
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id')
+        if options['user']:
+            users = users.filter(id__in=options['user'])
+
+        user_ids = list(users.values_list('id', flat=True))
+        total = inbox.reconcile(user_ids)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {total} inbox entries of {len(user_ids)} users'))
@@ -0,0 +1,30 @@
+"""
+Django management command to rebuild the daily instrument utilization rollup from the bookings
+"""
+from django.core.management.base import BaseCommand
+from cc.models import Instrument, InstrumentUsageDay
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily utilization rollup of instruments from their bookings'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--instrument',
+            type=int,
+            nargs='+',
+            help='IDs of the instruments to rebuild (default: all instruments)'
+        )
+
+    def handle(self, *args, **options):
+        instruments = Instrument.objects.order_by('id')
+        if options['instrument']:
+            instruments = instruments.filter(id__in=options['instrument'])
+
+        total = 0
+        for instrument_id, instrument_name in instruments.values_list('id', 'instrument_name'):
+            rows = InstrumentUsageDay.rebuild(instrument_id)
+            total += rows
+            self.stdout.write(f'{instrument_name}: {rows} daily rows')
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {total} daily utilization rows'))
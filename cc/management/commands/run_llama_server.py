@@ -0,0 +1,77 @@
+"""
+Django management command to run the warm llama.cpp server as a sidecar.
+
+Llama workers start the server on demand, this command is for deployments
+that prefer to supervise it as its own process or container.
+
+Usage:
+    python manage.py run_llama_server [--model /path/to/model.gguf] [--port 8179] [--parallel 2]
+"""
+
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from cc.services.llama_service import LlamaServer
+
+
+class Command(BaseCommand):
+    help = 'Run the warm llama.cpp summary server in the foreground'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model',
+            type=str,
+            default=settings.LLAMA_DEFAULT_MODEL,
+            help='Path to the gguf model to keep loaded'
+        )
+        parser.add_argument(
+            '--host',
+            type=str,
+            default=settings.LLAMA_SERVER_HOST,
+            help='Address to bind the server to'
+        )
+        parser.add_argument(
+            '--port',
+            type=int,
+            default=settings.LLAMA_SERVER_PORT,
+            help='Port to bind the server to'
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=settings.LLAMA_SERVER_THREAD_COUNT,
+            help='Number of inference threads'
+        )
+        parser.add_argument(
+            '--parallel',
+            type=int,
+            default=settings.LLAMA_SERVER_PARALLEL,
+            help='Number of concurrent generation slots, further requests are queued by the server'
+        )
+        parser.add_argument(
+            '--context',
+            type=int,
+            default=settings.LLAMA_SERVER_CONTEXT,
+            help='Context size per slot'
+        )
+
+    def handle(self, *args, **options):
+        server = LlamaServer(
+            settings.LLAMA_SERVER_PATH,
+            options['model'],
+            options['host'],
+            options['port'],
+            options['threads'],
+            options['parallel'],
+            options['context'],
+        )
+        if not server.is_available():
+            raise CommandError(f"llama.cpp server binary not found at {settings.LLAMA_SERVER_PATH}")
+        if server.is_running():
+            raise CommandError(f"A llama.cpp server is already running on {server.base_url}")
+
+        command = server.command()
+        self.stdout.write(f"Running: {' '.join(command)}")
+        os.execv(command[0], command)
@@ -0,0 +1,63 @@
+"""
+Django management command to run the persistent whisper.cpp server as a sidecar.
+
+Transcribe workers start the server on demand, this command is for deployments
+that prefer to supervise it as its own process or container.
+
+Usage:
+    python manage.py run_whisper_server [--model /path/to/ggml-model.bin] [--port 8178]
+"""
+
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from cc.services.transcription_service import WhisperServer
+
+
+class Command(BaseCommand):
+    help = 'Run the persistent whisper.cpp transcription server in the foreground'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model',
+            type=str,
+            default=settings.WHISPERCPP_DEFAULT_MODEL,
+            help='Path to the ggml whisper model to keep loaded'
+        )
+        parser.add_argument(
+            '--host',
+            type=str,
+            default=settings.WHISPERCPP_SERVER_HOST,
+            help='Address to bind the server to'
+        )
+        parser.add_argument(
+            '--port',
+            type=int,
+            default=settings.WHISPERCPP_SERVER_PORT,
+            help='Port to bind the server to'
+        )
+        parser.add_argument(
+            '--threads',
+            type=str,
+            default=settings.WHISPERCPP_THREAD_COUNT,
+            help='Number of inference threads'
+        )
+
+    def handle(self, *args, **options):
+        server = WhisperServer(
+            settings.WHISPERCPP_SERVER_PATH,
+            options['model'],
+            options['host'],
+            options['port'],
+            options['threads'],
+        )
+        if not server.is_available():
+            raise CommandError(f"whisper.cpp server binary not found at {settings.WHISPERCPP_SERVER_PATH}")
+        if server.is_running():
+            raise CommandError(f"A whisper.cpp server is already running on {server.base_url}")
+
+        command = server.command()
+        self.stdout.write(f"Running: {' '.join(command)}")
+        os.execv(command[0], command)
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-18 21:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cc', '0151_historicalsitesettings_allow_vaulted_object_deletion_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TranscriptionCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('language', models.CharField(default='auto', help_text='Language requested for the job', max_length=20)),
+                ('detected_language', models.CharField(blank=True, max_length=20, null=True)),
+                ('segments', models.JSONField(default=list, help_text='Completed segments as {start, end, text} in seconds')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('annotation', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='transcription_checkpoint', to='cc.annotation')),
+            ],
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-18 22:01
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cc', '0152_transcriptioncheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessingResultCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_type', models.CharField(choices=[('transcription', 'Transcription'), ('ocr', 'OCR'), ('summary', 'Summary'), ('summary_transcript', 'Transcript Summary')], max_length=30)),
+                ('cache_key', models.CharField(help_text='Hash of task type, content hash, model, language and parameters', max_length=64, unique=True)),
+                ('content_hash', models.CharField(db_index=True, help_text='SHA-256 of the processed audio, image or prompt', max_length=64)),
+                ('model_name', models.TextField(blank=True, null=True)),
+                ('language', models.CharField(blank=True, max_length=20, null=True)),
+                ('parameters', models.JSONField(default=dict)),
+                ('result', models.JSONField(default=dict)),
+                ('size_bytes', models.BigIntegerField(default=0)),
+                ('hit_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_accessed_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('annotation', models.ForeignKey(blank=True, help_text='Annotation the result was first computed for', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='processing_results', to='cc.annotation')),
+            ],
+            options={
+                'ordering': ['-last_accessed_at'],
+                'indexes': [models.Index(fields=['task_type', 'content_hash'], name='cc_processi_task_ty_30b169_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-18 23:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cc', '0153_processingresultcache'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('profile', models.CharField(default='default', max_length=100)),
+                ('exported_until', models.DateTimeField()),
+                ('last_export_id', models.UUIDField(blank=True, null=True)),
+                ('last_archive_path', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_watermarks', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-exported_until'],
+                'unique_together': {('user', 'profile')},
+            },
+        ),
+    ]
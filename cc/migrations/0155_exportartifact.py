@@ -0,0 +1,36 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:08
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cc', '0154_exportwatermark'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportArtifact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('export_type', models.CharField(choices=[('user_data', 'User Data'), ('protocol_data', 'Protocol Data'), ('session_data', 'Session Data'), ('docx', 'DOCX'), ('instrument_job_metadata', 'Instrument Job Metadata'), ('excel_template', 'Excel Template')], max_length=30)),
+                ('cache_key', models.CharField(help_text='Hash of export type, user, parameters and content version', max_length=64, unique=True)),
+                ('content_hash', models.CharField(help_text='Version hash of the exported objects', max_length=64)),
+                ('parameters', models.JSONField(default=dict)),
+                ('file_name', models.TextField(help_text='File name inside MEDIA_ROOT/temp')),
+                ('size_bytes', models.BigIntegerField(default=0)),
+                ('hit_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_accessed_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='export_artifacts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-last_accessed_at'],
+            },
+        ),
+    ]
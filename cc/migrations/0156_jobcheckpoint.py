@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cc', '0155_exportartifact'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_id', models.CharField(max_length=100, unique=True)),
+                ('job_name', models.CharField(max_length=100)),
+                ('stage', models.CharField(blank=True, max_length=100, null=True)),
+                ('table_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('offset', models.BigIntegerField(default=0)),
+                ('state', models.JSONField(default=dict)),
+                ('attempts', models.IntegerField(default=1)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-updated_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cc', '0156_jobcheckpoint'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='instrumentusage',
+            index=models.Index(fields=['instrument', 'time_started', 'time_ended'], name='cc_instrume_instrum_f6b827_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cc', '0157_instrumentusage_interval_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InstrumentAvailabilityDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('slot_minutes', models.IntegerField()),
+                ('busy', models.BinaryField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('instrument', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability_days', to='cc.instrument')),
+            ],
+            options={
+                'ordering': ['instrument', 'day'],
+                'unique_together': {('instrument', 'day')},
+            },
+        ),
+    ]
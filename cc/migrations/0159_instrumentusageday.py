@@ -0,0 +1,70 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:07
+
+from datetime import datetime, time, timedelta, timezone
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_usage_days(apps, schema_editor):
+    """Split the existing bookings into daily rows, as InstrumentUsageDay.rebuild does"""
+    InstrumentUsage = apps.get_model('cc', 'InstrumentUsage')
+    InstrumentUsageDay = apps.get_model('cc', 'InstrumentUsageDay')
+    bookings = InstrumentUsage.objects.filter(
+        instrument__isnull=False, time_started__isnull=False, time_ended__isnull=False
+    ).order_by('instrument_id').values_list(
+        'instrument_id', 'user_id', 'time_started', 'time_ended', 'maintenance', 'approved'
+    )
+    rows = {}
+    for instrument_id, user_id, time_started, time_ended, maintenance, approved in bookings.iterator():
+        if rows and next(iter(rows))[0] != instrument_id:
+            # Rows of the previous instrument are complete
+            InstrumentUsageDay.objects.bulk_create(rows.values(), batch_size=1000)
+            rows = {}
+        day = time_started.astimezone(timezone.utc).date()
+        while time_started < time_ended:
+            day_end = datetime.combine(day + timedelta(days=1), time.min, tzinfo=timezone.utc)
+            part = (min(time_ended, day_end) - time_started).total_seconds() / 3600
+            row = rows.setdefault(
+                (instrument_id, user_id, day),
+                InstrumentUsageDay(instrument_id=instrument_id, user_id=user_id, day=day)
+            )
+            if maintenance:
+                row.maintenance_hours += part
+            else:
+                row.booked_hours += part
+                if approved:
+                    row.approved_hours += part
+            time_started = day_end
+            day += timedelta(days=1)
+    InstrumentUsageDay.objects.bulk_create(rows.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cc', '0158_instrumentavailabilityday'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InstrumentUsageDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('booked_hours', models.FloatField(default=0)),
+                ('approved_hours', models.FloatField(default=0)),
+                ('maintenance_hours', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('instrument', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usage_days', to='cc.instrument')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='instrument_usage_days', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['instrument', 'day', 'user'],
+                'indexes': [models.Index(fields=['instrument', 'day'], name='cc_instrume_instrum_8f6c4a_idx'), models.Index(fields=['day'], name='cc_instrume_day_eb7d79_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_usage_days, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models.functions import TruncMonth
+
+
+def backfill_monthly_totals(apps, schema_editor):
+    """Total the existing billing records by lab group, month and status, as BillingMonthlyTotal.rebuild does"""
+    BillingRecord = apps.get_model('cc', 'BillingRecord')
+    BillingMonthlyTotal = apps.get_model('cc', 'BillingMonthlyTotal')
+    totals = BillingRecord.objects.annotate(
+        month=TruncMonth('billing_date'), lab_group_id=models.F('service_tier__lab_group_id')
+    ).values('lab_group_id', 'month', 'status').annotate(
+        record_count=models.Count('id'), total=models.Sum('total_amount')
+    ).order_by('lab_group_id', 'month', 'status')
+    BillingMonthlyTotal.objects.bulk_create(
+        (
+            BillingMonthlyTotal(
+                lab_group_id=row['lab_group_id'], month=row['month'], status=row['status'],
+                record_count=row['record_count'], total_amount=row['total'] or 0
+            )
+            for row in totals.iterator()
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cc', '0159_instrumentusageday'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BillingMonthlyTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('billed', 'Billed'), ('paid', 'Paid'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('record_count', models.IntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('lab_group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='billing_monthly_totals', to='cc.labgroup')),
+            ],
+            options={
+                'ordering': ['lab_group', 'month', 'status'],
+                'indexes': [models.Index(fields=['month', 'status'], name='cc_billingm_month_0d5a05_idx')],
+                'unique_together': {('lab_group', 'month', 'status')},
+            },
+        ),
+        migrations.RunPython(backfill_monthly_totals, migrations.RunPython.noop),
+    ]
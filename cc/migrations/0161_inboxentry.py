@@ -0,0 +1,81 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:10
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_inbox_entries(apps, schema_editor):
+    """Give users an entry for every thread they can see, as InboxEntry.rebuild does"""
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    LabGroup = apps.get_model('cc', 'LabGroup')
+    MessageThread = apps.get_model('cc', 'MessageThread')
+    MessageRecipient = apps.get_model('cc', 'MessageRecipient')
+    InboxEntry = apps.get_model('cc', 'InboxEntry')
+
+    members = defaultdict(set)
+    for lab_group_id, user_id in LabGroup.users.through.objects.values_list('labgroup_id', 'user_id').iterator():
+        members[lab_group_id].add(user_id)
+    participants = defaultdict(set)
+    for thread_id, user_id in MessageThread.participants.through.objects.values_list(
+        'messagethread_id', 'user_id'
+    ).iterator():
+        participants[thread_id].add(user_id)
+    announcements = set(MessageThread.objects.filter(
+        is_system_thread=True, messages__message_type='announcement'
+    ).values_list('id', flat=True))
+    unread = defaultdict(dict)
+    for thread_id, user_id, count in MessageRecipient.objects.filter(is_read=False, is_deleted=False).values(
+        'message__thread_id', 'user_id'
+    ).annotate(count=models.Count('id')).values_list('message__thread_id', 'user_id', 'count').iterator():
+        unread[thread_id][user_id] = count
+    everyone = None
+
+    threads = MessageThread.objects.values_list('id', 'updated_at', 'lab_group_id', 'creator_id')
+    for thread_id, updated_at, lab_group_id, creator_id in threads.iterator():
+        if thread_id in announcements:
+            if everyone is None:
+                everyone = set(User.objects.values_list('id', flat=True))
+            user_ids = everyone
+        else:
+            user_ids = participants.pop(thread_id, set()) | members.get(lab_group_id, set())
+            if creator_id:
+                user_ids.add(creator_id)
+        counts = unread.pop(thread_id, {})
+        InboxEntry.objects.bulk_create(
+            [
+                InboxEntry(user_id=user_id, thread_id=thread_id, thread_updated_at=updated_at,
+                           unread_count=counts.get(user_id, 0))
+                for user_id in user_ids
+            ],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cc', '0160_billingmonthlytotal'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InboxEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('thread_updated_at', models.DateTimeField()),
+                ('unread_count', models.IntegerField(default=0)),
+                ('thread', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inbox_entries', to='cc.messagethread')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inbox_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['user', '-thread_updated_at'],
+                'indexes': [models.Index(fields=['user', '-thread_updated_at'], name='cc_inboxent_user_id_9c7fce_idx')],
+                'unique_together': {('user', 'thread')},
+            },
+        ),
+        migrations.RunPython(backfill_inbox_entries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cc', '0161_inboxentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transcriptioncheckpoint',
+            name='translated_segments',
+            field=models.JSONField(default=list, help_text='Completed English translation segments'),
+        ),
+    ]
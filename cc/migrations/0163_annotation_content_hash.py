@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cc', '0162_transcriptioncheckpoint_translated_segments'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='annotation',
+            name='content_hash',
+            field=models.CharField(blank=True, help_text='SHA-256 of the file content, the key of its cached processing results', max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='historicalannotation',
+            name='content_hash',
+            field=models.CharField(blank=True, help_text='SHA-256 of the file content, the key of its cached processing results', max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cc', '0163_annotation_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobCheckpointEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100)),
+                ('data', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('checkpoint', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='cc.jobcheckpoint')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
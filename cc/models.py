@@ -1,18 +1,19 @@
-from datetime import datetime, timedelta
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
 import hashlib
+import json
+import os
 import requests
 from bs4 import BeautifulSoup
 from django.core import signing
 from django.db import models, transaction
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.db.models.functions import TruncMonth
 from django.dispatch import receiver
 from django.utils import timezone
 from rest_framework.authtoken.models import Token
 from cc.utils import default_columns
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
-from simple_history.models import HistoricalRecords
+from cc.utils.history import HistoricalRecords
 
 
 # Create your models here.
@@ -106,6 +107,25 @@ class ImportedRelationship(models.Model):
     def __str__(self):
         return f"{self.from_model}({self.from_object_id}) -> {self.to_model}({self.to_object_id})"
 
+
+class ExportWatermark(models.Model):
+    """Point in time up to which a user's data has been exported under an export profile"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="export_watermarks")
+    profile = models.CharField(max_length=100, default="default")
+    exported_until = models.DateTimeField()
+    last_export_id = models.UUIDField(blank=True, null=True)
+    last_archive_path = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label = "cc"
+        unique_together = ['user', 'profile']
+        ordering = ["-exported_until"]
+
+    def __str__(self):
+        return f"{self.user.username} ({self.profile}) exported until {self.exported_until}"
+
 class Project(models.Model):
     history = HistoricalRecords()
     project_name = models.CharField(max_length=255)
@@ -847,42 +867,12 @@ class Instrument(models.Model):
         :param subject: Subject of the email
         :return:
         """
+        from cc.services.instrument_checks import notify_managers
 
-        manager_permissions = InstrumentPermission.objects.filter(
-            instrument=self, can_manage=True
-        )
-
-        managers = [perm.user for perm in manager_permissions]
-
-        if not managers:
-            return False
-
-        thread = MessageThread.objects.create(
-            title=subject or f"Maintenance notification for {self.instrument_name}",
-            is_system_thread=True
-        )
-
-        for manager in managers:
-            thread.participants.add(manager)
-
-        system_message = Message.objects.create(
-            thread=thread,
-            content=message,
-            message_type="system_notification",
-            sender=None
-        )
-
-        for manager in managers:
-            MessageRecipient.objects.create(
-                message=system_message,
-                user=manager,
-                is_read=False
-            )
-
-        return True
+        return self.id in notify_managers({self.id: (subject or f"Maintenance notification for {self.instrument_name}", message)})
 
     @classmethod
-    def check_all_instruments(self, days_threshold=30):
+    def check_all_instruments(cls, days_threshold=30):
         """
         Check all instruments for warranty expiration and upcoming maintenance
         and send notifications for those meeting the threshold criteria
@@ -893,22 +883,9 @@ class Instrument(models.Model):
         Returns:
             tuple: (warranty_notification_count, maintenance_notification_count)
         """
-        print(days_threshold)
-        today = timezone.now().date()
-
-        warranty_count = 0
-        maintenance_count = 0
+        from cc.services.instrument_checks import InstrumentChecker
 
-        instruments = self.objects.filter(enabled=True).prefetch_related('support_information')
-
-        for instrument in instruments:
-            if instrument.check_warranty_expiration(days_threshold):
-                warranty_count += 1
-
-            if instrument.check_upcoming_maintenance(days_threshold):
-                maintenance_count += 1
-
-        return warranty_count, maintenance_count
+        return InstrumentChecker(cls.objects.filter(enabled=True), days_threshold, days_threshold).run()
 
     def check_warranty_expiration(self, days_threshold=30):
         """
@@ -920,48 +897,9 @@ class Instrument(models.Model):
         Returns:
             bool: True if notification was sent, False otherwise
         """
+        from cc.services.instrument_checks import InstrumentChecker
 
-        if not days_threshold:
-            days_threshold = self.days_before_warranty_notification or 30
-
-
-        today = timezone.now().date()
-
-        if self.last_warranty_notification_sent and timezone.now() - self.last_warranty_notification_sent < timedelta(
-                days=7):
-            return False
-
-        for support_info in self.support_information.all():
-            if not support_info.warranty_end_date:
-                continue
-
-            days_remaining = (support_info.warranty_end_date - today).days
-
-            if 0 < days_remaining <= days_threshold:
-                subject = f"Warranty Expiration Alert - {self.instrument_name}"
-                message = (
-                    f"⚠️ **Warranty Expiration Alert**<br>"
-                    f"The warranty for {self.instrument_name} will expire in {days_remaining} "
-                    f"{'day' if days_remaining == 1 else 'days'} on {support_info.warranty_end_date.strftime('%Y-%m-%d')}.<br>"
-                )
-
-                if support_info.vendor_name:
-                    message += f"**Vendor:** {support_info.vendor_name}<br>"
-
-                    vendor_contacts = support_info.vendor_contacts.all()
-                    if vendor_contacts.exists():
-                        message += "**Vendor Contacts:**<br>"
-                        for contact in vendor_contacts:
-                            message += f"- {contact.contact_name}<br>"
-                            for detail in contact.contact_details.all():
-                                message += f"  {detail.contact_type}: {detail.contact_value}<br>"
-
-                if self.notify_instrument_managers(message, subject):
-                    self.last_warranty_notification_sent = timezone.now()
-                    self.save(update_fields=['last_warranty_notification_sent'])
-                    return True
-
-        return False
+        return self.id in InstrumentChecker([self], warranty_days=days_threshold).check_warranties()
 
     def check_upcoming_maintenance(self, days_threshold=14):
         """
@@ -973,61 +911,9 @@ class Instrument(models.Model):
         Returns:
             bool: True if notification was sent, False otherwise
         """
-        if not days_threshold:
-            days_threshold = self.days_before_maintenance_notification or 14
-        print(days_threshold)
-        today = timezone.now().date()
-
-        if self.last_maintenance_notification_sent and timezone.now() - self.last_maintenance_notification_sent < timedelta(
-                days=7):
-            return False
-
-        for support_info in self.support_information.all():
-            if not support_info.maintenance_frequency_days:
-                continue
+        from cc.services.instrument_checks import InstrumentChecker
 
-            last_maintenance = self.maintenance_logs.filter(
-                status='completed'
-            ).order_by('-maintenance_date').first()
-
-            if last_maintenance:
-                next_maintenance_date = (
-                        last_maintenance.maintenance_date.date() +
-                        timedelta(days=support_info.maintenance_frequency_days)
-                )
-
-                days_remaining = (next_maintenance_date - today).days
-
-                if 0 < days_remaining <= days_threshold:
-                    subject = f"Scheduled Maintenance Reminder - {self.instrument_name}"
-                    message = (
-                        f"🔧 **Scheduled Maintenance Reminder**<br>"
-                        f"The {self.instrument_name} is due for maintenance in {days_remaining} <br>"
-                        f"{'day' if days_remaining == 1 else 'days'} on {next_maintenance_date.strftime('%Y-%m-%d')}.<br>"
-                        f"Last maintenance was performed on {last_maintenance.maintenance_date.strftime('%Y-%m-%d')}.<br>"
-                    )
-
-                    message += f"\nMaintenance frequency: Every {support_info.maintenance_frequency_days} days<br>"
-
-                    if self.notify_instrument_managers(message, subject):
-                        self.last_maintenance_notification_sent = timezone.now()
-                        self.save(update_fields=['last_maintenance_notification_sent'])
-                        return True
-            else:
-                if support_info.maintenance_frequency_days <= days_threshold:
-                    subject = f"Initial Maintenance Required - {self.instrument_name}"
-                    message = (
-                        f"🔧 **Initial Maintenance Required**<br>"
-                        f"The {self.instrument_name} requires initial maintenance as no previous logs exist.<br>"
-                        f"Please schedule maintenance as soon as possible.<br>"
-                    )
-
-                    if self.notify_instrument_managers(message, subject):
-                        self.last_maintenance_notification_sent = timezone.now()
-                        self.save(update_fields=['last_maintenance_notification_sent'])
-                        return True
-
-        return False
+        return self.id in InstrumentChecker([self], maintenance_days=days_threshold).check_maintenance()
 
 
 class InstrumentUsage(models.Model):
@@ -1049,6 +935,180 @@ class InstrumentUsage(models.Model):
     class Meta:
         app_label = "cc"
         ordering = ["id"]
+        indexes = [
+            # Booking overlap checks, see cc.services.instrument_booking
+            models.Index(fields=['instrument', 'time_started', 'time_ended']),
+        ]
+
+
+class InstrumentAvailabilityDay(models.Model):
+    """
+    Busy slots of an instrument on one UTC day as a bitmap: bit n is set when a booking overlaps
+    the n-th slot of INSTRUMENT_SLOT_MINUTES minutes of the day. Rows are recomputed when a booking
+    is saved and dropped when one is deleted; days without a row are computed when they are read,
+    see cc.services.instrument_availability.
+    """
+    instrument = models.ForeignKey(Instrument, on_delete=models.CASCADE, related_name="availability_days")
+    day = models.DateField()
+    slot_minutes = models.IntegerField()
+    busy = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label = "cc"
+        ordering = ["instrument", "day"]
+        unique_together = [["instrument", "day"]]
+
+    def __str__(self):
+        return f"{self.instrument_id} {self.day}"
+
+    @staticmethod
+    def slots_per_day() -> int:
+        return 24 * 60 // settings.INSTRUMENT_SLOT_MINUTES
+
+    @staticmethod
+    def day_start(day: date) -> datetime:
+        return datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+
+    @staticmethod
+    def to_day(moment: datetime) -> date:
+        return moment.astimezone(dt_timezone.utc).date()
+
+    @property
+    def bitmap(self) -> int:
+        return int.from_bytes(bytes(self.busy), "little")
+
+    @classmethod
+    def compute(cls, instrument_id: int, first_day: date, last_day: date) -> dict:
+        """Bitmaps of the days from first_day to last_day from one query of the bookings overlapping them"""
+        slot = timedelta(minutes=settings.INSTRUMENT_SLOT_MINUTES)
+        slots_per_day = cls.slots_per_day()
+        start = cls.day_start(first_day)
+        end = cls.day_start(last_day + timedelta(days=1))
+        bitmaps = {first_day + timedelta(days=n): 0 for n in range((last_day - first_day).days + 1)}
+        bookings = InstrumentUsage.objects.filter(
+            instrument_id=instrument_id, time_started__lt=end, time_ended__gt=start
+        ).values_list("time_started", "time_ended")
+        for time_started, time_ended in bookings:
+            # Slots from the one the booking starts in up to the one it ends in, both clipped to the range
+            first_slot = (max(time_started, start) - start) // slot
+            last_slot = -((start - min(time_ended, end)) // slot)
+            if last_slot <= first_slot:
+                continue
+            for day_index in range(first_slot // slots_per_day, (last_slot - 1) // slots_per_day + 1):
+                low = max(first_slot - day_index * slots_per_day, 0)
+                high = min(last_slot - day_index * slots_per_day, slots_per_day)
+                bitmaps[first_day + timedelta(days=day_index)] |= (1 << high) - (1 << low)
+        return bitmaps
+
+    @classmethod
+    def store(cls, instrument_id: int, bitmaps: dict):
+        """Insert or replace the rows of the days"""
+        size = (cls.slots_per_day() + 7) // 8
+        cls.objects.bulk_create(
+            [
+                cls(instrument_id=instrument_id, day=day, slot_minutes=settings.INSTRUMENT_SLOT_MINUTES,
+                    busy=bitmap.to_bytes(size, "little"))
+                for day, bitmap in bitmaps.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["instrument", "day"],
+            update_fields=["slot_minutes", "busy", "updated_at"],
+        )
+
+    @classmethod
+    def refresh(cls, instrument_id: int, time_started: datetime, time_ended: datetime):
+        """Recompute the days a booking covers"""
+        if instrument_id and time_started and time_ended:
+            cls.store(instrument_id, cls.compute(instrument_id, cls.to_day(time_started), cls.to_day(time_ended)))
+
+    @classmethod
+    def invalidate(cls, instrument_id: int, time_started: datetime = None, time_ended: datetime = None):
+        """Drop the rows of the days a booking covered, or of all days, they are computed again when read"""
+        rows = cls.objects.filter(instrument_id=instrument_id)
+        if time_started and time_ended:
+            rows = rows.filter(day__range=[cls.to_day(time_started), cls.to_day(time_ended)])
+        rows.delete()
+
+
+class InstrumentUsageDay(models.Model):
+    """
+    Hours an instrument was booked by a user on one UTC day, with bookings split at midnight.
+    Booked and approved hours count bookings other than maintenance, approved ones are also
+    booked ones. The days a booking covers are recomputed when it is saved or deleted, see
+    cc.services.instrument_utilization for the reports served from these rows.
+    """
+    instrument = models.ForeignKey(Instrument, on_delete=models.CASCADE, related_name="usage_days")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="instrument_usage_days", blank=True, null=True)
+    day = models.DateField()
+    booked_hours = models.FloatField(default=0)
+    approved_hours = models.FloatField(default=0)
+    maintenance_hours = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label = "cc"
+        ordering = ["instrument", "day", "user"]
+        indexes = [
+            models.Index(fields=["instrument", "day"]),
+            models.Index(fields=["day"]),
+        ]
+
+    def __str__(self):
+        return f"{self.instrument_id} {self.user_id} {self.day}"
+
+    @classmethod
+    def compute(cls, instrument_id: int, first_day: date, last_day: date) -> list:
+        """Unsaved rows of the days from first_day to last_day from one query of the bookings overlapping them"""
+        start = InstrumentAvailabilityDay.day_start(first_day)
+        end = InstrumentAvailabilityDay.day_start(last_day + timedelta(days=1))
+        hours = {}
+        bookings = InstrumentUsage.objects.filter(
+            instrument_id=instrument_id, time_started__lt=end, time_ended__gt=start
+        ).values_list("user_id", "time_started", "time_ended", "maintenance", "approved")
+        for user_id, time_started, time_ended, maintenance, approved in bookings.iterator():
+            time_started = max(time_started, start)
+            time_ended = min(time_ended, end)
+            day = InstrumentAvailabilityDay.to_day(time_started)
+            while time_started < time_ended:
+                day_end = InstrumentAvailabilityDay.day_start(day + timedelta(days=1))
+                part = (min(time_ended, day_end) - time_started).total_seconds() / 3600
+                row = hours.setdefault((user_id, day), cls(instrument_id=instrument_id, user_id=user_id, day=day))
+                if maintenance:
+                    row.maintenance_hours += part
+                else:
+                    row.booked_hours += part
+                    if approved:
+                        row.approved_hours += part
+                time_started = day_end
+                day += timedelta(days=1)
+        return list(hours.values())
+
+    @classmethod
+    def refresh(cls, instrument_id: int, time_started: datetime, time_ended: datetime):
+        """Recompute the days a booking covers for all users of the instrument"""
+        if instrument_id and time_started and time_ended:
+            first_day = InstrumentAvailabilityDay.to_day(time_started)
+            last_day = InstrumentAvailabilityDay.to_day(time_ended)
+            with transaction.atomic():
+                cls.objects.filter(instrument_id=instrument_id, day__range=[first_day, last_day]).delete()
+                cls.objects.bulk_create(cls.compute(instrument_id, first_day, last_day))
+
+    @classmethod
+    def rebuild(cls, instrument_id: int) -> int:
+        """Recompute all days of an instrument from its bookings, returns the number of rows"""
+        span = InstrumentUsage.objects.filter(
+            instrument_id=instrument_id, time_started__isnull=False, time_ended__isnull=False
+        ).aggregate(first=models.Min("time_started"), last=models.Max("time_ended"))
+        with transaction.atomic():
+            cls.objects.filter(instrument_id=instrument_id).delete()
+            if span["first"] is None:
+                return 0
+            rows = cls.compute(
+                instrument_id, InstrumentAvailabilityDay.to_day(span["first"]), InstrumentAvailabilityDay.to_day(span["last"])
+            )
+            cls.objects.bulk_create(rows, batch_size=1000)
+        return len(rows)
 
 
 
@@ -1101,6 +1161,7 @@ class Annotation(models.Model):
     summary = models.TextField(blank=True, null=True)
     remote_host = models.ForeignKey("RemoteHost", on_delete=models.CASCADE, related_name="annotations", blank=True, null=True)
     fixed = models.BooleanField(default=False)
+    content_hash = models.CharField(max_length=64, blank=True, null=True, help_text="SHA-256 of the file content, the key of its cached processing results")
 
     class Meta:
         app_label = "cc"
@@ -1228,6 +1289,287 @@ class Annotation(models.Model):
                                     return True
         return False
 
+class TranscriptionCheckpoint(models.Model):
+    """
+    Segments already produced by an in-flight transcription job so that a crashed or
+    recycled worker can resume from the last completed segment instead of from zero.
+    """
+    annotation = models.OneToOneField(Annotation, on_delete=models.CASCADE, related_name="transcription_checkpoint")
+    language = models.CharField(max_length=20, default="auto", help_text="Language requested for the job")
+    detected_language = models.CharField(max_length=20, blank=True, null=True)
+    segments = models.JSONField(default=list, help_text="Completed segments as {start, end, text} in seconds")
+    translated_segments = models.JSONField(default=list, help_text="Completed English translation segments")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label = "cc"
+
+    def __str__(self):
+        return f"Transcription checkpoint for annotation {self.annotation_id} at {self.offset_seconds}s"
+
+    @property
+    def offset_seconds(self) -> float:
+        """End of the last completed segment"""
+        if not self.segments:
+            return 0.0
+        return float(self.segments[-1]["end"])
+
+
+class LRUCacheEntry(models.Model):
+    """
+    Entry of a content-addressed cache: entries are found by a key hashed from their inputs,
+    count their hits and are evicted least recently used first once the cache is over the
+    byte or entry bound named by max_bytes_setting and max_entries_setting.
+    """
+    size_bytes = models.BigIntegerField(default=0)
+    hit_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_accessed_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    max_bytes_setting = None
+    max_entries_setting = None
+    # Fields read for every entry considered for eviction
+    eviction_fields = ('id', 'size_bytes')
+
+    class Meta:
+        abstract = True
+        ordering = ['-last_accessed_at']
+
+    @staticmethod
+    def hash_key(*parts) -> str:
+        key_source = json.dumps(list(parts), sort_keys=True, default=str)
+        return hashlib.sha256(key_source.encode('utf-8')).hexdigest()
+
+    def is_stale(self) -> bool:
+        """Whether the entry can no longer be served, stale entries are dropped on lookup"""
+        return False
+
+    def discard(self):
+        """Release what the entry holds outside the database before it is evicted"""
+        pass
+
+    @classmethod
+    def lookup_key(cls, cache_key: str):
+        """Return the entry stored under the key, recording the hit."""
+        entry = cls.objects.filter(cache_key=cache_key).first()
+        if entry is None:
+            return None
+        if entry.is_stale():
+            entry.delete()
+            return None
+        cls.objects.filter(pk=entry.pk).update(
+            hit_count=models.F('hit_count') + 1, last_accessed_at=timezone.now()
+        )
+        return entry
+
+    @classmethod
+    def store_key(cls, cache_key: str, **fields):
+        """Store an entry under the key and evict the least recently used entries beyond the configured bounds."""
+        entry, _ = cls.objects.update_or_create(
+            cache_key=cache_key, defaults=dict(fields, last_accessed_at=timezone.now())
+        )
+        cls.evict()
+        return entry
+
+    @classmethod
+    def evict(cls, max_bytes: int = None, max_entries: int = None) -> int:
+        """Delete least recently used entries until the cache fits its size and entry bounds."""
+        max_bytes = getattr(settings, cls.max_bytes_setting) if max_bytes is None else max_bytes
+        max_entries = getattr(settings, cls.max_entries_setting) if max_entries is None else max_entries
+        totals = cls.objects.aggregate(total_bytes=models.Sum('size_bytes'), total_entries=models.Count('id'))
+        excess_bytes = (totals['total_bytes'] or 0) - max_bytes
+        excess_entries = totals['total_entries'] - max_entries
+        if excess_bytes <= 0 and excess_entries <= 0:
+            return 0
+
+        evicted = []
+        for entry in cls.objects.order_by('last_accessed_at').only(*cls.eviction_fields).iterator():
+            if excess_bytes <= 0 and excess_entries <= 0:
+                break
+            entry.discard()
+            evicted.append(entry.id)
+            excess_bytes -= entry.size_bytes
+            excess_entries -= 1
+        cls.objects.filter(id__in=evicted).delete()
+        return len(evicted)
+
+
+class ProcessingResultCache(LRUCacheEntry):
+    """
+    Results of transcription, OCR and summary jobs keyed by the hash of their input content
+    plus the model, language and parameters used, so repeated work on duplicated annotations,
+    cloned sessions or imported archives is answered without enqueueing a job.
+    """
+    task_type = models.CharField(max_length=30, choices=[
+        ('transcription', 'Transcription'),
+        ('ocr', 'OCR'),
+        ('summary', 'Summary'),
+        ('summary_transcript', 'Transcript Summary'),
+    ])
+    cache_key = models.CharField(max_length=64, unique=True, help_text="Hash of task type, content hash, model, language and parameters")
+    content_hash = models.CharField(max_length=64, db_index=True, help_text="SHA-256 of the processed audio, image or prompt")
+    model_name = models.TextField(blank=True, null=True)
+    language = models.CharField(max_length=20, blank=True, null=True)
+    parameters = models.JSONField(default=dict)
+    result = models.JSONField(default=dict)
+    annotation = models.ForeignKey(Annotation, on_delete=models.SET_NULL, related_name="processing_results", blank=True, null=True, help_text="Annotation the result was first computed for")
+
+    max_bytes_setting = "PROCESSING_CACHE_MAX_BYTES"
+    max_entries_setting = "PROCESSING_CACHE_MAX_ENTRIES"
+
+    class Meta(LRUCacheEntry.Meta):
+        app_label = "cc"
+        indexes = [
+            models.Index(fields=['task_type', 'content_hash']),
+        ]
+
+    def __str__(self):
+        return f"{self.task_type} result for {self.content_hash[:12]} ({self.model_name})"
+
+    @classmethod
+    def build_key(cls, task_type: str, content_hash: str, model_name: str = None, language: str = None, parameters: dict = None) -> str:
+        """Generate the cache key for a piece of content processed with a model and parameters."""
+        return cls.hash_key(task_type, content_hash, model_name or "", language or "", parameters or {})
+
+    @classmethod
+    def lookup(cls, task_type: str, content_hash: str, model_name: str = None, language: str = None, parameters: dict = None):
+        """Return the cached entry for this content and configuration, recording the hit."""
+        return cls.lookup_key(cls.build_key(task_type, content_hash, model_name, language, parameters))
+
+    @classmethod
+    def store(cls, task_type: str, content_hash: str, result: dict, model_name: str = None, language: str = None,
+              parameters: dict = None, annotation=None):
+        """Store a result and evict the least recently used entries beyond the configured bounds."""
+        return cls.store_key(
+            cls.build_key(task_type, content_hash, model_name, language, parameters),
+            task_type=task_type,
+            content_hash=content_hash,
+            model_name=model_name,
+            language=language,
+            parameters=parameters or {},
+            result=result,
+            size_bytes=len(json.dumps(result).encode('utf-8')),
+            annotation=annotation,
+        )
+
+
+class ExportArtifact(LRUCacheEntry):
+    """
+    Export files kept in MEDIA_ROOT/temp keyed by export type, parameters and a version hash
+    of the exported objects, so a repeated export request is answered with the existing file
+    instead of a new job. Files are evicted least recently used first.
+    """
+    export_type = models.CharField(max_length=30, choices=[
+        ('user_data', 'User Data'),
+        ('protocol_data', 'Protocol Data'),
+        ('session_data', 'Session Data'),
+        ('docx', 'DOCX'),
+        ('instrument_job_metadata', 'Instrument Job Metadata'),
+        ('excel_template', 'Excel Template'),
+    ])
+    cache_key = models.CharField(max_length=64, unique=True, help_text="Hash of export type, user, parameters and content version")
+    content_hash = models.CharField(max_length=64, help_text="Version hash of the exported objects")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="export_artifacts", blank=True, null=True)
+    parameters = models.JSONField(default=dict)
+    file_name = models.TextField(help_text="File name inside MEDIA_ROOT/temp")
+
+    max_bytes_setting = "EXPORT_CACHE_MAX_BYTES"
+    max_entries_setting = "EXPORT_CACHE_MAX_ENTRIES"
+    eviction_fields = ('id', 'size_bytes', 'file_name')
+
+    class Meta(LRUCacheEntry.Meta):
+        app_label = "cc"
+
+    def __str__(self):
+        return f"{self.export_type} export {self.file_name}"
+
+    @property
+    def file_path(self) -> str:
+        return os.path.join(settings.MEDIA_ROOT, "temp", self.file_name)
+
+    def remove_file(self):
+        """Delete the export file and the hash file written next to archives"""
+        for path in (self.file_path, f"{self.file_path}.sha256"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def is_stale(self) -> bool:
+        return not os.path.exists(self.file_path)
+
+    def discard(self):
+        self.remove_file()
+
+    @classmethod
+    def build_key(cls, export_type: str, user_id: int = None, parameters: dict = None, content_hash: str = "") -> str:
+        """Generate the cache key for an export of the given objects with the given parameters."""
+        return cls.hash_key(export_type, user_id, parameters or {}, content_hash)
+
+    @classmethod
+    def lookup(cls, export_type: str, user_id: int = None, parameters: dict = None, content_hash: str = ""):
+        """Return the artifact for this export when its file is still there, recording the hit."""
+        return cls.lookup_key(cls.build_key(export_type, user_id, parameters, content_hash))
+
+    @classmethod
+    def store(cls, export_type: str, file_path: str, user_id: int = None, parameters: dict = None, content_hash: str = ""):
+        """Record a finished export file and evict the least recently used artifacts beyond the configured bounds."""
+        cache_key = cls.build_key(export_type, user_id, parameters, content_hash)
+        previous = cls.objects.filter(cache_key=cache_key).first()
+        if previous and previous.file_name != os.path.basename(file_path):
+            previous.remove_file()
+        return cls.store_key(
+            cache_key,
+            export_type=export_type,
+            content_hash=content_hash,
+            user_id=user_id,
+            parameters=parameters or {},
+            file_name=os.path.basename(file_path),
+            size_bytes=os.path.getsize(file_path),
+        )
+
+
+class JobCheckpoint(models.Model):
+    """
+    Progress of a long running RQ job, keyed by the RQ job id. A job retried after its
+    worker was stopped finds its checkpoint under the same id and continues from the
+    saved stage, table and offset, see cc.utils.job_checkpoint.
+    """
+    job_id = models.CharField(max_length=100, unique=True)
+    job_name = models.CharField(max_length=100)
+    stage = models.CharField(max_length=100, blank=True, null=True)
+    table_name = models.CharField(max_length=100, blank=True, null=True)
+    offset = models.BigIntegerField(default=0)
+    state = models.JSONField(default=dict)
+    attempts = models.IntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label = "cc"
+        ordering = ['-updated_at']
+
+    def __str__(self):
+        return f"{self.job_name} {self.job_id} at {self.stage} ({self.table_name}:{self.offset})"
+
+
+class JobCheckpointEntry(models.Model):
+    """
+    State a checkpointed job appends to instead of saving it whole at every checkpoint, e.g. the
+    id mappings an import adds stage by stage. Read back in order when the job resumes.
+    """
+    checkpoint = models.ForeignKey(JobCheckpoint, on_delete=models.CASCADE, related_name="entries")
+    key = models.CharField(max_length=100)
+    data = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        app_label = "cc"
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.key} of {self.checkpoint.job_id}"
+
+
 class AnnotationFolder(models.Model):
     history = HistoricalRecords()
     session = models.ForeignKey(Session, on_delete=models.CASCADE, related_name="annotation_folders", blank=True, null=True)
@@ -1629,14 +1971,10 @@ class StoredReagent(models.Model):
             stored_reagent=self
         )
 
-        for subscription in self.subscriptions.filter(notify_on_low_stock=True):
-            if subscription.notify_on_low_stock:
-                thread.participants.add(subscription.user)
-                MessageRecipient.objects.create(
-                    message=message,
-                    user=subscription.user,
-                    is_read=False
-                )
+        from cc.services.notifications import build_audience, notify
+
+        subscribers = self.subscriptions.filter(notify_on_low_stock=True).values_list("user_id", flat=True)
+        notify(message, build_audience(users=subscribers))
 
         self.last_notification_sent = timezone.now()
         self.save(update_fields=['last_notification_sent'])
@@ -1684,14 +2022,10 @@ class StoredReagent(models.Model):
         )
 
         # Notify subscribers who opted for expiry notifications
-        for subscription in self.subscriptions.filter(notify_on_expiry=True):
-            if subscription.notify_on_expiry:
-                thread.participants.add(subscription.user)
-                MessageRecipient.objects.create(
-                    message=message,
-                    user=subscription.user,
-                    is_read=False
-                )
+        from cc.services.notifications import build_audience, notify
+
+        subscribers = self.subscriptions.filter(notify_on_expiry=True).values_list("user_id", flat=True)
+        notify(message, build_audience(users=subscribers))
 
         # Update the last notification timestamp
         self.last_expiry_notification_sent = timezone.now()
@@ -2246,6 +2580,140 @@ class MessageRecipient(models.Model):
             self.save()
 
 
+class InboxEntry(models.Model):
+    """
+    A thread in the inbox of a user with the number of its messages the user has not read. Users have
+    an entry for every thread they can see: as a participant, as its creator, as a member of its lab
+    group, and everyone for system threads with announcements. Entries follow the threads, their
+    participants, lab group members and message recipients, the unread counters of cc.services.inbox
+    are summed from them. Threads seen by everyone are refreshed by a job on the maintenance queue
+    once their change commits, unless NOTIFICATIONS_ASYNC is off.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="inbox_entries")
+    thread = models.ForeignKey(MessageThread, on_delete=models.CASCADE, related_name="inbox_entries")
+    thread_updated_at = models.DateTimeField()
+    unread_count = models.IntegerField(default=0)
+
+    class Meta:
+        app_label = "cc"
+        ordering = ["user", "-thread_updated_at"]
+        unique_together = ["user", "thread"]
+        indexes = [
+            models.Index(fields=["user", "-thread_updated_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.thread_id} {self.unread_count}"
+
+    @staticmethod
+    def seen_by_everyone(thread: MessageThread) -> bool:
+        """System threads with announcements are in the inbox of every user"""
+        return thread.is_system_thread and thread.messages.filter(message_type="announcement").exists()
+
+    @staticmethod
+    def thread_audience(thread: MessageThread) -> set:
+        """Ids of the users that can see a thread"""
+        if InboxEntry.seen_by_everyone(thread):
+            from django.contrib.auth import get_user_model
+            return set(get_user_model().objects.values_list("id", flat=True))
+        user_ids = set(MessageThread.participants.through.objects.filter(
+            messagethread_id=thread.id
+        ).values_list("user_id", flat=True))
+        if thread.lab_group_id:
+            user_ids.update(LabGroup.users.through.objects.filter(
+                labgroup_id=thread.lab_group_id
+            ).values_list("user_id", flat=True))
+        if thread.creator_id:
+            user_ids.add(thread.creator_id)
+        return user_ids
+
+    @staticmethod
+    def unread_counts(thread_id: int, user_ids=None) -> dict:
+        """Unread messages of a thread by user, from one aggregate query of the recipients"""
+        recipients = MessageRecipient.objects.filter(message__thread_id=thread_id, is_read=False, is_deleted=False)
+        if user_ids is not None:
+            recipients = recipients.filter(user_id__in=list(user_ids))
+        return dict(recipients.values("user_id").annotate(count=models.Count("id")).values_list("user_id", "count"))
+
+    @classmethod
+    def refresh_thread(cls, thread_id: int) -> dict:
+        """
+        Recompute the entries of a thread for everyone who can see it, returns the change of unread
+        messages by user. Entries of users who cannot see it anymore are deleted.
+        """
+        thread = MessageThread.objects.filter(pk=thread_id).first()
+        if thread is None:
+            return {}
+        previous = dict(cls.objects.filter(thread_id=thread_id).order_by().values_list("user_id", "unread_count"))
+        user_ids = cls.thread_audience(thread)
+        counts = cls.unread_counts(thread_id)
+        with transaction.atomic():
+            removed = set(previous) - user_ids
+            if removed:
+                cls.objects.filter(thread_id=thread_id, user_id__in=removed).delete()
+            cls.objects.bulk_create(
+                [
+                    cls(user_id=user_id, thread_id=thread_id, thread_updated_at=thread.updated_at,
+                        unread_count=counts.get(user_id, 0))
+                    for user_id in sorted(user_ids)
+                ],
+                update_conflicts=True, unique_fields=["user", "thread"],
+                update_fields=["thread_updated_at", "unread_count"], batch_size=1000,
+            )
+        deltas = {user_id: -previous[user_id] for user_id in removed if previous[user_id]}
+        for user_id in user_ids:
+            if counts.get(user_id, 0) != previous.get(user_id, 0):
+                deltas[user_id] = counts.get(user_id, 0) - previous.get(user_id, 0)
+        return deltas
+
+    @classmethod
+    def refresh_unread(cls, thread_id: int, user_ids) -> dict:
+        """Recompute the unread messages of the entries of a thread for some users, returns their change by user"""
+        entries = list(cls.objects.filter(thread_id=thread_id, user_id__in=list(user_ids)))
+        if not entries:
+            return {}
+        counts = cls.unread_counts(thread_id, [entry.user_id for entry in entries])
+        deltas = {}
+        for entry in entries:
+            count = counts.get(entry.user_id, 0)
+            if count != entry.unread_count:
+                deltas[entry.user_id] = count - entry.unread_count
+                entry.unread_count = count
+        if deltas:
+            cls.objects.bulk_update([entry for entry in entries if entry.user_id in deltas], ["unread_count"])
+        return deltas
+
+    @classmethod
+    def add_announcements(cls, user_id: int):
+        """Entries of the system threads with announcements for a new user"""
+        threads = MessageThread.objects.filter(
+            is_system_thread=True, messages__message_type="announcement"
+        ).distinct().values_list("id", "updated_at")
+        cls.objects.bulk_create(
+            [cls(user_id=user_id, thread_id=thread_id, thread_updated_at=updated_at) for thread_id, updated_at in threads],
+            ignore_conflicts=True,
+        )
+
+    @classmethod
+    def rebuild(cls, user_id: int) -> int:
+        """Recompute all entries of a user from the threads and recipients, returns the number of entries"""
+        threads = MessageThread.objects.filter(
+            models.Q(participants=user_id) | models.Q(lab_group__users=user_id) | models.Q(creator_id=user_id) |
+            models.Q(is_system_thread=True, messages__message_type="announcement")
+        ).distinct().values_list("id", "updated_at")
+        counts = dict(MessageRecipient.objects.filter(
+            user_id=user_id, is_read=False, is_deleted=False
+        ).values("message__thread_id").annotate(count=models.Count("id")).values_list("message__thread_id", "count"))
+        entries = [
+            cls(user_id=user_id, thread_id=thread_id, thread_updated_at=updated_at, unread_count=counts.get(thread_id, 0))
+            for thread_id, updated_at in threads
+        ]
+        with transaction.atomic():
+            cls.objects.filter(user_id=user_id).delete()
+            cls.objects.bulk_create(entries, batch_size=1000)
+        return len(entries)
+
+
 class MessageAttachment(models.Model):
     """Files attached to messages"""
     message = models.ForeignKey(Message, on_delete=models.CASCADE, related_name="attachments")
@@ -2953,6 +3421,107 @@ def create_auth_token(sender, instance=None, created=False, **kwargs):
     if created:
         Token.objects.create(user=instance)
 
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def create_inbox(sender, instance=None, created=False, **kwargs):
+    if created:
+        InboxEntry.add_announcements(instance.pk)
+
+def _update_unread_counters(deltas: dict):
+    from cc.services import inbox
+    inbox.apply_unread_changes(deltas)
+
+def _refresh_thread_entries(thread_id: int, everyone: bool = False):
+    """Recompute the inbox entries of a thread, in a job once the change commits when everyone sees it"""
+    if everyone and settings.NOTIFICATIONS_ASYNC:
+        from cc.rq_tasks import refresh_inbox_thread
+        transaction.on_commit(lambda: refresh_inbox_thread.delay(thread_id))
+    else:
+        _update_unread_counters(InboxEntry.refresh_thread(thread_id))
+
+def _reset_unread_counters(user_ids):
+    """Drop the cached unread counters once the changes commit, they are summed again on their next read"""
+    user_ids = list(user_ids)
+    if user_ids:
+        from cc.services import inbox
+        transaction.on_commit(lambda: inbox.reset_unread(user_ids))
+
+@receiver(post_save, sender=MessageThread)
+def refresh_thread_inbox(sender, instance=None, **kwargs):
+    if instance:
+        _refresh_thread_entries(instance.pk, InboxEntry.seen_by_everyone(instance))
+
+@receiver(pre_delete, sender=MessageThread)
+def remove_thread_inbox(sender, instance=None, **kwargs):
+    if instance:
+        _reset_unread_counters(instance.inbox_entries.values_list("user_id", flat=True))
+
+@receiver(m2m_changed, sender=MessageThread.participants.through)
+def refresh_participant_inbox(sender, instance=None, action=None, reverse=False, pk_set=None, **kwargs):
+    """Participants see their threads, entries follow them from either side of the relation"""
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        InboxEntry.rebuild(instance.pk)
+        _reset_unread_counters([instance.pk])
+    else:
+        _update_unread_counters(InboxEntry.refresh_thread(instance.pk))
+
+@receiver(m2m_changed, sender=LabGroup.users.through)
+def refresh_member_inbox(sender, instance=None, action=None, reverse=False, pk_set=None, **kwargs):
+    """Lab group members see the threads of the lab group"""
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        user_ids = [instance.pk]
+    elif pk_set is not None:
+        user_ids = sorted(pk_set)
+    else:
+        for thread_id in instance.message_threads.values_list("id", flat=True):
+            _update_unread_counters(InboxEntry.refresh_thread(thread_id))
+        return
+    for user_id in user_ids:
+        InboxEntry.rebuild(user_id)
+    _reset_unread_counters(user_ids)
+
+@receiver(post_save, sender=Message)
+def add_announcement_inbox(sender, instance=None, created=False, **kwargs):
+    """Announcements make system threads visible to everyone"""
+    if created and instance.message_type == "announcement" and instance.thread.is_system_thread:
+        _refresh_thread_entries(instance.thread_id, everyone=True)
+
+@receiver(post_save, sender=MessageRecipient)
+@receiver(post_delete, sender=MessageRecipient)
+def refresh_recipient_inbox(sender, instance=None, **kwargs):
+    if instance:
+        thread_id = Message.objects.filter(pk=instance.message_id).values_list("thread_id", flat=True).first()
+        if thread_id:
+            _update_unread_counters(InboxEntry.refresh_unread(thread_id, [instance.user_id]))
+
+@receiver(pre_save, sender=InstrumentUsage)
+def remember_booked_interval(sender, instance=None, **kwargs):
+    """Keep the interval a booking had before it is saved, the availability of those days changes too"""
+    if instance and instance.pk:
+        instance._booked_interval = InstrumentUsage.objects.filter(pk=instance.pk).values_list(
+            "instrument_id", "time_started", "time_ended"
+        ).first()
+
+@receiver(post_save, sender=InstrumentUsage)
+def refresh_instrument_availability(sender, instance=None, **kwargs):
+    if not instance:
+        return
+    previous = getattr(instance, "_booked_interval", None)
+    if previous and previous != (instance.instrument_id, instance.time_started, instance.time_ended):
+        InstrumentAvailabilityDay.refresh(*previous)
+        InstrumentUsageDay.refresh(*previous)
+    InstrumentAvailabilityDay.refresh(instance.instrument_id, instance.time_started, instance.time_ended)
+    InstrumentUsageDay.refresh(instance.instrument_id, instance.time_started, instance.time_ended)
+
+@receiver(post_delete, sender=InstrumentUsage)
+def invalidate_instrument_availability(sender, instance=None, **kwargs):
+    if instance and instance.time_started and instance.time_ended:
+        InstrumentAvailabilityDay.invalidate(instance.instrument_id, instance.time_started, instance.time_ended)
+        InstrumentUsageDay.refresh(instance.instrument_id, instance.time_started, instance.time_ended)
+
 @receiver(post_save, sender=ProtocolModel)
 def create_protocol_hash(sender, instance=None, created=False, **kwargs):
     if created:
@@ -2992,58 +3561,12 @@ def create_owner_subscription(sender, instance=None, created=False, **kwargs):
 
 @receiver(post_save, sender=TimeKeeper)
 def notify_timekeeper_changes(sender, instance=None, created=False, **kwargs):
-    """Send notifications when a TimeKeeper is created or updated"""
-
+    """Publish timer changes to the session through the debounced publisher, see cc.services.timer_notifications"""
     if not instance:
         return
+    from cc.services import timer_notifications
 
-    if created:
-        action = "started"
-        title = f"Timer Started: {instance.step.step_description if instance.step else 'Session Timer'}"
-    else:
-        action = "updated"
-        title = f"Timer Updated: {instance.step.step_description if instance.step else 'Session Timer'}"
-
-    notification_data = {
-        "type": "timer_notification",
-        "action": action,
-        "title": title,
-        "timer_id": instance.id,
-        "started": instance.started,
-        "current_duration": instance.current_duration or 0,
-        "timestamp": timezone.now().isoformat()
-    }
-
-    if instance.session:
-        notification_data["session_id"] = str(instance.session.unique_id)
-        notification_data["session_name"] = instance.session.name or f"Session {instance.session.id}"
-
-    if instance.step:
-        notification_data["step_id"] = instance.step.id
-        notification_data["step_description"] = instance.step.step_description
-
-    channel_layer = get_channel_layer()
-
-    users_to_notify = set()
-
-    users_to_notify.add(instance.user.id)
-
-    if instance.session:
-        users_to_notify.add(instance.session.user.id)
-
-        for editor in instance.session.editors.all():
-            users_to_notify.add(editor.id)
-        for viewer in instance.session.viewers.all():
-            users_to_notify.add(viewer.id)
-
-    for user_id in users_to_notify:
-        async_to_sync(channel_layer.group_send)(
-            f"user_{user_id}_notifications",
-            {
-                "type": "notification_message",
-                "message": notification_data
-            }
-        )
+    timer_notifications.notify(instance, created)
 
 
 class ServiceTier(models.Model):
@@ -3148,6 +3671,115 @@ class BillingRecord(models.Model):
         super().save(*args, **kwargs)
 
 
+class BillingMonthlyTotal(models.Model):
+    """
+    Number and total amount of the billing records of a lab group in one month and status, by the
+    lab group of their service tier and their billing date. The month of a record is recomputed when
+    the record is saved or deleted, records written in bulk refresh their months themselves.
+    """
+    lab_group = models.ForeignKey(LabGroup, on_delete=models.CASCADE, related_name="billing_monthly_totals")
+    month = models.DateField()
+    status = models.CharField(max_length=20, choices=BillingRecord.STATUS_CHOICES)
+    record_count = models.IntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label = "cc"
+        ordering = ["lab_group", "month", "status"]
+        unique_together = ["lab_group", "month", "status"]
+        indexes = [
+            models.Index(fields=["month", "status"]),
+        ]
+
+    def __str__(self):
+        return f"{self.lab_group_id} {self.month:%Y-%m} {self.status}"
+
+    @staticmethod
+    def month_of(day: date) -> date:
+        return day.replace(day=1)
+
+    @classmethod
+    def compute(cls, lab_group_id: int, month: date) -> list:
+        """Unsaved rows of every status of the month from one aggregate query of the billing records"""
+        next_month = (month + timedelta(days=32)).replace(day=1)
+        totals = BillingRecord.objects.filter(
+            service_tier__lab_group_id=lab_group_id, billing_date__gte=month, billing_date__lt=next_month
+        ).values("status").annotate(
+            record_count=models.Count("id"), total_amount=models.Sum("total_amount")
+        ).order_by("status")
+        return [
+            cls(lab_group_id=lab_group_id, month=month, status=row["status"],
+                record_count=row["record_count"], total_amount=row["total_amount"] or 0)
+            for row in totals
+        ]
+
+    @classmethod
+    def refresh(cls, lab_group_id: int, billing_date: date):
+        """Recompute the month of a billing date for a lab group"""
+        if lab_group_id and billing_date:
+            month = cls.month_of(billing_date)
+            with transaction.atomic():
+                cls.objects.filter(lab_group_id=lab_group_id, month=month).delete()
+                cls.objects.bulk_create(cls.compute(lab_group_id, month))
+
+    @classmethod
+    def rebuild(cls) -> int:
+        """Recompute every month of every lab group from the billing records, returns the number of rows"""
+        totals = BillingRecord.objects.annotate(
+            month=TruncMonth("billing_date"), lab_group_id=models.F("service_tier__lab_group_id")
+        ).values("lab_group_id", "month", "status").annotate(
+            record_count=models.Count("id"), total=models.Sum("total_amount")
+        ).order_by("lab_group_id", "month", "status")
+        rows = [
+            cls(lab_group_id=row["lab_group_id"], month=row["month"], status=row["status"],
+                record_count=row["record_count"], total_amount=row["total"] or 0)
+            for row in totals
+        ]
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(rows, batch_size=1000)
+        return len(rows)
+
+
+@receiver(pre_save, sender=BillingRecord)
+def remember_billing_month(sender, instance=None, **kwargs):
+    """Keep the lab group and billing date a record had before it is saved, that month changes too"""
+    if instance and instance.pk:
+        instance._billing_month = BillingRecord.objects.filter(pk=instance.pk).values_list(
+            "service_tier__lab_group_id", "billing_date"
+        ).first()
+
+@receiver(post_save, sender=BillingRecord)
+def refresh_billing_monthly_total(sender, instance=None, **kwargs):
+    if not instance:
+        return
+    current = (instance.service_tier.lab_group_id, instance.billing_date)
+    previous = getattr(instance, "_billing_month", None)
+    if previous and (previous[0], BillingMonthlyTotal.month_of(previous[1])) != (current[0], BillingMonthlyTotal.month_of(current[1])):
+        BillingMonthlyTotal.refresh(*previous)
+    BillingMonthlyTotal.refresh(*current)
+
+@receiver(post_delete, sender=BillingRecord)
+def remove_from_billing_monthly_total(sender, instance=None, **kwargs):
+    if instance:
+        lab_group_id = ServiceTier.objects.filter(pk=instance.service_tier_id).values_list("lab_group_id", flat=True).first()
+        BillingMonthlyTotal.refresh(lab_group_id, instance.billing_date)
+
+@receiver(post_save, sender=ServiceTier)
+@receiver(post_delete, sender=ServiceTier)
+@receiver(post_save, sender=ServicePrice)
+@receiver(post_delete, sender=ServicePrice)
+@receiver(post_save, sender=Instrument)
+@receiver(post_delete, sender=Instrument)
+@receiver(post_save, sender=LabGroup)
+@receiver(post_delete, sender=LabGroup)
+def invalidate_pricing_snapshot(sender, **kwargs):
+    """Public pricing shows tiers, prices, instruments and lab groups, it is rebuilt once their changes commit"""
+    from cc.billing_services import PricingSnapshot
+    transaction.on_commit(PricingSnapshot.invalidate)
+
+
 class CellType(models.Model):
     """Model to store cell types and cell lines for SDRF proteomics metadata"""
     identifier = models.CharField(max_length=255, primary_key=True)
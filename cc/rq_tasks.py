@@ -21,6 +21,7 @@ from django.db import transaction
 from django.db.models import Q, QuerySet
 from django.utils import timezone
 from django_rq import job
+from rq import Retry, get_current_job
 from docx.oxml import parse_xml
 from docx.oxml.ns import nsdecls
 import re
@@ -37,11 +38,11 @@ from pytesseract import pytesseract
 from rest_framework.exceptions import ValidationError
 from sdrf_pipelines.sdrf.sdrf import SdrfDataFrame
 import time
-from pathlib import Path
 from cc.models import Annotation, ProtocolModel, ProtocolStep, StepVariation, ProtocolSection, Session, \
     AnnotationFolder, Reagent, ProtocolReagent, StepReagent, ProtocolTag, StepTag, Tag, Project, MetadataColumn, \
     InstrumentJob, SubcellularLocation, Species, MSUniqueVocabularies, Unimod, FavouriteMetadataOption, InstrumentUsage, \
-    LabGroup, Tissue, StorageObject, ReagentAction, StoredReagent, Instrument, SiteSettings, SamplePool
+    LabGroup, Tissue, StorageObject, ReagentAction, StoredReagent, Instrument, SiteSettings, SamplePool, \
+    TranscriptionCheckpoint, ImportTracker, Message, InboxEntry
 from django.conf import settings
 import numpy as np
 import subprocess
@@ -60,23 +61,263 @@ from django.contrib.auth.models import User
 from cc.improved_docx_generator import EnhancedDocxGenerator, DocxGenerationError
 from cc.models import SiteSettings
 from cc.utils import user_metadata, staff_metadata, required_metadata_name, identify_barcode_format
-from cc.utils.user_data_export_revised import export_user_data_revised, export_protocol_data, export_session_data
-from cc.utils.user_data_import_revised import dry_run_import_user_data, import_user_data_revised
+from cc.utils.user_data_export_revised import export_user_data_revised, export_protocol_data, export_session_data, \
+    export_incremental_data
+from cc.utils.user_data_import_revised import dry_run_import_user_data, import_user_data_revised, ImportReverter
+from cc.utils.media_collector import MediaCollector
+from cc.utils.job_checkpoint import JobCheckpointer
+from cc.utils.instrument_usage_report import HEADERS as INSTRUMENT_USAGE_HEADERS, InstrumentUsageReport
 from mcp_server.tools.protocol_analyzer import ProtocolAnalyzer
 from cc.models import ProtocolStep, ProtocolStepSuggestionCache
 from mcp_server.tools.sdrf_generator import SDRFMetadataGenerator
+from cc.services.transcription_service import get_transcription_service, TranscriptionServiceError, \
+    TranscriptionStream, parse_segment_line, segments_to_vtt
+from cc.services import result_cache, export_cache, notifications, inbox
+from cc.services.instrument_checks import InstrumentChecker
+from cc.services.llama_service import get_llama_service, LlamaServiceError, TokenCoalescer
+from cc.services.ocr_service import OCRBatch, OCRServiceError, OCR_ANNOTATION_TYPES, annotation_ocr_item, \
+    read_image_bytes, image_content_hash, decode_data_url, recognize_image_bytes
+from simple_history.utils import bulk_update_with_history
 
 capture_language = re.compile(r"auto-detected language: (\w+)")
 
+# Checkpointed jobs whose worker was stopped are requeued under the same job id and resume, see JobCheckpointer
+resumable_job_retry = Retry(max=settings.JOB_RESUME_RETRIES, interval=settings.JOB_RESUME_INTERVAL)
+
+
+def _serve_cached_transcription(annotation: Annotation, content_hash: str, model_path: str, language: str, translate: bool) -> bool:
+    """
+    Apply the cached transcription of the same media, model, language and translation setting to the annotation.
+    Returns True when the cache had a result.
+    :param annotation:
+    :param content_hash:
+    :param model_path:
+    :param language:
+    :param translate:
+    :return:
+    """
+    if not content_hash:
+        return False
+    entry = result_cache.lookup(
+        "transcription", content_hash, result_cache.transcription_cache_args(model_path, language, translate)
+    )
+    if not entry:
+        return False
+    annotation.transcription = entry.result["transcription"]
+    annotation.translation = entry.result.get("translation")
+    annotation.language = entry.result.get("language")
+    annotation.transcribed = True
+    annotation.save()
+    _finish_transcription(annotation)
+    return True
+
+
+def _finish_transcription(annotation: Annotation, content_hash: str = None, model_path: str = None, language: str = "auto", translate: bool = False):
+    """
+    Drop the resume checkpoint, record the result in the content-hash cache when the media hash is given,
+    and push the final serialized annotation to everyone following the session transcription channel
+    :param annotation:
+    :param content_hash:
+    :param model_path:
+    :param language:
+    :param translate:
+    :return:
+    """
+    TranscriptionCheckpoint.objects.filter(annotation=annotation).delete()
+    if content_hash:
+        result_cache.store(
+            "transcription",
+            content_hash,
+            result_cache.transcription_cache_args(model_path, language, translate),
+            {
+                "transcription": annotation.transcription,
+                "translation": annotation.translation,
+                "language": annotation.language,
+            },
+            annotation,
+        )
+    session_id = annotation.session.unique_id
+    channel_layer = get_channel_layer()
+    data = AnnotationSerializer(annotation, many=False).data
+    async_to_sync(channel_layer.group_send)(
+        f"transcription_{session_id}",
+        {
+            "type": "transcription_message",
+            "message": data,
+        },
+    )
+
+
+def _create_transcription_stream(annotation: Annotation, language: str) -> TranscriptionStream:
+    """
+    Create the segment stream for a transcription job, seeded from the annotation checkpoint when a previous
+    job with the same language did not finish. Partial segments are pushed to the session transcription channel
+    and the checkpoint is updated at most every TRANSCRIPTION_STREAM_INTERVAL seconds.
+    :param annotation:
+    :param language:
+    :return:
+    """
+    checkpoint, created = TranscriptionCheckpoint.objects.get_or_create(annotation=annotation, defaults={"language": language})
+    if not created and checkpoint.language != language:
+        checkpoint.language = language
+        checkpoint.detected_language = None
+        checkpoint.segments = []
+        checkpoint.translated_segments = []
+        checkpoint.save()
+    if checkpoint.segments:
+        print(f"Resuming transcription of annotation {annotation.id} from {checkpoint.offset_seconds}s")
+
+    channel_layer = get_channel_layer()
+
+    def publish(stream: TranscriptionStream, segments: list):
+        if not annotation.session:
+            return
+        async_to_sync(channel_layer.group_send)(
+            f"transcription_{annotation.session.unique_id}",
+            {
+                "type": "transcription_message",
+                "message": {
+                    "id": annotation.id,
+                    "partial": True,
+                    "language": stream.language,
+                    "offset": stream.offset_seconds,
+                    "segments": segments,
+                },
+            },
+        )
+
+    def save_checkpoint(stream: TranscriptionStream):
+        TranscriptionCheckpoint.objects.filter(pk=checkpoint.pk).update(
+            segments=stream.segments, translated_segments=stream.translated_segments,
+            detected_language=stream.language, updated_at=timezone.now()
+        )
+
+    stream_language = checkpoint.detected_language
+    if language != "auto":
+        stream_language = language
+    return TranscriptionStream(
+        publish, save_checkpoint, settings.TRANSCRIPTION_STREAM_INTERVAL, checkpoint.segments, stream_language,
+        checkpoint.translated_segments,
+    )
+
+
+def _run_whisper_cli(cmd: list, annotation: Annotation, stream: TranscriptionStream):
+    """
+    Run the whisper-cli binary, streaming every segment it prints and capturing the auto-detected language.
+    When the stream was resumed from a checkpoint, whisper starts at the end of the last completed segment.
+    :param cmd:
+    :param annotation:
+    :param stream:
+    :return:
+    """
+    if stream.offset_seconds:
+        cmd = cmd + ["-ot", str(int(stream.offset_seconds * 1000))]
+    if stream.language:
+        annotation.language = stream.language
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    # capture whisper detected language and segments as they are emitted
+    for line in process.stdout:
+        line = line.decode("utf-8")
+        print(line)
+        if "auto-detected language" in line:
+            s = capture_language.search(line)
+            if s:
+                annotation.language = s.group(1)
+                stream.language = annotation.language
+        segment = parse_segment_line(line)
+        if segment:
+            stream.add(segment)
+    if not annotation.language:
+        for line in process.stderr:
+            line = line.decode("utf-8")
+            print(line)
+            if "auto-detected language" in line:
+                s = capture_language.search(line)
+                if s:
+                    annotation.language = s.group(1)
+                    stream.language = annotation.language
+    process.wait()
+    stream.flush()
+
+
+def _transcribe_with_service(annotation: Annotation, media_path: str, model_path: str, language: str, translate: bool, stream: TranscriptionStream,
+                             content_hash: str = None) -> bool:
+    """
+    Transcribe through the persistent whisper.cpp server when it is available on this worker.
+    Returns False when the caller should fall back to running whisper-cli directly.
+    :param annotation:
+    :param media_path:
+    :param model_path:
+    :param language:
+    :param translate:
+    :param stream:
+    :param content_hash: hash of the media the result is cached under
+    :return:
+    """
+    service = get_transcription_service(model_path)
+    if service is None:
+        return False
+    try:
+        result = service.transcribe(media_path, language, translate, stream)
+    except TranscriptionServiceError as e:
+        logging.getLogger(__name__).warning(f"Persistent transcription failed, falling back to whisper-cli: {e}")
+        return False
+
+    annotation.language = result["language"]
+    annotation.transcription = result["transcription"]
+    annotation.transcribed = True
+    if result["translation"] is not None:
+        annotation.translation = result["translation"]
+    annotation.save()
+
+    current_job = get_current_job()
+    if current_job:
+        current_job.meta["transcription_stats"] = result["stats"]
+        current_job.save_meta()
+
+    _finish_transcription(annotation, content_hash, model_path, language, translate)
+    return True
+
+
+def enqueue_transcription(annotation: Annotation, language: str = "auto", translate: bool = True, custom_id: str = None, use_cache: bool = True) -> bool:
+    """
+    Answer from the content-hash cache when the same media was already transcribed with the same model, language
+    and translation setting, otherwise enqueue the transcription job. use_cache off forces a fresh run.
+    Returns True when the result came from the cache.
+    :param annotation:
+    :param language:
+    :param translate:
+    :param custom_id:
+    :param use_cache:
+    :return:
+    """
+    model_path = settings.WHISPERCPP_DEFAULT_MODEL
+    content_hash = result_cache.annotation_content_hash(annotation)
+    if use_cache and _serve_cached_transcription(annotation, content_hash, model_path, language, translate):
+        return True
+    if annotation.annotation_type == "video":
+        transcribe_audio_from_video.delay(annotation.file.path, model_path, annotation.id, language, translate, custom_id, content_hash)
+    else:
+        transcribe_audio.delay(annotation.file.path, model_path, annotation.id, language, translate, custom_id, content_hash)
+    return False
+
+
 @job('transcribe', timeout='1h')
-def transcribe_audio(audio_path: str, model_path: str, step_annotation_id: int, language: str = "auto", translate: bool = False, custom_id: str = None):
+def transcribe_audio(audio_path: str, model_path: str, step_annotation_id: int, language: str = "auto", translate: bool = False, custom_id: str = None,
+        content_hash: str = None):
     """
     Convert audio from webm to wav using ffmpeg, then store the wave file as temporary file and transcribe it using the whisper model using subprocess and whispercpp main binary and base.en model before deleting the temporary file
     :param audio_path:
     :param model_path:
     :param step_annotation_id:
+    :param content_hash: hash of the media the result is cached under, the cache is looked up before enqueueing
     :return:
     """
+    annotation = Annotation.objects.get(id=step_annotation_id)
+    stream = _create_transcription_stream(annotation, language)
+    if _transcribe_with_service(annotation, audio_path, model_path, language, translate, stream, content_hash):
+        return annotation.transcription
+
     if audio_path.endswith(".webm"):
         wav_path = audio_path.replace(".webm", ".wav")
     elif audio_path.endswith(".m4a"):
@@ -89,38 +330,24 @@ def transcribe_audio(audio_path: str, model_path: str, step_annotation_id: int,
     whispercpp_bin_path = settings.WHISPERCPP_PATH
     temporary_vtt_path = wav_path + ".vtt"
     thread_count = settings.WHISPERCPP_THREAD_COUNT
+    resumed = bool(stream.segments)
     # Run whispercpp binary
     print(f"Running whispercpp binary: {whispercpp_bin_path} -m {model_path} -f {wav_path} -ovtt -t {thread_count}")
-    cmd = ['stdbuf', '-oL', whispercpp_bin_path, "-m", model_path, "-f", wav_path, "-ovtt", '-t', thread_count, '-l', language]
+    cmd = ['stdbuf', '-oL', whispercpp_bin_path, "-m", model_path, "-f", wav_path, "-ovtt", '-t', thread_count, '-l', stream.language or language]
     #if translate:
     #    cmd.append("-tr")
     #process = subprocess.run(cmd)
-    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    # capture whisper detected language
-
-    annotation = Annotation.objects.get(id=step_annotation_id)
-    for line in process.stdout:
-        line = line.decode("utf-8")
-        print(line)
-        if "auto-detected language" in line:
-            s = capture_language.search(line)
-            if s:
-                annotation.language = s.group(1)
-    if not annotation.language:
-        for line in process.stderr:
-            line = line.decode("utf-8")
-            print(line)
-            if "auto-detected language" in line:
-                s = capture_language.search(line)
-                if s:
-                    annotation.language = s.group(1)
+    _run_whisper_cli(cmd, annotation, stream)
 
     #for line in process.stderr.decode("utf-8").split("\n"):
     #    print(f"stderr: {line}")
-    with open(temporary_vtt_path, "rt") as f:
-        annotation.transcription = f.read()
-        annotation.transcribed = True
-        annotation.save()
+    if resumed:
+        annotation.transcription = segments_to_vtt(stream.segments)
+    else:
+        with open(temporary_vtt_path, "rt") as f:
+            annotation.transcription = f.read()
+    annotation.transcribed = True
+    annotation.save()
 
     if translate:
         if annotation.language and annotation.language != "en":
@@ -133,17 +360,7 @@ def transcribe_audio(audio_path: str, model_path: str, step_annotation_id: int,
 
     os.remove(wav_path)
     os.remove(temporary_vtt_path)
-    session_id = annotation.session.unique_id
-    channel_layer = get_channel_layer()
-    data = AnnotationSerializer(annotation, many=False).data
-
-    async_to_sync(channel_layer.group_send)(
-        f"transcription_{session_id}",
-        {
-            "type": "transcription_message",
-            "message": data,
-        },
-    )
+    _finish_transcription(annotation, content_hash, model_path, language, translate)
     return annotation.transcription
 
 
@@ -151,14 +368,20 @@ def transcribe_audio(audio_path: str, model_path: str, step_annotation_id: int,
 
 
 @job('transcribe', timeout='1h')
-def transcribe_audio_from_video(video_path: str, model_path: str, step_annotation_id: int, language: str = "auto", translate: bool = False, custom_id: str = None):
+def transcribe_audio_from_video(video_path: str, model_path: str, step_annotation_id: int, language: str = "auto", translate: bool = False, custom_id: str = None,
+        content_hash: str = None):
     """
     Convert audio from webm video to wav using ffmpeg, then store the wave file as temporary file and transcribe it using the whisper model using subprocess and whispercpp main binary and base.en model before deleting the temporary file
     :param video_path:
     :param model_path:
     :param step_annotation_id:
+    :param content_hash: hash of the media the result is cached under, the cache is looked up before enqueueing
     :return:
     """
+    annotation = Annotation.objects.get(id=step_annotation_id)
+    stream = _create_transcription_stream(annotation, language)
+    if _transcribe_with_service(annotation, video_path, model_path, language, translate, stream, content_hash):
+        return annotation.transcription
 
     # Convert audio from webm video to wav using ffmpeg specify the kHz to 16 kHz
     if video_path.endswith(".webm"):
@@ -174,32 +397,18 @@ def transcribe_audio_from_video(video_path: str, model_path: str, step_annotatio
     whispercpp_bin_path = settings.WHISPERCPP_PATH
     temporary_vtt_path = wav_path+".vtt"
     thread_count = settings.WHISPERCPP_THREAD_COUNT
+    resumed = bool(stream.segments)
     # Run whispercpp binary
     print(f"Running whispercpp binary: {whispercpp_bin_path} -m {model_path} -f {wav_path} -ovtt -t {thread_count}")
-    cmd = [whispercpp_bin_path, "-m", model_path, "-f", wav_path, "-ovtt", '-t', thread_count, '-l', language]
-    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    # capture whisper detected language
-
-    annotation = Annotation.objects.get(id=step_annotation_id)
-    for line in process.stdout:
-        line = line.decode("utf-8")
-        print(line)
-        if "auto-detected language" in line:
-            s = capture_language.search(line)
-            if s:
-                annotation.language = s.group(1)
-    if not annotation.language:
-        for line in process.stderr:
-            line = line.decode("utf-8")
-            print(line)
-            if "auto-detected language" in line:
-                s = capture_language.search(line)
-                if s:
-                    annotation.language = s.group(1)
+    cmd = ['stdbuf', '-oL', whispercpp_bin_path, "-m", model_path, "-f", wav_path, "-ovtt", '-t', thread_count, '-l', stream.language or language]
+    _run_whisper_cli(cmd, annotation, stream)
 
-    with open(temporary_vtt_path, "rt") as f:
-        annotation.transcription = f.read()
-        annotation.transcribed = True
+    if resumed:
+        annotation.transcription = segments_to_vtt(stream.segments)
+    else:
+        with open(temporary_vtt_path, "rt") as f:
+            annotation.transcription = f.read()
+    annotation.transcribed = True
 
     if translate:
         if annotation.language and annotation.language != "en":
@@ -213,18 +422,30 @@ def transcribe_audio_from_video(video_path: str, model_path: str, step_annotatio
 
     os.remove(wav_path)
     os.remove(temporary_vtt_path)
-    session_id = annotation.session.unique_id
-    channel_layer = get_channel_layer()
-    data = AnnotationSerializer(annotation, many=False).data
-    async_to_sync(channel_layer.group_send)(
-        f"transcription_{session_id}",
-        {
-            "type": "transcription_message",
-            "message": data,
-        },
-    )
+    _finish_transcription(annotation, content_hash, model_path, language, translate)
     return annotation.transcription
 
+def serve_cached_docx(protocol_id: int, session_id: str = None, user_id: int = None, instance_id: str = None) -> str:
+    """
+    Send the download of an earlier create_docx run on the same protocol and session content.
+    Returns the signed value, or None when the document has to be generated.
+    :param protocol_id:
+    :param session_id:
+    :param user_id:
+    :param instance_id:
+    :return:
+    """
+    if not settings.EXPORT_CACHE_ENABLED:
+        return None
+    artifact = export_cache.lookup(export_cache.docx_version(protocol_id, session_id), export_cache.docx_cache_args(protocol_id, session_id))
+    if not artifact:
+        return None
+    return export_cache.send_cached_download(
+        artifact, f"user_{user_id}",
+        {"user_download": True, "instance_id": instance_id, "filename": artifact.file_name, "enhanced": True}
+    )
+
+
 @job('export', timeout='2h')
 def create_docx(protocol_id: int, session_id: str = None, user_id: int = None, instance_id: str = None):
     """
@@ -240,6 +461,8 @@ def create_docx(protocol_id: int, session_id: str = None, user_id: int = None, i
         str: Path to generated DOCX file
     """
     logger = logging.getLogger(__name__)
+    cache_args = export_cache.docx_cache_args(protocol_id, session_id)
+    content_hash = export_cache.docx_version(protocol_id, session_id) if settings.EXPORT_CACHE_ENABLED else None
     
     try:
         # Get protocol with error handling
@@ -296,8 +519,9 @@ def create_docx(protocol_id: int, session_id: str = None, user_id: int = None, i
                     },
                 )
             
-            # Schedule cleanup (20 minutes)
-            threading.Timer(60*20, remove_file, args=[docx_filepath]).start()
+            # Cached documents are removed by LRU eviction, others after 20 minutes
+            if not export_cache.store(docx_filepath, content_hash, cache_args):
+                threading.Timer(60*20, remove_file, args=[docx_filepath]).start()
             
             return docx_filepath
             
@@ -924,12 +1148,100 @@ def html_to_docx(html, doc: docx.Document):
             # Add a run with normal style
             doc.add_paragraph(tag.text)
 
-@job('llama', timeout='1h')
-def llama_summary(prompt: str, user_id: int, target: dict = None, instance_id: str = None):
+def _send_summary_message(user_id: int, data: str, message_type: str, finished: bool, target: dict = None, instance_id: str = None,
+                          error: str = None):
+    channel_layer = get_channel_layer()
+    message = {
+        "data": data,
+        "type": message_type,
+        "finished": finished,
+        "target": target,
+        "instance_id": instance_id
+    }
+    if error:
+        message["error"] = error
+    async_to_sync(channel_layer.group_send)(
+        f"user_{user_id}_summary",
+        {
+            "type": "summary_message",
+            "message": message,
+        },
+    )
+
+
+def enqueue_summary(prompt: str, user_id: int, target: dict = None, instance_id: str = None, transcript: bool = False) -> bool:
     """
-    Generate completion using llama model
+    Replay a cached completion for the same prompt and model to the user summary channel, otherwise enqueue
+    llama_summary (or llama_summary_transcript when summarizing an annotation transcript).
+    Returns True when the result came from the cache.
     :param prompt:
     :param user_id:
+    :param target:
+    :param instance_id:
+    :param transcript:
+    :return:
+    """
+    task_type = "summary_transcript" if transcript else "summary"
+    message_type = "annotation" if transcript else "step"
+    entry = result_cache.lookup(task_type, result_cache.hash_text(prompt), result_cache.summary_cache_args())
+    if entry:
+        if transcript:
+            annotation = Annotation.objects.get(id=target["annotation"])
+            annotation.summary = entry.result.get("summary", entry.result["final"])
+            annotation.save()
+        if entry.result["streamed"]:
+            _send_summary_message(user_id, entry.result["streamed"], message_type, False, target, instance_id)
+        _send_summary_message(user_id, entry.result["final"], message_type, True, target, instance_id)
+        return True
+    if transcript:
+        llama_summary_transcript.delay(prompt, user_id, target, instance_id)
+    else:
+        llama_summary.delay(prompt, user_id, target, instance_id)
+    return False
+
+
+def _summary_coalescer(user_id: int, message_type: str, target: dict = None, instance_id: str = None) -> TokenCoalescer:
+    """
+    Coalesce generated text into summary channel frames bounded by LLAMA_STREAM_INTERVAL and LLAMA_STREAM_MAX_CHARS
+    """
+    return TokenCoalescer(
+        lambda data: _send_summary_message(user_id, data, message_type, False, target, instance_id),
+        settings.LLAMA_STREAM_INTERVAL,
+        settings.LLAMA_STREAM_MAX_CHARS,
+    )
+
+
+def _llama_server_completion(prompt: str, coalescer: TokenCoalescer):
+    """
+    Stream a completion from the warm llama.cpp server into the coalescer.
+    Returns None when the server is not available, or failed before any frame was sent, so the caller can fall
+    back to the llama binary. A failure after frames were sent is raised, the binary would repeat their text.
+    The final frame is left in the coalescer for the caller to send once its results are saved.
+    :param prompt:
+    :param coalescer:
+    :return:
+    """
+    service = get_llama_service()
+    if service is None:
+        return None
+    try:
+        text = service.complete(prompt, coalescer.add)
+    except LlamaServiceError as e:
+        if coalescer.frames_sent:
+            raise
+        logging.getLogger(__name__).warning(f"Warm llama.cpp server failed, falling back to llama binary: {e}")
+        coalescer.take()
+        return None
+    final = coalescer.take()
+    return {"streamed": text[:len(text) - len(final)], "final": final, "summary": text}
+
+
+def _llama_cli_completion(prompt: str, coalescer: TokenCoalescer):
+    """
+    Run the llama binary for a single prompt, streaming its output lines into the coalescer.
+    Returns None when the model did not finish its answer.
+    :param prompt:
+    :param coalescer:
     :return:
     """
     llama_bin_path = settings.LLAMA_BIN_PATH
@@ -938,6 +1250,7 @@ def llama_summary(prompt: str, user_id: int, target: dict = None, instance_id: s
     process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
     finished = False
     started = False
+    streamed = []
     for line in process.stdout:
         line = line.decode("utf-8")
         print(line)
@@ -946,36 +1259,36 @@ def llama_summary(prompt: str, user_id: int, target: dict = None, instance_id: s
         if "<|im_end|>" in line and started:
             finished = True
             break
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            f"user_{user_id}_summary",
-            {
-                "type": "summary_message",
-                "message": {
-                    "data": line,
-                    "type": "step",
-                    "finished": finished,
-                    "target": target,
-                    "instance_id": instance_id
-                },
-            },
-        )
+        streamed.append(line)
+        coalescer.add(line)
+    coalescer.flush()
 
-    if finished:
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            f"user_{user_id}_summary",
-            {
-                "type": "summary_message",
-                "message": {
-                    "data": line.split("<|im_end|>")[0],
-                    "type": "step",
-                    "finished": finished,
-                    "target": target,
-                    "instance_id": instance_id
-                },
-            },
-        )
+    if not finished:
+        return None
+    final = line.split("<|im_end|>")[0]
+    return {"streamed": "".join(streamed), "final": final, "summary": final}
+
+
+@job('llama', timeout='1h')
+def llama_summary(prompt: str, user_id: int, target: dict = None, instance_id: str = None):
+    """
+    Generate completion using llama model
+    :param prompt:
+    :param user_id:
+    :return:
+    """
+    coalescer = _summary_coalescer(user_id, "step", target, instance_id)
+    try:
+        result = _llama_server_completion(prompt, coalescer)
+    except LlamaServiceError as e:
+        _send_summary_message(user_id, coalescer.take(), "step", True, target, instance_id, error=str(e))
+        return
+    if result is None:
+        result = _llama_cli_completion(prompt, coalescer)
+
+    if result is not None:
+        _send_summary_message(user_id, result["final"], "step", True, target, instance_id)
+        result_cache.store("summary", result_cache.hash_text(prompt), result_cache.summary_cache_args(), result)
 
 
 @job('llama', timeout='1h')
@@ -987,73 +1300,164 @@ def llama_summary_transcript(prompt: str, user_id: int, target: dict = None, ins
     :param target:
     :return:
     """
-    llama_bin_path = settings.LLAMA_BIN_PATH
-    cmd = [llama_bin_path, "-p", prompt, "-m", settings.LLAMA_DEFAULT_MODEL, "-t", "8", "-c", "2048", "--repeat_penalty", "1.0", "--log-disable", "-n", "4096"]
-    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    started = False
-    finished = False
-    for line in process.stdout:
-        line = line.decode("utf-8")
-        print(line)
-        if "<|im_start|>assistant" in line:
-            started = True
-        if "<|im_end|>" in line and started:
-            finished = True
-            break
-        channel_layer = get_channel_layer()
+    coalescer = _summary_coalescer(user_id, "annotation", target, instance_id)
+    try:
+        result = _llama_server_completion(prompt, coalescer)
+    except LlamaServiceError as e:
+        _send_summary_message(user_id, coalescer.take(), "annotation", True, target, instance_id, error=str(e))
+        return
+    if result is None:
+        result = _llama_cli_completion(prompt, coalescer)
+
+    if result is not None:
+        annotation = Annotation.objects.get(id=target["annotation"])
+        annotation.summary = result["summary"]
+        annotation.save()
+        _send_summary_message(user_id, result["final"], "annotation", True, target, instance_id)
+        result_cache.store("summary_transcript", result_cache.hash_text(prompt), result_cache.summary_cache_args(), result, annotation)
+
+
+def enqueue_ocr(annotation: Annotation, instance_id: str = None) -> bool:
+    """
+    Answer from the content-hash cache when the same image was already recognized, otherwise enqueue
+    ocr_annotations with a reference to the stored annotation file. Returns True when the result came from the cache.
+    :param annotation:
+    :param instance_id:
+    :return:
+    """
+    if annotation_ocr_item(annotation) is None:
+        return False
+    content_hash = result_cache.annotation_content_hash(annotation)
+    entry = result_cache.lookup("ocr", content_hash, result_cache.ocr_cache_args()) if content_hash else None
+    if entry:
+        annotation.transcription = entry.result["text"]
+        annotation.transcribed = True
+        annotation.save()
+        _send_ocr_results([annotation])
+        return True
+    ocr_annotations.delay([annotation.id], instance_id=instance_id)
+    return False
+
+
+def _send_ocr_results(annotations: list):
+    """
+    Push recognized annotations to their session transcription channels with one message per session.
+    A single annotation keeps the plain serialized annotation message sent for transcriptions.
+    :param annotations:
+    :return:
+    """
+    by_session = {}
+    for annotation in annotations:
+        if annotation.session:
+            by_session.setdefault(annotation.session.unique_id, []).append(annotation)
+    channel_layer = get_channel_layer()
+    for session_id, session_annotations in by_session.items():
+        data = AnnotationSerializer(session_annotations, many=True).data
+        message = data[0] if len(data) == 1 else {"ocr": True, "annotations": data}
         async_to_sync(channel_layer.group_send)(
-            f"user_{user_id}_summary",
+            f"transcription_{session_id}",
             {
-                "type": "summary_message",
-                "message": {
-                    "data": line,
-                    "type": "annotation",
-                    "finished": finished,
-                    "target": target,
-                    "instance_id": instance_id
-                },
+                "type": "transcription_message",
+                "message": message,
             },
         )
-    if finished:
+
+
+@job('ocr', timeout='1h')
+def ocr_annotations(annotation_ids: list, user_id: int = None, instance_id: str = None):
+    """
+    Perform OCR on the stored images of sketch and image annotations as one batch.
+    Cached results are reused, the remaining images are recognized across a process pool of OCR_WORKERS,
+    and all annotations are written back with a single bulk update.
+    :param annotation_ids:
+    :param user_id: requesting user, notified once when the batch is finished
+    :param instance_id:
+    :return:
+    """
+    annotations = {
+        annotation.id: annotation
+        for annotation in Annotation.objects.filter(
+            id__in=annotation_ids, annotation_type__in=OCR_ANNOTATION_TYPES
+        ).select_related("session")
+    }
+    texts = {}
+    content_hashes = {}
+    pending = []
+    errors = {}
+    for annotation in annotations.values():
+        item = annotation_ocr_item(annotation)
+        if item is None:
+            continue
+        try:
+            content_hash = annotation.content_hash or image_content_hash(read_image_bytes(item["path"], item["annotation_type"]))
+        except OCRServiceError as e:
+            errors[annotation.id] = str(e)
+            continue
+        content_hashes[annotation.id] = content_hash
+        entry = result_cache.lookup("ocr", content_hash, result_cache.ocr_cache_args())
+        if entry:
+            texts[annotation.id] = entry.result["text"]
+        else:
+            pending.append(item)
+
+    recognized, failed, stats = OCRBatch().recognize(pending)
+    errors.update(failed)
+    stats["cached"] = len(texts)
+    texts.update(recognized)
+
+    now = timezone.now()
+    updated = []
+    for annotation_id, text in texts.items():
+        annotation = annotations[annotation_id]
+        annotation.transcription = text
+        annotation.transcribed = True
+        annotation.updated_at = now
+        updated.append(annotation)
+    if updated:
+        bulk_update_with_history(updated, Annotation, ["transcription", "transcribed", "updated_at"], batch_size=500)
+    for annotation_id, text in recognized.items():
+        result_cache.store("ocr", content_hashes[annotation_id], result_cache.ocr_cache_args(), {"text": text}, annotations[annotation_id])
+
+    current_job = get_current_job()
+    if current_job:
+        current_job.meta["ocr_stats"] = stats
+        current_job.save_meta()
+
+    _send_ocr_results(updated)
+    if user_id:
         channel_layer = get_channel_layer()
-        annotation = Annotation.objects.get(id=target["annotation"])
-        annotation.summary = line.split("<|im_end|>")[0]
-        annotation.save()
         async_to_sync(channel_layer.group_send)(
-            f"user_{user_id}_summary",
+            f"user_{user_id}",
             {
-                "type": "summary_message",
+                "type": "user_message",
                 "message": {
-                    "data": line.split("<|im_end|>")[0],
-                    "type": "annotation",
-                    "finished": finished,
-                    "target": target,
-                    "instance_id": instance_id
+                    "instance_id": instance_id,
+                    "status": "completed",
+                    "message": f"OCR finished for {len(updated)} of {len(annotation_ids)} annotations",
+                    "ocr": stats,
+                    "annotations": [annotation.id for annotation in updated],
+                    "errors": {str(k): v for k, v in errors.items()},
                 },
             },
         )
+    return stats
 
 
 @job('ocr', timeout='1h')
 def ocr_b64_image(image_b64: str, annotation_id: int, session_id: str, instance_id: str = None):
     """
-    Perform OCR on base64 image
+    Perform OCR on base64 image. Kept for jobs enqueued before ocr_annotations, new jobs reference the stored file.
     :param image_b64:
     :param user_id:
     :return:
     """
-
-    imgstring = image_b64.split('base64,')[-1].strip()
-    image_string = io.BytesIO(base64.b64decode(imgstring))
-    image = Image.open(image_string)
-    bg = Image.new("RGB", image.size, (255, 255, 255))
-    bg.paste(image, image)
-    data = pytesseract.image_to_string(bg)
+    image_bytes = decode_data_url(image_b64)
+    data = recognize_image_bytes(image_bytes)
     annotation = Annotation.objects.get(id=annotation_id)
     annotation.transcription = data
     annotation.transcribed = True
     annotation.save()
-    print(data)
+    result_cache.store("ocr", image_content_hash(image_bytes), result_cache.ocr_cache_args(), {"text": data}, annotation)
     data = AnnotationSerializer(annotation, many=False).data
     channel_layer = get_channel_layer()
     async_to_sync(channel_layer.group_send)(
@@ -1095,20 +1499,22 @@ def export_sqlite(user_id:int, session_id: str = None, instance_id: str = None):
         },
     )
 
-@job('export', timeout='3h')
-def export_data(user_id: int, protocol_ids: list[int] = None, session_ids: list[int] = None, instance_id: str = None, export_type: str = "complete", format_type: str = "zip"):
+@job('export', timeout='3h', retry=resumable_job_retry)
+def export_data(user_id: int, protocol_ids: list[int] = None, session_ids: list[int] = None, instance_id: str = None, export_type: str = "complete", format_type: str = "zip", export_profile: str = "default"):
     """
-    Export user data using the revised export system with options for complete, protocol-specific, or session-specific exports
+    Export user data using the revised export system with options for complete, incremental, protocol-specific, or session-specific exports
     
     :param user_id: ID of the user to export data for
     :param protocol_ids: Optional list of protocol IDs to limit export to specific protocols
     :param session_ids: Optional list of session IDs to limit export to specific sessions  
     :param instance_id: Optional instance ID for tracking the export job
-    :param export_type: Type of export - "complete", "protocol", or "session"
-    :param format_type: Archive format - "zip" or "tar.gz"
+    :param export_type: Type of export - "complete", "incremental", "protocol", or "session"
+    :param format_type: Archive format - "zip", "tar.gz", "tar" or "tar.zst"
+    :param export_profile: Watermark profile of incremental exports
     """
     user = User.objects.get(id=user_id)
     channel_layer = get_channel_layer()
+    checkpoint = JobCheckpointer('export_data')
     
     # Send initial notification
     async_to_sync(channel_layer.group_send)(
@@ -1129,7 +1535,7 @@ def export_data(user_id: int, protocol_ids: list[int] = None, session_ids: list[
     media_temp_dir = os.path.join(settings.MEDIA_ROOT, "temp")
     os.makedirs(media_temp_dir, exist_ok=True)
     
-    # Clean up old export files (older than 7 days) to prevent storage buildup
+    # Evict cached exports over budget and remove old untracked export files
     async_to_sync(channel_layer.group_send)(
         f"user_{user_id}",
         {
@@ -1143,7 +1549,14 @@ def export_data(user_id: int, protocol_ids: list[int] = None, session_ids: list[
             },
         },
     )
-    _cleanup_old_exports(media_temp_dir)
+    export_cache.sweep_temp_dir(media_temp_dir)
+    cache_args = export_cache.export_data_cache_args(export_type, format_type, protocol_ids, session_ids)
+    # A resumed export keeps the version it started from
+    if checkpoint.resumed:
+        content_hash = checkpoint.state.get('content_hash')
+    else:
+        content_hash = export_cache.user_data_version(user_id) if cache_args and settings.EXPORT_CACHE_ENABLED else None
+        checkpoint.save(content_hash=content_hash)
     
     try:
         # Send progress notification for data collection
@@ -1178,11 +1591,14 @@ def export_data(user_id: int, protocol_ids: list[int] = None, session_ids: list[
             )
         
         if export_type == "protocol" and protocol_ids:
-            filename = export_protocol_data(user, protocol_ids, export_dir=media_temp_dir, format_type=format_type, progress_callback=progress_callback)
+            filename = export_protocol_data(user, protocol_ids, export_dir=media_temp_dir, format_type=format_type, progress_callback=progress_callback, checkpoint=checkpoint)
         elif export_type == "session" and session_ids:
-            filename = export_session_data(user, session_ids, export_dir=media_temp_dir, format_type=format_type, progress_callback=progress_callback)
+            filename = export_session_data(user, session_ids, export_dir=media_temp_dir, format_type=format_type, progress_callback=progress_callback, checkpoint=checkpoint)
+        elif export_type == "incremental":
+            filename = export_incremental_data(user, export_profile, export_dir=media_temp_dir, format_type=format_type, progress_callback=progress_callback, checkpoint=checkpoint)
         else:
-            filename = export_user_data_revised(user, export_dir=media_temp_dir, format_type=format_type, progress_callback=progress_callback)
+            filename = export_user_data_revised(user, export_dir=media_temp_dir, format_type=format_type, progress_callback=progress_callback, checkpoint=checkpoint)
+        checkpoint.finish()
         
         # Send progress notification for file creation
         async_to_sync(channel_layer.group_send)(
@@ -1199,48 +1615,12 @@ def export_data(user_id: int, protocol_ids: list[int] = None, session_ids: list[
             },
         )
 
-        base_filename = os.path.basename(filename)
-        
-        # Create relative path for media URL
-        relative_path = os.path.relpath(filename, settings.MEDIA_ROOT)
-        
-        signer = TimestampSigner()
-        value = signer.sign(base_filename)
-        
-        # Send completion notification with download information
-        async_to_sync(channel_layer.group_send)(
-            f"user_{user_id}",
-            {
-                "type": "export_progress",
-                "message": {
-                    "instance_id": instance_id,
-                    "progress": 100,
-                    "status": "completed",
-                    "message": f"Export completed successfully! File ready for download.",
-                    "export_type": export_type,
-                    "file_size": _get_file_size_mb(filename)
-                },
-            },
-        )
-        
-        # Send download message
-        async_to_sync(channel_layer.group_send)(
-            f"user_{user_id}",
-            {
-                "type": "download_message",
-                "message": {
-                    "signed_value": value,
-                    "user_download": True,
-                    "instance_id": instance_id,
-                    "export_type": export_type,
-                    "export_path": filename,
-                    "download_url": f"/media/{relative_path}",
-                    "file_size_mb": _get_file_size_mb(filename)
-                },
-            },
-        )
+        if cache_args:
+            export_cache.store(filename, content_hash, cache_args, user_id)
+        _send_export_download(user_id, instance_id, export_type, filename)
         
     except Exception as e:
+        checkpoint.finish()
         # Send error notification with progress information
         async_to_sync(channel_layer.group_send)(
             f"user_{user_id}",
@@ -1270,6 +1650,80 @@ def export_data(user_id: int, protocol_ids: list[int] = None, session_ids: list[
             },
         )
 
+def _send_export_download(user_id: int, instance_id: str, export_type: str, filename: str, cached: bool = False) -> str:
+    """
+    Send the completion and download messages of a user data export and return the signed value
+    :param user_id:
+    :param instance_id:
+    :param export_type:
+    :param filename: Path of the archive in MEDIA_ROOT/temp
+    :param cached: Whether the archive was produced by an earlier export
+    :return:
+    """
+    channel_layer = get_channel_layer()
+    relative_path = os.path.relpath(filename, settings.MEDIA_ROOT)
+    signer = TimestampSigner()
+    value = signer.sign(os.path.basename(filename))
+
+    # Send completion notification with download information
+    async_to_sync(channel_layer.group_send)(
+        f"user_{user_id}",
+        {
+            "type": "export_progress",
+            "message": {
+                "instance_id": instance_id,
+                "progress": 100,
+                "status": "completed",
+                "message": f"Export completed successfully! File ready for download.",
+                "export_type": export_type,
+                "file_size": _get_file_size_mb(filename),
+                "cached": cached
+            },
+        },
+    )
+
+    # Send download message
+    async_to_sync(channel_layer.group_send)(
+        f"user_{user_id}",
+        {
+            "type": "download_message",
+            "message": {
+                "signed_value": value,
+                "user_download": True,
+                "instance_id": instance_id,
+                "export_type": export_type,
+                "export_path": filename,
+                "download_url": f"/media/{relative_path}",
+                "file_size_mb": _get_file_size_mb(filename),
+                "cached": cached
+            },
+        },
+    )
+    return value
+
+
+def serve_cached_export_data(user_id: int, protocol_ids: list[int] = None, session_ids: list[int] = None, instance_id: str = None, export_type: str = "complete", format_type: str = "zip") -> str:
+    """
+    Send the download of an earlier export_data archive with the same scope and format when the user data
+    has not changed since. Incremental exports are never served from the cache.
+    Returns the signed value, or None when the export has to run.
+    :param user_id:
+    :param protocol_ids:
+    :param session_ids:
+    :param instance_id:
+    :param export_type:
+    :param format_type:
+    :return:
+    """
+    cache_args = export_cache.export_data_cache_args(export_type, format_type, protocol_ids, session_ids)
+    if not cache_args or not settings.EXPORT_CACHE_ENABLED:
+        return None
+    artifact = export_cache.lookup(export_cache.user_data_version(user_id), cache_args, user_id)
+    if not artifact:
+        return None
+    return _send_export_download(user_id, instance_id, export_type, artifact.file_path, cached=True)
+
+
 def export_user_data(user_id: int, filename: str = None, protocol_ids: list[int] = None):
     """
     A function that would export user's protocol, protocolstep, annotation, variation, and section data to individual jsons and archive into a tar.gz file
@@ -1391,18 +1845,16 @@ def export_user_data(user_id: int, filename: str = None, protocol_ids: list[int]
             json.dump(step_tag, f)
 
     os.makedirs(os.path.join(user_folder, "media", "annotations"), exist_ok=True)
+    media = MediaCollector()
     for i in annotations_data:
         if i["file"]:
             correct_path = i["file"].replace("/media/app/", "/app/")
-            print(i)
-            print(os.path.exists(correct_path))
             if not os.path.exists(correct_path):
                 correct_path = "/app" + i["file"]
-                print(os.path.exists(correct_path))
-            new_path = os.path.join(user_folder, "media", "annotations", os.path.basename(correct_path))
-            print(correct_path)
-            print(new_path)
-            shutil.copy(correct_path, new_path)
+            media.add(correct_path, os.path.join("annotations", os.path.basename(correct_path)))
+    media.resolve()
+    # The staging folder lives under MEDIA_ROOT, so files are hardlinked instead of copied
+    media.stage(os.path.join(user_folder, "media"))
     if not filename:
         filename = str(uuid.uuid4())
         shutil.make_archive(os.path.join(media_root, "temp", f"{filename}"), 'gztar', user_folder)
@@ -1411,7 +1863,7 @@ def export_user_data(user_id: int, filename: str = None, protocol_ids: list[int]
     shutil.rmtree(user_folder)
     return filename
 
-@job('import-data', timeout='3h')
+@job('import-data', timeout='3h', retry=resumable_job_retry)
 def import_data(user_id: int, archive_file: str, instance_id: str = None, import_options: dict = None, storage_object_mappings: dict = None, bulk_transfer_mode: bool = False, vault_items: bool = True):
     """
     Import user data with progress tracking and selective import options
@@ -1494,7 +1946,8 @@ def import_data(user_id: int, archive_file: str, instance_id: str = None, import
             progress_callback=progress_callback,
             storage_object_mappings=storage_object_mappings,
             bulk_transfer_mode=bulk_transfer_mode,
-            vault_items=vault_items
+            vault_items=vault_items,
+            checkpoint=JobCheckpointer('import_data')
         )
         
         if result['success']:
@@ -1548,6 +2001,50 @@ def import_data(user_id: int, archive_file: str, instance_id: str = None, import
         )
 
 
+@job('import-data', timeout='3h')
+def revert_import_data(import_id: str, user_id: int, instance_id: str = None, suppress_history: bool = False):
+    """
+    Revert a user data import in batches, reporting progress over the websocket. Running it again
+    for a revert that stopped half way continues from its last finished batch.
+    
+    :param import_id: UUID of the import to revert
+    :param user_id: ID of the user performing the revert
+    :param instance_id: Optional instance ID for tracking the revert job
+    :param suppress_history: If True, do not write history rows for the deleted objects
+    """
+    user = User.objects.get(id=user_id)
+    channel_layer = get_channel_layer()
+    
+    def progress_callback(progress, message, status="processing"):
+        async_to_sync(channel_layer.group_send)(
+            f"user_{user_id}",
+            {
+                "type": "import_progress",
+                "message": {
+                    "instance_id": instance_id,
+                    "progress": progress,
+                    "status": status,
+                    "message": message,
+                    "import_type": "revert",
+                    "import_id": import_id
+                },
+            },
+        )
+    
+    try:
+        import_tracker = ImportTracker.objects.get(import_id=import_id)
+        reverter = ImportReverter(
+            import_tracker, user, progress_callback=progress_callback, suppress_history=suppress_history
+        )
+        result = reverter.revert_import()
+        if not result['success']:
+            progress_callback(-1, f"Revert failed: {result.get('error', 'Unknown error')}", "error")
+        return result
+    except Exception as e:
+        progress_callback(-1, f"Revert failed: {str(e)}", "error")
+        return {'success': False, 'error': str(e)}
+
+
 @job('import-data', timeout='1h')
 def dry_run_import_data(user_id: int, archive_file: str, instance_id: str = None, import_options: dict = None, bulk_transfer_mode: bool = False):
     """
@@ -1932,8 +2429,31 @@ def import_user_data(user_id: int, tar_file: str, instance_id: str = None):
         session.processing = False
         session.save()
 
+def serve_cached_instrument_job_metadata(instrument_job_id: int, data_type: str, user_id: int, instance_id: str = None) -> str:
+    """
+    Send the download of an earlier metadata TSV of the instrument job when its metadata and pools are unchanged.
+    Returns the signed value, or None when the file has to be generated.
+    :param instrument_job_id:
+    :param data_type:
+    :param user_id:
+    :param instance_id:
+    :return:
+    """
+    if not settings.EXPORT_CACHE_ENABLED:
+        return None
+    artifact = export_cache.lookup(
+        export_cache.instrument_job_metadata_version(instrument_job_id),
+        export_cache.instrument_job_metadata_cache_args(instrument_job_id, data_type),
+    )
+    if not artifact:
+        return None
+    return export_cache.send_cached_download(artifact, f"user_{user_id}_instrument_job", {"instance_id": instance_id})
+
+
 @job('export', timeout='3h')
 def export_instrument_job_metadata(instrument_job_id: int, data_type: str, user_id: int, instance_id: str = None):
+    cache_args = export_cache.instrument_job_metadata_cache_args(instrument_job_id, data_type)
+    content_hash = export_cache.instrument_job_metadata_version(instrument_job_id) if settings.EXPORT_CACHE_ENABLED else None
     instrument_job = InstrumentJob.objects.get(id=instrument_job_id)
     if data_type == "user_metadata":
         metadata = instrument_job.user_metadata.all()
@@ -1960,6 +2480,7 @@ def export_instrument_job_metadata(instrument_job_id: int, data_type: str, user_
         writer.writerow(result[0])
         for row in result[1:]:
             writer.writerow(row)
+    export_cache.store(tsv_filepath, content_hash, cache_args)
     signer = TimestampSigner()
     value = signer.sign(f"{filename}.tsv")
     channel_layer = get_channel_layer()
@@ -2942,7 +3463,7 @@ def _create_pool_metadata_from_import(pool, pool_data, metadata_columns,
             else:
                 pool.staff_metadata.add(pool_metadata_column)
 
-@job('import-data', timeout='3h')
+@job('import-data', timeout='3h', retry=resumable_job_retry)
 def import_sdrf_file(annotation_id: int, user_id: int, instrument_job_id: int, instance_id: str = None, data_type: str = "user_metadata"):
     """
     Import SDRF file
@@ -3042,88 +3563,101 @@ def import_sdrf_file(annotation_id: int, user_id: int, instrument_job_id: int, i
                 # Update sn_rows indices to reflect their new positions at the end
                 sn_rows = list(range(instrument_job.sample_number, len(data)))
 
-    if data_type == "user_metadata":
-        for m in instrument_job.user_metadata.all():
-            m.delete()
-        instrument_job.user_metadata.clear()
-    elif data_type == "staff_metadata":
-        for m in instrument_job.staff_metadata.all():
-            m.delete()
-        instrument_job.staff_metadata.clear()
-    else:
-        for m in instrument_job.user_metadata.all():
-            m.delete()
-        instrument_job.user_metadata.clear()
-        for m in instrument_job.staff_metadata.all():
-            m.delete()
-        instrument_job.staff_metadata.clear()
-    for i in range(len(metadata_columns)):
-        metadata_value_map = {}
-        for j in range(len(data)):
-            name = metadata_columns[i].name.lower()
-            if data[j][i] == "":
-                continue
-            if data[j][i] == "not applicable":
-                metadata_columns[i].not_applicable = True
-                continue
-            value = convert_sdrf_to_metadata(name, data[j][i])
-            if value not in metadata_value_map:
-                metadata_value_map[value] = []
-            metadata_value_map[value].append(j)
-        # get value with the highest count
-        max_count = 0
-        max_value = None
-        for value in metadata_value_map:
-            if len(metadata_value_map[value]) > max_count:
-                max_count = len(metadata_value_map[value])
-                max_value = value
-        if max_value:
-            metadata_columns[i].value = max_value
+    # Old metadata is cleared once, then every column is saved together with the checkpoint
+    # recording it, a resumed job reloads the saved columns and continues with the next one
+    checkpoint = JobCheckpointer('import_sdrf_file')
+    if not checkpoint.stage_done('clear'):
+        with transaction.atomic():
+            if data_type == "user_metadata":
+                for m in instrument_job.user_metadata.all():
+                    m.delete()
+                instrument_job.user_metadata.clear()
+            elif data_type == "staff_metadata":
+                for m in instrument_job.staff_metadata.all():
+                    m.delete()
+                instrument_job.staff_metadata.clear()
+            else:
+                for m in instrument_job.user_metadata.all():
+                    m.delete()
+                instrument_job.user_metadata.clear()
+                for m in instrument_job.staff_metadata.all():
+                    m.delete()
+                instrument_job.staff_metadata.clear()
+            checkpoint.complete_stage('clear', column_ids=[])
+    column_ids = list(checkpoint.state.get('column_ids', []))
+    saved_columns = MetadataColumn.objects.in_bulk(column_ids)
+    for i, column_id in enumerate(column_ids):
+        metadata_columns[i] = saved_columns[column_id]
+    for i in range(len(column_ids), len(metadata_columns)):
+        with transaction.atomic():
+            metadata_value_map = {}
+            for j in range(len(data)):
+                name = metadata_columns[i].name.lower()
+                if data[j][i] == "":
+                    continue
+                if data[j][i] == "not applicable":
+                    metadata_columns[i].not_applicable = True
+                    continue
+                value = convert_sdrf_to_metadata(name, data[j][i])
+                if value not in metadata_value_map:
+                    metadata_value_map[value] = []
+                metadata_value_map[value].append(j)
+            # get value with the highest count
+            max_count = 0
+            max_value = None
+            for value in metadata_value_map:
+                if len(metadata_value_map[value]) > max_count:
+                    max_count = len(metadata_value_map[value])
+                    max_value = value
+            if max_value:
+                metadata_columns[i].value = max_value
+                metadata_columns[i].save()
+            # calculate modifiers from the rest of the values
+            modifiers = []
+            for value in metadata_value_map:
+                if value != max_value:
+                    modifier = {"samples": [], "value": value}
+                    # sort from lowest to highest. add samples index. for continuous samples, add range
+                    samples = metadata_value_map[value]
+                    samples.sort()
+                    start = samples[0]
+                    end = samples[0]
+                    for i2 in range(1, len(samples)):
+                        if samples[i2] == end + 1:
+                            end = samples[i2]
+                        else:
+                            if start == end:
+                                modifier["samples"].append(str(start+1))
+                            else:
+                                modifier["samples"].append(f"{start+1}-{end+1}")
+                            start = samples[i2]
+                            end = samples[i2]
+                    if start == end:
+                        modifier["samples"].append(str(start+1))
+                    else:
+                        modifier["samples"].append(f"{start+1}-{end+1}")
+                    if len(modifier["samples"]) == 1:
+                        modifier["samples"] = modifier["samples"][0]
+                    else:
+                        modifier["samples"] = ",".join(modifier["samples"])
+                    modifiers.append(modifier)
+            if modifiers:
+                metadata_columns[i].modifiers = json.dumps(modifiers)
             metadata_columns[i].save()
-        # calculate modifiers from the rest of the values
-        modifiers = []
-        for value in metadata_value_map:
-            if value != max_value:
-                modifier = {"samples": [], "value": value}
-                # sort from lowest to highest. add samples index. for continuous samples, add range
-                samples = metadata_value_map[value]
-                samples.sort()
-                start = samples[0]
-                end = samples[0]
-                for i2 in range(1, len(samples)):
-                    if samples[i2] == end + 1:
-                        end = samples[i2]
+            if data_type == "user_metadata":
+                instrument_job.user_metadata.add(metadata_columns[i])
+            elif data_type == "staff_metadata":
+                instrument_job.staff_metadata.add(metadata_columns[i])
+            else:
+                if metadata_columns[i].type in user_metadata_field_map:
+                    if metadata_columns[i].name in user_metadata_field_map[metadata_columns[i].type]:
+                        instrument_job.user_metadata.add(metadata_columns[i])
                     else:
-                        if start == end:
-                            modifier["samples"].append(str(start+1))
-                        else:
-                            modifier["samples"].append(f"{start+1}-{end+1}")
-                        start = samples[i2]
-                        end = samples[i2]
-                if start == end:
-                    modifier["samples"].append(str(start+1))
-                else:
-                    modifier["samples"].append(f"{start+1}-{end+1}")
-                if len(modifier["samples"]) == 1:
-                    modifier["samples"] = modifier["samples"][0]
-                else:
-                    modifier["samples"] = ",".join(modifier["samples"])
-                modifiers.append(modifier)
-        if modifiers:
-            metadata_columns[i].modifiers = json.dumps(modifiers)
-        metadata_columns[i].save()
-        if data_type == "user_metadata":
-            instrument_job.user_metadata.add(metadata_columns[i])
-        elif data_type == "staff_metadata":
-            instrument_job.staff_metadata.add(metadata_columns[i])
-        else:
-            if metadata_columns[i].type in user_metadata_field_map:
-                if metadata_columns[i].name in user_metadata_field_map[metadata_columns[i].type]:
-                    instrument_job.user_metadata.add(metadata_columns[i])
+                        instrument_job.staff_metadata.add(metadata_columns[i])
                 else:
                     instrument_job.staff_metadata.add(metadata_columns[i])
-            else:
-                instrument_job.staff_metadata.add(metadata_columns[i])
+            column_ids.append(metadata_columns[i].id)
+            checkpoint.save('metadata', 'metadata_columns', i + 1, column_ids=column_ids)
 
     # Create pools from SDRF data if pooled samples were found
     if pooled_sample_column_index is not None:
@@ -3211,9 +3745,11 @@ def import_sdrf_file(annotation_id: int, user_id: int, instrument_job_id: int, i
                 })
         
         # Synchronize pools: update existing, create new, delete missing
-        _synchronize_pools_with_import_data(instrument_job, import_pools_data, metadata_columns, 
-                                          pooled_sample_column_index, source_name_column_index, 
-                                          user, data_type, user_metadata_field_map, staff_metadata_field_map)
+        with transaction.atomic():
+            _synchronize_pools_with_import_data(instrument_job, import_pools_data, metadata_columns, 
+                                              pooled_sample_column_index, source_name_column_index, 
+                                              user, data_type, user_metadata_field_map, staff_metadata_field_map)
+    checkpoint.finish()
 
     channel_layer = get_channel_layer()
     #notify user through channels that it has completed
@@ -3290,6 +3826,29 @@ def sdrf_validate(result):
     return errors
 
 
+def serve_cached_excel_template(user_id: int, instance_id: str, instrument_job_id: int, export_type: str = "user_metadata") -> str:
+    """
+    Send the download of an earlier excel template of the instrument job for the same user when the job,
+    its metadata and the offered favourites are unchanged.
+    Returns the signed value, or None when the workbook has to be generated.
+    :param user_id:
+    :param instance_id:
+    :param instrument_job_id:
+    :param export_type:
+    :return:
+    """
+    if not settings.EXPORT_CACHE_ENABLED:
+        return None
+    artifact = export_cache.lookup(
+        export_cache.excel_template_version(instrument_job_id, user_id),
+        export_cache.excel_template_cache_args(instrument_job_id, export_type),
+        user_id,
+    )
+    if not artifact:
+        return None
+    return export_cache.send_cached_download(artifact, f"user_{user_id}_instrument_job", {"instance_id": instance_id})
+
+
 @job('export', timeout='3h')
 def export_excel_template(user_id: int, instance_id: str, instrument_job_id: int, export_type: str = "user_metadata"):
     """
@@ -3299,6 +3858,8 @@ def export_excel_template(user_id: int, instance_id: str, instrument_job_id: int
     :param instrument_job_id:
     :return:
     """
+    cache_args = export_cache.excel_template_cache_args(instrument_job_id, export_type)
+    content_hash = export_cache.excel_template_version(instrument_job_id, user_id) if settings.EXPORT_CACHE_ENABLED else None
     instrument_job = InstrumentJob.objects.get(id=instrument_job_id)
     field_mask_map = {}
     if instrument_job.selected_template:
@@ -3765,6 +4326,7 @@ def export_excel_template(user_id: int, instance_id: str, instrument_job_id: int
     xlsx_filepath = os.path.join(settings.MEDIA_ROOT, "temp", f"{filename}.xlsx")
 
     wb.save(xlsx_filepath)
+    export_cache.store(xlsx_filepath, content_hash, cache_args, user_id)
     signer = TimestampSigner()
     value = signer.sign(f"{filename}.xlsx")
 
@@ -4507,18 +5069,18 @@ def check_and_remove_metadata_from_map(i, metadata_columns, metadata_field_map):
             if not metadata_field_map[metadata_columns[i].type][metadata_columns[i].name]:
                 del metadata_field_map[metadata_columns[i].type][metadata_columns[i].name]
 
-@job('export', timeout='3h')
+@job('export', timeout='3h', retry=resumable_job_retry)
 def export_instrument_usage(instrument_ids: list[int], lab_group_ids: list[int], user_ids: list[int], mode: str, instance_id: str, time_started: str = None, time_ended: str = None, calculate_duration_with_cutoff: bool = False, user_id: int = 0, file_format: str = "xlsx", includes_maintenance: bool = False, approved_only: bool = True):
     instrument_usages = InstrumentUsage.objects.filter(instrument__id__in=instrument_ids)
     channel_layer = get_channel_layer()
     if mode == 'service_lab_group':
-        lab_group = LabGroup.objects.filter(id__in=lab_group_ids, can_perform_ms_analysis=True)
-        if lab_group.exists():
-            users = User.objects.filter(lab_groups__in=lab_group)
-            instrument_jobs = InstrumentJob.objects.filter(service_lab_group__in=lab_group)
-            instrument_usages = instrument_usages.filter(
-                Q(user__in=users)|Q(annotation__instrument_jobs__in=instrument_jobs)
-            )
+        lab_group_ids = list(LabGroup.objects.filter(id__in=lab_group_ids, can_perform_ms_analysis=True).values_list("id", flat=True))
+        if lab_group_ids:
+            # matched through a subquery so usages reached by both conditions are reported once
+            matched = InstrumentUsage.objects.filter(
+                Q(user__lab_groups__id__in=lab_group_ids)|Q(annotation__instrument_jobs__service_lab_group__id__in=lab_group_ids)
+            ).values("id")
+            instrument_usages = instrument_usages.filter(id__in=matched)
 
         else:
             async_to_sync(channel_layer.group_send)(
@@ -4534,10 +5096,10 @@ def export_instrument_usage(instrument_ids: list[int], lab_group_ids: list[int],
             )
             return
     elif mode == 'lab_group':
-        lab_group = LabGroup.objects.filter(lab_group__id__in=lab_group_ids, can_perform_ms_analysis=False)
-        if lab_group.exists():
-            users = User.objects.filter(lab_group__in=lab_group)
-            instrument_usages = instrument_usages.filter(user__in=users)
+        lab_group_ids = list(LabGroup.objects.filter(id__in=lab_group_ids, can_perform_ms_analysis=False).values_list("id", flat=True))
+        if lab_group_ids:
+            matched = InstrumentUsage.objects.filter(user__lab_groups__id__in=lab_group_ids).values("id")
+            instrument_usages = instrument_usages.filter(id__in=matched)
         else:
             async_to_sync(channel_layer.group_send)(
                 f"user_{user_id}_instrument_job",
@@ -4565,88 +5127,47 @@ def export_instrument_usage(instrument_ids: list[int], lab_group_ids: list[int],
         instrument_usages = instrument_usages.filter(approved=True)
 
     if instrument_usages.exists():
-        filename = str(uuid.uuid4())
         if time_started:
             time_started = timezone.make_aware(datetime.datetime.strptime(time_started, "%Y-%m-%dT%H:%M:%S.%fZ"))
         if time_ended:
             time_ended = timezone.make_aware(datetime.datetime.strptime(time_ended, "%Y-%m-%dT%H:%M:%S.%fZ"))
-        if file_format == "xlsx":
-            wb = Workbook()
-            ws = wb.active
-            ws.title = "instrument_usage"
-            filename = filename + ".xlsx"
-            filepath = os.path.join(settings.MEDIA_ROOT, "temp", filename)
-        elif file_format == "csv" or file_format == "tsv":
-            filename = filename + f".{file_format}"
-            filepath = os.path.join(settings.MEDIA_ROOT, "temp", filename)
-            infile = open(filepath, "wt", encoding="utf-8", newline="")
-            if file_format == "csv":
-                writer = csv.writer(infile)
-            else:
-                writer = csv.writer(infile, delimiter="\t")
 
-        headers = ["Instrument", "User", "Time Started", "Time Ended", "Duration", "Description", "Associated Jobs", "Is Maintenance", "Is Approved"]
-        if file_format == "xlsx":
-            ws.append(headers)
-        elif file_format == "csv" or file_format == "tsv":
-            writer.writerow(headers)
-        for i in instrument_usages:
-            # check if instrument_usage time_started and time_ended are not splitted by the time_started and time_ended of the function
-            duration = i.time_ended - i.time_started
-            if calculate_duration_with_cutoff:
-                if time_ended:
-                    if i.time_ended > time_ended:
-                        # calculate the duration within the boundary
-                        if time_started:
-                            if i.time_started <= time_started:
-                                duration += time_ended - time_started
-                            else:
-                                duration += time_ended - i.time_started
-                        else:
-                            duration += time_ended - i.time_started
-                    else:
-                        if time_started:
-                            if i.time_started <= time_started:
-                                duration += i.time_ended - time_started
-                            else:
-                                duration += i.time_ended - i.time_started
-                        else:
-                            duration += i.time_ended - i.time_started
-                else:
-                    if time_started:
-                        if i.time_started <= time_started:
-                            duration += i.time_ended - time_started
-                        else:
-                            duration += i.time_ended - i.time_started
-            associated_jobs_information = []
-            if i.annotation:
-                associated_jobs = i.annotation.assigned_instrument_jobs.all()
-                for j in associated_jobs:
-                    associated_jobs_information.append(f"{j.submitted_at} {j.job_name} ({j.user.username})")
-
-            # convert time to string for excel
-            exported_time_started = i.time_started.strftime("%Y-%m-%d")
-            exported_time_ended = i.time_ended.strftime("%Y-%m-%d")
-            exported_duration = duration.days+1
-            if file_format == "xlsx":
-                ws.append([i.instrument.instrument_name, i.user.username, exported_time_started, exported_time_ended, exported_duration, i.description, ";\n".join(associated_jobs_information), i.maintenance, i.approved])
-            if file_format == "csv" or file_format == "tsv":
-                writer.writerow([i.instrument.instrument_name, i.user.username, exported_time_started, exported_time_ended, exported_duration, i.description, ";".join(associated_jobs_information), i.maintenance, i.approved])
-        if file_format == "xlsx":
-            for col in ws.columns:
-                max_length = 0
-                column = col[0].column_letter
-                for cell in col:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(cell.value)
-                    except:
-                        pass
-                adjusted_width = (max_length + 2)
-                ws.column_dimensions[column].width = adjusted_width
+        # Rows are staged in id order as delimited text next to the export, with the last id and the
+        # staged size checkpointed after every chunk. A resumed job cuts the staged file back to the
+        # checkpoint and continues after that id.
+        checkpoint = JobCheckpointer('export_instrument_usage')
+        filename = checkpoint.state.get('filename') or f"{uuid.uuid4()}.{file_format}"
+        filepath = os.path.join(settings.MEDIA_ROOT, "temp", filename)
+        staging_path = f"{filepath}.part"
+        delimiter = "\t" if file_format == "tsv" else ","
+        report = InstrumentUsageReport(
+            instrument_usages, time_started, time_ended, calculate_duration_with_cutoff,
+            job_separator=";\n" if file_format == "xlsx" else ";",
+        )
+        last_id = 0
+        if checkpoint.resumed and os.path.exists(staging_path):
+            staging = open(staging_path, "r+", encoding="utf-8", newline="")
+            staging.seek(checkpoint.state["position"])
+            staging.truncate()
+            last_id = checkpoint.offset
+        else:
+            os.makedirs(os.path.dirname(staging_path), exist_ok=True)
+            staging = open(staging_path, "wt", encoding="utf-8", newline="")
+        writer = csv.writer(staging, delimiter=delimiter)
+        with staging:
+            if last_id == 0:
+                writer.writerow(INSTRUMENT_USAGE_HEADERS)
+            for last_id, rows in report.chunks(last_id):
+                writer.writerows(rows)
+                staging.flush()
+                checkpoint.save("rows", "instrument_usage", last_id, filename=filename, position=staging.tell())
 
         if file_format == "xlsx":
-            wb.save(filepath)
+            InstrumentUsageReport.write_xlsx(staging_path, filepath)
+            os.remove(staging_path)
+        else:
+            os.replace(staging_path, filepath)
+        checkpoint.finish()
         signer = TimestampSigner()
         value = signer.sign(filename)
         async_to_sync(channel_layer.group_send)(
@@ -4918,11 +5439,9 @@ def check_instrument_warranty_maintenance(instrument_ids: list[int], days_before
         "maintenance": 0
     }
 
-    for i in instruments:
-        if i.check_upcoming_maintenance(days_before_maintenance_warning):
-            task_ran_count["warranty"] += 1
-        if i.check_warranty_expiration(days_before_warranty_warning):
-            task_ran_count["maintenance"] += 1
+    task_ran_count["warranty"], task_ran_count["maintenance"] = InstrumentChecker(
+        instruments, days_before_warranty_warning, days_before_maintenance_warning
+    ).run()
 
     async_to_sync(channel_layer.group_send)(
         f"user_{user_id}",
@@ -4937,6 +5456,29 @@ def check_instrument_warranty_maintenance(instrument_ids: list[int], days_before
     )
 
 
+@job('maintenance', timeout='1h')
+def deliver_notifications(deliveries: list):
+    """
+    Write the recipients of messages and tell their audiences, see cc.services.notifications
+    :param deliveries: (message id, audience, id of the user who has read the message) of every message
+    :return:
+    """
+    messages = Message.objects.in_bulk([message_id for message_id, _, _ in deliveries])
+    for message_id, audience, read_by in deliveries:
+        if message_id in messages:
+            notifications.deliver(messages[message_id], audience, read_by)
+
+
+@job('maintenance', timeout='1h')
+def refresh_inbox_thread(thread_id: int):
+    """
+    Recompute the inbox entries of a thread everyone sees, see cc.models.InboxEntry
+    :param thread_id: id of the message thread
+    :return:
+    """
+    inbox.apply_unread_changes(InboxEntry.refresh_thread(thread_id))
+
+
 def _get_file_size_mb(file_path: str) -> float:
     """
     Get file size in megabytes.
@@ -4955,44 +5497,6 @@ def _get_file_size_mb(file_path: str) -> float:
         return 0.0
 
 
-def _cleanup_old_exports(temp_dir: str, max_age_days: int = 7):
-    """
-    Clean up old export files from the temp directory to prevent storage buildup.
-    
-    Args:
-        temp_dir: Path to the temp directory containing export files
-        max_age_days: Maximum age in days before files are deleted (default: 7)
-    """
-
-    
-    try:
-        current_time = time.time()
-        max_age_seconds = max_age_days * 24 * 60 * 60
-        
-        for item in Path(temp_dir).iterdir():
-            if item.is_file() and (item.name.startswith('cupcake_export_') or 
-                                 item.name.endswith(('.zip', '.tar.gz', '.sha256'))):
-                file_age = current_time - item.stat().st_mtime
-                if file_age > max_age_seconds:
-                    try:
-                        item.unlink()
-                        print(f"Cleaned up old export file: {item.name}")
-                    except Exception as e:
-                        print(f"Failed to delete old export file {item.name}: {e}")
-            elif item.is_dir() and item.name.startswith('cupcake_export_'):
-                dir_age = current_time - item.stat().st_mtime
-                if dir_age > max_age_seconds:
-                    try:
-                        shutil.rmtree(item)
-                        print(f"Cleaned up old export directory: {item.name}")
-                    except Exception as e:
-                        print(f"Failed to delete old export directory {item.name}: {e}")
-                        
-    except Exception as e:
-        print(f"Error during export cleanup: {e}")
-        # Don't raise the exception to avoid breaking the export process
-
-
 @job('mcp', timeout='30m')
 def analyze_protocol_step_task(task_id: str, step_id: int, use_anthropic: bool = False, user_id: int = None):
     """
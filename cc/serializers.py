@@ -1198,6 +1198,10 @@ class MessageThreadSerializer(ModelSerializer):
         if not request or not request.user.is_authenticated:
             return 0
 
+        # Threads listed from the inbox of the user come with its unread count
+        if getattr(obj, 'inbox_unread_count', None) is not None:
+            return obj.inbox_unread_count
+
         # Count messages where user is a recipient and message is unread
         return MessageRecipient.objects.filter(
             message__thread=obj,
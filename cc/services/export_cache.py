@@ -0,0 +1,253 @@
+"""
+Export artifact cache helpers
+
+Exports are keyed by export type, parameters and a content version of the
+objects they read. The version is computed from the source querysets (row
+count, primary keys and the latest modification time) so the request path can
+tell whether an earlier export of the same data is still valid before a job is
+enqueued, and the job records the version it started from next to the file.
+The aggregates of all sources are read with one UNION ALL query.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from typing import Any, Dict, Optional
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.signing import TimestampSigner
+from django.db.models import Count, DateTimeField, Max, Q, Sum, Value
+
+from cc.models import (
+    Annotation, AnnotationFolder, ExportArtifact, FavouriteMetadataOption, Instrument, InstrumentJob,
+    InstrumentPermission, InstrumentUsage, LabGroup, MetadataColumn, MetadataTableTemplate, Project,
+    ProtocolModel, ProtocolRating, ProtocolReagent, ProtocolSection, ProtocolStep, ProtocolTag, Reagent,
+    ReagentAction, RemoteHost, SamplePool, Session, StepReagent, StepTag, StepVariation, StorageObject,
+    StoredReagent,
+)
+
+logger = logging.getLogger(__name__)
+
+# Files written to MEDIA_ROOT/temp by the export jobs
+EXPORT_FILE_PREFIXES = ('cupcake_export_',)
+EXPORT_FILE_SUFFIXES = ('.zip', '.tar.gz', '.tar', '.tar.zst', '.sha256', '.docx', '.tsv', '.xlsx')
+
+
+def _aggregates(source: str, rows, modified):
+    """One row of source name, row count, sum and maximum of the primary keys and latest modification time"""
+    return rows.order_by().annotate(source=Value(source)).values('source').annotate(
+        rows=Count('pk'), id_sum=Sum('pk'), id_max=Max('pk'), modified=modified
+    )
+
+
+def _version_queries(name: str, queryset) -> list:
+    """
+    Aggregate queries versioning a queryset. Models without updated_at take their modification
+    time from the newest entry of their history table, read as a second row named "<name>.history".
+    """
+    queryset = queryset.order_by().distinct()
+    model = queryset.model
+    rows = model.objects.filter(pk__in=queryset.values('pk'))
+    field_names = {field.name for field in model._meta.get_fields()}
+    if 'updated_at' in field_names:
+        return [_aggregates(name, rows, Max('updated_at'))]
+    queries = [_aggregates(name, rows, Value(None, output_field=DateTimeField()))]
+    if hasattr(model, 'history'):
+        history = model.history.filter(id__in=queryset.values('pk'))
+        queries.append(_aggregates(f"{name}.history", history, Max('history_date')))
+    return queries
+
+
+def content_version(**querysets) -> str:
+    """
+    Hash of the row count, primary keys and latest modification time of the named querysets,
+    read with a single query
+    """
+    queries = [query for name, queryset in querysets.items() for query in _version_queries(name, queryset)]
+    results = {row['source']: row for row in queries[0].union(*queries[1:], all=True)}
+    versions = {}
+    for name in querysets:
+        row = results.get(name, {})
+        modified = row.get('modified') or results.get(f"{name}.history", {}).get('modified')
+        versions[name] = [row.get('rows', 0), row.get('id_sum'), row.get('id_max'), modified.isoformat() if modified else None]
+    return hashlib.sha256(json.dumps(versions, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def user_data_version(user_id: int) -> str:
+    """Version of everything the user data exporter reads for a user"""
+    protocols = ProtocolModel.objects.filter(user_id=user_id)
+    return content_version(
+        protocols=protocols,
+        sections=ProtocolSection.objects.filter(protocol__user_id=user_id),
+        steps=ProtocolStep.objects.filter(protocol__user_id=user_id),
+        ratings=ProtocolRating.objects.filter(protocol__user_id=user_id),
+        sessions=Session.objects.filter(user_id=user_id),
+        annotations=Annotation.objects.filter(user_id=user_id),
+        folders=AnnotationFolder.objects.filter(session__user_id=user_id),
+        storage_objects=StorageObject.objects.filter(Q(user_id=user_id) | Q(stored_reagents__user_id=user_id)),
+        instruments=Instrument.objects.filter(instrument_permissions__user_id=user_id),
+        instrument_permissions=InstrumentPermission.objects.filter(user_id=user_id),
+        instrument_usage=InstrumentUsage.objects.filter(user_id=user_id),
+        reagents=Reagent.objects.filter(
+            Q(protocolreagent__protocol__user_id=user_id) |
+            Q(stepreagent__step__protocol__user_id=user_id) |
+            Q(stored_reagents__user_id=user_id)
+        ),
+        stored_reagents=StoredReagent.objects.filter(user_id=user_id),
+        reagent_actions=ReagentAction.objects.filter(user_id=user_id),
+        lab_groups=LabGroup.objects.filter(users__id=user_id),
+        projects=Project.objects.filter(owner_id=user_id),
+        remote_hosts=RemoteHost.objects.all(),
+    )
+
+
+def docx_version(protocol_id: int, session_id: str = None) -> str:
+    """Version of a protocol and, for session exports, the session annotations"""
+    step_annotations = Annotation.objects.filter(step__protocol_id=protocol_id)
+    session_annotations = Annotation.objects.none()
+    if session_id:
+        step_annotations = step_annotations.filter(session__unique_id=session_id)
+        session_annotations = Annotation.objects.filter(session__unique_id=session_id)
+    return content_version(
+        protocol=ProtocolModel.objects.filter(id=protocol_id),
+        sections=ProtocolSection.objects.filter(protocol_id=protocol_id),
+        steps=ProtocolStep.objects.filter(protocol_id=protocol_id),
+        variations=StepVariation.objects.filter(step__protocol_id=protocol_id),
+        protocol_reagents=ProtocolReagent.objects.filter(protocol_id=protocol_id),
+        step_reagents=StepReagent.objects.filter(step__protocol_id=protocol_id),
+        protocol_tags=ProtocolTag.objects.filter(protocol_id=protocol_id),
+        step_tags=StepTag.objects.filter(step__protocol_id=protocol_id),
+        step_annotations=step_annotations,
+        session=Session.objects.filter(unique_id=session_id) if session_id else Session.objects.none(),
+        session_annotations=session_annotations,
+    )
+
+
+def _instrument_job_sources(instrument_job_id: int) -> Dict[str, Any]:
+    pools = SamplePool.objects.filter(instrument_job_id=instrument_job_id)
+    return {
+        'instrument_job': InstrumentJob.objects.filter(id=instrument_job_id),
+        'user_metadata': MetadataColumn.objects.filter(instrument_jobs__id=instrument_job_id),
+        'staff_metadata': MetadataColumn.objects.filter(assigned_instrument_jobs__id=instrument_job_id),
+        'pools': pools,
+        'pool_metadata': MetadataColumn.objects.filter(
+            Q(sample_pools__in=pools) | Q(assigned_sample_pools__in=pools)
+        ),
+    }
+
+
+def instrument_job_metadata_version(instrument_job_id: int) -> str:
+    """Version of the metadata and sample pools of an instrument job"""
+    return content_version(**_instrument_job_sources(instrument_job_id))
+
+
+def excel_template_version(instrument_job_id: int, user_id: int) -> str:
+    """
+    Version of an instrument job, its template and the favourites offered in the workbook.
+    Project suggestions come from metadata anywhere in the project, so every metadata column counts.
+    """
+    instrument_job = InstrumentJob.objects.filter(id=instrument_job_id).values(
+        'service_lab_group_id', 'selected_template_id', 'project_id'
+    ).first() or {}
+    return content_version(
+        favourites=FavouriteMetadataOption.objects.filter(
+            Q(user_id=user_id, service_lab_group__isnull=True, lab_group__isnull=True) |
+            Q(service_lab_group_id=instrument_job.get('service_lab_group_id')) |
+            Q(is_global=True)
+        ),
+        template=MetadataTableTemplate.objects.filter(id=instrument_job.get('selected_template_id')),
+        project_annotations=Annotation.objects.filter(session__projects__id=instrument_job.get('project_id')),
+        metadata=MetadataColumn.objects.all(),
+        **_instrument_job_sources(instrument_job_id)
+    )
+
+
+def export_data_cache_args(export_type: str, format_type: str, protocol_ids: list = None, session_ids: list = None) -> Optional[Dict[str, Any]]:
+    """
+    Cache arguments of an export_data job, None for incremental exports as they depend on the
+    watermark of their profile rather than on the data alone.
+    """
+    if export_type == "incremental":
+        return None
+    if export_type == "protocol" and protocol_ids:
+        return {"export_type": "protocol_data", "parameters": {"format": format_type, "protocol_ids": sorted(protocol_ids)}}
+    if export_type == "session" and session_ids:
+        return {"export_type": "session_data", "parameters": {"format": format_type, "session_ids": sorted(session_ids)}}
+    return {"export_type": "user_data", "parameters": {"format": format_type}}
+
+
+def docx_cache_args(protocol_id: int, session_id: str = None) -> Dict[str, Any]:
+    return {"export_type": "docx", "parameters": {"protocol_id": protocol_id, "session_id": session_id}}
+
+
+def instrument_job_metadata_cache_args(instrument_job_id: int, data_type: str) -> Dict[str, Any]:
+    return {"export_type": "instrument_job_metadata", "parameters": {"instrument_job_id": instrument_job_id, "data_type": data_type}}
+
+
+def excel_template_cache_args(instrument_job_id: int, export_type: str) -> Dict[str, Any]:
+    return {"export_type": "excel_template", "parameters": {"instrument_job_id": instrument_job_id, "export_type": export_type}}
+
+
+def lookup(content_hash: str, cache_args: Dict[str, Any], user_id: int = None) -> Optional[ExportArtifact]:
+    """Cached export for the content, or None when caching is disabled or there is no hit"""
+    if not settings.EXPORT_CACHE_ENABLED:
+        return None
+    return ExportArtifact.lookup(cache_args["export_type"], user_id, cache_args["parameters"], content_hash)
+
+
+def store(file_path: str, content_hash: str, cache_args: Dict[str, Any], user_id: int = None) -> Optional[ExportArtifact]:
+    """Record a finished export file, evicting least recently used artifacts when over budget"""
+    if not settings.EXPORT_CACHE_ENABLED or not content_hash or not os.path.exists(file_path):
+        return None
+    try:
+        return ExportArtifact.store(cache_args["export_type"], file_path, user_id, cache_args["parameters"], content_hash)
+    except Exception as e:
+        logger.warning(f"Could not cache export {file_path}: {e}")
+        return None
+
+
+def send_cached_download(artifact: ExportArtifact, group: str, message: Dict[str, Any] = None) -> str:
+    """Send the download message of a cached export to a channel group and return its signed value"""
+    signed_value = TimestampSigner().sign(artifact.file_name)
+    message = dict(message or {})
+    message.update({"signed_value": signed_value, "cached": True})
+    async_to_sync(get_channel_layer().group_send)(group, {"type": "download_message", "message": message})
+    return signed_value
+
+
+def sweep_temp_dir(temp_dir: str = None, max_age_days: int = None) -> Dict[str, int]:
+    """
+    Evict least recently used export artifacts beyond the cache bounds, then remove export
+    files and staging directories the cache does not track once they are older than max_age_days.
+    """
+    temp_dir = temp_dir or os.path.join(settings.MEDIA_ROOT, "temp")
+    max_age_days = settings.EXPORT_TEMP_MAX_AGE_DAYS if max_age_days is None else max_age_days
+    removed = {"evicted": ExportArtifact.evict(), "files": 0, "directories": 0}
+    if not os.path.isdir(temp_dir):
+        return removed
+
+    tracked = set()
+    for file_name in ExportArtifact.objects.values_list('file_name', flat=True):
+        tracked.update((file_name, f"{file_name}.sha256"))
+    cutoff = time.time() - max_age_days * 24 * 60 * 60
+
+    for entry in os.scandir(temp_dir):
+        if entry.name in tracked:
+            continue
+        try:
+            if entry.stat().st_mtime > cutoff:
+                continue
+            if entry.is_file() and (entry.name.startswith(EXPORT_FILE_PREFIXES) or entry.name.endswith(EXPORT_FILE_SUFFIXES)):
+                os.remove(entry.path)
+                removed["files"] += 1
+            elif entry.is_dir() and entry.name.startswith(EXPORT_FILE_PREFIXES):
+                shutil.rmtree(entry.path)
+                removed["directories"] += 1
+        except OSError as e:
+            logger.warning(f"Failed to remove old export {entry.name}: {e}")
+    return removed
@@ -0,0 +1,83 @@
+"""
+Unread message counters of users
+
+The number of unread messages of a user is the sum of the unread counts of their inbox entries, see
+cc.models.InboxEntry. Counters are kept in the cache for INBOX_UNREAD_TIMEOUT seconds: polls read
+them from the cache, or sum the entries of the user with one indexed query when they are missing.
+Changes of the entries adjust the cached counters once they commit, and counters expiring
+reconciles them with the database. Without a reachable cache every read sums the entries.
+"""
+
+import logging
+from typing import Dict, Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum
+
+from cc.models import InboxEntry
+
+logger = logging.getLogger(__name__)
+
+
+def unread_key(user_id: int) -> str:
+    return f"inbox_unread_{user_id}"
+
+
+def count_unread(user_id: int) -> int:
+    """Unread messages of a user summed from their inbox entries"""
+    return InboxEntry.objects.filter(user_id=user_id).aggregate(total=Sum("unread_count"))["total"] or 0
+
+
+def unread_count(user_id: int) -> int:
+    """Unread messages of a user, from the cache when it has them"""
+    key = unread_key(user_id)
+    try:
+        count = cache.get(key)
+    except Exception as e:
+        logger.warning(f"Unread counter unavailable: {e}")
+        return count_unread(user_id)
+    if count is None:
+        count = count_unread(user_id)
+        try:
+            cache.add(key, count, timeout=settings.INBOX_UNREAD_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"Unread counter not stored: {e}")
+    return count
+
+
+def adjust_unread(deltas: Dict[int, int]):
+    """Add the changes of unread messages by user to the cached counters, missing counters are left to the next read"""
+    for user_id, delta in deltas.items():
+        if not delta:
+            continue
+        try:
+            cache.incr(unread_key(user_id), delta)
+        except ValueError:
+            pass
+        except Exception as e:
+            logger.warning(f"Unread counter not updated: {e}")
+            return
+
+
+def apply_unread_changes(deltas: Dict[int, int]):
+    """Adjust the cached counters by the changes of unread messages by user once they commit"""
+    if deltas:
+        transaction.on_commit(lambda: adjust_unread(deltas))
+
+
+def reset_unread(user_ids: Iterable[int]):
+    """Drop the cached counters of users"""
+    try:
+        cache.delete_many([unread_key(user_id) for user_id in user_ids])
+    except Exception as e:
+        logger.warning(f"Unread counters not reset: {e}")
+
+
+def reconcile(user_ids: Iterable[int]) -> int:
+    """Rebuild the inbox entries of users and drop their counters, returns the number of entries"""
+    user_ids = list(user_ids)
+    count = sum(InboxEntry.rebuild(user_id) for user_id in user_ids)
+    reset_unread(user_ids)
+    return count
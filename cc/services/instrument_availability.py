@@ -0,0 +1,102 @@
+"""
+Free/busy availability of instruments from the per-day slot bitmaps
+
+The busy slots of every instrument and UTC day are kept in InstrumentAvailabilityDay rows.
+A request reads the rows of the days it covers, computes the missing ones with one booking
+query per instrument, and works on the bitmaps only, so the cost of a calendar page or a
+search for a free window depends on the days asked for and not on the booking history.
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+from cc.models import InstrumentAvailabilityDay
+
+
+def day_bitmaps(instrument_ids: List[int], first_day: date, last_day: date) -> Dict[int, Dict[date, int]]:
+    """Busy bitmaps of the instruments by day, days without an up to date row are computed and stored"""
+    bitmaps = {instrument_id: {} for instrument_id in instrument_ids}
+    rows = InstrumentAvailabilityDay.objects.filter(
+        instrument_id__in=instrument_ids, day__range=[first_day, last_day],
+        slot_minutes=settings.INSTRUMENT_SLOT_MINUTES,
+    )
+    for row in rows:
+        bitmaps[row.instrument_id][row.day] = row.bitmap
+
+    days = [first_day + timedelta(days=n) for n in range((last_day - first_day).days + 1)]
+    for instrument_id, known in bitmaps.items():
+        missing = [day for day in days if day not in known]
+        if missing:
+            computed = InstrumentAvailabilityDay.compute(instrument_id, missing[0], missing[-1])
+            computed = {day: computed[day] for day in missing}
+            InstrumentAvailabilityDay.store(instrument_id, computed)
+            known.update(computed)
+    return bitmaps
+
+
+def _slot_range(time_started: datetime, time_ended: datetime):
+    """First day and the slot indexes from it of the first whole slot after time_started and the end slot"""
+    slot = timedelta(minutes=settings.INSTRUMENT_SLOT_MINUTES)
+    first_day = InstrumentAvailabilityDay.to_day(time_started)
+    day_start = InstrumentAvailabilityDay.day_start(first_day)
+    first_slot = -((day_start - time_started) // slot)
+    end_slot = (time_ended - day_start) // slot
+    return first_day, day_start, first_slot, end_slot
+
+
+def _first_free_run(free: int, length: int) -> Optional[int]:
+    """Lowest bit starting a run of length set bits, the run is narrowed by shifts doubling its length"""
+    run = free
+    covered = 1
+    while covered < length and run:
+        shift = min(covered, length - covered)
+        run &= run >> shift
+        covered += shift
+    return (run & -run).bit_length() - 1 if run else None
+
+
+def first_free_windows(instrument_ids: List[int], duration: timedelta, time_started: datetime, time_ended: datetime) -> List[dict]:
+    """
+    Earliest window of at least duration within [time_started, time_ended) per instrument that is
+    free on the slot grid, ordered by start. Instruments without a free window are left out.
+    """
+    slot = timedelta(minutes=settings.INSTRUMENT_SLOT_MINUTES)
+    length = max(1, -(-duration // slot))
+    first_day, day_start, first_slot, end_slot = _slot_range(time_started, time_ended)
+    if end_slot - first_slot < length:
+        return []
+    slots_per_day = InstrumentAvailabilityDay.slots_per_day()
+    last_day = first_day + timedelta(days=(end_slot - 1) // slots_per_day)
+    window_mask = (1 << end_slot) - (1 << first_slot)
+
+    windows = []
+    for instrument_id, bitmaps in day_bitmaps(instrument_ids, first_day, last_day).items():
+        busy = 0
+        for day, bitmap in bitmaps.items():
+            busy |= bitmap << ((day - first_day).days * slots_per_day)
+        start = _first_free_run(~busy & window_mask, length)
+        if start is not None:
+            windows.append({
+                "instrument": instrument_id,
+                "time_started": day_start + start * slot,
+                "time_ended": day_start + (start + length) * slot,
+            })
+    windows.sort(key=lambda window: (window["time_started"], window["instrument"]))
+    return windows
+
+
+def busy_days(instrument_ids: List[int], first_day: date, last_day: date) -> List[dict]:
+    """Busy slots of every day per instrument as strings with a 1 for every busy slot, in slot order"""
+    slots_per_day = InstrumentAvailabilityDay.slots_per_day()
+    return [
+        {
+            "instrument": instrument_id,
+            "days": [
+                {"day": day.isoformat(), "busy": format(bitmap, f"0{slots_per_day}b")[::-1]}
+                for day, bitmap in sorted(bitmaps.items())
+            ],
+        }
+        for instrument_id, bitmaps in day_bitmaps(instrument_ids, first_day, last_day).items()
+    ]
@@ -0,0 +1,96 @@
+"""
+Interval overlap checks for instrument bookings
+
+Bookings are half open intervals [time_started, time_ended) on one instrument. Two bookings
+conflict when each starts before the other ends, so back to back bookings do not conflict,
+and bookings of other instruments never do. All intervals of a request, e.g. a recurring
+maintenance series, are checked with a single query over the window they span, which the
+(instrument, time_started, time_ended) index of InstrumentUsage serves.
+"""
+
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from typing import Iterable, List, Tuple
+
+from django.db.models import Q, QuerySet
+from simple_history.utils import bulk_create_with_history
+
+from cc.models import InstrumentAvailabilityDay, InstrumentUsage, InstrumentUsageDay
+
+Interval = Tuple[datetime, datetime]
+
+
+def overlap_filter(time_started: datetime, time_ended: datetime) -> Q:
+    """Bookings overlapping [time_started, time_ended)"""
+    return Q(time_started__lt=time_ended, time_ended__gt=time_started)
+
+
+def overlapping_usages(instrument_id: int, time_started: datetime, time_ended: datetime, exclude_ids: Iterable[int] = ()) -> QuerySet:
+    """Bookings of an instrument overlapping [time_started, time_ended)"""
+    return InstrumentUsage.objects.filter(
+        overlap_filter(time_started, time_ended), instrument_id=instrument_id
+    ).exclude(id__in=list(exclude_ids))
+
+
+def find_conflicts(instrument_id: int, intervals: List[Interval], exclude_ids: Iterable[int] = ()) -> List[InstrumentUsage]:
+    """
+    Bookings of an instrument overlapping any of the intervals, in start order. The intervals
+    must not overlap each other, as in a booking series. Candidates are fetched with one query
+    over the window of the series and matched to the intervals by binary search.
+    """
+    intervals = sorted(intervals)
+    if not intervals:
+        return []
+    starts = [start for start, _ in intervals]
+    ends = [end for _, end in intervals]
+    if any(ends[n] > starts[n + 1] for n in range(len(intervals) - 1)):
+        raise ValueError("The intervals of a booking series must not overlap each other")
+
+    candidates = overlapping_usages(instrument_id, starts[0], ends[-1], exclude_ids).order_by('time_started', 'id')
+    conflicts = []
+    for usage in candidates:
+        # Intervals ending after the booking starts and starting before it ends
+        first = bisect_right(ends, usage.time_started)
+        last = bisect_left(starts, usage.time_ended)
+        if first < last:
+            conflicts.append(usage)
+    return conflicts
+
+
+def repeat_intervals(time_started: datetime, time_ended: datetime, repeat_days: int, repeat_until: datetime) -> List[Interval]:
+    """The booking followed by a repeat every repeat_days days for as long as the previous one ends before repeat_until"""
+    intervals = [(time_started, time_ended)]
+    if not repeat_days or repeat_days <= 0 or not repeat_until:
+        return intervals
+    step = timedelta(days=repeat_days)
+    while time_ended < repeat_until:
+        time_started += step
+        time_ended += step
+        intervals.append((time_started, time_ended))
+    return intervals
+
+
+def create_usage_series(usage: InstrumentUsage, intervals: List[Interval]) -> List[InstrumentUsage]:
+    """
+    Create a copy of an unsaved booking for every interval with one bulk insert, returned in
+    interval order. The insert skips the booking signals, so the availability and utilization
+    of the covered days are recomputed here.
+    """
+    usages = [
+        InstrumentUsage(
+            instrument=usage.instrument,
+            user=usage.user,
+            description=usage.description,
+            approved=usage.approved,
+            maintenance=usage.maintenance,
+            time_started=time_started,
+            time_ended=time_ended,
+        )
+        for time_started, time_ended in intervals
+    ]
+    usages = bulk_create_with_history(usages, InstrumentUsage, default_user=usage.user)
+    time_started = min(start for start, _ in intervals)
+    time_ended = max(end for _, end in intervals)
+    InstrumentAvailabilityDay.refresh(usage.instrument.id, time_started, time_ended)
+    InstrumentUsageDay.refresh(usage.instrument.id, time_started, time_ended)
+    return usages
@@ -0,0 +1,216 @@
+"""
+Set based warranty and maintenance checks of instruments
+
+The support records, warranty end dates and last completed maintenance of all checked
+instruments are read with a fixed number of queries, whatever the number of instruments.
+Instruments get at most one notice of each kind per run, for the first of their support
+records that is due, and managers are notified through threads, messages and recipients
+created with bulk inserts.
+"""
+
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from django.db.models import F, Max, Prefetch
+from django.utils import timezone
+from simple_history.utils import bulk_update_with_history
+
+from cc.models import (
+    ExternalContact, Instrument, InstrumentPermission, MaintenanceLog, Message, MessageThread, SupportInformation,
+)
+from cc.services import notifications
+
+# Instruments are notified again of the same kind of notice after this long
+NOTIFICATION_INTERVAL = timedelta(days=7)
+
+# Notices by instrument id as (subject, message)
+Notices = Dict[int, Tuple[str, str]]
+
+
+def notify_managers(notices: Notices) -> Set[int]:
+    """
+    Send every notice to the managers of its instrument in a system thread of its own. All threads
+    and messages are created with one bulk insert each and delivered together, see
+    cc.services.notifications. Returns the ids of the instruments with managers to notify.
+    """
+    managers = {}
+    for instrument_id, user_id in InstrumentPermission.objects.filter(
+        instrument_id__in=list(notices), can_manage=True
+    ).order_by("id").values_list("instrument_id", "user_id"):
+        managers.setdefault(instrument_id, {})[user_id] = None
+    notified = [instrument_id for instrument_id in notices if instrument_id in managers]
+    if not notified:
+        return set()
+
+    threads = MessageThread.objects.bulk_create([
+        MessageThread(title=notices[instrument_id][0], is_system_thread=True) for instrument_id in notified
+    ])
+    messages = Message.objects.bulk_create([
+        Message(thread=thread, content=notices[instrument_id][1], message_type="system_notification", sender=None)
+        for instrument_id, thread in zip(notified, threads)
+    ])
+    notifications.notify_many([
+        (message, notifications.build_audience(users=managers[instrument_id]), None)
+        for instrument_id, message in zip(notified, messages)
+    ])
+    return set(notified)
+
+
+class InstrumentChecker:
+    """
+    Warranty and maintenance notices of a set of instruments:
+
+        checker = InstrumentChecker(Instrument.objects.filter(enabled=True), warranty_days=30)
+        warranty_count, maintenance_count = checker.run()
+
+    Without a number of days the notification settings of every instrument are used.
+    """
+
+    def __init__(self, instruments: Iterable[Instrument], warranty_days: Optional[int] = None, maintenance_days: Optional[int] = None,
+                 today: date = None):
+        self.instruments = list(instruments)
+        self.warranty_days = warranty_days
+        self.maintenance_days = maintenance_days
+        self.now = timezone.now()
+        self.today = today or self.now.date()
+
+    def _warranty_threshold(self, instrument: Instrument) -> int:
+        return self.warranty_days or instrument.days_before_warranty_notification or 30
+
+    def _maintenance_threshold(self, instrument: Instrument) -> int:
+        return self.maintenance_days or instrument.days_before_maintenance_notification or 14
+
+    def _due(self, field: str) -> List[Instrument]:
+        """Instruments not notified of this kind within the notification interval"""
+        return [
+            instrument for instrument in self.instruments
+            if not getattr(instrument, field) or self.now - getattr(instrument, field) >= NOTIFICATION_INTERVAL
+        ]
+
+    @staticmethod
+    def _support_records(instrument_ids: Iterable[int], **filters) -> Dict[int, List[SupportInformation]]:
+        """Support records of the instruments matching the filters in id order, from one query"""
+        records = SupportInformation.objects.filter(
+            instrument__id__in=list(instrument_ids), **filters
+        ).annotate(linked_instrument_id=F("instrument__id")).order_by("id")
+        by_instrument = {}
+        for support_info in records:
+            by_instrument.setdefault(support_info.linked_instrument_id, []).append(support_info)
+        return by_instrument
+
+    def warranty_notices(self) -> Notices:
+        """Notices of warranties ending within the threshold of their instrument, from one query of the support records"""
+        instruments = {instrument.id: instrument for instrument in self._due("last_warranty_notification_sent")}
+        if not instruments:
+            return {}
+        longest = max(self._warranty_threshold(instrument) for instrument in instruments.values())
+        support_records = self._support_records(
+            instruments, warranty_end_date__gt=self.today, warranty_end_date__lte=self.today + timedelta(days=longest)
+        )
+        notices = {}
+        due = {}
+        for instrument_id, records in support_records.items():
+            instrument = instruments[instrument_id]
+            for support_info in records:
+                days_remaining = (support_info.warranty_end_date - self.today).days
+                if days_remaining <= self._warranty_threshold(instrument):
+                    due[instrument_id] = (support_info, days_remaining)
+                    break
+        contacts = Prefetch("vendor_contacts", queryset=ExternalContact.objects.prefetch_related("contact_details"))
+        vendors = SupportInformation.objects.prefetch_related(contacts).in_bulk(
+            [support_info.id for support_info, _ in due.values() if support_info.vendor_name]
+        )
+
+        for instrument_id, (support_info, days_remaining) in due.items():
+            instrument = instruments[instrument_id]
+            subject = f"Warranty Expiration Alert - {instrument.instrument_name}"
+            message = (
+                f"⚠️ **Warranty Expiration Alert**<br>"
+                f"The warranty for {instrument.instrument_name} will expire in {days_remaining} "
+                f"{'day' if days_remaining == 1 else 'days'} on {support_info.warranty_end_date.strftime('%Y-%m-%d')}.<br>"
+            )
+            if support_info.vendor_name:
+                message += f"**Vendor:** {support_info.vendor_name}<br>"
+                vendor_contacts = vendors[support_info.id].vendor_contacts.all()
+                if vendor_contacts:
+                    message += "**Vendor Contacts:**<br>"
+                    for contact in vendor_contacts:
+                        message += f"- {contact.contact_name}<br>"
+                        for detail in contact.contact_details.all():
+                            message += f"  {detail.contact_type}: {detail.contact_value}<br>"
+            notices[instrument_id] = (subject, message)
+        return notices
+
+    def maintenance_notices(self) -> Notices:
+        """
+        Notices of maintenance due within the threshold of the instrument after its last completed
+        maintenance, or of initial maintenance when none was completed, from one query of the support
+        records and one aggregate query of the maintenance logs
+        """
+        instruments = {instrument.id: instrument for instrument in self._due("last_maintenance_notification_sent")}
+        if not instruments:
+            return {}
+        support_records = self._support_records(instruments, maintenance_frequency_days__isnull=False)
+        last_maintenance = dict(
+            MaintenanceLog.objects.filter(
+                instrument_id__in=list(support_records), status="completed"
+            ).values("instrument_id").annotate(last=Max("maintenance_date")).values_list("instrument_id", "last")
+        )
+
+        notices = {}
+        for instrument_id, records in support_records.items():
+            instrument = instruments[instrument_id]
+            threshold = self._maintenance_threshold(instrument)
+            last = last_maintenance.get(instrument_id)
+            for support_info in records:
+                if not support_info.maintenance_frequency_days:
+                    continue
+                if last:
+                    next_maintenance_date = last.date() + timedelta(days=support_info.maintenance_frequency_days)
+                    days_remaining = (next_maintenance_date - self.today).days
+                    if 0 < days_remaining <= threshold:
+                        subject = f"Scheduled Maintenance Reminder - {instrument.instrument_name}"
+                        message = (
+                            f"🔧 **Scheduled Maintenance Reminder**<br>"
+                            f"The {instrument.instrument_name} is due for maintenance in {days_remaining} <br>"
+                            f"{'day' if days_remaining == 1 else 'days'} on {next_maintenance_date.strftime('%Y-%m-%d')}.<br>"
+                            f"Last maintenance was performed on {last.strftime('%Y-%m-%d')}.<br>"
+                        )
+                        message += f"\nMaintenance frequency: Every {support_info.maintenance_frequency_days} days<br>"
+                        notices[instrument_id] = (subject, message)
+                        break
+                elif support_info.maintenance_frequency_days <= threshold:
+                    subject = f"Initial Maintenance Required - {instrument.instrument_name}"
+                    message = (
+                        f"🔧 **Initial Maintenance Required**<br>"
+                        f"The {instrument.instrument_name} requires initial maintenance as no previous logs exist.<br>"
+                        f"Please schedule maintenance as soon as possible.<br>"
+                    )
+                    notices[instrument_id] = (subject, message)
+                    break
+        return notices
+
+    def _record_sent(self, instrument_ids: Set[int], field: str):
+        instruments = [instrument for instrument in self.instruments if instrument.id in instrument_ids]
+        for instrument in instruments:
+            setattr(instrument, field, self.now)
+        if instruments:
+            bulk_update_with_history(instruments, Instrument, [field])
+
+    def check_warranties(self) -> Set[int]:
+        """Notify the managers of instruments with a warranty ending soon, returns the notified instrument ids"""
+        notified = notify_managers(self.warranty_notices())
+        self._record_sent(notified, "last_warranty_notification_sent")
+        return notified
+
+    def check_maintenance(self) -> Set[int]:
+        """Notify the managers of instruments due for maintenance, returns the notified instrument ids"""
+        notified = notify_managers(self.maintenance_notices())
+        self._record_sent(notified, "last_maintenance_notification_sent")
+        return notified
+
+    def run(self, warranty: bool = True, maintenance: bool = True) -> Tuple[int, int]:
+        """Numbers of instruments notified of their warranty and of maintenance"""
+        warranty_count = len(self.check_warranties()) if warranty else 0
+        maintenance_count = len(self.check_maintenance()) if maintenance else 0
+        return warranty_count, maintenance_count
@@ -0,0 +1,62 @@
+"""
+Instrument utilization reports from the daily rollup
+
+Booked, approved and maintenance hours are kept per instrument, user and UTC day in
+InstrumentUsageDay rows, so a report over any range is a single aggregate query over the
+rollup, grouped by day, week or month and by instrument, user or lab group.
+"""
+
+from datetime import date
+from typing import List
+
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+
+from cc.models import InstrumentUsageDay
+
+PERIODS = {
+    "day": TruncDay,
+    "week": TruncWeek,
+    "month": TruncMonth,
+}
+
+# Columns of the rollup rows, and columns annotated from related models, reported per group
+GROUPS = {
+    "instrument": (["instrument_id"], {"instrument_name": F("instrument__instrument_name")}),
+    "user": (["user_id"], {"username": F("user__username")}),
+    "lab_group": ([], {"lab_group_id": F("user__lab_groups__id"), "lab_group_name": F("user__lab_groups__name")}),
+}
+
+
+def utilization(instrument_ids: List[int], first_day: date, last_day: date, period: str = "day", group_by: str = "instrument") -> List[dict]:
+    """
+    Hours of the instruments from first_day to last_day per period and group, in period order.
+    Users in several lab groups count towards each of them when grouped by lab group.
+    """
+    if period not in PERIODS:
+        raise ValueError(f"Unknown period {period}")
+    if group_by not in GROUPS:
+        raise ValueError(f"Unknown group {group_by}")
+    fields, related = GROUPS[group_by]
+    columns = [*fields, *related]
+    rows = InstrumentUsageDay.objects.filter(
+        instrument_id__in=instrument_ids, day__range=[first_day, last_day]
+    ).annotate(
+        period=PERIODS[period]("day"), **related
+    ).values(
+        "period", *columns
+    ).annotate(
+        booked_hours=Sum("booked_hours"),
+        approved_hours=Sum("approved_hours"),
+        maintenance_hours=Sum("maintenance_hours"),
+    ).order_by("period", *columns)
+    return [
+        {
+            **row,
+            "period": row["period"].isoformat(),
+            "booked_hours": round(row["booked_hours"], 2),
+            "approved_hours": round(row["approved_hours"], 2),
+            "maintenance_hours": round(row["maintenance_hours"], 2),
+        }
+        for row in rows
+    ]
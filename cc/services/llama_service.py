@@ -0,0 +1,162 @@
+"""
+Warm llama.cpp inference service
+
+The llama worker keeps one llama.cpp server process with the model loaded
+instead of spawning the llama binary for every prompt. The server runs
+LLAMA_SERVER_PARALLEL slots and queues further requests itself, which bounds
+concurrency across all llama workers on the host. Generated tokens are
+streamed back and coalesced by TokenCoalescer into time or size bounded
+frames before they are sent over the channel layer.
+"""
+
+import json
+import logging
+import time
+from typing import Callable, List, Optional
+
+import requests
+from django.conf import settings
+
+from cc.services.managed_server import ManagedServer, ManagedServerError
+
+logger = logging.getLogger(__name__)
+
+
+class LlamaServiceError(ManagedServerError):
+    """Raised when the warm llama.cpp server cannot handle a request"""
+    pass
+
+
+class TokenCoalescer:
+    """
+    Buffers streamed text and emits it in frames once max_interval seconds have passed
+    or max_chars characters are buffered, whichever comes first.
+    """
+
+    def __init__(self, emit: Callable[[str], None], max_interval: float, max_chars: int):
+        self.emit = emit
+        self.max_interval = max_interval
+        self.max_chars = max_chars
+        self.buffer = []
+        self.buffered_chars = 0
+        self.last_emit = time.monotonic()
+        self.frames_sent = 0
+
+    def add(self, text: str) -> None:
+        if not text:
+            return
+        self.buffer.append(text)
+        self.buffered_chars += len(text)
+        if self.buffered_chars >= self.max_chars or time.monotonic() - self.last_emit >= self.max_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        self.last_emit = time.monotonic()
+        if not self.buffer:
+            return
+        self.emit(self.take())
+        self.frames_sent += 1
+
+    def take(self) -> str:
+        """Return and clear the buffered text without emitting it"""
+        text = "".join(self.buffer)
+        self.buffer = []
+        self.buffered_chars = 0
+        return text
+
+
+class LlamaServer(ManagedServer):
+    """
+    Long-lived llama.cpp server keeping the summary model loaded.
+    /health answers 503 while the model is loading, so only 200 counts as ready.
+    """
+
+    name = "llama-server"
+    error_class = LlamaServiceError
+
+    def __init__(self, server_path: str, model_path: str, host: str, port: int,
+                 thread_count: int, parallel: int, context_per_slot: int):
+        super().__init__(server_path, model_path, host, port, settings.LLAMA_SERVER_STARTUP_TIMEOUT)
+        self.thread_count = int(thread_count)
+        self.parallel = int(parallel)
+        self.context_per_slot = int(context_per_slot)
+
+    def command(self) -> List[str]:
+        return [
+            self.server_path, "-m", self.model_path,
+            "--host", self.host, "--port", str(self.port),
+            "-t", str(self.thread_count),
+            "-np", str(self.parallel),
+            "-c", str(self.context_per_slot * self.parallel),
+        ]
+
+    def complete(self, prompt: str, on_text: Callable[[str], None], n_predict: int = 4096,
+                 repeat_penalty: float = 1.0, stop: Optional[List[str]] = None) -> str:
+        """
+        Stream a completion for the prompt, calling on_text with every piece of generated text.
+        Returns the full generated text.
+        """
+        payload = {
+            "prompt": prompt,
+            "n_predict": n_predict,
+            "repeat_penalty": repeat_penalty,
+            "stop": stop or ["<|im_end|>"],
+            "stream": True,
+            "cache_prompt": True,
+        }
+        generated = []
+        try:
+            with requests.post(f"{self.base_url}/completion", json=payload, stream=True,
+                               timeout=settings.LLAMA_SERVER_REQUEST_TIMEOUT) as response:
+                if response.status_code != 200:
+                    raise LlamaServiceError(
+                        f"llama.cpp server returned {response.status_code}: {response.text[:200]}"
+                    )
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data: "):
+                        continue
+                    chunk = json.loads(line[len("data: "):])
+                    content = chunk.get("content", "")
+                    if content:
+                        generated.append(content)
+                        on_text(content)
+                    if chunk.get("stop"):
+                        break
+        except requests.RequestException as e:
+            raise LlamaServiceError(f"llama.cpp server request failed: {e}")
+        return "".join(generated)
+
+
+class LlamaService:
+    """Runs prompts against the warm llama.cpp server"""
+
+    def __init__(self, server: LlamaServer):
+        self.server = server
+
+    def complete(self, prompt: str, on_text: Callable[[str], None]) -> str:
+        self.server.ensure_running()
+        started = time.monotonic()
+        text = self.server.complete(prompt, on_text)
+        logger.info(f"Generated {len(text)} characters in {time.monotonic() - started:.1f}s")
+        return text
+
+
+def get_llama_service() -> Optional[LlamaService]:
+    """
+    Return the warm llama.cpp service when the server binary is available on this host,
+    otherwise None so callers fall back to running the llama binary per prompt.
+    """
+    if not settings.LLAMA_USE_SERVER:
+        return None
+    server = LlamaServer(
+        settings.LLAMA_SERVER_PATH,
+        settings.LLAMA_DEFAULT_MODEL,
+        settings.LLAMA_SERVER_HOST,
+        settings.LLAMA_SERVER_PORT,
+        settings.LLAMA_SERVER_THREAD_COUNT,
+        settings.LLAMA_SERVER_PARALLEL,
+        settings.LLAMA_SERVER_CONTEXT,
+    )
+    if not server.is_available():
+        return None
+    return LlamaService(server)
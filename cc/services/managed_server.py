@@ -0,0 +1,95 @@
+"""
+Long-lived local inference servers shared by RQ workers
+
+RQ runs every job in a forked work horse, so a server started by a job must not
+be tied to that process. ManagedServer starts the server detached, guards the
+start with a host-wide file lock so concurrent workers do not race, and later
+jobs attach to it through its health endpoint.
+"""
+
+import fcntl
+import logging
+import os
+import subprocess
+import tempfile
+import time
+from typing import List
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class ManagedServerError(Exception):
+    """Raised when a managed inference server cannot be started or reached"""
+    pass
+
+
+class ManagedServer:
+    """Base class for a detached inference server bound to a local port"""
+
+    name = "server"
+    health_path = "/health"
+    ready_status_codes = (200,)
+    error_class = ManagedServerError
+
+    def __init__(self, server_path: str, model_path: str, host: str, port: int, startup_timeout: int):
+        self.server_path = server_path
+        self.model_path = model_path
+        self.host = host
+        self.port = int(port)
+        self.startup_timeout = startup_timeout
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def command(self) -> List[str]:
+        raise NotImplementedError
+
+    def is_available(self) -> bool:
+        """Whether the server binary exists on this host"""
+        return bool(self.server_path) and os.path.exists(self.server_path)
+
+    def is_running(self) -> bool:
+        """Check whether a ready server is answering on the configured port"""
+        try:
+            response = requests.get(f"{self.base_url}{self.health_path}", timeout=2)
+        except requests.RequestException:
+            return False
+        return response.status_code in self.ready_status_codes
+
+    def start(self, wait: bool = True) -> None:
+        """Start the server unless one is already running, guarded by a host-wide lock"""
+        lock_path = os.path.join(tempfile.gettempdir(), f"cupcake-{self.name}-{self.port}.lock")
+        with open(lock_path, "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if self.is_running():
+                    return
+                logger.info(f"Starting {self.name}: {' '.join(self.command())}")
+                subprocess.Popen(
+                    self.command(),
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    stdin=subprocess.DEVNULL,
+                    start_new_session=True,
+                )
+                if wait:
+                    self.wait_until_ready()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def wait_until_ready(self) -> None:
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.is_running():
+                return
+            time.sleep(0.5)
+        raise self.error_class(
+            f"{self.name} did not become ready on {self.base_url} within {self.startup_timeout}s"
+        )
+
+    def ensure_running(self) -> None:
+        if not self.is_running():
+            self.start()
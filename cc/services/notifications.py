@@ -0,0 +1,165 @@
+"""
+Delivery of messages to their audience
+
+An audience is a dict of user ids ("users"), lab group ids ("lab_groups") and whether it
+is everyone ("everyone"). A message is created in the request, its recipients are then
+written in batches of NOTIFICATION_BATCH_SIZE with bulk inserts on the maintenance queue, and
+connected clients are told with one websocket event per audience group: the group of every
+lab group of the audience, the group every client joins, and the group of each user of the
+audience. Users named in the audience also become participants of the message thread, lab
+groups and everyone see their threads through the lab group and announcement rules. The inbox
+entries of the thread are recomputed once all recipients are written, see cc.services.inbox.
+
+Notification sockets also join the group of every session their user owns, edits or views when
+they connect. Sockets that are already connected are told to join or leave the group of a session
+through the group of their user when the session is created or shared with or unshared from them.
+"""
+
+import logging
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q, QuerySet
+
+from cc.models import InboxEntry, Message, MessageRecipient, MessageThread, Session
+from cc.services import inbox
+
+logger = logging.getLogger(__name__)
+
+# Group every notification socket joins
+EVERYONE_GROUP = "notifications"
+
+
+def user_group(user_id: int) -> str:
+    return f"user_{user_id}_notifications"
+
+
+def lab_group_group(lab_group_id: int) -> str:
+    return f"lab_group_{lab_group_id}_notifications"
+
+
+def session_group(session_unique_id) -> str:
+    return f"session_{session_unique_id}_notifications"
+
+
+def follows_session(session: Session, user_id: int) -> bool:
+    """Whether the user owns, edits or views the session, their notification sockets are then in its group"""
+    return (
+        session.user_id == user_id
+        or session.editors.filter(pk=user_id).exists()
+        or session.viewers.filter(pk=user_id).exists()
+    )
+
+
+def update_session_groups(session: Session, user_ids: Iterable[int], joined: bool = True):
+    """Tell the connected notification sockets of users to join or leave the group of a session once the change commits"""
+    event = {"type": "session_group_join" if joined else "session_group_leave", "group": session_group(session.unique_id)}
+    user_ids = list(user_ids)
+
+    def send():
+        try:
+            channel_layer = get_channel_layer()
+            for user_id in user_ids:
+                async_to_sync(channel_layer.group_send)(user_group(user_id), event)
+        except Exception as e:
+            logger.warning(f"Session group change not sent: {e}")
+
+    if user_ids:
+        transaction.on_commit(send)
+
+
+def build_audience(users: Iterable[int] = (), lab_groups: Iterable[int] = (), everyone: bool = False) -> dict:
+    return {"users": sorted(set(users)), "lab_groups": sorted(set(lab_groups)), "everyone": everyone}
+
+
+def audience_user_ids(audience: dict) -> QuerySet:
+    """Ids of the active users in the audience"""
+    users = User.objects.filter(is_active=True)
+    if not audience.get("everyone"):
+        users = users.filter(
+            Q(id__in=audience.get("users", [])) | Q(lab_groups__id__in=audience.get("lab_groups", []))
+        )
+    return users.order_by("id").values_list("id", flat=True).distinct()
+
+
+def audience_groups(audience: dict) -> List[str]:
+    """Websocket groups reaching the audience"""
+    if audience.get("everyone"):
+        return [EVERYONE_GROUP]
+    return [lab_group_group(lab_group_id) for lab_group_id in audience.get("lab_groups", [])] + [
+        user_group(user_id) for user_id in audience.get("users", [])
+    ]
+
+
+def _batches(values: Iterable[int], size: int) -> Iterator[List[int]]:
+    values = iter(values)
+    while batch := list(islice(values, size)):
+        yield batch
+
+
+def deliver(message: Message, audience: dict, read_by: Optional[int] = None) -> int:
+    """
+    Write the recipients of a message and tell the audience, returns the number of recipients.
+    Recipients that already exist are left as they are, so a delivery can be run again.
+    """
+    batch_size = settings.NOTIFICATION_BATCH_SIZE
+    participants = MessageThread.participants.through
+    count = 0
+    for user_ids in _batches(audience_user_ids(audience).iterator(chunk_size=batch_size), batch_size):
+        MessageRecipient.objects.bulk_create(
+            [
+                MessageRecipient(message_id=message.id, user_id=user_id, is_read=user_id == read_by)
+                for user_id in user_ids
+            ],
+            ignore_conflicts=True,
+        )
+        count += len(user_ids)
+    for user_ids in _batches(audience.get("users", []), batch_size):
+        participants.objects.bulk_create(
+            [participants(messagethread_id=message.thread_id, user_id=user_id) for user_id in user_ids],
+            ignore_conflicts=True,
+        )
+    inbox.apply_unread_changes(InboxEntry.refresh_thread(message.thread_id))
+
+    channel_layer = get_channel_layer()
+    event = {
+        "type": "notification_message",
+        "message": {
+            "type": "new_message",
+            "message_id": message.id,
+            "thread_id": message.thread_id,
+            "message_type": message.message_type,
+            "priority": message.priority,
+        },
+    }
+    for group in audience_groups(audience):
+        async_to_sync(channel_layer.group_send)(group, event)
+    return count
+
+
+def notify_many(deliveries: List[Tuple[Message, dict, Optional[int]]]):
+    """
+    Deliver messages to their audiences, given as (message, audience, read_by), in one job on the
+    maintenance queue once the transaction creating them commits, or right away when NOTIFICATIONS_ASYNC
+    is off
+    """
+    if not deliveries:
+        return
+    if not settings.NOTIFICATIONS_ASYNC:
+        for message, audience, read_by in deliveries:
+            deliver(message, audience, read_by)
+        return
+    from cc.rq_tasks import deliver_notifications
+
+    jobs = [(message.id, audience, read_by) for message, audience, read_by in deliveries]
+    transaction.on_commit(lambda: deliver_notifications.delay(jobs))
+
+
+def notify(message: Message, audience: dict, read_by: Optional[int] = None):
+    """Deliver a message to its audience, see notify_many"""
+    notify_many([(message, audience, read_by)])
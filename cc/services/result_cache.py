@@ -0,0 +1,91 @@
+"""
+Content-hash result cache helpers
+
+Builds the lookup arguments for ProcessingResultCache so that the request path
+(before a job is enqueued) and the job itself (after the work is done) agree on
+the cache key for transcription, OCR and summary results. The hash of an annotation
+file is computed once, when it is uploaded or first processed, and kept on the annotation.
+"""
+
+import hashlib
+import os
+from typing import Dict, Any, Optional
+
+from django.conf import settings
+
+from cc.models import Annotation, ProcessingResultCache
+from cc.services.ocr_service import OCRServiceError, image_content_hash, read_image_bytes
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+OCR_ENGINE = "tesseract"
+SUMMARY_PARAMETERS = {"threads": 8, "context": 2048, "repeat_penalty": 1.0, "n_predict": 4096}
+
+
+def hash_file(path: str) -> str:
+    """SHA-256 of a file read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_text(text: str) -> str:
+    """SHA-256 of a text payload such as a prompt or base64 image"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def annotation_content_hash(annotation: Annotation) -> Optional[str]:
+    """
+    Stored hash of the content of an annotation file, computed and saved when it is missing. Sketches are
+    hashed on their rendered image, other files on their bytes. None when the cache is disabled or the
+    file cannot be read.
+    """
+    if not settings.PROCESSING_CACHE_ENABLED or not annotation.file:
+        return None
+    if not annotation.content_hash:
+        try:
+            if annotation.annotation_type == "sketch":
+                content_hash = image_content_hash(read_image_bytes(annotation.file.path, "sketch"))
+            else:
+                content_hash = hash_file(annotation.file.path)
+        except (OSError, OCRServiceError):
+            return None
+        annotation.content_hash = content_hash
+        Annotation.objects.filter(pk=annotation.pk).update(content_hash=content_hash)
+    return annotation.content_hash
+
+
+def transcription_cache_args(model_path: str, language: str, translate: bool) -> Dict[str, Any]:
+    return {
+        "model_name": os.path.basename(model_path),
+        "language": language,
+        "parameters": {"translate": bool(translate)},
+    }
+
+
+def ocr_cache_args() -> Dict[str, Any]:
+    return {"model_name": OCR_ENGINE, "language": None, "parameters": {}}
+
+
+def summary_cache_args() -> Dict[str, Any]:
+    return {
+        "model_name": os.path.basename(settings.LLAMA_DEFAULT_MODEL),
+        "language": None,
+        "parameters": SUMMARY_PARAMETERS,
+    }
+
+
+def lookup(task_type: str, content_hash: str, cache_args: Dict[str, Any]) -> Optional[ProcessingResultCache]:
+    """Cached entry for the content, or None when caching is disabled or there is no hit"""
+    if not settings.PROCESSING_CACHE_ENABLED:
+        return None
+    return ProcessingResultCache.lookup(task_type, content_hash, **cache_args)
+
+
+def store(task_type: str, content_hash: str, cache_args: Dict[str, Any], result: Dict[str, Any], annotation=None) -> Optional[ProcessingResultCache]:
+    """Record a finished result, evicting least recently used entries when over budget"""
+    if not settings.PROCESSING_CACHE_ENABLED:
+        return None
+    return ProcessingResultCache.store(task_type, content_hash, result, annotation=annotation, **cache_args)
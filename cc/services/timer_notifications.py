@@ -0,0 +1,127 @@
+"""
+Debounced publishing of timer notifications
+
+Timers are saved every few seconds while a session runs, so a save only hands the id of its timer
+to the publisher of the process once the transaction commits and returns. Pending timers are kept
+by id, later saves of a timer waiting are folded into one notification, and a thread of the process
+loads the pending timers, resolves who is told about them and sends the notifications at most
+TIMER_NOTIFICATIONS_PER_SECOND times a second. A timer is published to the group of its session,
+joined by the notification sockets of the session owner, editors and viewers that opened the session
+or connected while one of its timers ran, and to the group of its user when it has no session or its
+user is none of those. With TIMER_NOTIFICATIONS_ASYNC off notifications are sent right after the
+commit instead.
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Tuple
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from cc.models import TimeKeeper
+from cc.services.notifications import follows_session, session_group, user_group
+
+logger = logging.getLogger(__name__)
+
+
+def build_notification(timer: TimeKeeper, created: bool) -> dict:
+    step_description = timer.step.step_description if timer.step else "Session Timer"
+    notification = {
+        "type": "timer_notification",
+        "action": "started" if created else "updated",
+        "title": f"Timer {'Started' if created else 'Updated'}: {step_description}",
+        "timer_id": timer.id,
+        "started": timer.started,
+        "current_duration": timer.current_duration or 0,
+        "timestamp": timezone.now().isoformat(),
+    }
+    if timer.session:
+        notification["session_id"] = str(timer.session.unique_id)
+        notification["session_name"] = timer.session.name or f"Session {timer.session.id}"
+    if timer.step:
+        notification["step_id"] = timer.step.id
+        notification["step_description"] = timer.step.step_description
+    return notification
+
+
+def timer_groups(timer: TimeKeeper) -> List[str]:
+    """Websocket groups told about changes of the timer"""
+    if not timer.session:
+        return [user_group(timer.user_id)]
+    groups = [session_group(timer.session.unique_id)]
+    if timer.user_id and not follows_session(timer.session, timer.user_id):
+        groups.append(user_group(timer.user_id))
+    return groups
+
+
+def send(notifications: Iterable[Tuple[str, dict]]):
+    """Send (group, notification) pairs with one websocket event each"""
+    channel_layer = get_channel_layer()
+    for group, notification in notifications:
+        async_to_sync(channel_layer.group_send)(group, {"type": "notification_message", "message": notification})
+
+
+def timer_notifications(timers: Dict[int, bool]) -> List[Tuple[str, dict]]:
+    """(group, notification) pairs of the current state of timers, given by id and whether they were created"""
+    pairs = []
+    for timer in TimeKeeper.objects.filter(id__in=timers).select_related("session", "step"):
+        notification = build_notification(timer, timers[timer.id])
+        pairs.extend((group, notification) for group in timer_groups(timer))
+    return pairs
+
+
+class TimerPublisher:
+    """Ids of the changed timers, notified by a thread of the process at a bounded rate"""
+
+    def __init__(self):
+        self._pending: Dict[int, bool] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def publish(self, timer_id: int, created: bool = False):
+        if not settings.TIMER_NOTIFICATIONS_ASYNC:
+            send(timer_notifications({timer_id: created}))
+            return
+        with self._lock:
+            self._pending[timer_id] = self._pending.get(timer_id, False) or created
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="timer-notifications", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def flush(self) -> int:
+        """Notify the pending timers, returns how many notifications were sent"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        pairs = timer_notifications(pending)
+        send(pairs)
+        return len(pairs)
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning(f"Timer notifications not sent: {e}")
+            finally:
+                close_old_connections()
+            time.sleep(1 / settings.TIMER_NOTIFICATIONS_PER_SECOND)
+
+
+publisher = TimerPublisher()
+
+
+def notify(timer: TimeKeeper, created: bool = False):
+    """Publish the change of a timer once the transaction saving it commits"""
+    timer_id = timer.id
+    transaction.on_commit(lambda: publisher.publish(timer_id, created))
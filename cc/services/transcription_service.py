@@ -0,0 +1,368 @@
+"""
+Persistent whisper.cpp transcription service
+
+Keeps a single whisper.cpp server process per transcribe worker host so the
+model is loaded once instead of once per annotation. Audio is decoded by ffmpeg
+straight into 16 kHz mono PCM over a pipe and handed to the server over a local
+socket; the transcript and (optionally) the English translation are produced
+from the same decoded buffer against the already loaded model.
+
+Segments are surfaced as they are produced through TranscriptionStream so the
+caller can push partial results and persist checkpoints for resumable jobs.
+"""
+
+import io
+import logging
+import re
+import subprocess
+import time
+import wave
+from typing import Dict, Any, Optional, List, Callable
+
+import requests
+from django.conf import settings
+
+from cc.services.managed_server import ManagedServer, ManagedServerError
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+
+# whisper.cpp reports detected languages by full name, annotations store the code
+WHISPER_LANGUAGES = {
+    "en": "english", "zh": "chinese", "de": "german", "es": "spanish", "ru": "russian",
+    "ko": "korean", "fr": "french", "ja": "japanese", "pt": "portuguese", "tr": "turkish",
+    "pl": "polish", "ca": "catalan", "nl": "dutch", "ar": "arabic", "sv": "swedish",
+    "it": "italian", "id": "indonesian", "hi": "hindi", "fi": "finnish", "vi": "vietnamese",
+    "he": "hebrew", "uk": "ukrainian", "el": "greek", "ms": "malay", "cs": "czech",
+    "ro": "romanian", "da": "danish", "hu": "hungarian", "ta": "tamil", "no": "norwegian",
+    "th": "thai", "ur": "urdu", "hr": "croatian", "bg": "bulgarian", "lt": "lithuanian",
+    "la": "latin", "mi": "maori", "ml": "malayalam", "cy": "welsh", "sk": "slovak",
+    "te": "telugu", "fa": "persian", "lv": "latvian", "bn": "bengali", "sr": "serbian",
+    "az": "azerbaijani", "sl": "slovenian", "kn": "kannada", "et": "estonian", "mk": "macedonian",
+    "br": "breton", "eu": "basque", "is": "icelandic", "hy": "armenian", "ne": "nepali",
+    "mn": "mongolian", "bs": "bosnian", "kk": "kazakh", "sq": "albanian", "sw": "swahili",
+    "gl": "galician", "mr": "marathi", "pa": "punjabi", "si": "sinhala", "km": "khmer",
+    "sn": "shona", "yo": "yoruba", "so": "somali", "af": "afrikaans", "oc": "occitan",
+    "ka": "georgian", "be": "belarusian", "tg": "tajik", "sd": "sindhi", "gu": "gujarati",
+    "am": "amharic", "yi": "yiddish", "lo": "lao", "uz": "uzbek", "fo": "faroese",
+    "ht": "haitian creole", "ps": "pashto", "tk": "turkmen", "nn": "nynorsk", "mt": "maltese",
+    "sa": "sanskrit", "lb": "luxembourgish", "my": "myanmar", "bo": "tibetan", "tl": "tagalog",
+    "mg": "malagasy", "as": "assamese", "tt": "tatar", "haw": "hawaiian", "ln": "lingala",
+    "ha": "hausa", "ba": "bashkir", "jw": "javanese", "su": "sundanese", "yue": "cantonese",
+}
+WHISPER_LANGUAGE_CODES = {name: code for code, name in WHISPER_LANGUAGES.items()}
+
+# whisper-cli prints each finished segment as "[00:00:00.000 --> 00:00:05.000]  text"
+capture_segment = re.compile(r"^\[(\d+:\d{2}:\d{2}\.\d{3}) --> (\d+:\d{2}:\d{2}\.\d{3})\]\s*(.*)$")
+
+
+class TranscriptionServiceError(ManagedServerError):
+    """Raised when the persistent transcription service cannot handle a request"""
+    pass
+
+
+def decode_audio_to_pcm(media_path: str) -> bytes:
+    """
+    Decode any ffmpeg readable audio/video file into 16 kHz mono s16le PCM.
+    The samples are read from ffmpeg's stdout, nothing is written to disk.
+    """
+    cmd = [
+        "ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error",
+        "-i", media_path, "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE),
+        "-f", "s16le", "-acodec", "pcm_s16le", "-",
+    ]
+    process = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if process.returncode != 0:
+        raise TranscriptionServiceError(
+            f"ffmpeg failed to decode {media_path}: {process.stderr.decode('utf-8', errors='ignore')}"
+        )
+    return process.stdout
+
+
+def pcm_to_wav(pcm: bytes) -> bytes:
+    """Wrap raw PCM samples in an in-memory WAV container"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(SAMPLE_WIDTH)
+        wav_file.setframerate(SAMPLE_RATE)
+        wav_file.writeframes(pcm)
+    return buffer.getvalue()
+
+
+def pcm_duration(pcm: bytes) -> float:
+    """Duration in seconds of a 16 kHz mono s16le PCM buffer"""
+    return len(pcm) / float(SAMPLE_RATE * SAMPLE_WIDTH)
+
+
+def format_vtt_timestamp(seconds: float) -> str:
+    """Format seconds the same way whisper.cpp writes VTT timestamps"""
+    milliseconds = int(round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    secs, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}.{milliseconds:03d}"
+
+
+def parse_vtt_timestamp(timestamp: str) -> float:
+    """Parse an HH:MM:SS.mmm timestamp into seconds"""
+    hours, minutes, seconds = timestamp.split(":")
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def parse_segment_line(line: str) -> Optional[Dict[str, Any]]:
+    """Parse a segment printed by whisper-cli on stdout, None for any other output"""
+    match = capture_segment.match(line.strip())
+    if not match:
+        return None
+    return {
+        "start": parse_vtt_timestamp(match.group(1)),
+        "end": parse_vtt_timestamp(match.group(2)),
+        "text": match.group(3).strip(),
+    }
+
+
+def segments_to_vtt(segments: List[Dict[str, Any]]) -> str:
+    """Render whisper segments (start/end in seconds) as a WebVTT document"""
+    lines = ["WEBVTT", ""]
+    for segment in segments:
+        lines.append(f"{format_vtt_timestamp(segment['start'])} --> {format_vtt_timestamp(segment['end'])}")
+        lines.append(segment["text"].strip())
+        lines.append("")
+    return "\n".join(lines) + "\n"
+
+
+def normalize_language(language: Optional[str]) -> Optional[str]:
+    """Convert a whisper language name (e.g. "english") into its short code"""
+    if not language:
+        return None
+    language = language.strip().lower()
+    if language in WHISPER_LANGUAGES:
+        return language
+    return WHISPER_LANGUAGE_CODES.get(language, language)
+
+
+class TranscriptionStream:
+    """
+    Collects segments as whisper emits them and flushes them in throttled batches.
+
+    publish is called with the stream and the segments added since the previous
+    flush, checkpoint with the stream once those segments are complete. Both run
+    at most once per interval, plus a final flush when the job finishes. Translated
+    segments are checkpointed as each translated chunk completes.
+    """
+
+    def __init__(self, publish: Callable[["TranscriptionStream", List[Dict[str, Any]]], None],
+                 checkpoint: Callable[["TranscriptionStream"], None],
+                 interval: float, segments: Optional[List[Dict[str, Any]]] = None,
+                 language: Optional[str] = None, translated_segments: Optional[List[Dict[str, Any]]] = None):
+        self.publish = publish
+        self.checkpoint = checkpoint
+        self.interval = interval
+        self.segments = list(segments or [])
+        self.translated_segments = list(translated_segments or [])
+        self.language = language
+        self.pending = []
+        self.last_flush = time.monotonic()
+
+    @property
+    def offset_seconds(self) -> float:
+        """End of the last completed segment, where a resumed job continues from"""
+        if not self.segments:
+            return 0.0
+        return float(self.segments[-1]["end"])
+
+    @property
+    def translation_offset_seconds(self) -> float:
+        """End of the last translated segment, where a resumed translation continues from"""
+        if not self.translated_segments:
+            return 0.0
+        return float(self.translated_segments[-1]["end"])
+
+    def add_translation(self, segments: List[Dict[str, Any]]) -> None:
+        self.translated_segments.extend(segments)
+        self.checkpoint(self)
+
+    def add(self, segment: Dict[str, Any]) -> None:
+        self.segments.append(segment)
+        self.pending.append(segment)
+        if time.monotonic() - self.last_flush >= self.interval:
+            self.flush()
+
+    def extend(self, segments: List[Dict[str, Any]]) -> None:
+        for segment in segments:
+            self.add(segment)
+
+    def flush(self) -> None:
+        self.last_flush = time.monotonic()
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, []
+        self.checkpoint(self)
+        self.publish(self, pending)
+
+
+class WhisperServer(ManagedServer):
+    """
+    Long-lived whisper.cpp server keeping the transcription model loaded.
+    """
+
+    name = "whisper-server"
+    error_class = TranscriptionServiceError
+
+    def __init__(self, server_path: str, model_path: str, host: str, port: int, thread_count: str):
+        super().__init__(server_path, model_path, host, port, settings.WHISPERCPP_SERVER_STARTUP_TIMEOUT)
+        self.thread_count = str(thread_count)
+
+    def command(self) -> List[str]:
+        return [
+            self.server_path, "-m", self.model_path,
+            "--host", self.host, "--port", str(self.port),
+            "-t", self.thread_count,
+        ]
+
+    def infer(self, wav: bytes, language: str = "auto", translate: bool = False) -> Dict[str, Any]:
+        """Run one inference request against the loaded model"""
+        try:
+            response = requests.post(
+                f"{self.base_url}/inference",
+                files={"file": ("audio.wav", wav, "audio/wav")},
+                data={
+                    "response_format": "verbose_json",
+                    "language": language or "auto",
+                    "translate": "true" if translate else "false",
+                    "temperature": "0.0",
+                },
+                timeout=settings.WHISPERCPP_SERVER_REQUEST_TIMEOUT,
+            )
+        except requests.RequestException as e:
+            raise TranscriptionServiceError(f"whisper.cpp server request failed: {e}")
+        if response.status_code != 200:
+            raise TranscriptionServiceError(
+                f"whisper.cpp server returned {response.status_code}: {response.text[:200]}"
+            )
+        result = response.json()
+        if "error" in result:
+            raise TranscriptionServiceError(f"whisper.cpp server error: {result['error']}")
+        return result
+
+
+class TranscriptionService:
+    """
+    Transcribes media through the persistent whisper.cpp server and reports
+    throughput so deployments can be sized from real workloads.
+    """
+
+    def __init__(self, server: WhisperServer):
+        self.server = server
+
+    def transcribe(self, media_path: str, language: str = "auto", translate: bool = False,
+                   stream: Optional[TranscriptionStream] = None) -> Dict[str, Any]:
+        """
+        Decode the media once and produce the transcript, plus the English
+        translation when requested and the spoken language is not English.
+
+        The audio is sent to the server in WHISPERCPP_SERVER_CHUNK_SECONDS windows and
+        each window's segments are pushed to the stream, the translation is checkpointed
+        window by window too. When the stream already holds segments from a checkpoint,
+        audio before its offset is skipped.
+
+        Returns a dictionary with transcription, translation, language and stats.
+        """
+        self.server.ensure_running()
+        stream = stream or TranscriptionStream(lambda stream, segments: None, lambda stream: None, 0)
+
+        decode_started = time.monotonic()
+        pcm = decode_audio_to_pcm(media_path)
+        decode_seconds = time.monotonic() - decode_started
+        audio_seconds = pcm_duration(pcm)
+
+        detected_language = stream.language
+        if language and language != "auto":
+            detected_language = language
+
+        inference_started = time.monotonic()
+        for result, segments in self._infer_chunks(pcm, stream.offset_seconds, detected_language):
+            if not detected_language:
+                detected_language = normalize_language(
+                    result.get("detected_language") or result.get("language")
+                )
+            stream.language = detected_language
+            stream.extend(segments)
+        stream.flush()
+        transcription = segments_to_vtt(stream.segments)
+
+        translation = None
+        if translate and detected_language and detected_language != "en":
+            for _, segments in self._infer_chunks(pcm, stream.translation_offset_seconds, detected_language, True):
+                stream.add_translation(segments)
+            translation = segments_to_vtt(stream.translated_segments)
+        inference_seconds = time.monotonic() - inference_started
+
+        stats = self.build_stats(audio_seconds, decode_seconds, inference_seconds, translation is not None)
+        logger.info(
+            f"Transcribed {stats['audio_seconds']:.1f}s of audio in {stats['processing_seconds']:.1f}s "
+            f"(RTF {stats['real_time_factor']:.3f}, {stats['speed']:.1f}x real time, "
+            f"translated: {stats['translated']})"
+        )
+        return {
+            "transcription": transcription,
+            "translation": translation,
+            "language": detected_language,
+            "stats": stats,
+        }
+
+    def _infer_chunks(self, pcm: bytes, offset_seconds: float, language: Optional[str], translate: bool = False):
+        """Yield the server result of every window from the offset on, with its segments shifted to media time"""
+        chunk_bytes = int(settings.WHISPERCPP_SERVER_CHUNK_SECONDS * SAMPLE_RATE) * SAMPLE_WIDTH
+        position = int(offset_seconds * SAMPLE_RATE) * SAMPLE_WIDTH
+        while position < len(pcm):
+            chunk_offset = position / float(SAMPLE_RATE * SAMPLE_WIDTH)
+            result = self.server.infer(pcm_to_wav(pcm[position:position + chunk_bytes]),
+                                       language=language or "auto", translate=translate)
+            yield result, [
+                {
+                    "start": round(segment["start"] + chunk_offset, 3),
+                    "end": round(segment["end"] + chunk_offset, 3),
+                    "text": segment["text"].strip(),
+                }
+                for segment in result.get("segments", [])
+            ]
+            position += chunk_bytes
+
+    @staticmethod
+    def build_stats(audio_seconds: float, decode_seconds: float, inference_seconds: float, translated: bool) -> Dict[str, Any]:
+        processing_seconds = decode_seconds + inference_seconds
+        real_time_factor = processing_seconds / audio_seconds if audio_seconds else 0.0
+        return {
+            "audio_seconds": round(audio_seconds, 3),
+            "decode_seconds": round(decode_seconds, 3),
+            "inference_seconds": round(inference_seconds, 3),
+            "processing_seconds": round(processing_seconds, 3),
+            "real_time_factor": round(real_time_factor, 4),
+            "speed": round(1 / real_time_factor, 2) if real_time_factor else 0.0,
+            "translated": translated,
+        }
+
+
+def get_transcription_service(model_path: str) -> Optional[TranscriptionService]:
+    """
+    Return the persistent transcription service when it can serve the given
+    model on this host, otherwise None so callers fall back to whisper-cli.
+    """
+    if not settings.WHISPERCPP_USE_SERVER:
+        return None
+    if model_path != settings.WHISPERCPP_DEFAULT_MODEL:
+        return None
+    server = WhisperServer(
+        settings.WHISPERCPP_SERVER_PATH,
+        settings.WHISPERCPP_DEFAULT_MODEL,
+        settings.WHISPERCPP_SERVER_HOST,
+        settings.WHISPERCPP_SERVER_PORT,
+        settings.WHISPERCPP_THREAD_COUNT,
+    )
+    if not server.is_available():
+        return None
+    return TranscriptionService(server)
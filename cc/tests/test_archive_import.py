@@ -0,0 +1,173 @@
+"""
+Tests for importing media straight from export archives without extracting them
+"""
+import os
+import sqlite3
+import tarfile
+import tempfile
+import uuid
+import zipfile
+from unittest.mock import patch
+from django.core.files.base import ContentFile
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.contrib.auth.models import User
+
+from cc.models import Session, Annotation, ProtocolModel, ProtocolReagent, Reagent
+from cc.utils.archive_reader import ArchiveReader, SQLITE_MEMBER, safe_destination, normalize_member_name
+from cc.utils.user_data_export_revised import export_user_data_revised
+from cc.utils.user_data_import_revised import import_user_data_revised, dry_run_import_user_data
+
+
+class ArchiveReaderHelpersTest(TestCase):
+
+    def test_normalize_member_name(self):
+        self.assertEqual(normalize_member_name('./media/annotations/a.png'), 'media/annotations/a.png')
+        self.assertEqual(normalize_member_name('/user_data.sqlite'), 'user_data.sqlite')
+        self.assertEqual(normalize_member_name('.hidden'), '.hidden')
+
+    def test_safe_destination_rejects_escaping_paths(self):
+        root = tempfile.mkdtemp()
+        self.assertEqual(safe_destination(root, 'annotations/a.png'), os.path.join(root, 'annotations', 'a.png'))
+        self.assertIsNone(safe_destination(root, '../outside.png'))
+        self.assertIsNone(safe_destination(root, 'annotations/../../outside.png'))
+        self.assertIsNone(safe_destination(root, '/etc/passwd'))
+
+
+class ArchiveImportTest(TransactionTestCase):
+    """Import archives produced by the exporter and check the media handling"""
+
+    def setUp(self):
+        self.export_user = User.objects.create_user('archive_export_user', 'export@example.com', 'password')
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        session = Session.objects.create(user=self.export_user, unique_id=uuid.uuid4(), name='Run')
+        self.annotation = Annotation.objects.create(
+            session=session, annotation='Gel', annotation_type='image', user=self.export_user
+        )
+        self.annotation.file.save('gel.png', ContentFile(b'gel image bytes'))
+        self.source_file = self.annotation.file.path
+
+    def tearDown(self):
+        self.settings_override.disable()
+
+    def _export(self, format_type='zip'):
+        archive_path = export_user_data_revised(self.export_user, tempfile.mkdtemp(), format_type=format_type)
+        # Imported files land on the same relative path, so the source must not be there anymore
+        os.remove(self.source_file)
+        return archive_path
+
+    def _import(self, archive_path, username, import_options=None):
+        user = User.objects.create_user(username, f'{username}@example.com', 'password')
+        result = import_user_data_revised(user, archive_path, import_options=import_options)
+        self.assertTrue(result['success'], result.get('error'))
+        return user
+
+    def _assert_file_imported(self, user):
+        annotation = Annotation.objects.get(user=user)
+        self.assertTrue(annotation.file)
+        with annotation.file.open('rb') as f:
+            self.assertEqual(f.read(), b'gel image bytes')
+
+    def test_zip_media_streamed_without_full_extraction(self):
+        """Test only the database leaves the archive through extraction and media is linked"""
+        archive_path = self._export('zip')
+        with zipfile.ZipFile(archive_path, 'a') as archive:
+            archive.writestr('media/annotations/unreferenced.bin', b'x' * 1024)
+
+        with patch.object(zipfile.ZipFile, 'extractall') as extractall:
+            user = self._import(archive_path, 'archive_zip_user')
+        extractall.assert_not_called()
+
+        self._assert_file_imported(user)
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, 'annotations', 'unreferenced.bin')))
+
+    def test_tar_gz_media_streamed(self):
+        archive_path = self._export('tar.gz')
+        user = self._import(archive_path, 'archive_tar_user')
+        self._assert_file_imported(user)
+
+    def test_deselected_annotations_skip_media(self):
+        archive_path = self._export('zip')
+        options = {
+            'protocols': True, 'sessions': True, 'annotations': False, 'projects': True, 'reagents': True,
+            'instruments': True, 'lab_groups': True, 'messaging': False, 'support_models': True,
+        }
+        user = self._import(archive_path, 'archive_no_annotations_user', options)
+        self.assertFalse(Annotation.objects.filter(user=user).exists())
+        self.assertFalse(os.path.exists(self.source_file))
+
+    def test_database_path_replaces_archive_database(self):
+        """Test a migrated database next to the archive is imported with the archive media"""
+        archive_path = self._export('zip')
+        database_path = os.path.join(tempfile.mkdtemp(), SQLITE_MEMBER)
+        with ArchiveReader(archive_path) as archive:
+            archive.extract_member(SQLITE_MEMBER, database_path)
+        with sqlite3.connect(database_path) as conn:
+            conn.execute("UPDATE export_sessions SET name = 'Migrated run'")
+
+        user = User.objects.create_user('archive_database_user', 'database@example.com', 'password')
+        result = import_user_data_revised(user, archive_path, database_path=database_path)
+        self.assertTrue(result['success'], result.get('error'))
+        self.assertEqual(Session.objects.get(user=user).name, '[IMPORTED] Migrated run')
+        self._assert_file_imported(user)
+
+    def test_reader_extracts_single_member(self):
+        archive_path = self._export('tar.gz')
+        destination = os.path.join(tempfile.mkdtemp(), SQLITE_MEMBER)
+        with ArchiveReader(archive_path) as archive:
+            self.assertEqual(archive.archive_format, 'tar.gz')
+            self.assertTrue(archive.extract_member(SQLITE_MEMBER, destination))
+            self.assertFalse(archive.extract_member('missing.json', destination + '.missing'))
+            media = [(path, size) for path, size, _ in archive.iter_media()]
+        self.assertTrue(os.path.getsize(destination) > 0)
+        self.assertEqual(media, [(os.path.relpath(self.source_file, self.media_root), len(b'gel image bytes'))])
+
+
+class ArchiveDryRunTest(TransactionTestCase):
+    """Dry runs read the database and the archive index only"""
+
+    def setUp(self):
+        self.export_user = User.objects.create_user('dry_run_export_user', 'export@example.com', 'password')
+        self.target_user = User.objects.create_user('dry_run_target_user', 'target@example.com', 'password')
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        protocol = ProtocolModel.objects.create(protocol_title='Digestion', user=self.export_user)
+        for name in ('Trypsin', 'Urea'):
+            ProtocolReagent.objects.create(
+                protocol=protocol, reagent=Reagent.objects.create(name=name, unit='mg'), quantity=1
+            )
+        ProtocolModel.objects.create(protocol_title='Digestion', user=self.target_user)
+        session = Session.objects.create(user=self.export_user, unique_id=uuid.uuid4(), name='Run')
+        annotation = Annotation.objects.create(
+            session=session, annotation='Gel', annotation_type='image', user=self.export_user
+        )
+        annotation.file.save('gel.png', ContentFile(b'gel image bytes'))
+
+    def tearDown(self):
+        self.settings_override.disable()
+
+    def _dry_run(self, format_type):
+        archive_path = export_user_data_revised(self.export_user, tempfile.mkdtemp(), format_type=format_type)
+        with patch.object(zipfile.ZipFile, 'extractall') as zip_extractall, \
+                patch.object(tarfile.TarFile, 'extractall') as tar_extractall:
+            result = dry_run_import_user_data(self.target_user, archive_path)
+        zip_extractall.assert_not_called()
+        tar_extractall.assert_not_called()
+        self.assertTrue(result['success'], result.get('error'))
+        return result['analysis_report']
+
+    def test_sizes_come_from_archive_index(self):
+        for format_type in ('zip', 'tar.gz'):
+            report = self._dry_run(format_type)
+            self.assertTrue(report['archive_info']['has_media'])
+            self.assertEqual(report['size_analysis']['total_media_files'], 1)
+            self.assertEqual(report['size_analysis']['total_media_size_bytes'], len(b'gel image bytes'))
+            self.assertEqual(report['size_analysis']['file_types'], {'.png': 1})
+
+    def test_conflicts_detected(self):
+        report = self._dry_run('zip')
+        conflicts = {conflict['type']: conflict for conflict in report['potential_conflicts']}
+        self.assertEqual(conflicts['Protocol Title Conflict']['items'], ['Digestion'])
+        self.assertEqual(sorted(conflicts['Existing Reagents']['items']), ['Trypsin (mg)', 'Urea (mg)'])
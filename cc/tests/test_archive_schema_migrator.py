@@ -0,0 +1,98 @@
+"""
+Tests for migrating the database of export archives without rewriting their media
+"""
+import os
+import sqlite3
+import tarfile
+import tempfile
+import zipfile
+from io import StringIO
+from unittest.mock import patch
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from cc.utils.archive_reader import ArchiveReader, SQLITE_MEMBER, METADATA_MEMBER
+from cc.utils.archive_schema_migrator import ArchiveSchemaMigrator, migrate_archive_if_needed
+from cc.utils.archive_writer import ArchiveWriter
+
+
+class ArchiveSchemaMigratorTest(TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        # A 1.0.0 database: the basic tables only
+        sqlite_path = os.path.join(self.work_dir, SQLITE_MEMBER)
+        with sqlite3.connect(sqlite_path) as conn:
+            conn.execute("CREATE TABLE cc_protocolmodel (id INTEGER PRIMARY KEY, protocol_title TEXT)")
+            conn.execute("CREATE TABLE cc_session (id INTEGER PRIMARY KEY, name TEXT)")
+            conn.execute("INSERT INTO cc_protocolmodel (protocol_title) VALUES ('Digestion')")
+        metadata_path = os.path.join(self.work_dir, METADATA_MEMBER)
+        with open(metadata_path, 'w') as f:
+            f.write('{}')
+        self.media = os.urandom(64 * 1024)
+        media_path = os.path.join(self.work_dir, 'gel.png')
+        with open(media_path, 'wb') as f:
+            f.write(self.media)
+        self.members = [(sqlite_path, SQLITE_MEMBER), (metadata_path, METADATA_MEMBER), (media_path, 'media/annotations/gel.png')]
+
+    def _archive(self, format_type, extension):
+        archive_path = os.path.join(self.work_dir, f'legacy{extension}')
+        with ArchiveWriter(archive_path, format_type) as archive:
+            for path, name in self.members:
+                archive.add_file(path, name)
+        return archive_path
+
+    def _columns(self, sqlite_path, table):
+        with sqlite3.connect(sqlite_path) as conn:
+            return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+    def test_migrated_archive_copies_members_without_extracting(self):
+        for format_type, extension in (('zip', '.zip'), ('tar.gz', '.tar.gz')):
+            archive_path = self._archive(format_type, extension)
+            output_path = os.path.join(self.work_dir, f'migrated{extension}')
+            with patch.object(zipfile.ZipFile, 'extractall') as zip_extractall, \
+                    patch.object(tarfile.TarFile, 'extractall') as tar_extractall:
+                result = migrate_archive_if_needed(archive_path, output_path=output_path)
+            zip_extractall.assert_not_called()
+            tar_extractall.assert_not_called()
+            self.assertTrue(result['success'], result.get('error'))
+            self.assertEqual(result['current_version'], '1.0.0')
+
+            with ArchiveReader(output_path) as archive:
+                self.assertEqual(archive.names(), [SQLITE_MEMBER, METADATA_MEMBER, 'media/annotations/gel.png'])
+                media = [stream.read() for _, _, stream in archive.iter_media()]
+                migrated_db = os.path.join(self.work_dir, f'migrated_{format_type}.sqlite')
+                archive.extract_member(SQLITE_MEMBER, migrated_db)
+            self.assertEqual(media, [self.media])
+            self.assertIn('remote_id', self._columns(migrated_db, 'cc_protocolmodel'))
+            self.assertEqual(self._columns(migrated_db, 'cupcake_schema_metadata')[0], 'key')
+
+    def test_database_only_leaves_archive_alone(self):
+        archive_path = self._archive('zip', '.zip')
+        database_path = os.path.join(self.work_dir, 'migrated.sqlite')
+        migrator = ArchiveSchemaMigrator(archive_path)
+        result = migrator.migrate_archive(database_output_path=database_path)
+
+        self.assertTrue(result['success'], result.get('error'))
+        self.assertEqual(result['migrated_database'], database_path)
+        self.assertIn('processing', self._columns(database_path, 'cc_session'))
+        self.assertIsNone(migrator.temp_dir)
+        # The database in the original archive is untouched
+        with ArchiveReader(archive_path) as archive:
+            archive.extract_member(SQLITE_MEMBER, os.path.join(self.work_dir, 'original.sqlite'))
+        self.assertNotIn('remote_id', self._columns(os.path.join(self.work_dir, 'original.sqlite'), 'cc_protocolmodel'))
+
+    @patch('cc.management.commands.import_user_data.UserDataImportDryRun')
+    def test_import_command_removes_migrated_database(self, mock_dry_run):
+        """Test the database migrated by import_user_data is removed when the import stops"""
+        mock_dry_run.side_effect = RuntimeError('dry run failed')
+        archive_path = self._archive('zip', '.zip')
+        with self.assertRaises(CommandError):
+            call_command(
+                'import_user_data', 'archive_user', archive_path, '--auto-migrate', '--dry-run-only',
+                '--create-user', '--email', 'archive@example.com', stdout=StringIO(),
+            )
+        database_path = mock_dry_run.call_args.kwargs['database_path']
+        self.assertTrue(database_path.endswith('user_data.sqlite'))
+        self.assertFalse(os.path.exists(os.path.dirname(database_path)))
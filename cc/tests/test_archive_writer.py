@@ -0,0 +1,108 @@
+"""
+Tests for the single-pass export archive writer
+"""
+import hashlib
+import os
+import tempfile
+import unittest
+import uuid
+import zipfile
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+
+from cc.models import Session, Annotation
+from cc.utils.archive_reader import ArchiveReader, SQLITE_MEMBER, METADATA_MEMBER
+from cc.utils.archive_writer import ArchiveWriter, zstd_available
+from cc.utils.user_data_export_revised import export_user_data_revised
+
+
+def file_sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class ArchiveWriterTest(TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.text_path = os.path.join(self.work_dir, 'notes.txt')
+        with open(self.text_path, 'wb') as f:
+            f.write(b'protocol notes ' * 200)
+        self.image_path = os.path.join(self.work_dir, 'gel.png')
+        with open(self.image_path, 'wb') as f:
+            f.write(os.urandom(4096))
+
+    def _write(self, format_type, extension):
+        archive_path = os.path.join(self.work_dir, f'archive{extension}')
+        with ArchiveWriter(archive_path, format_type) as archive:
+            archive.add_file(self.text_path, 'notes.txt')
+            archive.add_file(self.image_path, 'media/annotations/gel.png')
+        self.assertEqual(archive.sha256, file_sha256(archive_path))
+        self.assertEqual(archive.bytes_written, os.path.getsize(archive_path))
+        return archive_path
+
+    def _assert_readable(self, archive_path):
+        with ArchiveReader(archive_path) as archive:
+            self.assertEqual(sorted(archive.names()), ['media/annotations/gel.png', 'notes.txt'])
+            self.assertEqual(archive.read_member('notes.txt'), b'protocol notes ' * 200)
+            media = [(path, stream.read()) for path, _, stream in archive.iter_media()]
+        with open(self.image_path, 'rb') as f:
+            self.assertEqual(media, [('annotations/gel.png', f.read())])
+
+    def test_zip_stores_precompressed_media(self):
+        archive_path = self._write('zip', '.zip')
+        with zipfile.ZipFile(archive_path) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(archive.getinfo('notes.txt').compress_type, zipfile.ZIP_DEFLATED)
+            self.assertEqual(archive.getinfo('media/annotations/gel.png').compress_type, zipfile.ZIP_STORED)
+        self._assert_readable(archive_path)
+
+    def test_tar_formats(self):
+        for format_type, extension in (('tar.gz', '.tar.gz'), ('tar', '.tar')):
+            self._assert_readable(self._write(format_type, extension))
+
+    @unittest.skipUnless(zstd_available(), "zstandard is not installed")
+    def test_tar_zst(self):
+        self._assert_readable(self._write('tar.zst', '.tar.zst'))
+
+    def test_unsupported_format(self):
+        with self.assertRaises(ValueError):
+            ArchiveWriter(os.path.join(self.work_dir, 'archive.rar'), 'rar')
+
+
+class StreamingExportTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('streaming_export_user', 'export@example.com', 'password')
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        session = Session.objects.create(user=self.user, unique_id=uuid.uuid4(), name='Run')
+        annotation = Annotation.objects.create(
+            session=session, annotation='Gel', annotation_type='image', user=self.user
+        )
+        annotation.file.save('gel.png', ContentFile(b'gel image bytes'))
+
+    def tearDown(self):
+        self.settings_override.disable()
+
+    def test_export_streams_media_and_hashes_archive(self):
+        export_dir = tempfile.mkdtemp()
+        archive_path = export_user_data_revised(self.user, export_dir, format_type='tar')
+        self.assertTrue(archive_path.endswith('.tar'))
+
+        # Only the archive and its hash file are left behind, no staged copies
+        self.assertEqual(
+            sorted(os.listdir(export_dir)),
+            sorted([os.path.basename(archive_path), os.path.basename(archive_path) + '.sha256'])
+        )
+        with open(archive_path + '.sha256') as f:
+            self.assertEqual(f.read().split()[0], file_sha256(archive_path))
+
+        with ArchiveReader(archive_path) as archive:
+            names = archive.names()
+            media = [(path, stream.read()) for path, _, stream in archive.iter_media()]
+        self.assertEqual(names[:2], [SQLITE_MEMBER, METADATA_MEMBER])
+        self.assertEqual(len(media), 1)
+        self.assertEqual(media[0][1], b'gel image bytes')
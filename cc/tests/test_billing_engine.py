@@ -0,0 +1,147 @@
+"""
+Tests for batch pricing of instrument jobs, billing record generation and the monthly billing totals
+"""
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from cc.billing_services import BillingEngine
+from cc.models import BillingMonthlyTotal, BillingRecord, Instrument, InstrumentJob, LabGroup, ServicePrice, ServiceTier
+
+
+class BillingEngineTestMixin:
+    def setUp(self):
+        self.user = User.objects.create_user('billing_user', 'billing@example.com', 'password')
+        self.lab_group = LabGroup.objects.create(name='Proteomics Core', is_core_facility=True)
+        self.lab_group.users.add(self.user)
+        self.tier = ServiceTier.objects.create(name='Academic', lab_group=self.lab_group)
+        self.instrument = Instrument.objects.create(instrument_name='Orbitrap')
+        for billing_unit, price in (('per_hour_instrument', '50.00'), ('per_hour_personnel', '30.00'), ('per_sample', '2.50')):
+            ServicePrice.objects.create(service_tier=self.tier, instrument=self.instrument, price=Decimal(price), billing_unit=billing_unit)
+        self.completed_at = datetime(2030, 3, 10, 12, tzinfo=dt_timezone.utc)
+
+    def _job(self, instrument_hours=2, personnel_hours=1, samples=4, status='completed', completed_at=None, instrument=None):
+        start = self.completed_at - timedelta(hours=6)
+        return InstrumentJob.objects.create(
+            user=self.user, instrument=instrument or self.instrument, service_lab_group=self.lab_group,
+            status=status, sample_number=samples, completed_at=completed_at or self.completed_at,
+            instrument_start_time=start, instrument_end_time=start + timedelta(hours=instrument_hours),
+            personnel_start_time=start, personnel_end_time=start + timedelta(hours=personnel_hours),
+        )
+
+    def _totals(self):
+        return list(BillingMonthlyTotal.objects.values_list('status', 'record_count', 'total_amount'))
+
+
+class BillingEngineTest(BillingEngineTestMixin, TestCase):
+
+    def test_price_jobs_from_one_query(self):
+        jobs = [self._job(instrument_hours=n + 1) for n in range(5)]
+        with self.assertNumQueries(1):
+            charges = BillingEngine([self.tier]).price_jobs(jobs, self.tier)
+        self.assertEqual([charge['instrument_cost'] for charge in charges], [Decimal(50 * (n + 1)) for n in range(5)])
+        self.assertEqual(charges[0]['personnel_cost'], Decimal('30.00'))
+        # The per sample price is not charged, as in calculate_billing
+        self.assertEqual(charges[0]['total_amount'], Decimal('80.00'))
+
+    def test_expired_and_other_tier_prices_ignored(self):
+        ServicePrice.objects.filter(billing_unit='per_hour_personnel').update(expiry_date=date(2000, 1, 1))
+        other_tier = ServiceTier.objects.create(name='Commercial', lab_group=self.lab_group)
+        ServicePrice.objects.create(service_tier=other_tier, instrument=self.instrument, price=Decimal('500'), billing_unit='per_hour_personnel')
+        charges = BillingEngine([self.tier]).price_job(self._job(), self.tier.id)
+        self.assertIsNone(charges['personnel_rate'])
+        self.assertEqual(charges['total_amount'], Decimal('100.00'))
+
+    def test_generate_records_for_period(self):
+        billed = self._job()
+        self._job(instrument_hours=1)
+        self._job(status='in_progress')
+        self._job(completed_at=self.completed_at + timedelta(days=30))
+        self._job(instrument=Instrument.objects.create(instrument_name='Unpriced'))
+        engine = BillingEngine([self.tier])
+        BillingRecord.objects.create(user=self.user, instrument_job=billed, service_tier=self.tier, instrument_cost=Decimal('1'))
+
+        records = engine.generate_records(self.tier, date(2030, 3, 1), date(2030, 3, 31))
+        self.assertEqual(len(records), 1)
+        record = BillingRecord.objects.get(id=records[0].id)
+        self.assertEqual(
+            (record.instrument_hours, record.instrument_cost, record.other_quantity, record.total_amount),
+            (Decimal('1.00'), Decimal('50.00'), None, Decimal('80.00')),
+        )
+        self.assertEqual(self._totals(), [('pending', 2, Decimal('81.00'))])
+        self.assertEqual(engine.generate_records(self.tier, date(2030, 3, 1), date(2030, 3, 31)), [])
+
+    def test_monthly_totals_follow_records(self):
+        record = BillingRecord.objects.create(user=self.user, instrument_job=self._job(), service_tier=self.tier, instrument_cost=Decimal('100'))
+        BillingRecord.objects.create(user=self.user, instrument_job=self._job(), service_tier=self.tier, other_cost=Decimal('20'))
+        self.assertEqual(self._totals(), [('pending', 2, Decimal('120.00'))])
+        self.assertEqual(BillingMonthlyTotal.objects.get().month, timezone.now().date().replace(day=1))
+
+        record.status = 'paid'
+        record.save()
+        self.assertEqual(self._totals(), [('paid', 1, Decimal('100.00')), ('pending', 1, Decimal('20.00'))])
+        record.delete()
+        self.assertEqual(self._totals(), [('pending', 1, Decimal('20.00'))])
+
+        BillingMonthlyTotal.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_billing_totals', stdout=out)
+        self.assertIn('Rebuilt 1 monthly billing totals', out.getvalue())
+        self.assertEqual(self._totals(), [('pending', 1, Decimal('20.00'))])
+
+
+class BillingEndpointTest(BillingEngineTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_calculate_billing_for_many_jobs(self):
+        jobs = [self._job(), self._job(instrument_hours=3)]
+        response = self.client.post('/api/billing_records/calculate_billing/', {
+            'job_ids': [job.id for job in jobs], 'service_tier_id': self.tier.id
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['total_amount'] for row in response.data['results']], [Decimal('130.00'), Decimal('180.00')])
+
+        response = self.client.post('/api/billing_records/calculate_billing/', {
+            'job_id': jobs[0].id, 'service_tier_id': self.tier.id
+        }, format='json')
+        self.assertEqual(response.data['instrument_rate'], Decimal('50.00'))
+
+        other_tier = ServiceTier.objects.create(name='Academic', lab_group=LabGroup.objects.create(name='Other Core', is_core_facility=True))
+        response = self.client.post('/api/billing_records/calculate_billing/', {
+            'job_id': jobs[0].id, 'service_tier_id': other_tier.id
+        }, format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_generate_records_and_summary(self):
+        self._job()
+        self._job(instrument_hours=3)
+        response = self.client.post('/api/billing_records/generate_records/', {
+            'service_tier_id': self.tier.id, 'start_date': '2030-03-01', 'end_date': '2030-03-31'
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['total_amount']), (2, Decimal('310.00')))
+        BillingRecord.objects.filter(id=response.data['record_ids'][0]).get().delete()
+
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/billing_records/summary/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['total_records'], response.data['total_amount']), (1, Decimal('180.00')))
+        self.assertEqual(response.data['by_status']['pending'], {'count': 1, 'total_amount': Decimal('180.00')})
+        self.assertEqual(response.data['by_status']['paid']['count'], 0)
+        self.assertEqual(response.data['monthly_totals'][timezone.now().month]['count'], 1)
+
+        response = self.client.get('/api/billing_records/summary/', {'status': 'paid'})
+        self.assertEqual(response.data['total_records'], 0)
+        self.assertEqual(self.client.get('/api/billing_records/summary/', {'start_date': 'soon'}).status_code, 400)
+        self.assertEqual(self.client.post('/api/billing_records/generate_records/', {
+            'service_tier_id': self.tier.id, 'start_date': '2030-03-31', 'end_date': '2030-03-01'
+        }, format='json').status_code, 400)
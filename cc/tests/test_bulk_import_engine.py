@@ -0,0 +1,105 @@
+"""
+Tests for the table-at-a-time bulk import path of UserDataImporter
+"""
+import os
+import tempfile
+import uuid
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+
+from cc.models import (
+    ProtocolModel, ProtocolSection, ProtocolStep, Session, Annotation, AnnotationFolder,
+    ImportTracker, ImportedObject, ImportedRelationship
+)
+from cc.utils.user_data_export_revised import export_user_data_revised
+from cc.utils.user_data_import_revised import import_user_data_revised
+
+
+class BulkImportEngineTest(TransactionTestCase):
+    """Import archives produced by the exporter and check the bulk-written result"""
+
+    def setUp(self):
+        self.export_user = User.objects.create_user('bulk_export_user', 'export@example.com', 'password')
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+
+    def _create_protocol(self, annotations_per_session):
+        protocol = ProtocolModel.objects.create(protocol_title='Digestion', user=self.export_user)
+        protocol.editors.add(self.export_user)
+        section = ProtocolSection.objects.create(protocol=protocol, section_description='Preparation')
+        previous = None
+        for n in range(3):
+            previous = ProtocolStep.objects.create(
+                protocol=protocol, step_section=section, step_description=f'Step {n}', previous_step=previous
+            )
+        session = Session.objects.create(user=self.export_user, unique_id=uuid.uuid4(), name='Run')
+        session.protocols.add(protocol)
+        parent = AnnotationFolder.objects.create(folder_name='Parent', session=session)
+        child = AnnotationFolder.objects.create(folder_name='Child', session=session, parent_folder=parent)
+        for n in range(annotations_per_session):
+            Annotation.objects.create(
+                session=session, step=previous, folder=child, annotation=f'Note {n}',
+                annotation_type='text', user=self.export_user
+            )
+
+    def _export(self):
+        return export_user_data_revised(self.export_user, tempfile.mkdtemp())
+
+    def _import(self, archive_path, username):
+        user = User.objects.create_user(username, f'{username}@example.com', 'password')
+        with CaptureQueriesContext(connection) as queries:
+            result = import_user_data_revised(user, archive_path)
+        self.assertTrue(result['success'], result.get('error'))
+        return user, result, len(queries.captured_queries)
+
+    def test_relationships_are_remapped(self):
+        """Test self-references, folders and many-to-many rows point at the imported objects"""
+        self._create_protocol(annotations_per_session=4)
+        user, result, _ = self._import(self._export(), 'bulk_import_user')
+
+        protocol = ProtocolModel.objects.get(user=user)
+        steps = ProtocolStep.objects.filter(protocol=protocol)
+        self.assertEqual(steps.count(), 3)
+        self.assertEqual(steps.filter(previous_step__isnull=False).count(), 2)
+        for step in steps.filter(previous_step__isnull=False):
+            self.assertEqual(step.previous_step.protocol_id, protocol.id)
+        self.assertTrue(protocol.editors.filter(id=user.id).exists())
+
+        session = Session.objects.get(user=user)
+        self.assertTrue(session.protocols.filter(id=protocol.id).exists())
+        child = AnnotationFolder.objects.get(session=session, folder_name='Child')
+        self.assertEqual(child.parent_folder.session_id, session.id)
+
+        annotations = Annotation.objects.filter(user=user)
+        self.assertEqual(annotations.count(), 4)
+        self.assertEqual(set(annotations.values_list('folder_id', flat=True)), {child.id})
+        self.assertEqual(annotations.first().history.count(), 1)
+
+    def test_tracker_counts_match_tracked_rows(self):
+        """Test tracker counters agree with the bulk inserted tracking rows"""
+        self._create_protocol(annotations_per_session=5)
+        user, result, _ = self._import(self._export(), 'bulk_import_user')
+
+        tracker = ImportTracker.objects.get(import_id=result['import_id'])
+        self.assertEqual(tracker.total_objects_created, ImportedObject.objects.filter(import_tracker=tracker).count())
+        self.assertEqual(tracker.total_relationships_created, ImportedRelationship.objects.filter(import_tracker=tracker).count())
+        self.assertEqual(ImportedObject.objects.filter(import_tracker=tracker, model_name='Annotation').count(), 5)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        """Test importing more annotations does not add per-row queries"""
+        self._create_protocol(annotations_per_session=2)
+        _, _, small_queries = self._import(self._export(), 'small_import_user')
+
+        session = Session.objects.get(user=self.export_user)
+        folder = AnnotationFolder.objects.get(session=session, folder_name='Child')
+        for n in range(10):
+            Annotation.objects.create(session=session, folder=folder, annotation=f'Extra {n}', annotation_type='text', user=self.export_user)
+        _, _, large_queries = self._import(self._export(), 'large_import_user')
+
+        self.assertEqual(small_queries, large_queries)
@@ -0,0 +1,183 @@
+"""
+Tests for the export artifact cache: ExportArtifact, content versions and the cache-aware export helpers
+"""
+import os
+import tempfile
+import time
+import uuid
+from unittest.mock import patch
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from cc.models import ExportArtifact, ProtocolModel, Session
+from cc.rq_tasks import export_data, serve_cached_export_data
+from cc.services import export_cache
+
+
+class ExportArtifactTestMixin:
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.temp_dir = os.path.join(self.media_root, 'temp')
+        os.makedirs(self.temp_dir)
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+
+    def _write_export(self, name, size=100, sidecar=False):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, 'wb') as f:
+            f.write(b'x' * size)
+        if sidecar:
+            with open(f'{path}.sha256', 'w') as f:
+                f.write(f'hash  {name}\n')
+        return path
+
+
+class ExportArtifactModelTest(ExportArtifactTestMixin, TestCase):
+    def test_store_and_lookup(self):
+        """Test stored exports are returned for the same content and hits are counted"""
+        path = self._write_export('protocol.docx')
+        ExportArtifact.store('docx', path, parameters={'protocol_id': 1}, content_hash='v1')
+
+        artifact = ExportArtifact.lookup('docx', parameters={'protocol_id': 1}, content_hash='v1')
+        self.assertEqual(artifact.file_path, path)
+        self.assertEqual(artifact.size_bytes, 100)
+        artifact.refresh_from_db()
+        self.assertEqual(artifact.hit_count, 1)
+        self.assertIsNone(ExportArtifact.lookup('docx', parameters={'protocol_id': 1}, content_hash='v2'))
+        self.assertIsNone(ExportArtifact.lookup('docx', parameters={'protocol_id': 2}, content_hash='v1'))
+
+    def test_missing_file_is_a_miss(self):
+        """Test an artifact whose file is gone is dropped"""
+        path = self._write_export('sheet.xlsx')
+        ExportArtifact.store('excel_template', path, content_hash='v1')
+        os.remove(path)
+        self.assertIsNone(ExportArtifact.lookup('excel_template', content_hash='v1'))
+        self.assertFalse(ExportArtifact.objects.exists())
+
+    @override_settings(EXPORT_CACHE_MAX_ENTRIES=2)
+    def test_evicts_least_recently_used_exports(self):
+        """Test the entry bound evicts the least recently accessed export with its hash file"""
+        first = self._write_export('first.zip', sidecar=True)
+        second = self._write_export('second.zip', sidecar=True)
+        ExportArtifact.store('user_data', first, parameters={'n': 1}, content_hash='v')
+        ExportArtifact.store('user_data', second, parameters={'n': 2}, content_hash='v')
+        ExportArtifact.lookup('user_data', parameters={'n': 1}, content_hash='v')
+        ExportArtifact.store('user_data', self._write_export('third.zip'), parameters={'n': 3}, content_hash='v')
+
+        self.assertEqual(ExportArtifact.objects.count(), 2)
+        self.assertFalse(os.path.exists(second))
+        self.assertFalse(os.path.exists(f'{second}.sha256'))
+        self.assertTrue(os.path.exists(first))
+
+    def test_evicts_by_size(self):
+        """Test the byte bound evicts until the cache fits"""
+        for n in range(5):
+            ExportArtifact.store('docx', self._write_export(f'{n}.docx'), parameters={'n': n}, content_hash='v')
+        self.assertEqual(ExportArtifact.evict(max_bytes=250, max_entries=100), 3)
+        self.assertEqual(sorted(os.listdir(self.temp_dir)), ['3.docx', '4.docx'])
+
+    def test_sweep_removes_old_untracked_exports(self):
+        """Test the sweep keeps cached and recent exports and removes old untracked ones"""
+        cached = self._write_export('cached.tar.gz', sidecar=True)
+        ExportArtifact.store('user_data', cached, content_hash='v')
+        old = self._write_export('old.zip', sidecar=True)
+        recent = self._write_export('recent.tsv')
+        staging = os.path.join(self.temp_dir, 'cupcake_export_old')
+        os.makedirs(staging)
+        unrelated = self._write_export('notes.txt')
+        week_ago = time.time() - 8 * 24 * 60 * 60
+        for path in (cached, f'{cached}.sha256', old, f'{old}.sha256', staging, unrelated):
+            os.utime(path, (week_ago, week_ago))
+
+        removed = export_cache.sweep_temp_dir(max_age_days=7)
+
+        self.assertEqual(removed, {'evicted': 0, 'files': 2, 'directories': 1})
+        self.assertEqual(
+            sorted(os.listdir(self.temp_dir)), ['cached.tar.gz', 'cached.tar.gz.sha256', 'notes.txt', 'recent.tsv']
+        )
+
+
+class ContentVersionTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('version_user', 'version@example.com', 'password')
+
+    def test_user_data_version_follows_changes(self):
+        """Test the version changes when exported objects are created, edited or deleted"""
+        session = Session.objects.create(user=self.user, unique_id=uuid.uuid4(), name='Run')
+        version = export_cache.user_data_version(self.user.id)
+        self.assertEqual(version, export_cache.user_data_version(self.user.id))
+
+        session.name = 'Renamed run'
+        session.save()
+        edited = export_cache.user_data_version(self.user.id)
+        self.assertNotEqual(edited, version)
+
+        session.delete()
+        self.assertNotEqual(export_cache.user_data_version(self.user.id), edited)
+
+    def test_history_versions_models_without_updated_at(self):
+        """Test protocol edits are picked up from the history table"""
+        protocol = ProtocolModel.objects.create(protocol_title='Digestion', user=self.user)
+        version = export_cache.user_data_version(self.user.id)
+        protocol.protocol_title = 'Digestion v2'
+        protocol.save()
+        self.assertNotEqual(export_cache.user_data_version(self.user.id), version)
+
+    def test_user_data_version_in_one_query(self):
+        ProtocolModel.objects.create(protocol_title='Digestion', user=self.user)
+        Session.objects.create(user=self.user, unique_id=uuid.uuid4(), name='Run')
+        with self.assertNumQueries(1):
+            export_cache.user_data_version(self.user.id)
+
+    def test_other_users_do_not_change_version(self):
+        version = export_cache.user_data_version(self.user.id)
+        other = User.objects.create_user('other_version_user', 'other@example.com', 'password')
+        Session.objects.create(user=other, unique_id=uuid.uuid4(), name='Other run')
+        self.assertEqual(export_cache.user_data_version(self.user.id), version)
+
+
+@patch('cc.rq_tasks.async_to_sync')
+@patch('cc.rq_tasks.get_channel_layer')
+class CachedExportDataTest(ExportArtifactTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('cached_export_user', 'export@example.com', 'password')
+        Session.objects.create(user=self.user, unique_id=uuid.uuid4(), name='Run')
+
+    def _download_messages(self, mock_async):
+        return [
+            call.args[1]['message'] for call in mock_async.return_value.call_args_list
+            if call.args[1]['type'] == 'download_message'
+        ]
+
+    def test_repeat_export_reuses_archive(self, mock_channel, mock_async):
+        """Test a repeated export of unchanged data is answered with the archive of the first export"""
+        self.assertIsNone(serve_cached_export_data(self.user.id, instance_id='first', format_type='tar'))
+        export_data(self.user.id, instance_id='first', export_type='complete', format_type='tar')
+        artifact = ExportArtifact.objects.get(user=self.user)
+        self.assertEqual(artifact.export_type, 'user_data')
+
+        signed_value = serve_cached_export_data(self.user.id, instance_id='second', format_type='tar')
+        self.assertIsNotNone(signed_value)
+        messages = self._download_messages(mock_async)
+        self.assertEqual(messages[-1]['signed_value'], signed_value)
+        self.assertEqual(messages[-1]['export_path'], artifact.file_path)
+        self.assertTrue(messages[-1]['cached'])
+
+        # Other formats and changed data need a new export
+        self.assertIsNone(serve_cached_export_data(self.user.id, format_type='zip'))
+        Session.objects.create(user=self.user, unique_id=uuid.uuid4(), name='Second run')
+        self.assertIsNone(serve_cached_export_data(self.user.id, format_type='tar'))
+
+    def test_incremental_exports_are_not_cached(self, mock_channel, mock_async):
+        export_data(self.user.id, instance_id='incremental', export_type='incremental', format_type='tar')
+        self.assertFalse(ExportArtifact.objects.exists())
+        self.assertIsNone(serve_cached_export_data(self.user.id, export_type='incremental', format_type='tar'))
+
+    @override_settings(EXPORT_CACHE_ENABLED=False)
+    def test_disabled_cache(self, mock_channel, mock_async):
+        export_data(self.user.id, instance_id='first', export_type='complete', format_type='tar')
+        self.assertFalse(ExportArtifact.objects.exists())
+        self.assertIsNone(serve_cached_export_data(self.user.id, format_type='tar'))
@@ -6,6 +6,7 @@ import json
 import uuid
 import tempfile
 import shutil
+import threading
 from unittest.mock import patch, MagicMock
 from django.test import TestCase, TransactionTestCase
 from django.contrib.auth.models import User
@@ -20,6 +21,7 @@ from cc.utils.user_data_import_revised import (
     UserDataImporter, ImportReverter, 
     revert_user_data_import, list_user_imports
 )
+from cc.utils.history import deletion_history_skipped, skip_deletion_history
 
 
 class ImportTrackerModelTest(TestCase):
@@ -395,6 +397,15 @@ class ImportReverterTest(TransactionTestCase):
             to_object_id=self.user.id,
             relationship_field='editors'
         )
+        # A tracked relationship removed since the import is not counted
+        ImportedRelationship.objects.create(
+            import_tracker=self.import_tracker,
+            from_model='ProtocolModel',
+            from_object_id=protocol.id,
+            to_model='User',
+            to_object_id=self.user.id,
+            relationship_field='viewers'
+        )
         
         # Update tracker stats
         self.import_tracker.total_objects_created = 2
@@ -475,6 +486,93 @@ class ImportReverterTest(TransactionTestCase):
         self.assertTrue(result['success'])
         self.assertEqual(result['stats']['files_deleted'], 2)
         self.assertEqual(mock_remove.call_count, 2)
+    
+    def _track_protocols(self, count):
+        protocols = [
+            ProtocolModel.objects.create(protocol_title=f'Protocol {i}', user=self.user) for i in range(count)
+        ]
+        ImportedObject.objects.bulk_create([
+            ImportedObject(import_tracker=self.import_tracker, model_name='ProtocolModel', object_id=protocol.id)
+            for protocol in protocols
+        ])
+        return protocols
+    
+    def test_revert_in_batches_with_progress(self):
+        """Test objects are deleted batch by batch and progress is reported"""
+        protocols = self._track_protocols(5)
+        progress = []
+        reverter = ImportReverter(
+            self.import_tracker, self.user, batch_size=2,
+            progress_callback=lambda value, message, status='processing': progress.append((value, status))
+        )
+        result = reverter.revert_import()
+        
+        self.assertTrue(result['success'])
+        self.assertEqual(result['stats']['objects_deleted'], 5)
+        self.assertFalse(ProtocolModel.objects.filter(id__in=[p.id for p in protocols]).exists())
+        self.assertEqual([value for value, _ in progress], [0, 39, 79, 99, 100])
+        self.assertEqual(progress[-1][1], 'completed')
+        
+        self.import_tracker.refresh_from_db()
+        self.assertNotIn('revert_progress', self.import_tracker.metadata)
+        self.assertFalse(self.import_tracker.can_revert)
+    
+    def test_interrupted_revert_resumes(self):
+        """Test a revert that failed half way continues from its checkpoint"""
+        self._track_protocols(3)
+        project = Project.objects.create(project_name='Test Project', owner=self.user)
+        ImportedObject.objects.create(import_tracker=self.import_tracker, model_name='Project', object_id=project.id)
+        
+        original = ImportReverter._delete_objects_of_model
+        
+        def fail_on_project(reverter, model_name, after_id=0):
+            if model_name == 'Project':
+                raise RuntimeError('worker stopped')
+            return original(reverter, model_name, after_id)
+        
+        with patch.object(ImportReverter, '_delete_objects_of_model', fail_on_project):
+            result = ImportReverter(self.import_tracker, self.user).revert_import()
+        self.assertFalse(result['success'])
+        self.assertTrue(result['resumable'])
+        self.assertEqual(ProtocolModel.objects.filter(user=self.user).count(), 0)
+        
+        self.import_tracker.refresh_from_db()
+        self.assertEqual(self.import_tracker.import_status, 'completed')
+        self.assertEqual(self.import_tracker.metadata['revert_progress']['completed_models'], ['ProtocolModel'])
+        
+        with patch.object(ImportReverter, '_delete_objects_of_model', side_effect=original, autospec=True) as delete:
+            result = ImportReverter(self.import_tracker, self.user).revert_import()
+        self.assertTrue(result['success'])
+        self.assertEqual([call.args[1] for call in delete.call_args_list], ['Project'])
+        self.assertEqual(result['stats']['objects_deleted'], 4)
+        self.assertFalse(Project.objects.filter(id=project.id).exists())
+    
+    def test_revert_can_suppress_history(self):
+        """Test deletion history rows are only skipped when asked to"""
+        kept, suppressed = self._track_protocols(2)
+        ImportedObject.objects.filter(object_id=suppressed.id).delete()
+        ImportReverter(self.import_tracker, self.user).revert_import()
+        self.assertTrue(ProtocolModel.history.filter(id=kept.id, history_type='-').exists())
+        
+        tracker = ImportTracker.objects.create(
+            import_id=uuid.uuid4(), user=self.user, archive_path='/path/to/archive.zip', import_status='completed'
+        )
+        ImportedObject.objects.create(import_tracker=tracker, model_name='ProtocolModel', object_id=suppressed.id)
+        ImportReverter(tracker, self.user, suppress_history=True).revert_import()
+        self.assertFalse(ProtocolModel.objects.filter(id=suppressed.id).exists())
+        self.assertFalse(ProtocolModel.history.filter(id=suppressed.id, history_type='-').exists())
+        self.assertTrue(getattr(settings, 'SIMPLE_HISTORY_ENABLED', True))
+    
+    def test_history_skipped_only_in_reverting_thread(self):
+        """Test skipping deletion history does not reach other threads of the worker"""
+        other_thread = []
+        with skip_deletion_history():
+            self.assertTrue(deletion_history_skipped())
+            thread = threading.Thread(target=lambda: other_thread.append(deletion_history_skipped()))
+            thread.start()
+            thread.join()
+        self.assertEqual(other_thread, [False])
+        self.assertFalse(deletion_history_skipped())
 
 
 class ImportManagementFunctionsTest(TestCase):
@@ -0,0 +1,121 @@
+"""
+Tests for the inbox entries of users and their cached unread counters
+"""
+from io import StringIO
+from unittest.mock import patch
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+
+from cc.models import InboxEntry, LabGroup, Message, MessageRecipient, MessageThread
+from cc.services import inbox, notifications
+
+
+@override_settings(
+    NOTIFICATIONS_ASYNC=False,
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+)
+class InboxTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        for target in ('cc.services.notifications.get_channel_layer', 'cc.services.notifications.async_to_sync'):
+            patcher = patch(target)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user('inbox_user', 'inbox@example.com', 'password')
+        self.other_user = User.objects.create_user('other_user', 'other@example.com', 'password')
+        self.lab_group = LabGroup.objects.create(name='Proteomics')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _thread(self, title, **fields):
+        return MessageThread.objects.create(title=title, **fields)
+
+    def _message(self, thread, audience, message_type='user_message'):
+        message = Message.objects.create(thread=thread, content=thread.title, message_type=message_type)
+        notifications.deliver(message, audience)
+        return message
+
+    def _listed(self, **params):
+        response = self.client.get('/api/message_threads/', params)
+        self.assertEqual(response.status_code, 200)
+        return {thread['title']: thread['unread_count'] for thread in response.data['results']}
+
+    def test_threads_the_user_can_see(self):
+        participant = self._thread('Participant')
+        participant.participants.add(self.user)
+        self._thread('Created', creator=self.user)
+        lab_group_thread = self._thread('Lab group', lab_group=self.lab_group)
+        self._thread('Other')
+        announcement = self._thread('Announcement', is_system_thread=True)
+        self._message(announcement, notifications.build_audience(everyone=True), message_type='announcement')
+        self._message(participant, notifications.build_audience(users=[self.user.id]))
+        self._message(participant, notifications.build_audience(users=[self.user.id]))
+
+        self.assertEqual(self._listed(), {'Participant': 2, 'Created': 0, 'Announcement': 1})
+        self.assertEqual(self._listed(unread='true'), {'Participant': 2, 'Announcement': 1})
+        self.assertEqual(self._listed(message_type='announcement'), {'Announcement': 1})
+
+        self.lab_group.users.add(self.user)
+        self.assertIn('Lab group', self._listed())
+        self.user.lab_groups.remove(self.lab_group)
+        self.assertNotIn('Lab group', self._listed())
+        self.assertFalse(InboxEntry.objects.filter(thread=lab_group_thread).exists())
+
+        newcomer = User.objects.create_user('newcomer', 'newcomer@example.com', 'password')
+        self.assertEqual(list(newcomer.inbox_entries.values_list('thread__title', flat=True)), ['Announcement'])
+
+    @override_settings(NOTIFICATIONS_ASYNC=True)
+    @patch('cc.rq_tasks.refresh_inbox_thread.delay')
+    def test_announcement_audience_refreshed_in_job(self, mock_delay):
+        from cc.rq_tasks import refresh_inbox_thread
+        announcement = self._thread('Announcement', is_system_thread=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            Message.objects.create(thread=announcement, content='Downtime', message_type='announcement')
+            announcement.save()
+        self.assertEqual([call.args for call in mock_delay.call_args_list], [(announcement.id,), (announcement.id,)])
+        self.assertFalse(InboxEntry.objects.filter(thread=announcement).exists())
+
+        refresh_inbox_thread(announcement.id)
+        self.assertEqual(
+            set(InboxEntry.objects.filter(thread=announcement).values_list('user_id', flat=True)),
+            {self.user.id, self.other_user.id}
+        )
+
+    def test_unread_counter_follows_reads(self):
+        thread = self._thread('Participant')
+        thread.participants.add(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self._message(thread, notifications.build_audience(users=[self.user.id]))
+            self._message(thread, notifications.build_audience(users=[self.user.id]))
+        self.assertEqual(self.client.get('/api/message_threads/unread_thread_count/').data, {'unread_count': 2})
+        with self.assertNumQueries(0):
+            self.assertEqual(inbox.unread_count(self.user.id), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post(f'/api/messages/{first.id}/mark_read/').status_code, 200)
+        self.assertEqual(cache.get(inbox.unread_key(self.user.id)), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/messages/{first.id}/mark_unread/')
+        self.assertEqual(cache.get(inbox.unread_key(self.user.id)), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/message_threads/{thread.id}/mark_all_read/')
+        self.assertEqual(cache.get(inbox.unread_key(self.user.id)), 0)
+        self.assertEqual(InboxEntry.objects.get(user=self.user, thread=thread).unread_count, 0)
+
+    def test_rebuild_command_reconciles(self):
+        thread = self._thread('Participant')
+        thread.participants.add(self.user)
+        self._message(thread, notifications.build_audience(users=[self.user.id]))
+        InboxEntry.objects.update(unread_count=5)
+        cache.set(inbox.unread_key(self.user.id), 5)
+
+        out = StringIO()
+        call_command('rebuild_inbox', '--user', str(self.user.id), stdout=out)
+        self.assertIn('Rebuilt 1 inbox entries of 1 users', out.getvalue())
+        self.assertEqual(inbox.unread_count(self.user.id), 1)
+        MessageRecipient.objects.filter(user=self.user).delete()
+        self.assertEqual(InboxEntry.objects.get(user=self.user).unread_count, 0)
@@ -0,0 +1,93 @@
+"""
+Tests for incremental exports applied on top of an earlier full import
+"""
+import json
+import tempfile
+import uuid
+from django.test import TransactionTestCase, override_settings
+from django.contrib.auth.models import User
+
+from cc.models import ExportWatermark, ProtocolModel, ProtocolStep, ProtocolSection, Session, Annotation
+from cc.utils.archive_reader import ArchiveReader, METADATA_MEMBER
+from cc.utils.user_data_export_revised import export_incremental_data
+from cc.utils.user_data_import_revised import import_user_data_revised
+
+
+class IncrementalExportTest(TransactionTestCase):
+
+    def setUp(self):
+        self.source_user = User.objects.create_user('incremental_source', 'source@example.com', 'password')
+        self.target_user = User.objects.create_user('incremental_target', 'target@example.com', 'password')
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+
+        self.protocol = ProtocolModel.objects.create(protocol_title='Digestion', user=self.source_user)
+        self.section = ProtocolSection.objects.create(protocol=self.protocol, section_description='Prepare')
+        self.step = ProtocolStep.objects.create(
+            protocol=self.protocol, step_section=self.section, step_description='Add trypsin', step_duration=60
+        )
+        self.obsolete_step = ProtocolStep.objects.create(
+            protocol=self.protocol, step_section=self.section, step_description='Wait', step_duration=30
+        )
+        self.session = Session.objects.create(user=self.source_user, unique_id=uuid.uuid4(), name='Run')
+        self.annotation = Annotation.objects.create(
+            session=self.session, step=self.step, annotation='Looks fine', annotation_type='text', user=self.source_user
+        )
+
+    def tearDown(self):
+        self.settings_override.disable()
+
+    def _export_and_import(self):
+        archive_path = export_incremental_data(self.source_user, export_dir=tempfile.mkdtemp())
+        result = import_user_data_revised(self.target_user, archive_path)
+        self.assertTrue(result['success'], result.get('error'))
+        with ArchiveReader(archive_path) as archive:
+            return json.loads(archive.read_member(METADATA_MEMBER)), result
+
+    def test_changes_applied_on_top_of_full_import(self):
+        metadata, _ = self._export_and_import()
+        self.assertEqual(metadata['export_mode'], 'complete')
+        imported_protocol = ProtocolModel.objects.get(user=self.target_user)
+        imported_step = ProtocolStep.objects.get(protocol=imported_protocol, step_description='Add trypsin')
+        imported_annotation = Annotation.objects.get(user=self.target_user)
+        watermark = ExportWatermark.objects.get(user=self.source_user, profile='default')
+        first_watermark = watermark.exported_until
+
+        # Change, add and delete at the source
+        self.step.step_description = 'Add trypsin 1:50'
+        self.step.save()
+        self.annotation.annotation = 'Looks degraded'
+        self.annotation.save()
+        ProtocolStep.objects.create(
+            protocol=self.protocol, step_section=self.section, step_description='Quench', step_duration=10
+        )
+        self.obsolete_step.delete()
+
+        metadata, result = self._export_and_import()
+        self.assertEqual(metadata['export_mode'], 'incremental')
+        self.assertEqual(metadata['tombstones'], 1)
+
+        # The objects of the first import were updated in place
+        self.assertEqual(ProtocolModel.objects.filter(user=self.target_user).count(), 1)
+        imported_step.refresh_from_db()
+        self.assertEqual(imported_step.step_description, 'Add trypsin 1:50')
+        imported_annotation.refresh_from_db()
+        self.assertEqual(imported_annotation.annotation, 'Looks degraded')
+        self.assertEqual(Annotation.objects.filter(user=self.target_user).count(), 1)
+
+        descriptions = set(ProtocolStep.objects.filter(protocol=imported_protocol).values_list('step_description', flat=True))
+        self.assertEqual(descriptions, {'Add trypsin 1:50', 'Quench'})
+        self.assertEqual(result['stats']['objects_deleted'], 1)
+
+        watermark.refresh_from_db()
+        self.assertGreater(watermark.exported_until, first_watermark)
+
+    def test_unchanged_incremental_export_is_empty(self):
+        self._export_and_import()
+        metadata, _ = self._export_and_import()
+        self.assertEqual(metadata['export_mode'], 'incremental')
+        self.assertEqual(metadata['tombstones'], 0)
+        self.assertEqual(ProtocolModel.objects.filter(user=self.target_user).count(), 1)
+        self.assertEqual(ProtocolStep.objects.filter(protocol__user=self.target_user).count(), 2)
+        self.assertEqual(Session.objects.filter(user=self.target_user).count(), 1)
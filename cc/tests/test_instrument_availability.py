@@ -0,0 +1,128 @@
+"""
+Tests for the instrument availability bitmaps and the free/busy endpoint
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+
+from cc.models import Instrument, InstrumentAvailabilityDay, InstrumentPermission, InstrumentUsage
+from cc.services import instrument_availability
+
+
+class AvailabilityTestMixin:
+    def setUp(self):
+        self.user = User.objects.create_user('availability_user', 'availability@example.com', 'password')
+        self.instrument = Instrument.objects.create(instrument_name='Orbitrap')
+        self.other_instrument = Instrument.objects.create(instrument_name='Timstof')
+        self.day = datetime(2030, 3, 4, tzinfo=dt_timezone.utc)
+
+    def _book(self, instrument, start_hours, end_hours):
+        return InstrumentUsage.objects.create(
+            instrument=instrument, user=self.user,
+            time_started=self.day + timedelta(hours=start_hours), time_ended=self.day + timedelta(hours=end_hours),
+        )
+
+    def _bitmap(self, instrument, day_offset=0):
+        return InstrumentAvailabilityDay.objects.get(
+            instrument=instrument, day=(self.day + timedelta(days=day_offset)).date()
+        ).bitmap
+
+
+@override_settings(INSTRUMENT_SLOT_MINUTES=60)
+class AvailabilityBitmapTest(AvailabilityTestMixin, TestCase):
+
+    def test_booking_marks_overlapped_slots(self):
+        """Test partially covered slots count as busy and bookings over midnight mark both days"""
+        self._book(self.instrument, 2.5, 4)
+        self.assertEqual(self._bitmap(self.instrument), 0b1100)
+        self._book(self.instrument, 23, 25)
+        self.assertEqual(self._bitmap(self.instrument), 0b1100 | 1 << 23)
+        self.assertEqual(self._bitmap(self.instrument, 1), 0b1)
+
+    def test_moving_and_deleting_bookings(self):
+        usage = self._book(self.instrument, 0, 2)
+        usage.time_started += timedelta(days=1)
+        usage.time_ended += timedelta(days=1)
+        usage.save()
+        self.assertEqual(self._bitmap(self.instrument), 0)
+        self.assertEqual(self._bitmap(self.instrument, 1), 0b11)
+
+        usage.delete()
+        self.assertFalse(InstrumentAvailabilityDay.objects.filter(instrument=self.instrument, day=usage.time_started.date()).exists())
+        bitmaps = instrument_availability.day_bitmaps([self.instrument.id], self.day.date(), (self.day + timedelta(days=1)).date())
+        self.assertEqual(bitmaps[self.instrument.id], {self.day.date(): 0, (self.day + timedelta(days=1)).date(): 0})
+
+    def test_missing_days_computed_once(self):
+        InstrumentUsage.objects.bulk_create([
+            InstrumentUsage(instrument=self.instrument, time_started=self.day, time_ended=self.day + timedelta(hours=1))
+        ])
+        first_day = self.day.date()
+        last_day = (self.day + timedelta(days=29)).date()
+        bitmaps = instrument_availability.day_bitmaps([self.instrument.id], first_day, last_day)
+        self.assertEqual(bitmaps[self.instrument.id][first_day], 0b1)
+        self.assertEqual(InstrumentAvailabilityDay.objects.filter(instrument=self.instrument).count(), 30)
+        with self.assertNumQueries(1):
+            instrument_availability.day_bitmaps([self.instrument.id], first_day, last_day)
+
+    def test_first_free_window_across_instruments(self):
+        """Test the earliest free window is found across days and instruments"""
+        self._book(self.instrument, 0, 30)
+        self._book(self.other_instrument, 0, 20)
+        self._book(self.other_instrument, 22, 40)
+        windows = instrument_availability.first_free_windows(
+            [self.instrument.id, self.other_instrument.id], timedelta(hours=3), self.day, self.day + timedelta(days=3)
+        )
+        self.assertEqual(
+            [(window['instrument'], window['time_started']) for window in windows],
+            [(self.instrument.id, self.day + timedelta(hours=30)), (self.other_instrument.id, self.day + timedelta(hours=40))],
+        )
+        self.assertEqual(windows[0]['time_ended'], self.day + timedelta(hours=33))
+
+    def test_window_respects_range(self):
+        self._book(self.instrument, 0, 22)
+        self.assertEqual(instrument_availability.first_free_windows(
+            [self.instrument.id], timedelta(hours=3), self.day, self.day + timedelta(hours=24)
+        ), [])
+        windows = instrument_availability.first_free_windows(
+            [self.instrument.id], timedelta(hours=1), self.day + timedelta(hours=22, minutes=30), self.day + timedelta(hours=24)
+        )
+        self.assertEqual(windows[0]['time_started'], self.day + timedelta(hours=23))
+
+
+@override_settings(INSTRUMENT_SLOT_MINUTES=60)
+class AvailabilityEndpointTest(AvailabilityTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        InstrumentPermission.objects.create(instrument=self.instrument, user=self.user, can_view=True)
+
+    def _get(self, **params):
+        return self.client.get('/api/instrument_usage/availability/', {
+            'instruments': f'{self.instrument.id},{self.other_instrument.id}',
+            'time_started': self.day.isoformat(), 'time_ended': (self.day + timedelta(days=2)).isoformat(), **params
+        })
+
+    def test_busy_slots_of_viewable_instruments(self):
+        self._book(self.instrument, 1, 2)
+        response = self._get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([entry['instrument'] for entry in response.data['instruments']], [self.instrument.id])
+        days = response.data['instruments'][0]['days']
+        self.assertEqual(len(days), 3)
+        self.assertEqual(days[0]['busy'], '01' + '0' * 22)
+
+    def test_first_free_window(self):
+        self._book(self.instrument, 0, 5)
+        response = self._get(duration_hours='2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['windows'][0]['time_started'], self.day + timedelta(hours=5))
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.client.get('/api/instrument_usage/availability/').status_code, 400)
+        self.assertEqual(self._get(duration_hours='long').status_code, 400)
+        self.assertEqual(self._get(time_ended=(self.day - timedelta(days=1)).isoformat()).status_code, 400)
+        self.assertEqual(self._get(instruments='1,abc').status_code, 400)
+        self.assertEqual(self._get(time_started='2024-13-45T00:00:00').status_code, 400)
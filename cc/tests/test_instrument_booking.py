@@ -0,0 +1,122 @@
+"""
+Tests for instrument booking overlap checks and recurring bookings
+"""
+from datetime import timedelta
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from cc.models import Instrument, InstrumentUsage
+from cc.services import instrument_booking
+
+
+class BookingTestMixin:
+    def setUp(self):
+        self.user = User.objects.create_user('booking_user', 'booking@example.com', 'password')
+        self.instrument = Instrument.objects.create(instrument_name='Orbitrap')
+        self.other_instrument = Instrument.objects.create(instrument_name='Timstof')
+        self.start = (timezone.now() + timedelta(days=2)).replace(microsecond=0)
+
+    def _book(self, instrument, start_hours, end_hours, **fields):
+        return InstrumentUsage.objects.create(
+            instrument=instrument, user=self.user,
+            time_started=self.start + timedelta(hours=start_hours),
+            time_ended=self.start + timedelta(hours=end_hours), **fields
+        )
+
+    def _interval(self, start_hours, end_hours):
+        return self.start + timedelta(hours=start_hours), self.start + timedelta(hours=end_hours)
+
+
+class FindConflictsTest(BookingTestMixin, TestCase):
+
+    def test_enclosing_booking_conflicts(self):
+        """Test a booking spanning the whole new interval is found"""
+        enclosing = self._book(self.instrument, 0, 10)
+        conflicts = instrument_booking.find_conflicts(self.instrument.id, [self._interval(2, 4)])
+        self.assertEqual(conflicts, [enclosing])
+
+    def test_other_instruments_and_adjacent_bookings_do_not_conflict(self):
+        self._book(self.other_instrument, 0, 10)
+        self._book(self.instrument, 0, 2)
+        self._book(self.instrument, 4, 6)
+        self.assertEqual(instrument_booking.find_conflicts(self.instrument.id, [self._interval(2, 4)]), [])
+
+    def test_excluded_booking(self):
+        usage = self._book(self.instrument, 0, 2)
+        self.assertEqual(
+            instrument_booking.find_conflicts(self.instrument.id, [self._interval(1, 3)], exclude_ids=[usage.id]), []
+        )
+
+    def test_series_checked_with_one_query(self):
+        """Test every interval of a series is matched against the bookings fetched in one query"""
+        between = self._book(self.instrument, 30, 40)
+        late = self._book(self.instrument, 24 * 8 + 1, 24 * 8 + 2)
+        series = instrument_booking.repeat_intervals(*self._interval(0, 4), 2, self.start + timedelta(days=7))
+        with self.assertNumQueries(1):
+            conflicts = instrument_booking.find_conflicts(self.instrument.id, series)
+        self.assertEqual(conflicts, [late])
+        self.assertNotIn(between, conflicts)
+
+    def test_overlapping_series_rejected(self):
+        with self.assertRaises(ValueError):
+            instrument_booking.find_conflicts(self.instrument.id, [self._interval(0, 4), self._interval(2, 6)])
+
+    def test_repeat_intervals(self):
+        series = instrument_booking.repeat_intervals(*self._interval(0, 4), 7, self.start + timedelta(days=20))
+        self.assertEqual([start - self.start for start, _ in series], [timedelta(days=days) for days in (0, 7, 14, 21)])
+        self.assertEqual(len(instrument_booking.repeat_intervals(*self._interval(0, 4), 0, None)), 1)
+
+
+class InstrumentUsageCreateTest(BookingTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user.is_staff = True
+        self.user.save()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _create(self, start_hours, end_hours, **data):
+        time_started, time_ended = self._interval(start_hours, end_hours)
+        return self.client.post('/api/instrument_usage/', {
+            'instrument': self.instrument.id, 'time_started': time_started.isoformat(),
+            'time_ended': time_ended.isoformat(), 'description': 'Booking', **data
+        }, format='json')
+
+    @override_settings(ALLOW_OVERLAP_BOOKINGS=False)
+    def test_conflicting_booking_rejected(self):
+        enclosing = self._book(self.instrument, 0, 10)
+        response = self._create(2, 4)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['conflicts'], [enclosing.id])
+
+        self._book(self.other_instrument, 10, 20)
+        self.assertEqual(self._create(10, 12).status_code, 201)
+
+    def test_recurring_maintenance_created_in_bulk(self):
+        repeat_until = self.start + timedelta(days=14)
+        response = self._create(0, 2, maintenance=True, repeat=7, repeat_until=repeat_until.isoformat())
+        self.assertEqual(response.status_code, 201)
+        usages = InstrumentUsage.objects.filter(instrument=self.instrument).order_by('time_started')
+        self.assertEqual(usages.count(), 3)
+        self.assertTrue(all(usage.maintenance and usage.approved for usage in usages))
+        self.assertEqual(response.data['id'], usages.last().id)
+        self.assertEqual(InstrumentUsage.history.filter(instrument=self.instrument).count(), 3)
+
+    @override_settings(ALLOW_OVERLAP_BOOKINGS=False)
+    def test_recurring_maintenance_shorter_than_booking_rejected(self):
+        repeat_until = self.start + timedelta(days=14)
+        response = self._create(0, 24 * 3, maintenance=True, repeat=2, repeat_until=repeat_until.isoformat())
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('repeat interval', response.data['error'])
+        self.assertFalse(InstrumentUsage.objects.filter(instrument=self.instrument).exists())
+
+    @override_settings(ALLOW_OVERLAP_BOOKINGS=False)
+    def test_recurring_maintenance_conflict_rejects_series(self):
+        self._book(self.instrument, 24 * 7, 24 * 7 + 1)
+        repeat_until = self.start + timedelta(days=14)
+        response = self._create(0, 2, maintenance=True, repeat=7, repeat_until=repeat_until.isoformat())
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(InstrumentUsage.objects.filter(instrument=self.instrument).count(), 1)
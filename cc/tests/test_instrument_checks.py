@@ -0,0 +1,97 @@
+"""
+Tests for the set based instrument warranty and maintenance checks
+"""
+from datetime import timedelta
+from unittest.mock import patch
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from cc.models import (
+    ExternalContact, ExternalContactDetails, Instrument, InstrumentPermission, MaintenanceLog, MessageRecipient,
+    MessageThread, SupportInformation,
+)
+from cc.services.instrument_checks import InstrumentChecker
+
+
+@override_settings(NOTIFICATIONS_ASYNC=False)
+class InstrumentCheckerTest(TestCase):
+
+    def setUp(self):
+        for target in ('cc.services.notifications.get_channel_layer', 'cc.services.notifications.async_to_sync'):
+            patcher = patch(target)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.manager = User.objects.create_user('instrument_manager', 'manager@example.com', 'password')
+        self.other_manager = User.objects.create_user('other_manager', 'other@example.com', 'password')
+        self.today = timezone.now().date()
+
+    def _instrument(self, name, warranty_days=None, maintenance_frequency_days=None, vendor_name=None):
+        instrument = Instrument.objects.create(instrument_name=name)
+        for manager in (self.manager, self.other_manager):
+            InstrumentPermission.objects.create(instrument=instrument, user=manager, can_manage=True)
+        support_info = SupportInformation.objects.create(
+            vendor_name=vendor_name,
+            warranty_end_date=self.today + timedelta(days=warranty_days) if warranty_days is not None else None,
+            maintenance_frequency_days=maintenance_frequency_days,
+        )
+        instrument.support_information.add(support_info)
+        return instrument, support_info
+
+    def test_warranty_notice_with_vendor_contacts(self):
+        instrument, support_info = self._instrument('Orbitrap', warranty_days=10, vendor_name='Thermo')
+        contact = ExternalContact.objects.create(contact_name='Service desk')
+        contact.contact_details.add(ExternalContactDetails.objects.create(
+            contact_method_alt_name='Support', contact_type='email', contact_value='support@example.com'
+        ))
+        support_info.vendor_contacts.add(contact)
+        self._instrument('Timstof', warranty_days=60)
+
+        self.assertEqual(InstrumentChecker(Instrument.objects.all(), warranty_days=30).check_warranties(), {instrument.id})
+        thread = MessageThread.objects.get()
+        self.assertEqual(thread.title, 'Warranty Expiration Alert - Orbitrap')
+        self.assertEqual(set(thread.participants.all()), {self.manager, self.other_manager})
+        content = thread.messages.get().content
+        self.assertIn('will expire in 10 days', content)
+        self.assertIn('email: support@example.com', content)
+        self.assertEqual(MessageRecipient.objects.filter(message__thread=thread).count(), 2)
+        instrument.refresh_from_db()
+        self.assertIsNotNone(instrument.last_warranty_notification_sent)
+
+    def test_maintenance_notices(self):
+        """Test maintenance is due after the last completed log, or initially when there is none"""
+        scheduled, _ = self._instrument('Orbitrap', maintenance_frequency_days=30)
+        MaintenanceLog.objects.create(instrument=scheduled, maintenance_date=timezone.now() - timedelta(days=40), status='completed')
+        MaintenanceLog.objects.create(instrument=scheduled, maintenance_date=timezone.now() - timedelta(days=25), status='completed')
+        MaintenanceLog.objects.create(instrument=scheduled, maintenance_date=timezone.now(), status='pending')
+        initial, _ = self._instrument('Timstof', maintenance_frequency_days=7)
+        not_due, _ = self._instrument('Exploris', maintenance_frequency_days=90)
+
+        notices = InstrumentChecker(Instrument.objects.all(), maintenance_days=14).maintenance_notices()
+        self.assertEqual(set(notices), {scheduled.id, initial.id})
+        self.assertIn('due for maintenance in 5', notices[scheduled.id][1])
+        self.assertEqual(notices[initial.id][0], 'Initial Maintenance Required - Timstof')
+
+    @override_settings(NOTIFICATIONS_ASYNC=True)
+    def test_queries_do_not_grow_with_instruments(self):
+        """Test the checks and the notices take the same queries for any number of instruments, delivery is queued"""
+        for n in range(2):
+            self._instrument(f'Instrument {n}', warranty_days=5, maintenance_frequency_days=7)
+        with self.assertNumQueries(14):
+            self.assertEqual(InstrumentChecker(Instrument.objects.all(), 30, 14).run(), (2, 2))
+
+        MessageThread.objects.all().delete()
+        Instrument.objects.update(last_warranty_notification_sent=None, last_maintenance_notification_sent=None)
+        for n in range(2, 10):
+            self._instrument(f'Instrument {n}', warranty_days=5, maintenance_frequency_days=7)
+        with self.assertNumQueries(14):
+            self.assertEqual(InstrumentChecker(Instrument.objects.all(), 30, 14).run(), (10, 10))
+        self.assertEqual(MessageThread.objects.count(), 20)
+
+    def test_recently_notified_instruments_skipped(self):
+        instrument, _ = self._instrument('Orbitrap', warranty_days=5)
+        self.assertTrue(instrument.check_warranty_expiration(30))
+        self.assertIsNotNone(instrument.last_warranty_notification_sent)
+        self.assertFalse(instrument.check_warranty_expiration(30))
+        self.assertEqual(Instrument.check_all_instruments(30), (0, 0))
+        self.assertEqual(MessageThread.objects.count(), 1)
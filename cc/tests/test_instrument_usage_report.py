@@ -0,0 +1,120 @@
+"""
+Tests for the streaming instrument usage report and the usage export job
+"""
+import csv
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest.mock import patch
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from openpyxl import load_workbook
+
+from cc.models import Annotation, Instrument, InstrumentJob, InstrumentUsage, LabGroup
+from cc.rq_tasks import export_instrument_usage
+from cc.utils.instrument_usage_report import HEADERS, InstrumentUsageReport
+
+
+class InstrumentUsageReportTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('report_user', 'report@example.com', 'password')
+        self.instrument = Instrument.objects.create(instrument_name='Orbitrap')
+        self.day = datetime(2030, 3, 4, tzinfo=dt_timezone.utc)
+
+    def _usage(self, start_hours, end_hours, **fields):
+        return InstrumentUsage.objects.create(
+            instrument=self.instrument, user=self.user,
+            time_started=self.day + timedelta(hours=start_hours), time_ended=self.day + timedelta(hours=end_hours), **fields
+        )
+
+    def _rows(self, report):
+        return [row for _, chunk in report.chunks() for row in chunk]
+
+    def test_durations_without_cutoff(self):
+        self._usage(0, 4)
+        self._usage(0, 50)
+        rows = self._rows(InstrumentUsageReport(InstrumentUsage.objects.all()))
+        self.assertEqual([row[4] for row in rows], [1, 3])
+        self.assertEqual(rows[0][:4], ['Orbitrap', 'report_user', '2030-03-04', '2030-03-04'])
+
+    def test_durations_clipped_to_period(self):
+        """Test the part of a usage within the period is added to its duration"""
+        self._usage(-48, 48)
+        self._usage(0, 24)
+        report = InstrumentUsageReport(
+            InstrumentUsage.objects.all(), self.day, self.day + timedelta(hours=24), calculate_duration_with_cutoff=True
+        )
+        self.assertEqual([row[4] for row in self._rows(report)], [6, 3])
+        report = InstrumentUsageReport(InstrumentUsage.objects.all(), self.day, None, calculate_duration_with_cutoff=True)
+        self.assertEqual([row[4] for row in self._rows(report)], [7, 3])
+
+    def test_chunk_queries_do_not_grow_with_rows(self):
+        jobs = []
+        for n in range(3):
+            annotation = Annotation.objects.create(annotation=f'Booking {n}', user=self.user)
+            self._usage(n * 24, n * 24 + 2, annotation=annotation)
+            job = InstrumentJob.objects.create(user=self.user, job_name=f'Job {n}')
+            job.staff_annotations.add(annotation)
+            jobs.append(job)
+        report = InstrumentUsageReport(InstrumentUsage.objects.all(), chunk_size=10)
+        with self.assertNumQueries(3):
+            rows = self._rows(report)
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[1][6], f'{jobs[1].submitted_at} Job 1 (report_user)')
+
+    def test_chunks_resume_after_id(self):
+        usages = [self._usage(n, n + 1) for n in range(5)]
+        chunks = list(InstrumentUsageReport(InstrumentUsage.objects.all(), chunk_size=2).chunks(usages[1].id))
+        self.assertEqual([last_id for last_id, _ in chunks], [usages[3].id, usages[4].id])
+
+
+@patch('cc.rq_tasks.async_to_sync')
+@patch('cc.rq_tasks.get_channel_layer')
+class InstrumentUsageExportTest(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.user = User.objects.create_user('export_user', 'export@example.com', 'password')
+        self.other_user = User.objects.create_user('other_user', 'other@example.com', 'password')
+        self.lab_group = LabGroup.objects.create(name='Lab')
+        self.lab_group.users.add(self.user)
+        self.instrument = Instrument.objects.create(instrument_name='Orbitrap')
+        self.day = datetime(2030, 3, 4, tzinfo=dt_timezone.utc)
+        for user in (self.user, self.other_user):
+            InstrumentUsage.objects.create(
+                instrument=self.instrument, user=user, approved=True, description=f'Run of {user.username}',
+                time_started=self.day, time_ended=self.day + timedelta(hours=4),
+            )
+        self.period = (
+            (self.day - timedelta(days=1)).strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+            (self.day + timedelta(days=1)).strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+        )
+
+    def tearDown(self):
+        self.settings_override.disable()
+
+    def _export(self, mode, file_format, lab_group_ids=()):
+        export_instrument_usage(
+            [self.instrument.id], list(lab_group_ids), [], mode, 'usage', self.period[0], self.period[1], file_format=file_format
+        )
+        exports = os.listdir(os.path.join(self.media_root, 'temp'))
+        self.assertEqual(len(exports), 1)
+        return os.path.join(self.media_root, 'temp', exports[0])
+
+    def test_xlsx_export(self, mock_channel, mock_async):
+        path = self._export('user', 'xlsx')
+        ws = load_workbook(path).active
+        rows = list(ws.values)
+        self.assertEqual(list(rows[0]), HEADERS)
+        self.assertEqual(list(rows[1][:5]), ['Orbitrap', 'export_user', '2030-03-04', '2030-03-04', 1])
+        self.assertEqual(rows[1][7:], (False, True))
+        self.assertEqual(ws.column_dimensions['F'].width, len('Run of export_user') + 2)
+
+    def test_lab_group_export(self, mock_channel, mock_async):
+        path = self._export('lab_group', 'tsv', [self.lab_group.id])
+        with open(path, newline='') as f:
+            rows = list(csv.reader(f, delimiter='\t'))
+        self.assertEqual([row[5] for row in rows[1:]], ['Run of export_user'])
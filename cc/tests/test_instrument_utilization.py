@@ -0,0 +1,126 @@
+"""
+Tests for the daily instrument utilization rollup and the utilization endpoint
+"""
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+
+from cc.models import Instrument, InstrumentPermission, InstrumentUsage, InstrumentUsageDay, LabGroup
+from cc.services import instrument_utilization
+
+
+class UtilizationTestMixin:
+    def setUp(self):
+        self.user = User.objects.create_user('utilization_user', 'utilization@example.com', 'password')
+        self.other_user = User.objects.create_user('other_user', 'other@example.com', 'password')
+        self.instrument = Instrument.objects.create(instrument_name='Orbitrap')
+        self.day = datetime(2030, 3, 4, tzinfo=dt_timezone.utc)
+
+    def _book(self, user, start_hours, end_hours, **fields):
+        return InstrumentUsage.objects.create(
+            instrument=self.instrument, user=user,
+            time_started=self.day + timedelta(hours=start_hours), time_ended=self.day + timedelta(hours=end_hours), **fields
+        )
+
+    def _hours(self, user, day_offset=0):
+        row = InstrumentUsageDay.objects.get(instrument=self.instrument, user=user, day=(self.day + timedelta(days=day_offset)).date())
+        return row.booked_hours, row.approved_hours, row.maintenance_hours
+
+
+class UtilizationRollupTest(UtilizationTestMixin, TestCase):
+
+    def test_bookings_split_at_midnight(self):
+        self._book(self.user, 20, 30, approved=True)
+        self.assertEqual(self._hours(self.user), (4, 4, 0))
+        self.assertEqual(self._hours(self.user, 1), (6, 6, 0))
+
+    def test_booking_kinds_per_user(self):
+        self._book(self.user, 0, 2)
+        self._book(self.user, 2, 3, approved=True)
+        self._book(self.user, 3, 5, maintenance=True, approved=True)
+        self._book(self.other_user, 0, 1)
+        self.assertEqual(self._hours(self.user), (3, 1, 2))
+        self.assertEqual(self._hours(self.other_user), (1, 0, 0))
+
+    def test_moving_reassigning_and_deleting_bookings(self):
+        usage = self._book(self.user, 0, 2)
+        usage.time_started += timedelta(days=1)
+        usage.time_ended += timedelta(days=1)
+        usage.user = self.other_user
+        usage.save()
+        self.assertFalse(InstrumentUsageDay.objects.filter(user=self.user).exists())
+        self.assertEqual(self._hours(self.other_user, 1), (2, 0, 0))
+
+        usage.delete()
+        self.assertFalse(InstrumentUsageDay.objects.exists())
+
+    def test_rebuild_command(self):
+        InstrumentUsage.objects.bulk_create([
+            InstrumentUsage(instrument=self.instrument, user=self.user, approved=True,
+                            time_started=self.day, time_ended=self.day + timedelta(hours=30)),
+        ])
+        self.assertFalse(InstrumentUsageDay.objects.exists())
+        out = StringIO()
+        call_command('rebuild_instrument_utilization', stdout=out)
+        self.assertIn('Rebuilt 2 daily utilization rows', out.getvalue())
+        self.assertEqual(self._hours(self.user, 1), (6, 6, 0))
+
+    def test_grouped_by_week_and_lab_group(self):
+        lab_group = LabGroup.objects.create(name='Proteomics')
+        lab_group.users.add(self.user, self.other_user)
+        self._book(self.user, 0, 2)
+        self._book(self.other_user, 24, 27)
+        self._book(self.user, 24 * 7, 24 * 7 + 1)
+        with self.assertNumQueries(1):
+            results = instrument_utilization.utilization(
+                [self.instrument.id], self.day.date(), (self.day + timedelta(days=13)).date(), 'week', 'lab_group'
+            )
+        self.assertEqual([(row['period'], row['lab_group_name'], row['booked_hours']) for row in results], [
+            ('2030-03-04', 'Proteomics', 5), ('2030-03-11', 'Proteomics', 1),
+        ])
+        with self.assertRaises(ValueError):
+            instrument_utilization.utilization([self.instrument.id], self.day.date(), self.day.date(), 'year')
+
+
+class UtilizationEndpointTest(UtilizationTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self._book(self.user, 0, 2)
+        self._book(self.other_user, 24 * 40, 24 * 40 + 1)
+
+    def _get(self, **params):
+        return self.client.get('/api/instrument/utilization/', {
+            'time_started': '2030-03-01', 'time_ended': '2030-04-30', **params
+        })
+
+    def test_managers_only(self):
+        self.assertEqual(self._get().status_code, 403)
+        InstrumentPermission.objects.create(instrument=self.instrument, user=self.user, can_view=True)
+        self.assertEqual(self._get().status_code, 403)
+
+    def test_monthly_hours_per_user(self):
+        InstrumentPermission.objects.create(instrument=self.instrument, user=self.user, can_manage=True)
+        response = self._get(period='month', group_by='user')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row['period'], row['username'], row['booked_hours']) for row in response.data['results']],
+            [('2030-03-01', 'utilization_user', 2), ('2030-04-01', 'other_user', 1)],
+        )
+        self.assertEqual(self._get(group_by='project').status_code, 400)
+        self.assertEqual(self._get(time_ended='2030-02-01').status_code, 400)
+        self.assertEqual(response.data['time_started'], date(2030, 3, 1))
+
+    def test_malformed_params(self):
+        InstrumentPermission.objects.create(instrument=self.instrument, user=self.user, can_manage=True)
+        response = self._get(instruments='a')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Invalid instruments')
+        self.assertEqual(self._get(time_started='2030-13-01').status_code, 400)
+        self.assertEqual(self._get(time_ended='not-a-date').status_code, 400)
+        self.assertEqual(self._get(time_started='2030-03-01', time_ended='2030-13-01').status_code, 400)
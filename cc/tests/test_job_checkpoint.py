@@ -0,0 +1,230 @@
+"""
+Tests for checkpointed jobs: JobCheckpointer and resuming exports, imports and usage exports
+"""
+import csv
+import os
+import sqlite3
+import tempfile
+import uuid
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+from django.core.files.base import ContentFile
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from cc.models import Annotation, ImportTracker, Instrument, InstrumentUsage, JobCheckpoint, JobCheckpointEntry, Session
+from cc.rq_tasks import export_instrument_usage
+from cc.utils.archive_reader import ArchiveReader, SQLITE_MEMBER
+from cc.utils.instrument_usage_report import InstrumentUsageReport
+from cc.utils.job_checkpoint import JobCheckpointer
+from cc.utils.user_data_export_revised import UserDataExporter, export_user_data_revised
+from cc.utils.user_data_import_revised import UserDataImporter, import_user_data_revised
+
+
+class WorkerStopped(BaseException):
+    """Stands in for a worker being stopped, job code does not catch it"""
+
+
+class JobCheckpointerTest(TestCase):
+
+    def test_in_memory_outside_of_a_job(self):
+        checkpoint = JobCheckpointer('export_data')
+        self.assertIsNone(checkpoint.job_id)
+        self.assertFalse(checkpoint.resumed)
+        checkpoint.complete_stage('schema', tables=1)
+        self.assertTrue(checkpoint.stage_done('schema'))
+        self.assertEqual(checkpoint.state['tables'], 1)
+        self.assertFalse(JobCheckpoint.objects.exists())
+
+    def test_resumes_saved_position(self):
+        checkpoint = JobCheckpointer('import_data', job_id='job-1')
+        checkpoint.complete_stage('protocols', mappings={'1': 2})
+        checkpoint.save('media_files', 'media', 10, copied_files={'a.png': 'annotations/a.png'})
+
+        resumed = JobCheckpointer('import_data', job_id='job-1')
+        self.assertTrue(resumed.resumed)
+        self.assertEqual(resumed.record.attempts, 2)
+        self.assertEqual((resumed.stage, resumed.table_name, resumed.offset), ('media_files', 'media', 10))
+        self.assertEqual(resumed.completed_stages, ['protocols'])
+        self.assertEqual(resumed.state['mappings'], {'1': 2})
+
+        resumed.finish()
+        self.assertFalse(JobCheckpoint.objects.exists())
+        self.assertFalse(JobCheckpointer('import_data', job_id='job-1').resumed)
+
+    def test_appended_entries(self):
+        for job_id in (None, 'job-1'):
+            checkpoint = JobCheckpointer('import_data', job_id=job_id)
+            checkpoint.append('id_mappings', {'protocols': {'1': 2}})
+            checkpoint.append('other', {})
+            checkpoint.append('id_mappings', {'protocols': {'1': None}})
+            self.assertEqual(checkpoint.entries('id_mappings'), [{'protocols': {'1': 2}}, {'protocols': {'1': None}}])
+        self.assertEqual(JobCheckpointer('import_data', job_id='job-1').entries('other'), [{}])
+        checkpoint.finish()
+        self.assertFalse(JobCheckpointEntry.objects.exists())
+        self.assertEqual(checkpoint.entries('id_mappings'), [])
+
+    def test_uses_current_rq_job(self):
+        with patch('cc.utils.job_checkpoint.get_current_job', return_value=MagicMock(id='rq-job')):
+            checkpoint = JobCheckpointer('export_data')
+        checkpoint.save('schema')
+        self.assertEqual(JobCheckpoint.objects.get().job_id, 'rq-job')
+
+
+class ResumeTestMixin:
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.export_user = User.objects.create_user('checkpoint_export_user', 'export@example.com', 'password')
+        session = Session.objects.create(user=self.export_user, unique_id=uuid.uuid4(), name='Run')
+        for name in ('Gel', 'Blot'):
+            annotation = Annotation.objects.create(
+                session=session, annotation=name, annotation_type='image', user=self.export_user
+            )
+            annotation.file.save(f'{name.lower()}.png', ContentFile(f'{name} image bytes'.encode()))
+
+    def tearDown(self):
+        self.settings_override.disable()
+
+
+class ExportResumeTest(ResumeTestMixin, TestCase):
+
+    def test_export_resumes_interrupted_stage(self):
+        """Test rows written by the interrupted stage are dropped and earlier stages are not run again"""
+        export_annotations = UserDataExporter._export_annotations_accurate
+
+        def stopped_export(exporter):
+            export_annotations(exporter)
+            exporter.conn.commit()
+            raise WorkerStopped()
+
+        export_dir = tempfile.mkdtemp()
+        with patch.object(UserDataExporter, '_export_annotations_accurate', stopped_export):
+            with self.assertRaises(WorkerStopped):
+                export_user_data_revised(self.export_user, export_dir, checkpoint=JobCheckpointer('export_data', 'job-1'))
+        self.assertEqual(JobCheckpoint.objects.get().stage, 'annotations')
+
+        with patch.object(UserDataExporter, '_export_protocols_accurate') as export_protocols:
+            archive_path = export_user_data_revised(
+                self.export_user, export_dir, checkpoint=JobCheckpointer('export_data', 'job-1')
+            )
+        export_protocols.assert_not_called()
+
+        database_path = os.path.join(tempfile.mkdtemp(), SQLITE_MEMBER)
+        with ArchiveReader(archive_path) as archive:
+            archive.extract_member(SQLITE_MEMBER, database_path)
+            media = sorted(os.path.basename(path) for path, _, _ in archive.iter_media())
+        with sqlite3.connect(database_path) as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM export_annotations").fetchone()[0], 2)
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM export_sessions").fetchone()[0], 1)
+        self.assertEqual(media, ['blot.png', 'gel.png'])
+
+
+class ImportResumeTest(ResumeTestMixin, TransactionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.archive_path = export_user_data_revised(self.export_user, tempfile.mkdtemp())
+        # Imported files land on the same relative path as the exported ones
+        for annotation in Annotation.objects.filter(user=self.export_user):
+            os.remove(annotation.file.path)
+        self.target_user = User.objects.create_user('checkpoint_import_user', 'import@example.com', 'password')
+
+    def test_import_resumes_after_committed_stages(self):
+        """Test a stopped import continues with its tracker and creates every object once"""
+        with patch.object(UserDataImporter, '_import_annotations_accurate', side_effect=WorkerStopped):
+            with self.assertRaises(WorkerStopped):
+                import_user_data_revised(
+                    self.target_user, self.archive_path, checkpoint=JobCheckpointer('import_data', 'job-1')
+                )
+        checkpoint = JobCheckpoint.objects.get()
+        self.assertIn('sessions', checkpoint.state['completed_stages'])
+        self.assertEqual(Session.objects.filter(user=self.target_user).count(), 1)
+        # Every stage appends only the id mappings it added
+        self.assertNotIn('id_mappings', checkpoint.state['import'])
+        sessions = [changes['sessions'] for changes in checkpoint.entries.values_list('data', flat=True) if 'sessions' in changes]
+        self.assertEqual(len(sessions), 1)
+        self.assertEqual(list(sessions[0].values()), [Session.objects.get(user=self.target_user).id])
+
+        result = import_user_data_revised(
+            self.target_user, self.archive_path, checkpoint=JobCheckpointer('import_data', 'job-1')
+        )
+        self.assertTrue(result['success'], result.get('error'))
+        self.assertEqual(Session.objects.filter(user=self.target_user).count(), 1)
+        annotations = Annotation.objects.filter(user=self.target_user)
+        self.assertEqual(annotations.count(), 2)
+        self.assertTrue(all(annotation.file for annotation in annotations))
+        self.assertEqual(ImportTracker.objects.get(user=self.target_user).import_status, 'completed')
+        self.assertFalse(JobCheckpoint.objects.exists())
+
+    def test_failing_stage_reverts_committed_stages(self):
+        with patch.object(UserDataImporter, '_import_annotations_accurate', side_effect=ValueError('broken row')):
+            result = import_user_data_revised(
+                self.target_user, self.archive_path, checkpoint=JobCheckpointer('import_data', 'job-1')
+            )
+        self.assertFalse(result['success'])
+        self.assertFalse(Session.objects.filter(user=self.target_user).exists())
+        self.assertFalse(JobCheckpoint.objects.exists())
+        tracker = ImportTracker.objects.get(user=self.target_user)
+        self.assertEqual(tracker.import_status, 'reverted')
+        self.assertTrue(tracker.metadata['import_failed'])
+
+
+@override_settings(JOB_CHECKPOINT_ROWS=2)
+@patch('cc.rq_tasks.async_to_sync')
+@patch('cc.rq_tasks.get_channel_layer')
+@patch('cc.utils.job_checkpoint.get_current_job', return_value=MagicMock(id='usage-job'))
+class InstrumentUsageResumeTest(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.user = User.objects.create_user('usage_export_user', 'usage@example.com', 'password')
+        self.instrument = Instrument.objects.create(instrument_name='Orbitrap')
+        start = timezone.now() - timedelta(days=10)
+        for day in range(5):
+            InstrumentUsage.objects.create(
+                instrument=self.instrument, user=self.user, approved=True, description=f'Run {day}',
+                time_started=start + timedelta(days=day), time_ended=start + timedelta(days=day, hours=4),
+            )
+        self.period = (
+            (start - timedelta(days=1)).strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+            timezone.now().strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+        )
+
+    def tearDown(self):
+        self.settings_override.disable()
+
+    def _export(self):
+        export_instrument_usage(
+            [self.instrument.id], [], [], 'user', 'usage', self.period[0], self.period[1], file_format='csv'
+        )
+
+    def test_resumes_after_last_checkpointed_chunk(self, mock_job, mock_channel, mock_async):
+        calls = []
+
+        associated_jobs = InstrumentUsageReport.associated_jobs
+
+        def stopped_chunk(annotation_ids):
+            calls.append(annotation_ids)
+            if len(calls) == 2:
+                raise WorkerStopped()
+            return associated_jobs(annotation_ids)
+
+        with patch.object(InstrumentUsageReport, 'associated_jobs', staticmethod(stopped_chunk)):
+            with self.assertRaises(WorkerStopped):
+                self._export()
+        self.assertEqual(JobCheckpoint.objects.get().table_name, 'instrument_usage')
+
+        self._export()
+        self.assertFalse(JobCheckpoint.objects.exists())
+        exports = os.listdir(os.path.join(self.media_root, 'temp'))
+        self.assertEqual(len(exports), 1)
+        self.assertTrue(exports[0].endswith('.csv'))
+        with open(os.path.join(self.media_root, 'temp', exports[0]), newline='') as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0][0], 'Instrument')
+        self.assertEqual([row[5] for row in rows[1:]], [f'Run {day}' for day in range(5)])
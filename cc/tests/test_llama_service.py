@@ -0,0 +1,144 @@
+"""
+Tests for the warm llama.cpp service: token coalescing and the summary tasks' server path
+"""
+import uuid
+from unittest.mock import patch, MagicMock
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from cc.models import Annotation, Session, ProcessingResultCache
+from cc.rq_tasks import llama_summary, llama_summary_transcript
+from cc.services.llama_service import TokenCoalescer, LlamaServer, LlamaServiceError
+
+
+class TokenCoalescerTest(TestCase):
+    def test_flushes_on_size(self):
+        """Test text is emitted once the character bound is reached"""
+        frames = []
+        coalescer = TokenCoalescer(frames.append, max_interval=3600, max_chars=5)
+        for token in ["ab", "cd", "ef", "g"]:
+            coalescer.add(token)
+        self.assertEqual(frames, ["abcdef"])
+        self.assertEqual(coalescer.take(), "g")
+        self.assertEqual(coalescer.frames_sent, 1)
+
+    def test_flushes_on_interval(self):
+        """Test every token is emitted when the interval has already elapsed"""
+        frames = []
+        coalescer = TokenCoalescer(frames.append, max_interval=0, max_chars=1000)
+        coalescer.add("a")
+        coalescer.add("b")
+        coalescer.add("")
+        self.assertEqual(frames, ["a", "b"])
+
+    def test_flush_without_buffer_emits_nothing(self):
+        frames = []
+        coalescer = TokenCoalescer(frames.append, max_interval=3600, max_chars=1000)
+        coalescer.flush()
+        self.assertEqual(frames, [])
+
+
+class LlamaServerTest(TestCase):
+    def test_command_sizes_context_for_all_slots(self):
+        server = LlamaServer("/bin/llama-server", "/models/m.gguf", "127.0.0.1", 8179, 4, 3, 2048)
+        command = server.command()
+        self.assertEqual(command[command.index("-np") + 1], "3")
+        self.assertEqual(command[command.index("-c") + 1], str(3 * 2048))
+
+    @patch('cc.services.llama_service.requests.post')
+    def test_complete_parses_event_stream(self, mock_post):
+        """Test streamed completion chunks are forwarded and joined"""
+        response = MagicMock(status_code=200)
+        response.iter_lines.return_value = [
+            'data: {"content": "Hello", "stop": false}',
+            '',
+            'data: {"content": " world", "stop": false}',
+            'data: {"content": "", "stop": true}',
+        ]
+        mock_post.return_value.__enter__.return_value = response
+        server = LlamaServer("/bin/llama-server", "/models/m.gguf", "127.0.0.1", 8179, 4, 2, 2048)
+
+        pieces = []
+        self.assertEqual(server.complete("prompt", pieces.append), "Hello world")
+        self.assertEqual(pieces, ["Hello", " world"])
+        self.assertTrue(mock_post.call_args.kwargs["json"]["cache_prompt"])
+
+
+@override_settings(LLAMA_STREAM_INTERVAL=3600, LLAMA_STREAM_MAX_CHARS=6)
+@patch('cc.rq_tasks.async_to_sync')
+@patch('cc.rq_tasks.get_channel_layer')
+class LlamaSummaryServerPathTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('testuser', 'test@example.com', 'password')
+
+    @staticmethod
+    def _service(tokens):
+        service = MagicMock()
+
+        def complete(prompt, on_text):
+            for token in tokens:
+                on_text(token)
+            return "".join(tokens)
+
+        service.complete.side_effect = complete
+        return service
+
+    def _messages(self, mock_async):
+        return [call.args[1]["message"] for call in mock_async.return_value.call_args_list]
+
+    @patch('cc.rq_tasks.subprocess.Popen')
+    @patch('cc.rq_tasks.get_llama_service')
+    def test_summary_streams_coalesced_frames(self, mock_service, mock_popen, mock_channel, mock_async):
+        """Test tokens from the server are sent in coalesced frames with a single finished message"""
+        mock_service.return_value = self._service(["The ", "summary ", "is ", "short", "."])
+        llama_summary("prompt", self.user.id, {"step": 1})
+
+        mock_popen.assert_not_called()
+        messages = self._messages(mock_async)
+        self.assertEqual([m["data"] for m in messages], ["The summary ", "is short", "."])
+        self.assertEqual([m["finished"] for m in messages], [False, False, True])
+        entry = ProcessingResultCache.objects.get(task_type="summary")
+        self.assertEqual(entry.result["summary"], "The summary is short.")
+
+    @patch('cc.rq_tasks.get_llama_service')
+    def test_transcript_summary_saves_full_text(self, mock_service, mock_channel, mock_async):
+        """Test the annotation summary holds the whole completion, not only the last frame"""
+        session = Session.objects.create(user=self.user, unique_id=uuid.uuid4(), name='Session')
+        annotation = Annotation.objects.create(session=session, annotation='Recording', annotation_type='audio')
+        mock_service.return_value = self._service(["Long ", "meeting ", "summary"])
+
+        llama_summary_transcript("prompt", self.user.id, {"annotation": annotation.id})
+
+        annotation.refresh_from_db()
+        self.assertEqual(annotation.summary, "Long meeting summary")
+        self.assertTrue(self._messages(mock_async)[-1]["finished"])
+
+    @patch('cc.rq_tasks._llama_cli_completion')
+    @patch('cc.rq_tasks.get_llama_service')
+    def test_falls_back_to_binary_on_server_error(self, mock_service, mock_cli, mock_channel, mock_async):
+        mock_service.return_value.complete.side_effect = LlamaServiceError("connection refused")
+        mock_cli.return_value = {"streamed": "", "final": "done", "summary": "done"}
+
+        llama_summary("prompt", self.user.id, {"step": 1})
+
+        mock_cli.assert_called_once()
+        self.assertEqual(self._messages(mock_async)[-1]["data"], "done")
+
+    @patch('cc.rq_tasks._llama_cli_completion')
+    @patch('cc.rq_tasks.get_llama_service')
+    def test_error_after_streaming_is_reported(self, mock_service, mock_cli, mock_channel, mock_async):
+        """Test a server failing mid stream ends the summary with an error instead of restarting on the binary"""
+        def complete(prompt, on_text):
+            for token in ["Partial ", "text ", "then", " more"]:
+                on_text(token)
+            raise LlamaServiceError("connection reset")
+
+        mock_service.return_value.complete.side_effect = complete
+
+        llama_summary("prompt", self.user.id, {"step": 1})
+
+        mock_cli.assert_not_called()
+        messages = self._messages(mock_async)
+        self.assertEqual([m["data"] for m in messages], ["Partial ", "text then", " more"])
+        self.assertTrue(messages[-1]["finished"])
+        self.assertIn("connection reset", messages[-1]["error"])
+        self.assertFalse(ProcessingResultCache.objects.exists())
@@ -0,0 +1,102 @@
+"""
+Tests for export media collection
+"""
+import os
+import tempfile
+import uuid
+from unittest.mock import patch
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+
+from cc.models import Session, Annotation
+from cc.utils.archive_reader import ArchiveReader
+from cc.utils.media_collector import MediaCollector, link_or_copy
+from cc.utils.user_data_export_revised import UserDataExporter
+
+
+class LinkOrCopyTest(TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.source = os.path.join(self.work_dir, 'source.bin')
+        with open(self.source, 'wb') as f:
+            f.write(b'recording')
+
+    def test_hardlink_on_same_filesystem(self):
+        destination = os.path.join(self.work_dir, 'staged', 'source.bin')
+        self.assertEqual(link_or_copy(self.source, destination), 'hardlink')
+        self.assertEqual(os.stat(destination).st_ino, os.stat(self.source).st_ino)
+
+    def test_falls_back_to_copy(self):
+        destination = os.path.join(self.work_dir, 'copy.bin')
+        with patch('cc.utils.media_collector.os.link', side_effect=OSError), \
+                patch('cc.utils.media_collector.reflink', return_value=False):
+            self.assertEqual(link_or_copy(self.source, destination), 'copy')
+        self.assertNotEqual(os.stat(destination).st_ino, os.stat(self.source).st_ino)
+        with open(destination, 'rb') as f:
+            self.assertEqual(f.read(), b'recording')
+
+
+class MediaCollectorTest(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.media_root, 'annotations'))
+        for name, size in (('a.png', 10), ('b.webm', 30)):
+            with open(os.path.join(self.media_root, 'annotations', name), 'wb') as f:
+                f.write(b'x' * size)
+
+    def _collector(self, progress=None):
+        collector = MediaCollector(workers=2, progress_callback=progress)
+        for name in ('a.png', 'a.png', 'b.webm', 'missing.m4a'):
+            relative_path = os.path.join('annotations', name)
+            collector.add(os.path.join(self.media_root, relative_path), relative_path)
+        return collector
+
+    def test_resolve_deduplicates_and_drops_missing(self):
+        collector = self._collector()
+        self.assertEqual(collector.resolve(), (2, 40))
+        self.assertEqual(collector.duplicate_references, 1)
+        self.assertEqual(collector.missing, [os.path.join('annotations', 'missing.m4a')])
+
+    def test_stage_reports_bytes(self):
+        progress = []
+        collector = self._collector(lambda done, total: progress.append((done, total)))
+        collector.resolve()
+        destination = tempfile.mkdtemp()
+        self.assertEqual(collector.stage(destination), {'hardlink': 2})
+        self.assertTrue(os.path.exists(os.path.join(destination, 'annotations', 'b.webm')))
+        self.assertEqual(progress, [(10, 40), (40, 40)])
+
+
+class ExporterMediaTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('media_export_user', 'export@example.com', 'password')
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        session = Session.objects.create(user=self.user, unique_id=uuid.uuid4(), name='Run')
+        first = Annotation.objects.create(session=session, annotation='Gel', annotation_type='image', user=self.user)
+        first.file.save('gel.png', ContentFile(b'gel image bytes'))
+        # A second annotation sharing the same stored file
+        Annotation.objects.create(
+            session=session, annotation='Gel copy', annotation_type='image', user=self.user, file=first.file.name
+        )
+
+    def tearDown(self):
+        self.settings_override.disable()
+
+    def test_shared_file_archived_once_with_byte_progress(self):
+        progress = []
+        exporter = UserDataExporter(
+            self.user, tempfile.mkdtemp(), 'zip', lambda value, message, status='processing': progress.append((value, message))
+        )
+        archive_path = exporter.export_user_data()
+
+        self.assertEqual(exporter.stats['files_copied'], 1)
+        self.assertEqual(exporter.stats['media_bytes'], len(b'gel image bytes'))
+        with ArchiveReader(archive_path) as archive:
+            self.assertEqual(len(list(archive.media_sizes())), 1)
+        self.assertIn((99, 'Archived 0.0 of 0.0 MB of media'), progress)
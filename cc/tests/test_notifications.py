@@ -0,0 +1,92 @@
+"""
+Tests for delivering messages to their audience
+"""
+from unittest.mock import patch
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+
+from cc.models import InboxEntry, LabGroup, Message, MessageRecipient, MessageThread
+from cc.rq_tasks import deliver_notifications
+from cc.services import notifications
+
+
+@override_settings(NOTIFICATIONS_ASYNC=False, NOTIFICATION_BATCH_SIZE=2)
+class DeliverTest(TestCase):
+
+    def setUp(self):
+        async_to_sync = patch('cc.services.notifications.async_to_sync')
+        self.group_send = async_to_sync.start().return_value
+        self.addCleanup(async_to_sync.stop)
+        patcher = patch('cc.services.notifications.get_channel_layer')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.users = [User.objects.create_user(f'user_{n}', f'user_{n}@example.com', 'password') for n in range(5)]
+        User.objects.create_user('inactive', 'inactive@example.com', 'password', is_active=False)
+        self.lab_group = LabGroup.objects.create(name='Proteomics')
+        self.lab_group.users.add(*self.users[2:5])
+        self.thread = MessageThread.objects.create(title='Notice', is_system_thread=True)
+        self.message = Message.objects.create(thread=self.thread, content='Hello', message_type='system_notification')
+
+    def _sent_groups(self):
+        return [call.args[0] for call in self.group_send.call_args_list]
+
+    def test_users_and_lab_groups(self):
+        """Test recipients are written in batches, the thread inbox is refreshed and each audience group gets one event"""
+        audience = notifications.build_audience(users=[self.users[0].id, self.users[2].id], lab_groups=[self.lab_group.id])
+        with self.assertNumQueries(12):
+            count = notifications.deliver(self.message, audience, read_by=self.users[0].id)
+        self.assertEqual(count, 4)
+        self.assertEqual(
+            set(MessageRecipient.objects.filter(message=self.message).values_list('user_id', 'is_read')),
+            {(self.users[0].id, True), (self.users[2].id, False), (self.users[3].id, False), (self.users[4].id, False)},
+        )
+        self.assertEqual(set(self.thread.participants.all()), {self.users[0], self.users[2]})
+        self.assertEqual(
+            set(InboxEntry.objects.filter(thread=self.thread).values_list('user_id', 'unread_count')),
+            {(self.users[0].id, 0), (self.users[2].id, 1)},
+        )
+        self.assertEqual(self._sent_groups(), [
+            f'lab_group_{self.lab_group.id}_notifications',
+            f'user_{self.users[0].id}_notifications',
+            f'user_{self.users[2].id}_notifications',
+        ])
+        self.assertEqual(self.group_send.call_args.args[1]['message']['message_id'], self.message.id)
+
+        notifications.deliver(self.message, audience)
+        self.assertEqual(MessageRecipient.objects.filter(message=self.message).count(), 4)
+
+    def test_everyone(self):
+        notifications.deliver(self.message, notifications.build_audience(everyone=True))
+        self.assertEqual(MessageRecipient.objects.filter(message=self.message).count(), 5)
+        self.assertFalse(self.thread.participants.exists())
+        self.assertEqual(self._sent_groups(), [notifications.EVERYONE_GROUP])
+
+    @override_settings(NOTIFICATIONS_ASYNC=True)
+    def test_delivery_queued_after_commit(self):
+        audience = notifications.build_audience(users=[self.users[1].id])
+        with patch('cc.rq_tasks.deliver_notifications.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                notifications.notify(self.message, audience)
+                delay.assert_not_called()
+        delay.assert_called_once_with([(self.message.id, audience, None)])
+        self.assertFalse(MessageRecipient.objects.exists())
+
+        deliver_notifications([(self.message.id, audience, None), (self.message.id + 100, audience, None)])
+        self.assertEqual(list(MessageRecipient.objects.values_list('user_id', flat=True)), [self.users[1].id])
+
+    def test_staff_announcement_reaches_everyone(self):
+        staff = self.users[0]
+        staff.is_staff = True
+        staff.save()
+        self.thread.participants.add(staff)
+        client = APIClient()
+        client.force_authenticate(user=staff)
+        response = client.post('/api/messages/', {
+            'thread': self.thread.id, 'content': 'Maintenance window', 'message_type': 'announcement'
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        recipients = MessageRecipient.objects.filter(message_id=response.data['id'])
+        self.assertEqual(recipients.count(), 5)
+        self.assertTrue(recipients.get(user=staff).is_read)
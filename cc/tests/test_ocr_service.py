@@ -0,0 +1,122 @@
+"""
+Tests for the batched OCR pipeline: image preprocessing, batch recognition and the ocr_annotations job
+"""
+import base64
+import io
+import json
+import tempfile
+import uuid
+from unittest.mock import patch
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from PIL import Image
+from cc.models import Annotation, Session, ProcessingResultCache
+from cc.rq_tasks import ocr_annotations
+from cc.services.ocr_service import preprocess_image, otsu_threshold, read_image_bytes, OCRBatch, OCRServiceError
+
+
+def _png_bytes(size=(40, 20), color=(0, 0, 0, 255), mode="RGBA"):
+    image = Image.new(mode, size, (0, 0, 0, 0) if mode == "RGBA" else (255, 255, 255))
+    image.paste(color, (0, 0, size[0] // 2, size[1]))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class PreprocessImageTest(TestCase):
+    def test_flattens_transparency_onto_white(self):
+        """Test transparent pixels become white and drawn pixels black after binarization"""
+        image = Image.open(io.BytesIO(_png_bytes()))
+        processed = preprocess_image(image, max_dimension=0, binarize=True)
+        self.assertEqual(processed.mode, "1")
+        self.assertEqual(processed.getpixel((30, 10)), 255)
+        self.assertEqual(processed.getpixel((5, 10)), 0)
+
+    def test_downsamples_large_images(self):
+        image = Image.new("RGB", (4000, 1000), (255, 255, 255))
+        processed = preprocess_image(image, max_dimension=1000, binarize=False)
+        self.assertEqual(processed.size, (1000, 250))
+        self.assertEqual(processed.mode, "L")
+
+    def test_otsu_threshold_separates_two_levels(self):
+        image = Image.new("L", (10, 10), 40)
+        image.paste(220, (0, 0, 5, 10))
+        self.assertTrue(40 <= otsu_threshold(image) < 220)
+
+    def test_read_sketch_image_bytes(self):
+        """Test the rendered PNG is taken from the sketch JSON document"""
+        png = _png_bytes()
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            json.dump({"png": "data:image/png;base64," + base64.b64encode(png).decode()}, f)
+        self.assertEqual(read_image_bytes(f.name, "sketch"), png)
+        with self.assertRaises(OCRServiceError):
+            read_image_bytes(f.name + ".missing", "sketch")
+
+
+class OCRBatchTest(TestCase):
+    @patch('cc.services.ocr_service.pytesseract.image_to_string', return_value="text")
+    def test_collects_results_and_errors(self, mock_ocr):
+        items = [
+            {"id": 1, "image_bytes": _png_bytes()},
+            {"id": 2, "path": "/missing/file.png", "annotation_type": "image"},
+        ]
+        texts, errors, stats = OCRBatch(workers=1).recognize(items)
+        self.assertEqual(texts, {1: "text"})
+        self.assertIn(2, errors)
+        self.assertEqual(stats["recognized"], 1)
+        self.assertEqual(stats["failed"], 1)
+
+
+@override_settings(OCR_WORKERS=1)
+@patch('cc.rq_tasks.async_to_sync')
+@patch('cc.rq_tasks.get_channel_layer')
+class OCRAnnotationsJobTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('testuser', 'test@example.com', 'password')
+        self.session = Session.objects.create(user=self.user, unique_id=uuid.uuid4(), name='Session')
+        self.settings_override = override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+
+    def _create_image_annotation(self, content):
+        annotation = Annotation.objects.create(session=self.session, annotation='Image', annotation_type='image', user=self.user)
+        annotation.file.save('image.png', ContentFile(content))
+        return annotation
+
+    @patch('cc.services.ocr_service.pytesseract.image_to_string', return_value="recognized")
+    def test_batch_updates_annotations_and_notifies_once(self, mock_ocr, mock_channel, mock_async):
+        """Test a batch is written back together and announced with one message per session"""
+        annotations = [self._create_image_annotation(_png_bytes(size=(40 + n, 20))) for n in range(3)]
+
+        stats = ocr_annotations([a.id for a in annotations], self.user.id, "instance")
+
+        self.assertEqual(stats["recognized"], 3)
+        for annotation in annotations:
+            annotation.refresh_from_db()
+            self.assertTrue(annotation.transcribed)
+            self.assertEqual(annotation.transcription, "recognized")
+            self.assertEqual(annotation.history.first().transcription, "recognized")
+        self.assertEqual(ProcessingResultCache.objects.filter(task_type="ocr").count(), 3)
+
+        groups = [call.args[0] for call in mock_async.return_value.call_args_list]
+        self.assertEqual(groups, [f"transcription_{self.session.unique_id}", f"user_{self.user.id}"])
+        session_message = mock_async.return_value.call_args_list[0].args[1]["message"]
+        self.assertEqual(len(session_message["annotations"]), 3)
+
+    @patch('cc.services.ocr_service.pytesseract.image_to_string', return_value="recognized")
+    def test_identical_images_use_cache(self, mock_ocr, mock_channel, mock_async):
+        """Test an image recognized in a previous batch is not passed to tesseract again"""
+        content = _png_bytes()
+        first = self._create_image_annotation(content)
+        ocr_annotations([first.id])
+        second = self._create_image_annotation(content)
+
+        stats = ocr_annotations([second.id])
+
+        self.assertEqual(mock_ocr.call_count, 1)
+        self.assertEqual(stats["cached"], 1)
+        second.refresh_from_db()
+        self.assertEqual(second.transcription, "recognized")
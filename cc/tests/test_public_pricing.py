@@ -0,0 +1,90 @@
+"""
+Tests for the public pricing snapshot, its entity tags and quotes computed from it
+"""
+from decimal import Decimal
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from cc.billing_services import PricingManager, PricingSnapshot
+from cc.models import Instrument, LabGroup, ServicePrice, ServiceTier
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class PricingSnapshotTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        PricingSnapshot._current = None
+        self.addCleanup(setattr, PricingSnapshot, '_current', None)
+        self.client = APIClient()
+        self.lab_group = LabGroup.objects.create(name='Proteomics Core', is_core_facility=True)
+        self.tier = ServiceTier.objects.create(name='Academic', lab_group=self.lab_group)
+        self.instrument = Instrument.objects.create(instrument_name='Orbitrap')
+        self.sample_price = ServicePrice.objects.create(
+            service_tier=self.tier, instrument=self.instrument, price=Decimal('20.00'), billing_unit='per_sample'
+        )
+        ServicePrice.objects.create(
+            service_tier=self.tier, instrument=self.instrument, price=Decimal('80.00'), billing_unit='per_hour_instrument'
+        )
+
+    def _display(self, **headers):
+        return self.client.get('/api/public_pricing/pricing_display/', {'lab_group_id': self.lab_group.id}, **headers)
+
+    def test_snapshot_served_from_memory_with_etag(self):
+        response = self._display()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['pricing_display']['instruments'][0]['price_range']['max_price'], Decimal('80.00'))
+        etag = response['ETag']
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        with self.assertNumQueries(0):
+            response = self._display(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/public_pricing/quote_form_config/').status_code, 200)
+        self.assertEqual(self._display(HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+        self.assertEqual(self.client.get('/api/public_pricing/pricing_display/', {'lab_group_id': 'x'}).status_code, 404)
+
+    def test_price_changes_start_a_new_version(self):
+        etag = self._display()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            PricingManager(self.lab_group).bulk_update_prices([{'id': self.sample_price.id, 'price': Decimal('25.00')}])
+        response = self._display(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        pricing = response.data['pricing_display']['service_tiers'][0]['instruments'][0]['pricing']
+        self.assertEqual([price['price'] for price in pricing], [Decimal('80.00'), Decimal('25.00')])
+
+        PricingSnapshot._current = None
+        with self.assertNumQueries(0):
+            self.assertEqual(self._display(HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_quotes_from_snapshot(self):
+        PricingSnapshot.current()
+        with self.assertNumQueries(0):
+            response = self.client.post('/api/public_pricing/generate_quote/', {
+                'service_tier_id': self.tier.id, 'instrument_id': self.instrument.id,
+                'samples': 3, 'estimated_instrument_hours': 1.5,
+            }, format='json')
+        self.assertTrue(response.data['success'])
+        self.assertEqual(
+            [(item['billing_unit'], item['total_price']) for item in response.data['quote']['line_items']],
+            [('per_sample', Decimal('60.00')), ('per_hour_instrument', Decimal('120.00'))],
+        )
+        self.assertEqual(response.data['quote']['total'], Decimal('180.00'))
+        self.assertEqual(self.client.post('/api/public_pricing/generate_quote/', {
+            'service_tier_id': self.tier.id + 100, 'instrument_id': self.instrument.id
+        }, format='json').status_code, 404)
+
+    def test_pricing_options_of_enabled_instruments(self):
+        params = {'instrument_id': self.instrument.id, 'service_tier_id': self.tier.id}
+        response = self.client.get('/api/public_pricing/pricing_options/', params)
+        self.assertEqual(
+            [option['billing_unit'] for option in response.data['pricing_options']['pricing_options']],
+            ['per_hour_instrument', 'per_sample'],
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.instrument.enabled = False
+            self.instrument.save()
+        self.assertEqual(self.client.get('/api/public_pricing/pricing_options/', params).status_code, 404)
@@ -0,0 +1,171 @@
+"""
+Tests for the content-hash result cache: ProcessingResultCache and the cache-aware enqueue helpers
+"""
+import base64
+import tempfile
+import uuid
+from unittest.mock import patch
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from rest_framework.test import APIClient
+from cc.models import Annotation, Session, ProcessingResultCache
+from cc.rq_tasks import enqueue_transcription, enqueue_ocr, enqueue_summary, ocr_annotations, transcribe_audio
+from cc.services import result_cache
+from cc.services.ocr_service import image_content_hash
+
+
+class ProcessingResultCacheModelTest(TestCase):
+    def test_cache_key_depends_on_configuration(self):
+        """Test the key changes with model, language and parameters but not with dict ordering"""
+        key = ProcessingResultCache.build_key('transcription', 'abc', 'ggml-medium.bin', 'auto', {'a': 1, 'b': 2})
+        self.assertEqual(key, ProcessingResultCache.build_key('transcription', 'abc', 'ggml-medium.bin', 'auto', {'b': 2, 'a': 1}))
+        self.assertNotEqual(key, ProcessingResultCache.build_key('transcription', 'abc', 'ggml-small.bin', 'auto', {'a': 1, 'b': 2}))
+        self.assertNotEqual(key, ProcessingResultCache.build_key('transcription', 'abc', 'ggml-medium.bin', 'de', {'a': 1, 'b': 2}))
+
+    def test_store_and_lookup(self):
+        """Test stored results are returned and hits are counted"""
+        ProcessingResultCache.store('ocr', 'hash1', {'text': 'hello'}, model_name='tesseract')
+        entry = ProcessingResultCache.lookup('ocr', 'hash1', model_name='tesseract')
+        self.assertEqual(entry.result, {'text': 'hello'})
+        entry.refresh_from_db()
+        self.assertEqual(entry.hit_count, 1)
+        self.assertIsNone(ProcessingResultCache.lookup('ocr', 'hash2', model_name='tesseract'))
+
+    @override_settings(PROCESSING_CACHE_MAX_ENTRIES=2)
+    def test_evicts_least_recently_used_entries(self):
+        """Test the entry bound evicts the least recently accessed results"""
+        ProcessingResultCache.store('ocr', 'first', {'text': '1'})
+        ProcessingResultCache.store('ocr', 'second', {'text': '2'})
+        ProcessingResultCache.lookup('ocr', 'first')
+        ProcessingResultCache.store('ocr', 'third', {'text': '3'})
+
+        self.assertEqual(ProcessingResultCache.objects.count(), 2)
+        self.assertFalse(ProcessingResultCache.objects.filter(content_hash='second').exists())
+
+    def test_evicts_by_size(self):
+        """Test the byte bound evicts until the cache fits"""
+        for n in range(5):
+            ProcessingResultCache.store('summary', f'hash{n}', {'final': 'x' * 100})
+        evicted = ProcessingResultCache.evict(max_bytes=250, max_entries=100)
+        self.assertEqual(evicted, 3)
+        self.assertEqual(ProcessingResultCache.objects.count(), 2)
+
+
+@patch('cc.rq_tasks.async_to_sync')
+@patch('cc.rq_tasks.get_channel_layer')
+class CacheAwareEnqueueTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('testuser', 'test@example.com', 'password')
+        self.session = Session.objects.create(user=self.user, unique_id=uuid.uuid4(), name='Session')
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+
+    def _create_audio_annotation(self):
+        annotation = Annotation.objects.create(
+            session=self.session, annotation='Recording', annotation_type='audio', user=self.user
+        )
+        annotation.file.save('recording.webm', ContentFile(b'same audio bytes'))
+        return annotation
+
+    def _store_transcription(self, annotation):
+        from django.conf import settings
+        result_cache.store(
+            "transcription",
+            result_cache.hash_file(annotation.file.path),
+            result_cache.transcription_cache_args(settings.WHISPERCPP_DEFAULT_MODEL, "auto", True),
+            {"transcription": "WEBVTT\n", "translation": None, "language": "en"},
+            annotation,
+        )
+
+    @patch('cc.rq_tasks.transcribe_audio.delay')
+    def test_miss_enqueues_with_stored_hash(self, mock_delay, mock_channel, mock_async):
+        """Test the media is hashed once and the stored hash is handed to the job"""
+        annotation = self._create_audio_annotation()
+        with patch('cc.services.result_cache.hash_file', wraps=result_cache.hash_file) as mock_hash:
+            self.assertFalse(enqueue_transcription(annotation, "auto", True))
+            self.assertFalse(enqueue_transcription(Annotation.objects.get(id=annotation.id), "de", True))
+        mock_hash.assert_called_once()
+        content_hash = Annotation.objects.get(id=annotation.id).content_hash
+        self.assertEqual(content_hash, result_cache.hash_file(annotation.file.path))
+        self.assertEqual([call.args[-1] for call in mock_delay.call_args_list], [content_hash, content_hash])
+
+    @patch('cc.rq_tasks.transcribe_audio.delay')
+    def test_duplicate_media_is_served_without_a_job(self, mock_delay, mock_channel, mock_async):
+        """Test a second annotation with identical media is answered from the cache before enqueueing unless forced"""
+        self._store_transcription(self._create_audio_annotation())
+
+        duplicate = self._create_audio_annotation()
+        self.assertTrue(enqueue_transcription(duplicate, "auto", True))
+        mock_delay.assert_not_called()
+        duplicate.refresh_from_db()
+        self.assertTrue(duplicate.transcribed)
+        self.assertEqual(duplicate.transcription, "WEBVTT\n")
+        self.assertEqual(duplicate.language, "en")
+
+        self.assertFalse(enqueue_transcription(duplicate, "auto", True, use_cache=False))
+        mock_delay.assert_called_once()
+
+    @patch('cc.rq_tasks.transcribe_audio.delay')
+    def test_retranscribe_uses_cache_unless_forced(self, mock_delay, mock_channel, mock_async):
+        annotation = self._create_audio_annotation()
+        self._store_transcription(annotation)
+        self.user.is_staff = True
+        self.user.save()
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        self.assertEqual(client.post(f'/api/annotation/{annotation.id}/retranscribe/').status_code, 200)
+        mock_delay.assert_not_called()
+        self.assertEqual(client.post(f'/api/annotation/{annotation.id}/retranscribe/?force=true').status_code, 200)
+        mock_delay.assert_called_once()
+
+    @patch('cc.rq_tasks._create_transcription_stream')
+    def test_job_stores_result_under_given_hash(self, mock_stream, mock_channel, mock_async):
+        from django.conf import settings
+        annotation = self._create_audio_annotation()
+        result = {"language": "en", "transcription": "WEBVTT\n", "translation": None, "stats": {}}
+        with patch('cc.rq_tasks.get_transcription_service') as mock_service:
+            mock_service.return_value.transcribe.return_value = result
+            transcribe_audio(annotation.file.path, settings.WHISPERCPP_DEFAULT_MODEL, annotation.id, "auto", True, None, "media-hash")
+        self.assertTrue(ProcessingResultCache.objects.filter(task_type="transcription", content_hash="media-hash").exists())
+
+    @patch('cc.rq_tasks.OCRBatch')
+    def test_ocr_cache_hit(self, mock_batch, mock_channel, mock_async):
+        """Test OCR of an already recognized image is answered from the cache without a job"""
+        mock_batch.return_value.recognize.return_value = ({}, {}, {})
+        annotation = Annotation.objects.create(session=self.session, annotation='Sketch', annotation_type='sketch')
+        annotation.file.save('sketch.json', ContentFile(b'{"png": "data:image/png;base64,AAAA"}'))
+        result_cache.store("ocr", image_content_hash(base64.b64decode("AAAA")), result_cache.ocr_cache_args(), {"text": "label"})
+
+        with patch('cc.rq_tasks.ocr_annotations.delay') as mock_delay:
+            self.assertTrue(enqueue_ocr(annotation))
+        mock_delay.assert_not_called()
+        annotation.refresh_from_db()
+        self.assertEqual(annotation.transcription, "label")
+        self.assertEqual(annotation.content_hash, image_content_hash(base64.b64decode("AAAA")))
+
+        self.assertEqual(ocr_annotations([annotation.id])["cached"], 1)
+        mock_batch.return_value.recognize.assert_called_once_with([])
+
+    @patch('cc.rq_tasks.llama_summary.delay')
+    def test_summary_cache_hit_replays_completion(self, mock_delay, mock_channel, mock_async):
+        """Test a repeated prompt replays the stored completion without using the llama queue"""
+        result_cache.store("summary", result_cache.hash_text("prompt"), result_cache.summary_cache_args(),
+                           {"streamed": "Summary ", "final": "text"})
+
+        self.assertTrue(enqueue_summary("prompt", self.user.id, {"step": 1}))
+        mock_delay.assert_not_called()
+        messages = [call.args[1]["message"] for call in mock_async.return_value.call_args_list]
+        self.assertEqual([m["data"] for m in messages], ["Summary ", "text"])
+        self.assertTrue(messages[-1]["finished"])
+
+    @patch('cc.rq_tasks.llama_summary.delay')
+    def test_summary_cache_miss_enqueues(self, mock_delay, mock_channel, mock_async):
+        """Test an unseen prompt is enqueued"""
+        self.assertFalse(enqueue_summary("new prompt", self.user.id, {"step": 1}))
+        mock_delay.assert_called_once()
@@ -0,0 +1,194 @@
+"""
+Tests for the debounced timer notifications
+"""
+import uuid
+from unittest.mock import AsyncMock, patch
+from asgiref.sync import async_to_sync
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+
+from cc.models import ProtocolModel, ProtocolStep, Session, TimeKeeper
+from cc.services import timer_notifications
+from cc.services.notifications import session_group, user_group
+from cupcake.consumers import NotificationConsumer, get_notification_groups
+
+
+class TimerNotificationTest(TestCase):
+
+    def setUp(self):
+        async_to_sync = patch('cc.services.timer_notifications.async_to_sync')
+        self.group_send = async_to_sync.start().return_value
+        self.addCleanup(async_to_sync.stop)
+        patcher = patch('cc.services.timer_notifications.get_channel_layer')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        thread = patch('cc.services.timer_notifications.threading.Thread')
+        self.thread = thread.start()
+        self.addCleanup(thread.stop)
+        publisher = patch.object(timer_notifications, 'publisher', timer_notifications.TimerPublisher())
+        publisher.start()
+        self.addCleanup(publisher.stop)
+
+        self.user = User.objects.create_user('timer_user', 'timer@example.com', 'password')
+        self.editor = User.objects.create_user('editor', 'editor@example.com', 'password')
+        self.session = Session.objects.create(unique_id=uuid.uuid4(), user=self.user, name='Digestion')
+        self.session.editors.add(self.editor)
+        protocol = ProtocolModel.objects.create(protocol_title='Digestion protocol', user=self.user)
+        self.step = ProtocolStep.objects.create(protocol=protocol, step_description='Add trypsin')
+
+    def _sent(self):
+        return [(call.args[0], call.args[1]['message']) for call in self.group_send.call_args_list]
+
+    def test_saves_coalesced_by_timer(self):
+        """Test the latest change of every timer is sent once to its session group at the next flush"""
+        with self.captureOnCommitCallbacks(execute=True):
+            timer = TimeKeeper.objects.create(session=self.session, step=self.step, user=self.user, current_duration=0)
+        for duration in (5, 10, 15):
+            timer.current_duration = duration
+            with self.captureOnCommitCallbacks(execute=True):
+                timer.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            TimeKeeper.objects.create(user=self.user, started=True)
+        self.group_send.assert_not_called()
+        self.thread.assert_called_once()
+
+        self.assertEqual(timer_notifications.publisher.flush(), 2)
+        (group, notification), (user_timer_group, user_timer_notification) = self._sent()
+        self.assertEqual(group, session_group(self.session.unique_id))
+        self.assertEqual(notification['action'], 'started')
+        self.assertEqual(notification['current_duration'], 15)
+        self.assertEqual(notification['session_id'], str(self.session.unique_id))
+        self.assertEqual(notification['step_description'], 'Add trypsin')
+        self.assertEqual(user_timer_group, user_group(self.user.id))
+        self.assertEqual(user_timer_notification['title'], 'Timer Started: Session Timer')
+        self.assertEqual(timer_notifications.publisher.flush(), 0)
+
+    @override_settings(TIMER_NOTIFICATIONS_ASYNC=False)
+    def test_sent_to_user_outside_the_session(self):
+        outsider = User.objects.create_user('outsider', 'outsider@example.com', 'password')
+        with self.captureOnCommitCallbacks(execute=True):
+            TimeKeeper.objects.create(session=self.session, user=outsider)
+        self.assertEqual(
+            [group for group, _ in self._sent()], [session_group(self.session.unique_id), user_group(outsider.id)]
+        )
+
+    def test_published_only_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            TimeKeeper.objects.create(session=self.session, user=self.user)
+        self.assertEqual(timer_notifications.publisher.flush(), 0)
+
+    def test_audience_resolved_at_flush(self):
+        """Test saves only hand the timer id to the publisher, the audience is looked up when it flushes"""
+        outsider = User.objects.create_user('outsider', 'outsider@example.com', 'password')
+        with self.captureOnCommitCallbacks(execute=False):
+            timer = TimeKeeper.objects.create(session=self.session, user=outsider)
+            deleted = TimeKeeper.objects.create(session=self.session, user=outsider)
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(0):
+            timer_notifications.notify(timer)
+            timer_notifications.notify(deleted)
+        self.session.viewers.add(outsider)
+        deleted.delete()
+
+        self.assertEqual(timer_notifications.publisher.flush(), 1)
+        self.assertEqual([group for group, _ in self._sent()], [session_group(self.session.unique_id)])
+
+    @override_settings(TIMER_NOTIFICATIONS_ASYNC=False)
+    def test_sent_after_commit_without_publisher(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            timer = TimeKeeper.objects.create(session=self.session, step=self.step, user=self.user)
+        self.thread.assert_not_called()
+        [(group, notification)] = self._sent()
+        self.assertEqual(group, session_group(self.session.unique_id))
+        self.assertEqual((notification['action'], notification['timer_id']), ('started', timer.id))
+
+    def test_session_groups_joined(self):
+        """Test only the followed sessions with a running timer are joined on connect"""
+        other = Session.objects.create(unique_id=uuid.uuid4(), user=self.user)
+        other.viewers.add(self.editor)
+        unfollowed = Session.objects.create(unique_id=uuid.uuid4(), user=self.user)
+        with self.captureOnCommitCallbacks(execute=False):
+            TimeKeeper.objects.create(session=other, user=self.user, started=True)
+            TimeKeeper.objects.create(session=self.session, user=self.user, started=False)
+            TimeKeeper.objects.create(session=unfollowed, user=self.user, started=True)
+        groups = get_notification_groups.func(self.editor)
+        self.assertEqual(
+            [group for group in groups if group.startswith('session_')], [session_group(other.unique_id)]
+        )
+
+
+class SessionGroupTest(TestCase):
+
+    def setUp(self):
+        for target in ('cc.services.notifications.get_channel_layer', 'cc.services.notifications.async_to_sync'):
+            patcher = patch(target)
+            mock = patcher.start()
+            self.addCleanup(patcher.stop)
+        self.group_send = mock.return_value
+        self.user = User.objects.create_user('session_owner', 'owner@example.com', 'password')
+        self.viewer = User.objects.create_user('viewer', 'viewer@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _events(self):
+        return [(call.args[0], call.args[1]['type']) for call in self.group_send.call_args_list]
+
+    def _role(self, action, role):
+        return self.client.post(f'/api/session/{self.session.unique_id}/{action}/', {'user': 'viewer', 'role': role}, format='json')
+
+    def test_sockets_follow_session_sharing(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/session/', {}, format='json')
+        self.session = Session.objects.get(unique_id=response.data['unique_id'])
+        self.assertEqual(self._events(), [(user_group(self.user.id), 'session_group_join')])
+        self.assertEqual(self.group_send.call_args.args[1]['group'], session_group(self.session.unique_id))
+
+        self.group_send.reset_mock()
+        with self.captureOnCommitCallbacks(execute=True):
+            self._role('add_user_role', 'viewer')
+            self._role('add_user_role', 'editor')
+            self._role('remove_user_role', 'viewer')
+        self.assertEqual(self._events(), [(user_group(self.viewer.id), 'session_group_join')] * 2)
+
+        self.group_send.reset_mock()
+        with self.captureOnCommitCallbacks(execute=True):
+            self._role('remove_user_role', 'editor')
+        self.assertEqual(self._events(), [(user_group(self.viewer.id), 'session_group_leave')])
+
+    def test_consumer_joins_and_leaves_session_group(self):
+        consumer = NotificationConsumer()
+        consumer.channel_name = 'notification-channel'
+        consumer.channel_layer = AsyncMock()
+        consumer.notification_groups = [user_group(self.viewer.id)]
+        event = {'group': session_group(uuid.uuid4())}
+        async_to_sync(consumer.session_group_join)(event)
+        async_to_sync(consumer.session_group_join)(event)
+        self.assertEqual(consumer.notification_groups, [user_group(self.viewer.id), event['group']])
+        consumer.channel_layer.group_add.assert_awaited_once_with(event['group'], 'notification-channel')
+
+        async_to_sync(consumer.session_group_leave)(event)
+        self.assertEqual(consumer.notification_groups, [user_group(self.viewer.id)])
+        consumer.channel_layer.group_discard.assert_awaited_once_with(event['group'], 'notification-channel')
+
+    def test_consumer_subscribes_to_opened_sessions(self):
+        session = Session.objects.create(unique_id=uuid.uuid4(), user=self.user)
+        private = Session.objects.create(unique_id=uuid.uuid4(), user=self.user, enabled=False)
+        session.viewers.add(self.viewer)
+        consumer = NotificationConsumer()
+        consumer.channel_name = 'notification-channel'
+        consumer.channel_layer = AsyncMock()
+        consumer.scope = {'user': self.viewer}
+        consumer.user_id = str(self.viewer.id)
+        consumer.notification_groups = [user_group(self.viewer.id)]
+        consumer.send_json = AsyncMock()
+
+        for session_id in (private.unique_id, 'not-a-session'):
+            async_to_sync(consumer.receive_json)({'type': 'subscribe_session', 'session_id': str(session_id)})
+        self.assertEqual(consumer.notification_groups, [user_group(self.viewer.id)])
+        self.assertEqual(consumer.send_json.await_count, 2)
+
+        async_to_sync(consumer.receive_json)({'type': 'subscribe_session', 'session_id': str(session.unique_id)})
+        self.assertEqual(consumer.notification_groups, [user_group(self.viewer.id), session_group(session.unique_id)])
+        async_to_sync(consumer.receive_json)({'type': 'unsubscribe_session', 'session_id': str(session.unique_id)})
+        self.assertEqual(consumer.notification_groups, [user_group(self.viewer.id)])
+        consumer.channel_layer.group_send.assert_not_awaited()
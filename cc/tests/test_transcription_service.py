@@ -0,0 +1,233 @@
+"""
+Tests for the persistent whisper.cpp transcription service
+"""
+import uuid
+import wave
+import io
+from unittest.mock import patch, MagicMock
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from cc.models import Annotation, Session, TranscriptionCheckpoint
+from cc.rq_tasks import _create_transcription_stream
+from cc.services.transcription_service import (
+    TranscriptionService, TranscriptionStream, WhisperServer, get_transcription_service,
+    segments_to_vtt, format_vtt_timestamp, normalize_language, pcm_to_wav, pcm_duration,
+    parse_segment_line
+)
+
+
+class TranscriptionHelpersTest(TestCase):
+    def test_format_vtt_timestamp(self):
+        """Test VTT timestamps match whisper.cpp formatting"""
+        self.assertEqual(format_vtt_timestamp(0), "00:00:00.000")
+        self.assertEqual(format_vtt_timestamp(3725.5), "01:02:05.500")
+
+    def test_segments_to_vtt(self):
+        """Test whisper segments are rendered as WebVTT cues"""
+        vtt = segments_to_vtt([
+            {"start": 0.0, "end": 2.5, "text": " Hello"},
+            {"start": 2.5, "end": 4.0, "text": " world"},
+        ])
+        self.assertTrue(vtt.startswith("WEBVTT\n\n"))
+        self.assertIn("00:00:00.000 --> 00:00:02.500\nHello\n", vtt)
+        self.assertIn("00:00:02.500 --> 00:00:04.000\nworld\n", vtt)
+
+    def test_parse_segment_line(self):
+        """Test whisper-cli segment output is parsed into seconds"""
+        segment = parse_segment_line("[00:01:02.500 --> 00:01:04.000]   Add the buffer\n")
+        self.assertEqual(segment, {"start": 62.5, "end": 64.0, "text": "Add the buffer"})
+        self.assertIsNone(parse_segment_line("whisper_init_from_file: loading model"))
+
+    def test_normalize_language(self):
+        """Test whisper language names are converted to codes"""
+        self.assertEqual(normalize_language("english"), "en")
+        self.assertEqual(normalize_language("German"), "de")
+        self.assertEqual(normalize_language("fr"), "fr")
+        self.assertIsNone(normalize_language(None))
+
+    def test_pcm_to_wav(self):
+        """Test PCM samples are wrapped in a 16 kHz mono WAV container"""
+        pcm = b"\x00\x00" * 16000
+        self.assertEqual(pcm_duration(pcm), 1.0)
+        with wave.open(io.BytesIO(pcm_to_wav(pcm)), "rb") as wav_file:
+            self.assertEqual(wav_file.getframerate(), 16000)
+            self.assertEqual(wav_file.getnchannels(), 1)
+            self.assertEqual(wav_file.getnframes(), 16000)
+
+
+class TranscriptionStreamTest(TestCase):
+    def test_stream_throttles_publish_and_checkpoint(self):
+        """Test segments are batched until the interval elapses or the stream is flushed"""
+        published = []
+        checkpoints = []
+        stream = TranscriptionStream(
+            lambda stream, segments: published.append(list(segments)),
+            lambda stream: checkpoints.append(list(stream.segments)),
+            interval=3600,
+        )
+        stream.add({"start": 0.0, "end": 1.0, "text": "one"})
+        stream.add({"start": 1.0, "end": 2.0, "text": "two"})
+        self.assertEqual(published, [])
+
+        stream.flush()
+        self.assertEqual(len(published), 1)
+        self.assertEqual(len(published[0]), 2)
+        self.assertEqual(len(checkpoints[0]), 2)
+        self.assertEqual(stream.offset_seconds, 2.0)
+
+        stream.flush()
+        self.assertEqual(len(published), 1)
+
+    def test_stream_publishes_every_segment_without_interval(self):
+        """Test a zero interval pushes each segment immediately"""
+        published = []
+        stream = TranscriptionStream(lambda stream, segments: published.append(segments), lambda stream: None, interval=0)
+        stream.add({"start": 0.0, "end": 1.0, "text": "one"})
+        stream.add({"start": 1.0, "end": 2.0, "text": "two"})
+        self.assertEqual(len(published), 2)
+
+
+class TranscriptionCheckpointTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('testuser', 'test@example.com', 'password')
+        self.session = Session.objects.create(user=self.user, unique_id=uuid.uuid4(), name='Recording Session')
+        self.annotation = Annotation.objects.create(
+            session=self.session, annotation='Recording', annotation_type='audio', user=self.user
+        )
+
+    @patch('cc.rq_tasks.async_to_sync')
+    @patch('cc.rq_tasks.get_channel_layer')
+    def test_stream_checkpoint_is_resumed(self, mock_channel, mock_async):
+        """Test a new job resumes from the segments saved by an interrupted one"""
+        stream = _create_transcription_stream(self.annotation, "auto")
+        stream.language = "de"
+        stream.add({"start": 0.0, "end": 4.5, "text": "Hallo"})
+        stream.flush()
+
+        message = mock_async.return_value.call_args.args[1]["message"]
+        self.assertTrue(message["partial"])
+        self.assertEqual(message["segments"][0]["text"], "Hallo")
+
+        checkpoint = TranscriptionCheckpoint.objects.get(annotation=self.annotation)
+        self.assertEqual(checkpoint.offset_seconds, 4.5)
+        self.assertEqual(checkpoint.detected_language, "de")
+
+        stream.add_translation([{"start": 0.0, "end": 4.5, "text": "Hello"}])
+        resumed = _create_transcription_stream(self.annotation, "auto")
+        self.assertEqual(resumed.offset_seconds, 4.5)
+        self.assertEqual(resumed.translation_offset_seconds, 4.5)
+        self.assertEqual(resumed.language, "de")
+
+    @patch('cc.rq_tasks.async_to_sync')
+    @patch('cc.rq_tasks.get_channel_layer')
+    def test_checkpoint_reset_for_different_language(self, mock_channel, mock_async):
+        """Test a job requested with another language starts from the beginning"""
+        stream = _create_transcription_stream(self.annotation, "auto")
+        stream.add({"start": 0.0, "end": 4.5, "text": "Hallo"})
+        stream.flush()
+
+        restarted = _create_transcription_stream(self.annotation, "en")
+        self.assertEqual(restarted.offset_seconds, 0.0)
+        self.assertEqual(restarted.language, "en")
+
+
+class TranscriptionServiceTest(TestCase):
+    def setUp(self):
+        self.server = MagicMock(spec=WhisperServer)
+        self.service = TranscriptionService(self.server)
+
+    @patch('cc.services.transcription_service.decode_audio_to_pcm')
+    def test_transcribe_and_translate_reuse_decoded_audio(self, mock_decode):
+        """Test transcript and translation share one decode and report real-time factor"""
+        mock_decode.return_value = b"\x00\x00" * 16000 * 10
+        self.server.infer.side_effect = [
+            {"detected_language": "german", "segments": [{"start": 0, "end": 1, "text": " Hallo"}]},
+            {"segments": [{"start": 0, "end": 1, "text": " Hello"}]},
+        ]
+
+        result = self.service.transcribe("/tmp/audio.webm", "auto", True)
+
+        mock_decode.assert_called_once_with("/tmp/audio.webm")
+        self.assertEqual(self.server.infer.call_count, 2)
+        self.assertTrue(self.server.infer.call_args.kwargs["translate"])
+        self.assertEqual(result["language"], "de")
+        self.assertIn("Hallo", result["transcription"])
+        self.assertIn("Hello", result["translation"])
+        self.assertEqual(result["stats"]["audio_seconds"], 10.0)
+        self.assertTrue(result["stats"]["translated"])
+
+    @override_settings(WHISPERCPP_SERVER_CHUNK_SECONDS=5)
+    @patch('cc.services.transcription_service.decode_audio_to_pcm')
+    def test_transcribe_resumes_from_stream_offset(self, mock_decode):
+        """Test audio before the checkpoint is skipped and chunk timestamps are shifted"""
+        mock_decode.return_value = b"\x00\x00" * 16000 * 12
+        self.server.infer.return_value = {"segments": [{"start": 0.0, "end": 1.0, "text": " next"}]}
+        stream = TranscriptionStream(
+            lambda stream, segments: None, lambda stream: None, 0,
+            segments=[{"start": 0.0, "end": 6.0, "text": "done"}], language="en"
+        )
+
+        result = self.service.transcribe("/tmp/audio.webm", "auto", False, stream)
+
+        self.assertEqual(self.server.infer.call_count, 2)
+        self.assertEqual(stream.segments[1], {"start": 6.0, "end": 7.0, "text": "next"})
+        self.assertEqual(stream.segments[2], {"start": 11.0, "end": 12.0, "text": "next"})
+        self.assertIn("done", result["transcription"])
+        self.assertEqual(result["language"], "en")
+
+    @override_settings(WHISPERCPP_SERVER_CHUNK_SECONDS=5)
+    @patch('cc.services.transcription_service.decode_audio_to_pcm')
+    def test_translation_checkpointed_and_resumed(self, mock_decode):
+        """Test translated windows are checkpointed and a resumed job translates only what is left"""
+        mock_decode.return_value = b"\x00\x00" * 16000 * 10
+        self.server.infer.return_value = {"segments": [{"start": 0.0, "end": 5.0, "text": " rest"}]}
+        checkpoints = []
+        stream = TranscriptionStream(
+            lambda stream, segments: None, lambda stream: checkpoints.append(list(stream.translated_segments)), 0,
+            segments=[{"start": 0.0, "end": 10.0, "text": "Hallo"}], language="de",
+            translated_segments=[{"start": 0.0, "end": 5.0, "text": "Hello"}],
+        )
+
+        result = self.service.transcribe("/tmp/audio.webm", "auto", True, stream)
+
+        self.server.infer.assert_called_once()
+        self.assertTrue(self.server.infer.call_args.kwargs["translate"])
+        self.assertEqual(stream.translated_segments[1], {"start": 5.0, "end": 10.0, "text": "rest"})
+        self.assertEqual(len(checkpoints[-1]), 2)
+        self.assertIn("Hello", result["translation"])
+        self.assertIn("rest", result["translation"])
+
+    @patch('cc.services.transcription_service.decode_audio_to_pcm')
+    def test_english_audio_is_not_translated(self, mock_decode):
+        """Test translation pass is skipped for English audio"""
+        mock_decode.return_value = b"\x00\x00" * 16000
+        self.server.infer.return_value = {"language": "english", "segments": []}
+
+        result = self.service.transcribe("/tmp/audio.webm", "auto", True)
+
+        self.server.infer.assert_called_once()
+        self.assertIsNone(result["translation"])
+        self.assertFalse(result["stats"]["translated"])
+
+    @override_settings(WHISPERCPP_USE_SERVER=False)
+    def test_service_disabled_falls_back(self):
+        """Test no service is returned when the persistent server is disabled"""
+        self.assertIsNone(get_transcription_service("/models/ggml-medium.bin"))
+
+    @override_settings(WHISPERCPP_USE_SERVER=True, WHISPERCPP_SERVER_PATH="/nonexistent/whisper-server")
+    def test_missing_server_binary_falls_back(self):
+        """Test no service is returned when the server binary is missing"""
+        from django.conf import settings
+        self.assertIsNone(get_transcription_service(settings.WHISPERCPP_DEFAULT_MODEL))
+
+    @patch('cc.services.managed_server.requests.get')
+    def test_server_ready_only_on_health(self, mock_get):
+        """Test only a 200 from the health endpoint counts as a ready server"""
+        server = WhisperServer("/bin/whisper-server", "/models/ggml-medium.bin", "127.0.0.1", 8178, "4")
+        mock_get.return_value = MagicMock(status_code=404)
+        self.assertFalse(server.is_running())
+        mock_get.return_value = MagicMock(status_code=503)
+        self.assertFalse(server.is_running())
+        mock_get.return_value = MagicMock(status_code=200)
+        self.assertTrue(server.is_running())
+        self.assertEqual(mock_get.call_args.args[0], "http://127.0.0.1:8178/health")
@@ -0,0 +1,210 @@
+"""
+Member-level access to user data export archives
+
+Exports are ZIP or TAR(.GZ) archives holding user_data.sqlite, export_metadata.json
+and the annotation files under media/. ArchiveReader reads single members out of
+the archive without extracting the rest, so an import only needs disk space for
+the SQLite database and media can be streamed straight to its final location.
+"""
+
+import os
+import shutil
+import tarfile
+import zipfile
+from typing import IO, Iterator, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+SQLITE_MEMBER = 'user_data.sqlite'
+METADATA_MEMBER = 'export_metadata.json'
+MEDIA_PREFIX = 'media/'
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+
+def detect_archive_format(file_path: str) -> str:
+    """Detect archive format from the file name, falling back to the file contents"""
+    if file_path.lower().endswith('.zip'):
+        return 'zip'
+    if file_path.lower().endswith(('.tar.gz', '.tgz')):
+        return 'tar.gz'
+    if file_path.lower().endswith('.tar'):
+        return 'tar'
+    if file_path.lower().endswith(('.tar.zst', '.tzst')):
+        return 'tar.zst'
+    if zipfile.is_zipfile(file_path):
+        return 'zip'
+    magic = _read_magic(file_path)
+    if magic.startswith(ZSTD_MAGIC):
+        return 'tar.zst'
+    if tarfile.is_tarfile(file_path):
+        return 'tar.gz' if magic.startswith(b'\x1f\x8b') else 'tar'
+    raise ValueError(f"Cannot determine archive format for file: {file_path}")
+
+
+def _read_magic(file_path: str) -> bytes:
+    with open(file_path, 'rb') as f:
+        return f.read(4)
+
+
+def normalize_member_name(name: str) -> str:
+    """Member name relative to the archive root, without a leading ./ or /"""
+    name = name.replace('\\', '/')
+    while name.startswith('./'):
+        name = name[2:]
+    return name.lstrip('/')
+
+
+def safe_destination(root: str, relative_path: str) -> Optional[str]:
+    """Absolute path of relative_path under root, None when it would escape root"""
+    root = os.path.abspath(root)
+    destination = os.path.abspath(os.path.join(root, relative_path))
+    if os.path.commonpath([root, destination]) != root or destination == root:
+        return None
+    return destination
+
+
+class ArchiveReader:
+    """
+    Read-only view over an export archive. tar.zst archives are not seekable, so
+    every pass over their members decompresses the stream again from the start.
+    Use as a context manager:
+
+        with ArchiveReader(path) as archive:
+            archive.extract_member(SQLITE_MEMBER, sqlite_path)
+            for relative_path, size, stream in archive.iter_media():
+                ...
+    """
+
+    def __init__(self, archive_path: str, archive_format: str = None):
+        self.archive_path = archive_path
+        self.archive_format = archive_format or detect_archive_format(archive_path)
+        self._zip = None
+        self._tar = None
+        self._raw = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def open(self):
+        if self.archive_format == 'zip':
+            self._zip = zipfile.ZipFile(self.archive_path, 'r')
+        elif self.archive_format in ('tar.gz', 'tar'):
+            self._tar = tarfile.open(self.archive_path, 'r:*')
+        elif self.archive_format == 'tar.zst':
+            if zstandard is None:
+                raise ValueError("tar.zst archives require the zstandard package")
+        else:
+            raise ValueError(f"Unsupported archive format: {self.archive_format}")
+
+    def _open_zstd_stream(self):
+        self._close_tar()
+        self._raw = open(self.archive_path, 'rb')
+        reader = zstandard.ZstdDecompressor().stream_reader(self._raw)
+        self._tar = tarfile.open(fileobj=reader, mode='r|')
+
+    def _close_tar(self):
+        if self._tar is not None:
+            self._tar.close()
+            self._tar = None
+        if self._raw is not None:
+            self._raw.close()
+            self._raw = None
+
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+        self._close_tar()
+
+    def _file_members(self) -> Iterator[Tuple[str, object]]:
+        """Yield (normalized name, member) for regular file members in archive order"""
+        if self._zip is not None:
+            for info in self._zip.infolist():
+                if not info.is_dir():
+                    yield normalize_member_name(info.filename), info
+        else:
+            if self.archive_format == 'tar.zst':
+                self._open_zstd_stream()
+            for member in self._tar:
+                if member.isfile():
+                    yield normalize_member_name(member.name), member
+
+    def _open_member(self, member) -> IO[bytes]:
+        if self._zip is not None:
+            return self._zip.open(member, 'r')
+        return self._tar.extractfile(member)
+
+    @staticmethod
+    def _member_size(member) -> int:
+        return member.file_size if isinstance(member, zipfile.ZipInfo) else member.size
+
+    def names(self) -> List[str]:
+        return [name for name, _ in self._file_members()]
+
+    def find_member(self, name: str):
+        for member_name, member in self._file_members():
+            if member_name == name:
+                return member
+        return None
+
+    def has_member(self, name: str) -> bool:
+        return self.find_member(name) is not None
+
+    def read_member(self, name: str) -> Optional[bytes]:
+        """Contents of a small member such as the metadata file, None when it is missing"""
+        member = self.find_member(name)
+        if member is None:
+            return None
+        with self._open_member(member) as stream:
+            return stream.read()
+
+    def extract_member(self, name: str, destination: str) -> bool:
+        """Stream a single member to destination. Returns False when the member is missing."""
+        member = self.find_member(name)
+        if member is None:
+            return False
+        os.makedirs(os.path.dirname(destination) or '.', exist_ok=True)
+        with self._open_member(member) as stream, open(destination, 'wb') as out:
+            shutil.copyfileobj(stream, out, COPY_BUFFER_SIZE)
+        return True
+
+    def iter_members(self) -> Iterator[Tuple[str, int, IO[bytes]]]:
+        """
+        Yield (name, size, stream) for every file member in archive order.
+        The stream is only valid until the next item is requested.
+        """
+        for name, member in self._file_members():
+            with self._open_member(member) as stream:
+                yield name, self._member_size(member), stream
+
+    def _media_members(self) -> Iterator[Tuple[str, object]]:
+        for name, member in self._file_members():
+            if name.startswith(MEDIA_PREFIX) and name != MEDIA_PREFIX:
+                yield name[len(MEDIA_PREFIX):], member
+
+    def media_sizes(self) -> Iterator[Tuple[str, int]]:
+        """
+        Yield (path relative to media/, size) for every media member from the zip central
+        directory or the tar headers, without reading member contents
+        """
+        for relative_path, member in self._media_members():
+            yield relative_path, self._member_size(member)
+
+    def iter_media(self) -> Iterator[Tuple[str, int, IO[bytes]]]:
+        """
+        Yield (path relative to media/, size, stream) for every media member in archive order.
+        The stream is only valid until the next item is requested.
+        """
+        for relative_path, member in self._media_members():
+            with self._open_member(member) as stream:
+                yield relative_path, self._member_size(member), stream
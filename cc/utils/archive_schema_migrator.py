@@ -3,6 +3,11 @@ Archive Schema Migration Utility for CUPCAKE LIMS
 
 This utility handles migration of SQLite export archives from different versions
 of the application to ensure compatibility with the current schema.
+
+Only the SQLite database is extracted and migrated. A migrated archive is written
+by copying every other member stream to stream from the original archive, or the
+migrated database can be written next to the original archive and passed to the
+importer as database_path, so the archive is not rewritten at all.
 """
 
 import sqlite3
@@ -15,6 +20,9 @@ from typing import Dict, List, Tuple, Any, Optional
 from datetime import datetime
 import logging
 
+from cc.utils.archive_reader import ArchiveReader, SQLITE_MEMBER, detect_archive_format
+from cc.utils.archive_writer import ArchiveWriter
+
 logger = logging.getLogger(__name__)
 
 
@@ -40,7 +48,37 @@ class ArchiveSchemaMigrator:
         self.target_version = target_version
         self.temp_dir = None
         self.sqlite_path = None
+        self.sqlite_member = None
+        self.archive_format = None
         self.migration_log = []
+    
+    def extract_database(self) -> Optional[str]:
+        """
+        Extract only the SQLite database of the archive into a temporary directory.
+        Returns its path, None when the archive holds no database.
+        """
+        self.archive_format = detect_archive_format(self.archive_path)
+        if self.temp_dir is None:
+            self.temp_dir = tempfile.mkdtemp(prefix='cupcake_migration_')
+        
+        with ArchiveReader(self.archive_path, self.archive_format) as archive:
+            names = archive.names()
+            if SQLITE_MEMBER in names:
+                self.sqlite_member = SQLITE_MEMBER
+            else:
+                self.sqlite_member = next((name for name in names if name.endswith(('.sqlite', '.db'))), None)
+            if self.sqlite_member is None:
+                return None
+            self.sqlite_path = os.path.join(self.temp_dir, os.path.basename(self.sqlite_member))
+            archive.extract_member(self.sqlite_member, self.sqlite_path)
+        return self.sqlite_path
+    
+    def cleanup(self):
+        """Remove the temporary directory holding the extracted database"""
+        if self.temp_dir and os.path.exists(self.temp_dir):
+            shutil.rmtree(self.temp_dir)
+        self.temp_dir = None
+        self.sqlite_path = None
         
     def detect_schema_version(self) -> Tuple[str, Dict[str, Any]]:
         """
@@ -129,33 +167,24 @@ class ArchiveSchemaMigrator:
         """
         Check if the archive needs migration to target version
         """
+        if self.sqlite_path is None and self.extract_database() is None:
+            return False
         current_version, _ = self.detect_schema_version()
         return current_version != self.target_version and current_version != "unknown"
     
-    def migrate_archive(self, output_path: Optional[str] = None) -> Dict[str, Any]:
+    def migrate_archive(self, output_path: Optional[str] = None, database_output_path: Optional[str] = None) -> Dict[str, Any]:
         """
         Migrate the archive to the target schema version
         Returns migration result with details
-        """
-        # Extract archive to temporary directory
-        self.temp_dir = tempfile.mkdtemp(prefix='cupcake_migration_')
         
+        Args:
+            output_path: Write a migrated copy of the archive here
+            database_output_path: Write only the migrated database here, for importing it
+                together with the original archive
+        """
         try:
-            # Extract archive
-            if self.archive_path.endswith('.zip'):
-                import zipfile
-                with zipfile.ZipFile(self.archive_path, 'r') as zip_ref:
-                    zip_ref.extractall(self.temp_dir)
-            elif self.archive_path.endswith(('.tar.gz', '.tgz')):
-                import tarfile
-                with tarfile.open(self.archive_path, 'r:gz') as tar_ref:
-                    tar_ref.extractall(self.temp_dir)
-            else:
-                raise ValueError(f"Unsupported archive format: {self.archive_path}")
-            
-            # Find SQLite database
-            self.sqlite_path = self._find_sqlite_db()
-            if not self.sqlite_path:
+            # Extract the database only, media stays in the archive
+            if self.sqlite_path is None and self.extract_database() is None:
                 raise ValueError("No SQLite database found in archive")
             
             # Detect current version
@@ -181,20 +210,14 @@ class ArchiveSchemaMigrator:
                 self._create_migrated_archive(output_path)
                 migration_result['migrated_archive'] = output_path
             
+            if database_output_path and migration_result['success']:
+                shutil.copyfile(self.sqlite_path, database_output_path)
+                migration_result['migrated_database'] = database_output_path
+            
             return migration_result
             
         finally:
-            # Cleanup temporary directory
-            if self.temp_dir and os.path.exists(self.temp_dir):
-                shutil.rmtree(self.temp_dir)
-    
-    def _find_sqlite_db(self) -> Optional[str]:
-        """Find SQLite database in extracted archive"""
-        for root, dirs, files in os.walk(self.temp_dir):
-            for file in files:
-                if file.endswith('.sqlite') or file.endswith('.db'):
-                    return os.path.join(root, file)
-        return None
+            self.cleanup()
     
     def _perform_migration(self, current_version: str, schema_info: Dict) -> Dict[str, Any]:
         """
@@ -362,19 +385,22 @@ class ArchiveSchemaMigrator:
         """, (datetime.now().isoformat(),))
     
     def _create_migrated_archive(self, output_path: str):
-        """Create a new archive with the migrated data"""
-        if output_path.endswith('.zip'):
-            import zipfile
-            with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-                for root, dirs, files in os.walk(self.temp_dir):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        arc_path = os.path.relpath(file_path, self.temp_dir)
-                        zip_file.write(file_path, arc_path)
-        elif output_path.endswith(('.tar.gz', '.tgz')):
-            import tarfile
-            with tarfile.open(output_path, 'w:gz') as tar_file:
-                tar_file.add(self.temp_dir, arcname='.')
+        """
+        Create a new archive with the migrated database. Every other member is copied
+        stream to stream from the original archive without touching the disk.
+        """
+        try:
+            output_format = detect_archive_format(output_path)
+        except (ValueError, OSError):
+            output_format = self.archive_format
+        
+        with ArchiveReader(self.archive_path, self.archive_format) as archive, \
+                ArchiveWriter(output_path, output_format) as writer:
+            for name, size, stream in archive.iter_members():
+                if name == self.sqlite_member:
+                    writer.add_file(self.sqlite_path, name)
+                else:
+                    writer.add_stream(name, stream, size)
     
     @classmethod
     def can_migrate(cls, from_version: str, to_version: str) -> bool:
@@ -394,7 +420,8 @@ class ArchiveSchemaMigrator:
 
 
 def migrate_archive_if_needed(archive_path: str, target_version: str = "1.7.0", 
-                             output_path: Optional[str] = None) -> Dict[str, Any]:
+                             output_path: Optional[str] = None,
+                             database_output_path: Optional[str] = None) -> Dict[str, Any]:
     """
     Convenience function to migrate an archive if needed
     
@@ -402,14 +429,16 @@ def migrate_archive_if_needed(archive_path: str, target_version: str = "1.7.0",
         archive_path: Path to the source archive
         target_version: Target schema version (default: latest)
         output_path: Path for migrated archive (optional)
+        database_output_path: Path for the migrated database alone (optional)
     
     Returns:
         Migration result dictionary
     """
     migrator = ArchiveSchemaMigrator(archive_path, target_version)
     
-    # Check if migration is needed
+    # Check if migration is needed, the extracted database is reused by the migration
     if not migrator.needs_migration():
+        migrator.cleanup()
         return {
             'success': True,
             'migration_needed': False,
@@ -417,4 +446,4 @@ def migrate_archive_if_needed(archive_path: str, target_version: str = "1.7.0",
         }
     
     # Perform migration
-    return migrator.migrate_archive(output_path)
\ No newline at end of file
+    return migrator.migrate_archive(output_path, database_output_path)
\ No newline at end of file
@@ -0,0 +1,165 @@
+"""
+Single-pass writer for user data export archives
+
+The exporter only stages the SQLite database and the metadata file. Media files
+are read once from MEDIA_ROOT and streamed into the archive, and the SHA-256 of
+the archive is computed from the bytes as they are written, so the finished
+archive never has to be read back.
+
+Supported formats:
+    zip      deflate, already-compressed media is stored as is
+    tar.gz   gzip compressed tar stream
+    tar      uncompressed tar stream
+    tar.zst  zstandard compressed tar stream, requires the zstandard package
+"""
+
+import gzip
+import hashlib
+import os
+import shutil
+import tarfile
+import time
+import zipfile
+from typing import IO, Optional
+
+from cc.utils.archive_reader import COPY_BUFFER_SIZE
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ARCHIVE_EXTENSIONS = {
+    'zip': '.zip',
+    'tar.gz': '.tar.gz',
+    'tar': '.tar',
+    'tar.zst': '.tar.zst',
+}
+
+# Formats that gain nothing from a second compression pass
+STORED_EXTENSIONS = {
+    '.png', '.jpg', '.jpeg', '.gif', '.webp', '.heic',
+    '.mp4', '.webm', '.mov', '.mkv', '.m4a', '.mp3', '.ogg', '.opus', '.aac', '.flac',
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.zst', '.7z', '.rar',
+}
+
+
+def zstd_available() -> bool:
+    return zstandard is not None
+
+
+class _HashingWriter:
+    """
+    Write-only file wrapper hashing every byte written. It deliberately has no seek(),
+    so zipfile writes data descriptors instead of seeking back to patch local headers.
+    """
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.sha256 = hashlib.sha256()
+        self.position = 0
+
+    def write(self, data) -> int:
+        self.sha256.update(data)
+        self.position += len(data)
+        return self.fileobj.write(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        self.fileobj.flush()
+
+
+class ArchiveWriter:
+    """
+    Streams members into a new export archive. Use as a context manager and read
+    sha256 after it has been closed:
+
+        with ArchiveWriter(path, 'zip') as archive:
+            archive.add_file(sqlite_path, 'user_data.sqlite')
+            archive.add_file(media_path, 'media/annotations/a.png')
+        digest = archive.sha256
+    """
+
+    def __init__(self, archive_path: str, format_type: str = 'zip', compression_level: Optional[int] = None):
+        if format_type not in ARCHIVE_EXTENSIONS:
+            raise ValueError(f"Unsupported archive format: {format_type}")
+        if format_type == 'tar.zst' and not zstd_available():
+            raise ValueError("tar.zst exports require the zstandard package")
+        self.archive_path = archive_path
+        self.format_type = format_type
+        self.compression_level = compression_level
+        self.sha256 = None
+        self.bytes_written = 0
+        self._file = None
+        self._hashing = None
+        self._compressor = None
+        self._zip = None
+        self._tar = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def open(self):
+        self._file = open(self.archive_path, 'wb')
+        self._hashing = _HashingWriter(self._file)
+        if self.format_type == 'zip':
+            self._zip = zipfile.ZipFile(
+                self._hashing, 'w', zipfile.ZIP_DEFLATED, allowZip64=True, compresslevel=self.compression_level
+            )
+        elif self.format_type == 'tar':
+            self._tar = tarfile.open(fileobj=self._hashing, mode='w|')
+        else:
+            if self.format_type == 'tar.gz':
+                self._compressor = gzip.GzipFile(
+                    filename='', mode='wb', fileobj=self._hashing, compresslevel=self.compression_level or 6
+                )
+            else:
+                self._compressor = zstandard.ZstdCompressor(level=self.compression_level or 3).stream_writer(
+                    self._hashing, closefd=False
+                )
+            self._tar = tarfile.open(fileobj=self._compressor, mode='w|')
+
+    def close(self):
+        if self._file is None:
+            return
+        if self._zip is not None:
+            self._zip.close()
+        if self._tar is not None:
+            self._tar.close()
+        if self._compressor is not None:
+            self._compressor.close()
+        self._file.close()
+        self.sha256 = self._hashing.sha256.hexdigest()
+        self.bytes_written = self._hashing.position
+        self._file = None
+
+    def add_file(self, path: str, arcname: str):
+        """Stream a file from disk into the archive"""
+        if self._zip is not None:
+            compress_type = zipfile.ZIP_STORED if self.is_precompressed(arcname) else zipfile.ZIP_DEFLATED
+            self._zip.write(path, arcname, compress_type=compress_type)
+        else:
+            self._tar.add(path, arcname=arcname, recursive=False)
+
+    def add_stream(self, arcname: str, stream: IO[bytes], size: int):
+        """Copy size bytes from an open stream into the archive, e.g. a member of another archive"""
+        if self._zip is not None:
+            info = zipfile.ZipInfo(arcname, date_time=time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_STORED if self.is_precompressed(arcname) else zipfile.ZIP_DEFLATED
+            with self._zip.open(info, 'w', force_zip64=size > zipfile.ZIP64_LIMIT) as destination:
+                shutil.copyfileobj(stream, destination, COPY_BUFFER_SIZE)
+        else:
+            info = tarfile.TarInfo(arcname)
+            info.size = size
+            info.mtime = int(time.time())
+            self._tar.addfile(info, stream)
+
+    @staticmethod
+    def is_precompressed(name: str) -> bool:
+        return os.path.splitext(name)[1].lower() in STORED_EXTENSIONS
@@ -0,0 +1,42 @@
+"""
+Per-thread suppression of simple_history deletion rows
+
+simple_history can only be switched off process wide with SIMPLE_HISTORY_ENABLED, which
+would also drop the history of every other request served by the same worker. The
+HistoricalRecords used by cc.models checks a flag on HistoricalRecords.context, the
+thread-local state simple_history already keeps per request, so deletions made inside
+skip_deletion_history() in one thread leave no history rows while others are untouched.
+"""
+
+from contextlib import contextmanager
+
+from simple_history import models as history_models
+
+
+class HistoricalRecords(history_models.HistoricalRecords):
+    """HistoricalRecords that writes no deletion rows while skip_deletion_history is active in the thread"""
+
+    def pre_delete(self, instance, **kwargs):
+        if deletion_history_skipped():
+            return
+        super().pre_delete(instance, **kwargs)
+
+    def post_delete(self, instance, using=None, **kwargs):
+        if deletion_history_skipped():
+            return
+        super().post_delete(instance, using=using, **kwargs)
+
+
+def deletion_history_skipped() -> bool:
+    return getattr(HistoricalRecords.context, "skip_deletion_history", False)
+
+
+@contextmanager
+def skip_deletion_history():
+    """Delete without history rows in the current thread"""
+    previous = deletion_history_skipped()
+    HistoricalRecords.context.skip_deletion_history = True
+    try:
+        yield
+    finally:
+        HistoricalRecords.context.skip_deletion_history = previous
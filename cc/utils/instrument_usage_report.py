@@ -0,0 +1,130 @@
+"""
+Streaming instrument usage reports
+
+Usages are read in id order, chunk_size at a time, with one query joining the instrument
+and the user that selects only the exported columns, and one query for the jobs of the
+annotations in the chunk. Durations are computed for the whole chunk at once with numpy.
+Rows are written out chunk by chunk and XLSX workbooks are written in openpyxl's write-only
+mode, so memory stays flat however long the reported period is.
+"""
+
+import csv
+from datetime import datetime, timezone as dt_timezone
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db.models import QuerySet
+from openpyxl.workbook import Workbook
+
+from cc.models import InstrumentJob
+
+HEADERS = ["Instrument", "User", "Time Started", "Time Ended", "Duration", "Description", "Associated Jobs", "Is Maintenance", "Is Approved"]
+
+# Columns read for every usage, in row order
+COLUMNS = (
+    "id", "instrument__instrument_name", "user__username", "time_started", "time_ended",
+    "description", "maintenance", "approved", "annotation_id",
+)
+
+# Columns whose width is fitted to their longest text in XLSX reports
+TEXT_COLUMNS = (0, 1, 2, 3, 5, 6)
+
+
+def _to_datetime64(values: Sequence[datetime]) -> np.ndarray:
+    return np.array([value.astimezone(dt_timezone.utc).replace(tzinfo=None) for value in values], dtype="datetime64[us]")
+
+
+class InstrumentUsageReport:
+    """
+    Rows of an instrument usage report:
+
+        report = InstrumentUsageReport(usages, time_started, time_ended, calculate_duration_with_cutoff=True)
+        for last_id, rows in report.chunks():
+            writer.writerows(rows)
+    """
+
+    def __init__(self, queryset: QuerySet, time_started: Optional[datetime] = None, time_ended: Optional[datetime] = None,
+                 calculate_duration_with_cutoff: bool = False, job_separator: str = ";", chunk_size: int = None):
+        self.queryset = queryset.filter(time_started__isnull=False, time_ended__isnull=False)
+        self.time_started = time_started
+        self.time_ended = time_ended
+        self.calculate_duration_with_cutoff = calculate_duration_with_cutoff
+        self.job_separator = job_separator
+        self.chunk_size = chunk_size or settings.JOB_CHECKPOINT_ROWS
+
+    def chunks(self, after_id: int = 0) -> Iterator[Tuple[int, List[list]]]:
+        """(id of the last usage, rows) of the usages after after_id, one chunk at a time"""
+        while True:
+            records = list(
+                self.queryset.filter(id__gt=after_id).order_by("id").values_list(*COLUMNS)[:self.chunk_size]
+            )
+            if not records:
+                return
+            ids, instruments, users, starts, ends, descriptions, maintenance, approved, annotation_ids = zip(*records)
+            starts = _to_datetime64(starts)
+            ends = _to_datetime64(ends)
+            durations = self.durations(starts, ends)
+            started = np.datetime_as_string(starts, unit="D")
+            ended = np.datetime_as_string(ends, unit="D")
+            jobs = self.associated_jobs(annotation_ids)
+            rows = [
+                [
+                    instruments[n], users[n], str(started[n]), str(ended[n]), int(durations[n]), descriptions[n],
+                    self.job_separator.join(jobs.get(annotation_ids[n], [])), maintenance[n], approved[n],
+                ]
+                for n in range(len(records))
+            ]
+            after_id = ids[-1]
+            yield after_id, rows
+
+    def durations(self, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        """
+        Reported durations in days, counting a started day as a whole one. With the cutoff the
+        part of the usage within the reported period is added to its duration.
+        """
+        duration = ends - starts
+        if self.calculate_duration_with_cutoff and (self.time_started or self.time_ended):
+            clipped_starts = np.maximum(starts, _to_datetime64([self.time_started])[0]) if self.time_started else starts
+            clipped_ends = np.minimum(ends, _to_datetime64([self.time_ended])[0]) if self.time_ended else ends
+            duration = duration + (clipped_ends - clipped_starts)
+        return duration // np.timedelta64(1, "D") + 1
+
+    @staticmethod
+    def associated_jobs(annotation_ids: Sequence[Optional[int]]) -> Dict[int, List[str]]:
+        """Descriptions of the jobs the annotations are assigned to, newest job first"""
+        annotation_ids = [annotation_id for annotation_id in set(annotation_ids) if annotation_id]
+        jobs = {}
+        if not annotation_ids:
+            return jobs
+        assignments = InstrumentJob.staff_annotations.through.objects.filter(
+            annotation_id__in=annotation_ids
+        ).order_by("annotation_id", "-instrumentjob_id").values_list(
+            "annotation_id", "instrumentjob__submitted_at", "instrumentjob__job_name", "instrumentjob__user__username"
+        )
+        for annotation_id, submitted_at, job_name, username in assignments:
+            jobs.setdefault(annotation_id, []).append(f"{submitted_at} {job_name} ({username})")
+        return jobs
+
+    @staticmethod
+    def write_xlsx(rows_path: str, xlsx_path: str, delimiter: str = ","):
+        """
+        Write delimited report rows, headers first, to a workbook in write-only mode. The file is read
+        twice, once to fit the column widths, which have to be set before the first row is written.
+        """
+        widths = [0] * len(HEADERS)
+        with open(rows_path, "rt", encoding="utf-8", newline="") as staged:
+            for row in csv.reader(staged, delimiter=delimiter):
+                for column in TEXT_COLUMNS:
+                    widths[column] = max(widths[column], len(row[column]))
+
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("instrument_usage")
+        for column, width in enumerate(widths):
+            ws.column_dimensions[chr(ord("A") + column)].width = width + 2
+        with open(rows_path, "rt", encoding="utf-8", newline="") as staged:
+            reader = csv.reader(staged, delimiter=delimiter)
+            ws.append(next(reader))
+            for row in reader:
+                ws.append(row[:4] + [int(row[4])] + [row[5] or None, row[6], row[7] == "True", row[8] == "True"])
+        wb.save(xlsx_path)
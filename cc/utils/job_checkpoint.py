@@ -0,0 +1,116 @@
+"""
+Checkpoints for long running RQ jobs
+
+Exports and imports run for hours. When a worker is stopped in the middle of
+one, RQ requeues the job under the same job id (the jobs are declared with a
+Retry), so the job keeps its stage, table and offset in a JobCheckpoint row
+keyed by that id and skips the work that was already done when it runs again.
+
+Work that lives in the database should save its checkpoint inside the
+transaction that writes it, so the two can never disagree. State that grows
+with the job, like the id mappings of an import, is appended in entries
+holding what changed since the previous checkpoint rather than saved whole. Outside of an RQ
+worker, e.g. in management commands and tests, the checkpoint is only kept in
+memory and a job always starts from the beginning.
+"""
+
+from typing import Any, Dict, List, Optional
+
+from rq import get_current_job
+
+from cc.models import JobCheckpoint, JobCheckpointEntry
+
+
+class JobCheckpointer:
+    """
+    Loads and saves the checkpoint of the current RQ job.
+
+        checkpoint = JobCheckpointer('import_data')
+        if checkpoint.stage_done('protocols'):
+            ...
+        with transaction.atomic():
+            import_protocols()
+            checkpoint.complete_stage('protocols', id_mappings=mappings)
+    """
+
+    def __init__(self, job_name: str, job_id: Optional[str] = None):
+        if job_id is None:
+            job = get_current_job()
+            job_id = job.id if job else None
+        self.job_name = job_name
+        self.job_id = job_id
+        self.record = JobCheckpoint.objects.filter(job_id=job_id).first() if job_id else None
+        self.resumed = self.record is not None
+        # Entries of a job run outside of a worker
+        self._entries: List[JobCheckpointEntry] = []
+        if self.record:
+            self.record.attempts += 1
+            self.record.save(update_fields=['attempts', 'updated_at'])
+        else:
+            self.record = JobCheckpoint(job_id=job_id or '', job_name=job_name)
+
+    @property
+    def stage(self) -> Optional[str]:
+        return self.record.stage
+
+    @property
+    def table_name(self) -> Optional[str]:
+        return self.record.table_name
+
+    @property
+    def offset(self) -> int:
+        return self.record.offset
+
+    @property
+    def state(self) -> Dict[str, Any]:
+        return self.record.state
+
+    @property
+    def completed_stages(self) -> list:
+        return self.record.state.get('completed_stages', [])
+
+    def stage_done(self, stage: str) -> bool:
+        return stage in self.completed_stages
+
+    def save(self, stage: str = None, table_name: str = None, offset: int = 0, **state):
+        """Record the current position, state entries are merged into the saved state"""
+        self.record.stage = stage
+        self.record.table_name = table_name
+        self.record.offset = offset
+        self.record.state = {**self.record.state, **state}
+        if self.job_id:
+            self.record.save()
+
+    def append(self, key: str, data):
+        """Add an entry to the state kept under key, see entries()"""
+        entry = JobCheckpointEntry(key=key, data=data)
+        if not self.job_id:
+            self._entries.append(entry)
+            return
+        if self.record.pk is None:
+            self.record.save()
+        entry.checkpoint = self.record
+        entry.save()
+
+    def entries(self, key: str) -> List[Any]:
+        """Data of the entries appended under key, in the order they were added"""
+        if not self.job_id:
+            return [entry.data for entry in self._entries if entry.key == key]
+        if self.record.pk is None:
+            return []
+        return list(self.record.entries.filter(key=key).values_list('data', flat=True))
+
+    def complete_stage(self, stage: str, **state):
+        """Mark a stage as done, it is skipped when the job runs again"""
+        completed = self.completed_stages
+        if stage not in completed:
+            completed = completed + [stage]
+        self.save(stage, completed_stages=completed, **state)
+
+    def finish(self):
+        """Drop the checkpoint once the job is done, a new run of the job starts over"""
+        if self.job_id and self.record.pk:
+            self.record.delete()
+        self.record = JobCheckpoint(job_id=self.job_id or '', job_name=self.job_name)
+        self._entries = []
+        self.resumed = False
@@ -11,6 +11,7 @@ import sqlite3
 import shutil
 import zipfile
 import tempfile
+import uuid
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Any, Optional
@@ -19,6 +20,12 @@ from django.core.files.storage import default_storage
 from django.conf import settings
 from django.db import models
 from django.apps import apps
+from django.utils import timezone
+
+from cc.utils.archive_reader import SQLITE_MEMBER, METADATA_MEMBER, MEDIA_PREFIX
+from cc.utils.archive_writer import ArchiveWriter, ARCHIVE_EXTENSIONS
+from cc.utils.media_collector import MediaCollector
+from cc.utils.job_checkpoint import JobCheckpointer
 
 # Import all relevant models with correct names verified from schema
 from cc.models import (
@@ -51,6 +58,9 @@ from cc.models import (
     # Projects
     Project,
     
+    # Export bookkeeping
+    ExportWatermark,
+    
     # Vocabulary Models
     Tissue, HumanDisease, MSUniqueVocabularies, Species, SubcellularLocation, Unimod,
     
@@ -64,20 +74,29 @@ class UserDataExporter:
     COMPLETELY REVISED comprehensive user data exporter with exact field mapping
     """
     
-    def __init__(self, user: User, export_dir: str = None, format_type: str = "zip", progress_callback=None):
+    def __init__(self, user: User, export_dir: str = None, format_type: str = "zip", progress_callback=None, since: datetime = None, checkpoint: JobCheckpointer = None):
         self.user = user
         self.progress_callback = progress_callback
+        # Only rows changed after this point are exported when set, see export_incremental_data
+        self.since = since
+        
+        # A resumed job continues in the staging directory of the interrupted run
+        self.checkpoint = checkpoint
+        self._resume_state = checkpoint.state.get('export') if checkpoint and checkpoint.resumed else None
+        if self._resume_state and not os.path.exists(self._resume_state['export_dir']):
+            self._resume_state = None
         
         # If export_dir is provided, create a unique subdirectory within it
-        if export_dir:
+        if self._resume_state:
+            self.export_dir = self._resume_state['export_dir']
+        elif export_dir:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             unique_dir = f'cupcake_export_{user.username}_{timestamp}'
             self.export_dir = os.path.join(export_dir, unique_dir)
         else:
             self.export_dir = tempfile.mkdtemp(prefix=f'cupcake_export_{user.username}_')
             
-        self.sqlite_path = os.path.join(self.export_dir, 'user_data.sqlite')
-        self.media_dir = os.path.join(self.export_dir, 'media')
+        self.sqlite_path = os.path.join(self.export_dir, SQLITE_MEMBER)
         self.format_type = format_type
         self.metadata = {
             'export_timestamp': datetime.now().isoformat(),
@@ -86,11 +105,14 @@ class UserDataExporter:
             'source_email': user.email,
             'cupcake_version': '1.0',
             'export_format_version': '3.0',  # Updated version for revised export
-            'archive_format': format_type
+            'archive_format': format_type,
+            'export_id': str(uuid.uuid4()),
+            'export_mode': 'incremental' if since else 'complete',
+            'incremental_since': since.isoformat() if since else None
         }
         
-        # Create directories
-        os.makedirs(self.media_dir, exist_ok=True)
+        # Create the staging directory, it only holds the database and metadata
+        os.makedirs(self.export_dir, exist_ok=True)
         
         # Initialize SQLite connection
         self.conn = sqlite3.connect(self.sqlite_path)
@@ -112,6 +134,9 @@ class UserDataExporter:
             'projects': set(),
         }
         self.file_mappings = {}
+        # Media files to stream into the archive, deduplicated by path relative to MEDIA_ROOT
+        self.media = MediaCollector(progress_callback=self._send_media_progress)
+        self._last_media_progress = None
         self.stats = {
             'models_exported': 0,
             'relationships_exported': 0,
@@ -122,79 +147,55 @@ class UserDataExporter:
         # Optional filters for protocol/session-specific exports
         self._protocol_filter = None
         self._session_filter = None
+        
+        if self._resume_state:
+            self.metadata = self._resume_state['metadata']
     
     def _send_progress(self, progress: int, message: str, status: str = "processing"):
         """Send progress update via callback if available"""
         if self.progress_callback:
             self.progress_callback(progress, message, status)
     
+    def _send_media_progress(self, done_bytes: int, total_bytes: int):
+        """Report archived media bytes within the 90-99% range, once per percent"""
+        progress = 90 + (9 * done_bytes // total_bytes if total_bytes else 9)
+        if progress == self._last_media_progress:
+            return
+        self._last_media_progress = progress
+        self._send_progress(
+            progress,
+            f"Archived {round(done_bytes / (1024 * 1024), 2)} of {round(total_bytes / (1024 * 1024), 2)} MB of media"
+        )
+    
     def export_user_data(self) -> str:
         """
         Export ALL user data with completely accurate field mapping.
         
+        With a checkpoint the state is recorded before every stage, and a resumed job
+        continues with the stage that was interrupted.
+        
         Returns:
             str: Path to the ZIP file containing exported data
         """
         try:
             print(f"Starting REVISED COMPREHENSIVE export for user: {self.user.username}")
-            self._send_progress(15, "Creating export database schema...")
-
-            # Create schema that exactly matches the database
-            self._create_accurate_export_schema()
-            
-            # Export in dependency order to avoid foreign key issues
-            self._send_progress(20, "Exporting user data...")
-            self._export_user_data()
-            
-            self._send_progress(25, "Exporting remote hosts...")
-            self._export_remote_hosts()
-            
-            self._send_progress(30, "Exporting lab groups...")
-            self._export_lab_groups_accurate()
-            
-            self._send_progress(35, "Exporting storage objects...")
-            self._export_storage_objects()
-            
-            self._send_progress(40, "Exporting reagents...")
-            self._export_reagents_accurate()
-            
-            self._send_progress(42, "Exporting reagent actions...")
-            self._export_reagent_actions_accurate()
-            
-            self._send_progress(45, "Exporting projects...")
-            self._export_projects_accurate()
-            
-            self._send_progress(55, "Exporting protocols...")
-            self._export_protocols_accurate()
-            
-            self._send_progress(65, "Exporting sessions...")
-            self._export_sessions_accurate()
-            
-            self._send_progress(75, "Exporting annotations...")
-            self._export_annotations_accurate()
+            stages = self._export_stages()
+            resume_stage = self._restore_checkpoint()
+            names = [name for name, _, _, _ in stages]
+            if resume_stage == 'archive':
+                start = len(stages)
+            else:
+                start = names.index(resume_stage) if resume_stage in names else 0
+            if resume_stage:
+                print(f"Resuming export at stage {resume_stage}")
             
-            self._send_progress(80, "Exporting instruments...")
-            self._export_instruments_accurate()
-            
-            self._send_progress(82, "Exporting messaging data...")
-            self._export_messaging_accurate()
-            
-            self._send_progress(85, "Exporting support models...")
-            self._export_support_models_accurate()
-            
-            # Export vocabulary data (optional but useful for completeness)
-            self._send_progress(87, "Exporting vocabulary data...")
-            self._export_vocabulary_data()
-            
-            # Copy all media files
-            self._send_progress(88, "Copying media files...")
-            self._export_media_files()
-            
-            # Save metadata
-            self._send_progress(89, "Saving export metadata...")
-            self._save_export_metadata()
+            for name, progress, message, method in stages[start:]:
+                self._save_checkpoint(name)
+                self._send_progress(progress, message)
+                method()
             
             # Close SQLite connection before creating archive
+            self._save_checkpoint('archive')
             if self.conn:
                 self.conn.close()
                 self.conn = None
@@ -212,6 +213,95 @@ class UserDataExporter:
             if self.conn:
                 self.conn.close()
     
+    def _export_stages(self) -> list:
+        """(name, progress, message, method) of the export stages in dependency order"""
+        stages = [
+            ('schema', 15, "Creating export database schema...", self._create_accurate_export_schema),
+            ('users', 20, "Exporting user data...", self._export_user_data),
+        ]
+        
+        # Incremental exports only carry protocols, sessions and annotations
+        if self.since is None:
+            stages += [
+                ('remote_hosts', 25, "Exporting remote hosts...", self._export_remote_hosts),
+                ('lab_groups', 30, "Exporting lab groups...", self._export_lab_groups_accurate),
+                ('storage_objects', 35, "Exporting storage objects...", self._export_storage_objects),
+                ('reagents', 40, "Exporting reagents...", self._export_reagents_accurate),
+                ('reagent_actions', 42, "Exporting reagent actions...", self._export_reagent_actions_accurate),
+                ('projects', 45, "Exporting projects...", self._export_projects_accurate),
+            ]
+        
+        stages += [
+            ('protocols', 55, "Exporting protocols...", self._export_protocols_accurate),
+            ('sessions', 65, "Exporting sessions...", self._export_sessions_accurate),
+            ('annotations', 75, "Exporting annotations...", self._export_annotations_accurate),
+        ]
+        
+        if self.since is None:
+            stages += [
+                ('instruments', 80, "Exporting instruments...", self._export_instruments_accurate),
+                ('messaging', 82, "Exporting messaging data...", self._export_messaging_accurate),
+                ('support_models', 85, "Exporting support models...", self._export_support_models_accurate),
+                # Export vocabulary data (optional but useful for completeness)
+                ('vocabulary', 87, "Exporting vocabulary data...", self._export_vocabulary_data),
+            ]
+        else:
+            stages.append(('tombstones', 85, "Exporting deletions...", self._export_tombstones))
+        
+        # Media files are streamed into the archive by _create_archive
+        stages += [
+            ('media', 88, "Collecting media files...", self._export_media_files),
+            ('metadata', 89, "Saving export metadata...", self._save_export_metadata),
+        ]
+        return stages
+    
+    def _save_checkpoint(self, stage: str):
+        """Commit the staging database and record the state the stage starts from"""
+        if self.checkpoint is None:
+            return
+        tables = {}
+        if self.conn:
+            self.conn.commit()
+            for table in self._staging_tables():
+                tables[table] = self.conn.execute(f'SELECT COALESCE(MAX(rowid), 0) FROM "{table}"').fetchone()[0]
+        self.checkpoint.save(stage, export={
+            'export_dir': self.export_dir,
+            'metadata': self.metadata,
+            'stats': self.stats,
+            'exported_objects': {key: sorted(ids) for key, ids in self.exported_objects.items()},
+            'file_mappings': self.file_mappings,
+            'media': self.media.snapshot(),
+            'tables': tables,
+        })
+    
+    def _staging_tables(self) -> List[str]:
+        return [
+            table for (table,) in self.conn.execute(
+                "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+            ).fetchall()
+        ]
+    
+    def _restore_checkpoint(self) -> Optional[str]:
+        """
+        Reset the staging database and the exporter state to the start of the interrupted stage:
+        tables created and rows written after the checkpoint are dropped. Returns that stage.
+        """
+        state = self._resume_state
+        if not state:
+            return None
+        self.stats = state['stats']
+        self.exported_objects = {key: set(ids) for key, ids in state['exported_objects'].items()}
+        self.file_mappings = state['file_mappings']
+        self.media.restore(state['media'])
+        
+        for table in self._staging_tables():
+            if table not in state['tables']:
+                self.conn.execute(f'DROP TABLE "{table}"')
+            else:
+                self.conn.execute(f'DELETE FROM "{table}" WHERE rowid > ?', (state['tables'][table],))
+        self.conn.commit()
+        return self.checkpoint.stage
+    
     def _create_accurate_export_schema(self):
         """Create SQLite schema that exactly matches the PostgreSQL database"""
         
@@ -943,9 +1033,57 @@ class UserDataExporter:
         print(f"Exported {exported_count} storage objects")
         self.stats['models_exported'] += 1
 
+    def _changed(self, queryset):
+        """
+        Restrict a queryset to rows created or changed since the incremental watermark, going by
+        updated_at where the model has it and by its history table otherwise. Plain
+        QuerySet.update() calls bypass both and are not picked up.
+        """
+        if self.since is None:
+            return queryset
+        model = queryset.model
+        changed = models.Q(id__in=model.history.filter(
+            history_date__gt=self.since
+        ).exclude(history_type='-').values('id'))
+        if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+            changed |= models.Q(updated_at__gt=self.since)
+        return queryset.filter(changed)
+    
+    def _export_tombstones(self):
+        """Export the rows deleted since the incremental watermark, read from the history tables"""
+        self.conn.execute('''
+            CREATE TABLE export_tombstones (
+                table_name TEXT NOT NULL,
+                original_id INTEGER NOT NULL,
+                deleted_at TEXT
+            )
+        ''')
+        deletions = (
+            ('export_protocols', ProtocolModel.history.filter(user=self.user)),
+            ('export_protocol_sections', ProtocolSection.history.filter(protocol__user=self.user)),
+            ('export_protocol_steps', ProtocolStep.history.filter(protocol__user=self.user)),
+            ('export_sessions', Session.history.filter(user=self.user)),
+            ('export_annotation_folders', AnnotationFolder.history.filter(
+                models.Q(session__user=self.user) | models.Q(owner=self.user)
+            )),
+            ('export_annotations', Annotation.history.filter(user=self.user)),
+        )
+        tombstones = 0
+        for table_name, history in deletions:
+            rows = history.filter(history_type='-', history_date__gt=self.since).values_list('id', 'history_date')
+            for original_id, deleted_at in rows:
+                self.conn.execute(
+                    'INSERT INTO export_tombstones (table_name, original_id, deleted_at) VALUES (?, ?, ?)',
+                    (table_name, original_id, deleted_at.isoformat())
+                )
+                tombstones += 1
+        self.conn.commit()
+        self.metadata['tombstones'] = tombstones
+        print(f"Exported {tombstones} deletions")
+    
     def _export_protocols_accurate(self):
         """Export protocols with exact field mapping from schema"""
-        protocols = ProtocolModel.objects.filter(user=self.user)
+        protocols = self._changed(ProtocolModel.objects.filter(user=self.user))
         
         # Apply protocol filter if set for protocol-specific export
         if self._protocol_filter:
@@ -992,7 +1130,7 @@ class UserDataExporter:
                 ''', (protocol.id, viewer.id))
 
         # Export protocol sections with exact field names from cc_protocolsection
-        sections = ProtocolSection.objects.filter(protocol__user=self.user)
+        sections = self._changed(ProtocolSection.objects.filter(protocol__user=self.user))
         for section in sections:
             cursor.execute('''
                 INSERT INTO export_protocol_sections 
@@ -1011,7 +1149,7 @@ class UserDataExporter:
             ))
 
         # Export protocol steps with exact field names from cc_protocolstep
-        steps = ProtocolStep.objects.filter(protocol__user=self.user)
+        steps = self._changed(ProtocolStep.objects.filter(protocol__user=self.user))
         for step in steps:
             cursor.execute('''
                 INSERT INTO export_protocol_steps 
@@ -1034,8 +1172,10 @@ class UserDataExporter:
                 getattr(step, 'remote_host_id', None)
             ))
 
-        # Export protocol ratings from cc_protocolrating
+        # Export protocol ratings from cc_protocolrating, imports cannot update them in place
         ratings = ProtocolRating.objects.filter(protocol__user=self.user)
+        if self.since is not None:
+            ratings = ratings.none()
         for rating in ratings:
             cursor.execute('''
                 INSERT INTO export_protocol_ratings 
@@ -1060,7 +1200,7 @@ class UserDataExporter:
 
     def _export_sessions_accurate(self):
         """Export sessions with exact field mapping"""
-        sessions = Session.objects.filter(user=self.user)
+        sessions = self._changed(Session.objects.filter(user=self.user))
         
         # Apply session filter if set for session-specific export
         if self._session_filter:
@@ -1118,7 +1258,7 @@ class UserDataExporter:
     def _export_annotations_accurate(self):
         """Export annotations with exact field mapping"""
         # Get all annotations owned by user
-        annotations = Annotation.objects.filter(user=self.user)
+        annotations = self._changed(Annotation.objects.filter(user=self.user))
         
         # Apply filtering if specific sessions are selected
         if self._session_filter:
@@ -1133,9 +1273,9 @@ class UserDataExporter:
         print(f"Exporting {annotations.count()} annotations...")
         
         # First export annotation folders - filter by sessions if needed
-        folders = AnnotationFolder.objects.filter(
+        folders = self._changed(AnnotationFolder.objects.filter(
             models.Q(session__user=self.user) | models.Q(owner=self.user)
-        ).distinct()
+        ).distinct())
         
         if self._session_filter:
             # Also filter folders by the selected sessions
@@ -1512,32 +1652,31 @@ class UserDataExporter:
         self.stats['models_exported'] += 1
 
     def _copy_media_file(self, file_field) -> Optional[str]:
-        """Copy a media file to the export directory and return the new path"""
+        """
+        Register a media file to be streamed into the archive and return its path relative
+        to MEDIA_ROOT. Nothing is read here, _export_media_files checks the files exist.
+        """
         if not file_field:
             return None
         
         try:
             original_path = file_field.path
-            if not os.path.exists(original_path):
-                return None
-
             relative_path = os.path.relpath(original_path, settings.MEDIA_ROOT)
-            export_path = os.path.join(self.media_dir, relative_path)
-
-            os.makedirs(os.path.dirname(export_path), exist_ok=True)
-
-            shutil.copy2(original_path, export_path)
-            self.stats['files_copied'] += 1
-            
-            return relative_path
+            return self.media.add(original_path, relative_path)
             
         except Exception as e:
             self.stats['errors'].append(f"Error copying file {file_field.name}: {e}")
             return None
     
     def _export_media_files(self):
-        """Export all media files referenced in the data"""
-        print("Media files export completed")
+        """Resolve all media files referenced in the data in parallel, missing files are left out"""
+        file_count, total_bytes = self.media.resolve()
+        self.stats['files_copied'] = file_count
+        self.stats['media_bytes'] = total_bytes
+        
+        print(f"Collected {file_count} media files ({total_bytes} bytes), "
+              f"{self.media.duplicate_references} duplicate references, {len(self.media.missing)} missing")
+        self._send_progress(88, f"Collected {file_count} media files ({round(total_bytes / (1024 * 1024), 2)} MB)")
     
     def _save_export_metadata(self):
         """Save export metadata to the database"""
@@ -1557,51 +1696,38 @@ class UserDataExporter:
         self.conn.commit()
         
         # Also save as JSON file
-        metadata_path = os.path.join(self.export_dir, 'export_metadata.json')
+        metadata_path = os.path.join(self.export_dir, METADATA_MEMBER)
         with open(metadata_path, 'w') as f:
             json.dump({**self.metadata, 'stats': self.stats}, f, indent=2)
         
         print("Export metadata saved")
     
     def _create_archive(self, format_type: str = "zip") -> tuple[str, str]:
-        """Create archive containing all exported data and return path with SHA256 hash"""
+        """
+        Stream the database, metadata and media files into the archive in a single pass
+        and return its path with the SHA256 hash computed while writing
+        """
         import time
-        import hashlib
-        import tarfile
         
-        if format_type == "tar.gz":
-            archive_path = f"{self.export_dir}.tar.gz"
-            
-            with tarfile.open(archive_path, 'w:gz') as tarf:
-                # Add all files in export directory
-                for root, dirs, files in os.walk(self.export_dir):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        arc_path = os.path.relpath(file_path, self.export_dir)
-                        tarf.add(file_path, arcname=arc_path)
-                        
-            print(f"TAR.GZ archive created: {archive_path}")
-            
-        else:  # Default to ZIP
-            archive_path = f"{self.export_dir}.zip"
-            
-            with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                # Add all files in export directory
-                for root, dirs, files in os.walk(self.export_dir):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        arc_path = os.path.relpath(file_path, self.export_dir)
-                        zipf.write(file_path, arc_path)
-            
-            print(f"ZIP archive created: {archive_path}")
+        if format_type not in ARCHIVE_EXTENSIONS:
+            format_type = "zip"
+        archive_path = f"{self.export_dir}{ARCHIVE_EXTENSIONS[format_type]}"
+        metadata_path = os.path.join(self.export_dir, METADATA_MEMBER)
         
-        # Generate SHA256 hash of the archive
-        sha256_hash = hashlib.sha256()
-        with open(archive_path, 'rb') as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(chunk)
+        with ArchiveWriter(archive_path, format_type) as archive:
+            # Database and metadata first so importers find them without scanning the media
+            archive.add_file(self.sqlite_path, SQLITE_MEMBER)
+            if os.path.exists(metadata_path):
+                archive.add_file(metadata_path, METADATA_MEMBER)
+            
+            for entry in self.media.iter_files():
+                try:
+                    archive.add_file(entry.source_path, MEDIA_PREFIX + entry.relative_path.replace(os.sep, '/'))
+                except OSError as e:
+                    self.stats['errors'].append(f"Error adding file {entry.relative_path} to archive: {e}")
         
-        file_hash = sha256_hash.hexdigest()
+        file_hash = archive.sha256
+        print(f"{format_type.upper()} archive created: {archive_path}")
         
         # Create hash file
         hash_file_path = f"{archive_path}.sha256"
@@ -1634,24 +1760,65 @@ class UserDataExporter:
         return archive_path, file_hash
 
 
-def export_user_data_revised(user: User, export_dir: str = None, format_type: str = "zip", progress_callback=None) -> str:
+def export_user_data_revised(user: User, export_dir: str = None, format_type: str = "zip", progress_callback=None, checkpoint: JobCheckpointer = None) -> str:
     """
     REVISED comprehensive function to export ALL user data with accurate field mapping.
     
     Args:
         user: Django User instance to export data for
         export_dir: Optional directory to export to (temp dir if not provided)
-        format_type: Archive format - "zip" or "tar.gz"
+        format_type: Archive format - "zip", "tar.gz", "tar" or "tar.zst"
         progress_callback: Optional callback function for progress updates
+        checkpoint: Optional job checkpoint to record and resume progress with
     
     Returns:
         str: Path to archive file containing exported data
     """
-    exporter = UserDataExporter(user, export_dir, format_type, progress_callback)
+    exporter = UserDataExporter(user, export_dir, format_type, progress_callback, checkpoint=checkpoint)
     return exporter.export_user_data()
 
 
-def export_protocol_data(user: User, protocol_ids: List[int], export_dir: str = None, format_type: str = "zip", progress_callback=None) -> str:
+def export_incremental_data(user: User, profile: str = "default", export_dir: str = None, format_type: str = "zip", progress_callback=None, checkpoint: JobCheckpointer = None) -> str:
+    """
+    Export the protocols, sessions, folders and annotations changed since the last export of
+    this profile, with tombstones for the ones deleted. Without a previous export of the profile
+    a complete export is made. The watermark only moves forward once the archive is written.
+    
+    Args:
+        user: Django User instance to export data for
+        profile: Name of the export profile the watermark is kept for
+        export_dir: Optional directory to export to (temp dir if not provided)
+        format_type: Archive format - "zip", "tar.gz", "tar" or "tar.zst"
+        progress_callback: Optional callback function for progress updates
+        checkpoint: Optional job checkpoint to record and resume progress with
+    
+    Returns:
+        str: Path to archive file containing exported data
+    """
+    watermark = ExportWatermark.objects.filter(user=user, profile=profile).first()
+    
+    exporter = UserDataExporter(
+        user, export_dir, format_type, progress_callback, since=watermark.exported_until if watermark else None,
+        checkpoint=checkpoint
+    )
+    exporter.metadata['export_profile'] = profile
+    # Rows saved while the export runs are picked up again by the next one, a resumed export keeps its start
+    exporter.metadata.setdefault('export_started_at', timezone.now().isoformat())
+    started_at = datetime.fromisoformat(exporter.metadata['export_started_at'])
+    archive_path = exporter.export_user_data()
+    
+    ExportWatermark.objects.update_or_create(
+        user=user, profile=profile,
+        defaults={
+            'exported_until': started_at,
+            'last_export_id': exporter.metadata['export_id'],
+            'last_archive_path': archive_path,
+        }
+    )
+    return archive_path
+
+
+def export_protocol_data(user: User, protocol_ids: List[int], export_dir: str = None, format_type: str = "zip", progress_callback=None, checkpoint: JobCheckpointer = None) -> str:
     """
     Export data specific to selected protocols and their associated data.
     
@@ -1659,8 +1826,9 @@ def export_protocol_data(user: User, protocol_ids: List[int], export_dir: str =
         user: Django User instance to export data for
         protocol_ids: List of protocol IDs to export
         export_dir: Optional directory to export to (temp dir if not provided)
-        format_type: Archive format - "zip" or "tar.gz"
+        format_type: Archive format - "zip", "tar.gz", "tar" or "tar.zst"
         progress_callback: Optional callback function for progress updates
+        checkpoint: Optional job checkpoint to record and resume progress with
     
     Returns:
         str: Path to archive file containing exported protocol data
@@ -1672,7 +1840,7 @@ def export_protocol_data(user: User, protocol_ids: List[int], export_dir: str =
         raise ValueError("No protocols found for the specified IDs or user doesn't own them")
         
     # Create custom exporter for protocol-specific data
-    exporter = UserDataExporter(user, export_dir, format_type, progress_callback)
+    exporter = UserDataExporter(user, export_dir, format_type, progress_callback, checkpoint=checkpoint)
     exporter.metadata['export_type'] = 'protocol_specific'
     exporter.metadata['protocol_ids'] = protocol_ids
     exporter.metadata['protocol_count'] = len(protocol_ids)
@@ -1690,7 +1858,7 @@ def export_protocol_data(user: User, protocol_ids: List[int], export_dir: str =
     return exporter.export_user_data()
 
 
-def export_session_data(user: User, session_ids: List[int], export_dir: str = None, format_type: str = "zip", progress_callback=None) -> str:
+def export_session_data(user: User, session_ids: List[int], export_dir: str = None, format_type: str = "zip", progress_callback=None, checkpoint: JobCheckpointer = None) -> str:
     """
     Export data specific to selected sessions and their associated data.
     
@@ -1698,8 +1866,9 @@ def export_session_data(user: User, session_ids: List[int], export_dir: str = No
         user: Django User instance to export data for  
         session_ids: List of session IDs to export
         export_dir: Optional directory to export to (temp dir if not provided)
-        format_type: Archive format - "zip" or "tar.gz"
+        format_type: Archive format - "zip", "tar.gz", "tar" or "tar.zst"
         progress_callback: Optional callback function for progress updates
+        checkpoint: Optional job checkpoint to record and resume progress with
     
     Returns:
         str: Path to archive file containing exported session data
@@ -1711,7 +1880,7 @@ def export_session_data(user: User, session_ids: List[int], export_dir: str = No
         raise ValueError("No sessions found for the specified IDs or user doesn't own them")
     
     # Create custom exporter for session-specific data
-    exporter = UserDataExporter(user, export_dir, format_type, progress_callback)
+    exporter = UserDataExporter(user, export_dir, format_type, progress_callback, checkpoint=checkpoint)
     exporter.metadata['export_type'] = 'session_specific'
     exporter.metadata['session_ids'] = ",".join([str(s.unique_id) for s in sessions])
     exporter.metadata['session_count'] = len(session_ids)
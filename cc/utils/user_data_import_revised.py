@@ -11,6 +11,9 @@ import shutil
 import zipfile
 import tempfile
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from functools import partial
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Any, Optional, Tuple
@@ -19,10 +22,18 @@ from django.core.files import File
 from django.core.files.storage import default_storage
 from django.conf import settings
 from django.db import transaction, models
+from django.db.models.fields.files import FieldFile
 from django.apps import apps
 from django.utils import timezone
 from django.core.serializers import serialize
 from django.forms.models import model_to_dict
+from simple_history.utils import bulk_create_with_history, bulk_update_with_history
+
+from cc.utils.archive_reader import (
+    ArchiveReader, SQLITE_MEMBER, METADATA_MEMBER, COPY_BUFFER_SIZE, detect_archive_format, safe_destination
+)
+from cc.utils.history import skip_deletion_history
+from cc.utils.job_checkpoint import JobCheckpointer
 
 # Import all relevant models with exact names
 from cc.models import (
@@ -37,7 +48,7 @@ from cc.models import (
     
     # Instrument Models
     Instrument, InstrumentUsage, InstrumentPermission, InstrumentJob,
-    MaintenanceLog, SupportInformation,
+    MaintenanceLog, SupportInformation, InstrumentAvailabilityDay, InstrumentUsageDay,
     
     # Reagent and Storage Models
     Reagent, ProtocolReagent, StepReagent, StoredReagent, StorageObject, 
@@ -65,18 +76,44 @@ from cc.models import (
     WebRTCSession, WebRTCUserChannel, WebRTCUserOffer
 )
 
+# Export tables an incremental archive can update in place: model, id mapping, import option,
+# fields copied from the row and foreign key columns remapped through the id mappings
+INCREMENTAL_TABLES = (
+    ('export_protocols', ProtocolModel, 'protocols', 'protocols',
+     ['protocol_title', 'protocol_description', 'protocol_url', 'protocol_version_uri', 'protocol_doi', 'enabled'],
+     {}),
+    ('export_protocol_sections', ProtocolSection, 'sections', 'protocols',
+     ['section_description', 'section_duration'],
+     {}),
+    ('export_protocol_steps', ProtocolStep, 'steps', 'protocols',
+     ['step_description', 'step_duration', 'original'],
+     {'step_section_id': 'sections', 'previous_step_id': 'steps', 'branch_from_id': 'steps'}),
+    ('export_sessions', Session, 'sessions', 'sessions',
+     ['name', 'enabled', 'processing', 'started_at', 'ended_at'],
+     {}),
+    ('export_annotation_folders', AnnotationFolder, 'folders', 'annotations',
+     ['folder_name', 'is_shared_document_folder'],
+     {'parent_folder_id': 'folders'}),
+    ('export_annotations', Annotation, 'annotations', 'annotations',
+     ['annotation', 'annotation_type', 'annotation_name', 'transcribed', 'transcription', 'language',
+      'translation', 'scratched', 'summary', 'fixed'],
+     {'step_id': 'steps', 'folder_id': 'folders'}),
+)
+
 
 class UserDataImporter:
     """
     COMPLETELY REVISED comprehensive user data importer with exact field mapping
     """
     
-    def __init__(self, target_user: User, import_path: str, import_options: dict = None, progress_callback=None, storage_object_mappings: dict = None, bulk_transfer_mode: bool = False, vault_items: bool = True):
+    def __init__(self, target_user: User, import_path: str, import_options: dict = None, progress_callback=None, storage_object_mappings: dict = None, bulk_transfer_mode: bool = False, vault_items: bool = True, database_path: str = None, checkpoint: JobCheckpointer = None):
         self.target_user = target_user
         self.import_path = import_path
+        # Migrated database used instead of the one in the archive, see ArchiveSchemaMigrator
+        self.database_path = database_path
         self.temp_dir = tempfile.mkdtemp(prefix=f'cupcake_import_{target_user.username}_')
         self.sqlite_path = None
-        self.media_dir = None
+        self.archive_format = None
         self.progress_callback = progress_callback
         self.bulk_transfer_mode = bulk_transfer_mode
         self.vault_items = vault_items
@@ -117,6 +154,12 @@ class UserDataImporter:
             'remote_hosts': {},
         }
         
+        # Incremental archives are applied on top of earlier imports of the same source user
+        self.incremental = False
+        self.updated_annotation_files = {}
+        # Archive rows applied as updates, by table
+        self.incremental_rows = {}
+        
         self.stats = {
             'models_imported': 0,
             'relationships_imported': 0,
@@ -130,6 +173,15 @@ class UserDataImporter:
         # Initialize import tracking
         self.import_tracker = None
         self.import_id = uuid.uuid4()
+        
+        # Export tables are read and written batch_size rows at a time
+        self.batch_size = settings.IMPORT_BATCH_SIZE
+        
+        # Stages are committed one at a time with the job checkpoint, a resumed job skips the finished ones
+        self.checkpoint = checkpoint
+        self._resume_state = checkpoint.state.get('import') if checkpoint and checkpoint.resumed else None
+        # Id mappings as of the last checkpoint, each checkpoint only appends what changed since
+        self._checkpointed_mappings = {}
     
     def _safe_get_row_value(self, row, column_name, default=None):
         """Safely get a value from a sqlite3.Row object
@@ -148,6 +200,54 @@ class UserDataImporter:
         if self.progress_callback:
             self.progress_callback(progress, message, status)
     
+    def _iter_rows(self, query: str, params: tuple = ()):
+        """Yield rows of an export table in chunks of batch_size instead of loading the whole table"""
+        cursor = self.conn.cursor()
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(self.batch_size)
+            if not rows:
+                return
+            yield rows
+    
+    def _table_exists(self, table_name: str) -> bool:
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
+        return cursor.fetchone() is not None
+    
+    def _bulk_create(self, model, objs: list) -> list:
+        """Insert objects in batches, writing history rows in bulk for models with HistoricalRecords"""
+        if not objs:
+            return []
+        if getattr(model._meta, 'simple_history_manager_attribute', None):
+            return bulk_create_with_history(objs, model, batch_size=self.batch_size)
+        return model.objects.bulk_create(objs, batch_size=self.batch_size)
+    
+    def _bulk_update(self, model, objs: list, fields: List[str]):
+        """Update objects in batches, writing history rows in bulk for models with HistoricalRecords"""
+        if not objs:
+            return
+        if getattr(model._meta, 'simple_history_manager_attribute', None):
+            bulk_update_with_history(objs, model, fields, batch_size=self.batch_size)
+        else:
+            model.objects.bulk_update(objs, fields, batch_size=self.batch_size)
+    
+    def _bulk_add_m2m(self, model, field_name: str, pairs) -> List[Tuple[int, int]]:
+        """Insert (owner id, target id) rows into a many-to-many through table, returning the distinct pairs"""
+        pairs = list(dict.fromkeys(pairs))
+        if not pairs:
+            return []
+        field = model._meta.get_field(field_name)
+        through = field.remote_field.through
+        source = field.m2m_field_name()
+        target = field.m2m_reverse_field_name()
+        through.objects.bulk_create(
+            [through(**{f"{source}_id": from_id, f"{target}_id": to_id}) for from_id, to_id in pairs],
+            batch_size=self.batch_size,
+            ignore_conflicts=True
+        )
+        return pairs
+    
     def _initialize_import_tracker(self, metadata: dict = None):
         """Initialize the import tracker to monitor all changes"""
         # Archive must exist - this should fail if missing
@@ -164,85 +264,111 @@ class UserDataImporter:
         )
         print(f"Created import tracker with ID: {self.import_id}")
     
+    def _serialize_tracked_object(self, obj) -> dict:
+        """Serialize the concrete fields of a created object for rollback"""
+        object_data = model_to_dict(obj, fields=[field.name for field in obj._meta.concrete_fields])
+        
+        # Handle non-serializable fields
+        for field_name, field_value in list(object_data.items()):
+            if hasattr(field_value, 'isoformat'):
+                object_data[field_name] = field_value.isoformat()
+            elif isinstance(field_value, uuid.UUID):
+                object_data[field_name] = str(field_value)
+            elif isinstance(field_value, FieldFile):  # Django FieldFile/ImageFieldFile
+                # Store file path or URL instead of the FieldFile object
+                try:
+                    object_data[field_name] = field_value.url if field_value else None
+                except ValueError:
+                    # File doesn't exist, store the name
+                    object_data[field_name] = str(field_value) if field_value else None
+            elif not isinstance(field_value, (str, int, float, bool, type(None), list, dict)):
+                # Convert any other non-serializable objects to string
+                object_data[field_name] = str(field_value)
+        return object_data
+    
     def _track_created_object(self, obj, original_id=None):
         """Track a created object for rollback purposes"""
-        if not self.import_tracker:
+        self._track_created_objects([obj], [original_id])
+    
+    def _track_created_objects(self, objs: list, original_ids: list = None):
+        """Track created objects for rollback with one bulk insert and one tracker update"""
+        if not self.import_tracker or not objs:
             return
+        if original_ids is None:
+            original_ids = [None] * len(objs)
+        
+        records = []
+        for obj, original_id in zip(objs, original_ids):
+            try:
+                records.append(ImportedObject(
+                    import_tracker=self.import_tracker,
+                    model_name=obj.__class__.__name__,
+                    object_id=obj.pk,
+                    original_id=original_id,
+                    object_data=self._serialize_tracked_object(obj)
+                ))
+            except Exception as e:
+                self.stats['errors'].append(f"Failed to track object {obj.__class__.__name__}({obj.pk}): {e}")
         
         try:
-            # Serialize object data for rollback
-            object_data = model_to_dict(obj)
-            
-            # Handle non-serializable fields
-            for field_name, field_value in list(object_data.items()):
-                if hasattr(field_value, 'isoformat'):
-                    object_data[field_name] = field_value.isoformat()
-                elif isinstance(field_value, uuid.UUID):
-                    object_data[field_name] = str(field_value)
-                elif hasattr(field_value, 'url'):  # Django FieldFile/ImageFieldFile
-                    # Store file path or URL instead of the FieldFile object
-                    try:
-                        object_data[field_name] = field_value.url if field_value else None
-                    except ValueError:
-                        # File doesn't exist, store the name
-                        object_data[field_name] = str(field_value) if field_value else None
-                elif not isinstance(field_value, (str, int, float, bool, type(None), list, dict)):
-                    # Convert any other non-serializable objects to string
-                    object_data[field_name] = str(field_value)
-            
-            ImportedObject.objects.create(
-                import_tracker=self.import_tracker,
-                model_name=obj.__class__.__name__,
-                object_id=obj.pk,
-                original_id=original_id,
-                object_data=object_data
-            )
-            
-            self.import_tracker.total_objects_created += 1
-            self.import_tracker.save()
-            
+            ImportedObject.objects.bulk_create(records, batch_size=self.batch_size)
+            self.import_tracker.total_objects_created += len(records)
+            self.import_tracker.save(update_fields=['total_objects_created'])
         except Exception as e:
-            self.stats['errors'].append(f"Failed to track object {obj.__class__.__name__}({obj.pk}): {e}")
+            self.stats['errors'].append(f"Failed to track {len(records)} {objs[0].__class__.__name__} objects: {e}")
     
     def _track_created_file(self, file_path: str, original_name: str):
         """Track a created file for rollback purposes"""
-        if not self.import_tracker:
+        self._track_created_files([(file_path, original_name)])
+    
+    def _track_created_files(self, files: List[Tuple[str, str]]):
+        """Track created (file_path, original_name) files with one bulk insert and one tracker update"""
+        if not self.import_tracker or not files:
             return
         
-        # File must exist - this should fail if missing (no graceful fallback)
-        full_path = os.path.join(settings.MEDIA_ROOT, file_path)
-        file_size = os.path.getsize(full_path)
-        
-        ImportedFile.objects.create(
-            import_tracker=self.import_tracker,
-            file_path=file_path,
-            original_name=original_name,
-            file_size_bytes=file_size
-        )
+        records = []
+        for file_path, original_name in files:
+            # File must exist - this should fail if missing (no graceful fallback)
+            full_path = os.path.join(settings.MEDIA_ROOT, file_path)
+            file_size = os.path.getsize(full_path)
+            records.append(ImportedFile(
+                import_tracker=self.import_tracker,
+                file_path=file_path,
+                original_name=original_name,
+                file_size_bytes=file_size
+            ))
         
-        self.import_tracker.total_files_imported += 1
-        self.import_tracker.save()
+        ImportedFile.objects.bulk_create(records, batch_size=self.batch_size)
+        self.import_tracker.total_files_imported += len(records)
+        self.import_tracker.save(update_fields=['total_files_imported'])
     
     def _track_created_relationship(self, from_obj, to_obj, field_name):
         """Track a many-to-many relationship for rollback purposes"""
-        if not self.import_tracker:
+        self._track_created_relationships(
+            from_obj.__class__.__name__, to_obj.__class__.__name__, field_name, [(from_obj.pk, to_obj.pk)]
+        )
+    
+    def _track_created_relationships(self, from_model: str, to_model: str, field_name: str, pairs: List[Tuple[int, int]]):
+        """Track (from id, to id) many-to-many rows of one field with one bulk insert and one tracker update"""
+        if not self.import_tracker or not pairs:
             return
         
         try:
-            ImportedRelationship.objects.create(
-                import_tracker=self.import_tracker,
-                from_model=from_obj.__class__.__name__,
-                from_object_id=from_obj.pk,
-                to_model=to_obj.__class__.__name__,
-                to_object_id=to_obj.pk,
-                relationship_field=field_name
-            )
-            
-            self.import_tracker.total_relationships_created += 1
-            self.import_tracker.save()
-            
+            ImportedRelationship.objects.bulk_create([
+                ImportedRelationship(
+                    import_tracker=self.import_tracker,
+                    from_model=from_model,
+                    from_object_id=from_id,
+                    to_model=to_model,
+                    to_object_id=to_id,
+                    relationship_field=field_name
+                )
+                for from_id, to_id in pairs
+            ], batch_size=self.batch_size)
+            self.import_tracker.total_relationships_created += len(pairs)
+            self.import_tracker.save(update_fields=['total_relationships_created'])
         except Exception as e:
-            self.stats['errors'].append(f"Failed to track relationship {from_obj.__class__.__name__} -> {to_obj.__class__.__name__}: {e}")
+            self.stats['errors'].append(f"Failed to track relationships {from_model} -> {to_model}: {e}")
     
     def _finalize_import_tracker(self, success: bool):
         """Finalize the import tracker with completion status"""
@@ -250,7 +376,11 @@ class UserDataImporter:
             return
         
         self.import_tracker.import_completed_at = timezone.now()
-        self.import_tracker.import_status = 'completed' if success else 'failed'
+        if not success and self.import_tracker.import_status == 'reverted':
+            # The committed stages were rolled back, keep the reverted status and record the failure
+            self.import_tracker.metadata['import_failed'] = True
+        else:
+            self.import_tracker.import_status = 'completed' if success else 'failed'
         self.import_tracker.save()
         
         print(f"Import tracker finalized. Status: {self.import_tracker.import_status}")
@@ -260,45 +390,22 @@ class UserDataImporter:
     
     def _detect_archive_format(self, file_path: str) -> str:
         """Detect archive format based on file extension and magic bytes"""
-        import tarfile
-        
-        file_path_lower = file_path.lower()
-        
-        # Check file extensions first
-        if file_path_lower.endswith('.zip'):
-            return 'zip'
-        elif file_path_lower.endswith(('.tar.gz', '.tgz')):
-            return 'tar.gz'
-        elif file_path_lower.endswith('.tar'):
-            return 'tar'
-        
-        # If no clear extension, try to detect by content
-        try:
-            if zipfile.is_zipfile(file_path):
-                return 'zip'
-            elif tarfile.is_tarfile(file_path):
-                return 'tar.gz'
-        except Exception:
-            pass
-        
-        # Default fallback
-        raise ValueError(f"Cannot determine archive format for file: {file_path}")
+        return detect_archive_format(file_path)
     
     def _extract_archive(self, archive_path: str, extract_dir: str) -> str:
-        """Extract archive based on detected format"""
-        import tarfile
-        
+        """
+        Extract only the SQLite database and export metadata from the archive.
+        Media members stay in the archive and are streamed by _import_media_files.
+        """
         archive_format = self._detect_archive_format(archive_path)
-        self._send_progress(5, f"Extracting {archive_format} archive...")
-        
-        if archive_format == 'zip':
-            with zipfile.ZipFile(archive_path, 'r') as zip_ref:
-                zip_ref.extractall(extract_dir)
-        elif archive_format in ['tar.gz', 'tar']:
-            with tarfile.open(archive_path, 'r:*') as tar_ref:
-                tar_ref.extractall(extract_dir)
-        else:
-            raise ValueError(f"Unsupported archive format: {archive_format}")
+        self._send_progress(5, f"Reading {archive_format} archive...")
+        
+        with ArchiveReader(archive_path, archive_format) as archive:
+            for member in (SQLITE_MEMBER, METADATA_MEMBER):
+                if member == SQLITE_MEMBER and self.database_path:
+                    shutil.copyfile(self.database_path, os.path.join(extract_dir, member))
+                else:
+                    archive.extract_member(member, os.path.join(extract_dir, member))
         
         return archive_format
     
@@ -321,87 +428,42 @@ class UserDataImporter:
             self._send_progress(10, "Loading and validating metadata...")
             metadata = self._load_and_validate_metadata()
             
-            # Initialize import tracking
-            self._send_progress(12, "Initializing import tracking...")
-            self._initialize_import_tracker(metadata)
+            # Initialize import tracking, a resumed job continues with the tracker of the interrupted run
+            resumed = self._resume_import_tracker()
+            if not resumed:
+                self._send_progress(12, "Initializing import tracking...")
+                self._initialize_import_tracker(metadata)
             
             # Connect to SQLite database
             self._send_progress(15, "Connecting to import database...")
             self._connect_to_import_database()
+            self.incremental = metadata.get('export_mode') == 'incremental'
+            if resumed:
+                self._restore_checkpoint()
             
+            # Without a persisted checkpoint the whole import is one transaction, as a job
+            # every stage commits together with the checkpoint that records it
+            checkpointed = bool(self.checkpoint and self.checkpoint.job_id)
             try:
-                with transaction.atomic():
-                    # Import data in correct dependency order to avoid foreign key constraint violations
-                    
-                    # PHASE 1: Independent base objects (no FK dependencies to other imported models)
-                    if self.import_options.get('lab_groups', True):
-                        self._send_progress(15, "Importing lab groups and remote hosts...")
-                        self._import_remote_hosts()
-                        self._import_lab_groups()
-                    
-                    if self.import_options.get('reagents', True):
-                        self._send_progress(20, "Importing storage objects and reagents...")
-                        self._import_storage_objects()  # Independent
-                        self._import_reagents()  # Independent
-                    
-                    if self.import_options.get('projects', True):
-                        self._send_progress(25, "Importing projects...")
-                        self._import_projects()  # Independent
-                    
-                    if self.import_options.get('instruments', True):
-                        self._send_progress(30, "Importing instruments...")
-                        self._import_instruments_accurate()  # Independent
-                    
-                    # PHASE 2: Protocol hierarchy (ProtocolModel -> ProtocolSection -> ProtocolStep)
-                    if self.import_options.get('protocols', True):
-                        self._send_progress(40, "Importing protocols and structure...")
-                        self._import_protocols_accurate()  # Creates protocols, sections, and steps
-                    
-                    # PHASE 3: Sessions (depends on protocols via many-to-many, but can be created independently)
-                    if self.import_options.get('sessions', True):
-                        self._send_progress(55, "Importing sessions...")
-                        self._import_sessions_accurate()  # Can reference protocols
-                    
-                    # PHASE 4: Dependent storage objects (depends on storage objects and reagents)
-                    if self.import_options.get('reagents', True):
-                        self._send_progress(60, "Importing stored reagents...")
-                        self._import_stored_reagents()  # Depends on StorageObject and Reagent
-                    
-                    # PHASE 5: Annotations and related objects (depend on sessions, steps, stored reagents, instruments)
-                    if self.import_options.get('annotations', True):
-                        self._send_progress(70, "Importing annotations...")
-                        self._import_annotations_accurate()  # Depends on Session, ProtocolStep, StoredReagent, AnnotationFolder
-                    
-                    # PHASE 6: Usage and action objects (depend on annotations and other objects)
-                    self._send_progress(80, "Importing usage and actions...")
-                    if self.import_options.get('instruments', True) and self.import_options.get('annotations', True):
-                        self._import_instrument_usage_and_jobs()  # Depends on Instrument and Annotation
-                    
-                    if self.import_options.get('reagents', True):
-                        self._import_reagent_actions()  # Depends on StoredReagent, Session, StepReagent
-                    
-                    # PHASE 7: Tags and relationships (depend on protocols and steps)
-                    self._send_progress(85, "Importing tags and relationships...")
-                    self._import_tags_and_relationships()  # Depends on ProtocolModel, ProtocolStep
-                    
-                    # PHASE 8: Support models and metadata (depend on annotations and instruments)
-                    if self.import_options.get('support_models', True):
-                        self._send_progress(88, "Importing metadata and support models...")
-                        self._import_metadata_and_support()  # Depends on Annotation, Instrument
-                    
-                    # PHASE 9: Media files (depend on annotations being created)
-                    if self.import_options.get('annotations', True):
-                        self._send_progress(92, "Importing media files...")
-                        self._import_media_files()
-                    else:
-                        print("Skipping media files import (annotations not imported)")
-                    
-                    # PHASE 10: Final relationships and many-to-many
-                    self._send_progress(95, "Finalizing relationships...")
-                    self._import_remaining_relationships()
+                with nullcontext() if checkpointed else transaction.atomic():
+                    for name, progress, message, methods in self._import_stages(metadata):
+                        if self.checkpoint and self.checkpoint.stage_done(name):
+                            continue
+                        if message:
+                            self._send_progress(progress, message)
+                        if name == 'media_files':
+                            # Copied in batches, each batch is checkpointed on its own
+                            self._import_media_files()
+                            continue
+                        with transaction.atomic():
+                            for method in methods:
+                                method()
+                            self._save_checkpoint(name)
             except Exception as e:
                 print(f"Database transaction error during import: {str(e)}")
                 print("Rolling back transaction...")
+                if checkpointed:
+                    self._revert_committed_stages()
                 # Re-raise with better context
                 raise Exception(f"Import failed due to database error: {str(e)}. All changes have been rolled back.")
             
@@ -410,6 +472,8 @@ class UserDataImporter:
             
             # Finalize import tracking
             self._finalize_import_tracker(True)
+            if self.checkpoint:
+                self.checkpoint.finish()
             
             return {
                 'success': True,
@@ -425,6 +489,8 @@ class UserDataImporter:
             
             # Finalize import tracking as failed
             self._finalize_import_tracker(False)
+            if self.checkpoint:
+                self.checkpoint.finish()
             
             return {
                 'success': False,
@@ -435,6 +501,168 @@ class UserDataImporter:
         finally:
             self._cleanup()
     
+    def _import_stages(self, metadata: dict) -> list:
+        """
+        (name, progress, message, methods) of the import stages in dependency order to avoid
+        foreign key constraint violations, only the stages of the selected import options
+        """
+        options = self.import_options
+        stages = []
+        
+        # Incremental archives: update rows imported before, only new rows are created below
+        if self.incremental:
+            stages.append(('incremental_updates', 15, "Applying incremental changes...", [
+                partial(self._load_incremental_base, metadata), self._apply_incremental_updates
+            ]))
+        
+        # PHASE 1: Independent base objects (no FK dependencies to other imported models)
+        if options.get('lab_groups', True):
+            stages.append(('lab_groups', 15, "Importing lab groups and remote hosts...", [
+                self._import_remote_hosts, self._import_lab_groups
+            ]))
+        
+        if options.get('reagents', True):
+            stages.append(('reagents', 20, "Importing storage objects and reagents...", [
+                self._import_storage_objects, self._import_reagents  # Independent
+            ]))
+        
+        if options.get('projects', True):
+            stages.append(('projects', 25, "Importing projects...", [self._import_projects]))
+        
+        if options.get('instruments', True):
+            stages.append(('instruments', 30, "Importing instruments...", [self._import_instruments_accurate]))
+        
+        # PHASE 2: Protocol hierarchy (ProtocolModel -> ProtocolSection -> ProtocolStep)
+        if options.get('protocols', True):
+            stages.append(('protocols', 40, "Importing protocols and structure...", [self._import_protocols_accurate]))
+        
+        # PHASE 3: Sessions (depends on protocols via many-to-many, but can be created independently)
+        if options.get('sessions', True):
+            stages.append(('sessions', 55, "Importing sessions...", [self._import_sessions_accurate]))
+        
+        # PHASE 4: Dependent storage objects (depends on storage objects and reagents)
+        if options.get('reagents', True):
+            stages.append(('stored_reagents', 60, "Importing stored reagents...", [self._import_stored_reagents]))
+        
+        # PHASE 5: Annotations and related objects (depend on sessions, steps, stored reagents, instruments)
+        if options.get('annotations', True):
+            stages.append(('annotations', 70, "Importing annotations...", [self._import_annotations_accurate]))
+        
+        # PHASE 6: Usage and action objects (depend on annotations and other objects)
+        usage = []
+        if options.get('instruments', True) and options.get('annotations', True):
+            usage.append(self._import_instrument_usage_and_jobs)  # Depends on Instrument and Annotation
+        if options.get('reagents', True):
+            usage.append(self._import_reagent_actions)  # Depends on StoredReagent, Session, StepReagent
+        stages.append(('usage_and_actions', 80, "Importing usage and actions...", usage))
+        
+        # PHASE 7: Tags and relationships (depend on protocols and steps)
+        stages.append(('tags', 85, "Importing tags and relationships...", [self._import_tags_and_relationships]))
+        
+        # PHASE 8: Support models and metadata (depend on annotations and instruments)
+        if options.get('support_models', True):
+            stages.append(('support_models', 88, "Importing metadata and support models...", [
+                self._import_metadata_and_support
+            ]))
+        
+        # PHASE 9: Media files (depend on annotations being created)
+        if options.get('annotations', True):
+            stages.append(('media_files', 92, "Importing media files...", [self._import_media_files]))
+        else:
+            print("Skipping media files import (annotations not imported)")
+        
+        # PHASE 10: Final relationships and many-to-many
+        stages.append(('relationships', 95, "Finalizing relationships...", [self._import_remaining_relationships]))
+        
+        # PHASE 11: Deletions recorded by an incremental export
+        if self.incremental:
+            stages.append(('tombstones', None, None, [self._apply_tombstones]))
+        return stages
+    
+    def _save_checkpoint(self, stage: str, completed: bool = True, table_name: str = None, offset: int = 0, **state):
+        """Record the importer state, called inside the transaction of the stage it records"""
+        if self.checkpoint is None:
+            return
+        state['import'] = {
+            'import_id': str(self.import_id),
+            'stats': self.stats,
+            'updated_annotation_files': self.updated_annotation_files,
+            'incremental_rows': self.incremental_rows,
+        }
+        changes = self._id_mapping_changes()
+        if changes:
+            self.checkpoint.append('id_mappings', changes)
+        if completed:
+            self.checkpoint.complete_stage(stage, **state)
+        else:
+            self.checkpoint.save(stage, table_name, offset, **state)
+    
+    def _id_mapping_changes(self) -> Dict[str, Dict[int, Optional[int]]]:
+        """Id mappings added or changed since the last checkpoint, removed ones map to None"""
+        changes = {}
+        for key, mapping in self.id_mappings.items():
+            saved = self._checkpointed_mappings.setdefault(key, {})
+            changed = {
+                original_id: object_id for original_id, object_id in mapping.items()
+                if saved.get(original_id) != object_id
+            }
+            saved.update(changed)
+            for original_id in saved.keys() - mapping.keys():
+                del saved[original_id]
+                changed[original_id] = None
+            if changed:
+                changes[key] = changed
+        return changes
+    
+    def _resume_import_tracker(self) -> bool:
+        """Pick up the tracker of the interrupted run of this job"""
+        if not self._resume_state:
+            return False
+        self.import_tracker = ImportTracker.objects.filter(
+            import_id=self._resume_state['import_id'], import_status='in_progress'
+        ).first()
+        if self.import_tracker is None:
+            self._resume_state = None
+            self.checkpoint.finish()
+            return False
+        self.import_id = self.import_tracker.import_id
+        print(f"Resuming import {self.import_id} after stage {self.checkpoint.stage}")
+        return True
+    
+    def _restore_checkpoint(self):
+        """
+        Restore the state of the finished stages. The database was extracted again, so the
+        rows applied as incremental updates are dropped from it once more.
+        """
+        state = self._resume_state
+        # JSON turned the original ids into strings
+        for changes in self.checkpoint.entries('id_mappings'):
+            for key, changed in changes.items():
+                mapping = self.id_mappings.setdefault(key, {})
+                for original_id, object_id in changed.items():
+                    if object_id is None:
+                        mapping.pop(int(original_id), None)
+                    else:
+                        mapping[int(original_id)] = object_id
+        self._checkpointed_mappings = {key: dict(mapping) for key, mapping in self.id_mappings.items()}
+        self.stats = state['stats']
+        self.updated_annotation_files = state['updated_annotation_files']
+        self.incremental_rows = state['incremental_rows']
+        for table, row_ids in self.incremental_rows.items():
+            for start in range(0, len(row_ids), self.batch_size):
+                batch = row_ids[start:start + self.batch_size]
+                self.conn.execute(f"DELETE FROM {table} WHERE id IN ({','.join('?' * len(batch))})", batch)
+        self.conn.commit()
+    
+    def _revert_committed_stages(self):
+        """Undo the stages a failing job had already committed, using the import tracker"""
+        if not self.import_tracker:
+            return
+        self.import_tracker.refresh_from_db()
+        result = ImportReverter(self.import_tracker, self.target_user).revert_import()
+        if not result['success']:
+            self.stats['errors'].append(f"Rollback of committed stages failed: {result.get('error')}")
+    
     def _extract_and_validate_archive(self):
         """Extract archive (ZIP or TAR.GZ) and validate structure"""
         if not os.path.exists(self.import_path):
@@ -443,13 +671,13 @@ class UserDataImporter:
         # Detect and extract archive format
         try:
             archive_format = self._extract_archive(self.import_path, self.temp_dir)
-            print(f"Extracted {archive_format} archive successfully")
+            print(f"Extracted database from {archive_format} archive successfully")
         except Exception as e:
             raise ValueError(f"Failed to extract archive: {e}")
         
         # Set paths
-        self.sqlite_path = os.path.join(self.temp_dir, 'user_data.sqlite')
-        self.media_dir = os.path.join(self.temp_dir, 'media')
+        self.archive_format = archive_format
+        self.sqlite_path = os.path.join(self.temp_dir, SQLITE_MEMBER)
         
         # Validate required files
         if not os.path.exists(self.sqlite_path):
@@ -477,246 +705,373 @@ class UserDataImporter:
         self.conn.row_factory = sqlite3.Row  # Enable column access by name
         print("Connected to import database")
     
+    def _load_incremental_base(self, metadata: dict):
+        """Load the id mappings of earlier completed imports from the same source user"""
+        trackers = ImportTracker.objects.filter(
+            user=self.target_user,
+            import_status='completed',
+            metadata__source_user_id=metadata.get('source_user_id'),
+        ).exclude(import_id=self.import_id)
+        models_by_name = {model.__name__: (model, key) for _, model, key, _, _, _ in INCREMENTAL_TABLES}
+        
+        # Later imports win when the same original row was imported more than once
+        loaded = {}
+        records = ImportedObject.objects.filter(
+            import_tracker__in=trackers, model_name__in=models_by_name.keys(), original_id__isnull=False
+        ).order_by('import_tracker__import_started_at', 'id').values_list('model_name', 'original_id', 'object_id')
+        for model_name, original_id, object_id in records.iterator():
+            loaded.setdefault(model_name, {})[original_id] = object_id
+        
+        # Objects deleted locally since then are created again
+        for model_name, mapping in loaded.items():
+            model, key = models_by_name[model_name]
+            object_ids = list(mapping.values())
+            existing = set()
+            for start in range(0, len(object_ids), self.batch_size):
+                existing.update(model.objects.filter(
+                    id__in=object_ids[start:start + self.batch_size]
+                ).values_list('id', flat=True))
+            self.id_mappings.setdefault(key, {}).update(
+                {original_id: object_id for original_id, object_id in mapping.items() if object_id in existing}
+            )
+        print(f"Loaded {sum(len(mapping) for mapping in loaded.values())} objects of earlier imports")
+    
+    def _apply_incremental_updates(self):
+        """
+        Update the objects imported earlier from the changed rows of an incremental archive and drop
+        those rows from the archive database, so the table importers only create the new ones
+        """
+        self.stats['objects_updated'] = 0
+        # Same marking as the table importers apply to newly created objects
+        marked_fields = {ProtocolModel: 'protocol_title', Session: 'name', Annotation: 'annotation_name'}
+        for table, model, key, option, fields, foreign_keys in INCREMENTAL_TABLES:
+            if not self.import_options.get(option, True) or not self._table_exists(table):
+                continue
+            mapping = self.id_mappings.get(key, {})
+            updated_rows = []
+            for rows in self._iter_rows(f"SELECT * FROM {table}"):
+                rows = [row for row in rows if row['id'] in mapping]
+                objects = model.objects.in_bulk([mapping[row['id']] for row in rows])
+                changed = []
+                for row in rows:
+                    obj = objects.get(mapping[row['id']])
+                    if obj is None:
+                        continue
+                    for name in fields:
+                        setattr(obj, name, model._meta.get_field(name).to_python(self._safe_get_row_value(row, name)))
+                    for column, mapping_key in foreign_keys.items():
+                        original_id = self._safe_get_row_value(row, column)
+                        if original_id is None:
+                            setattr(obj, column, None)
+                        elif original_id in self.id_mappings.get(mapping_key, {}):
+                            setattr(obj, column, self.id_mappings[mapping_key][original_id])
+                    marked_field = marked_fields.get(model)
+                    value = getattr(obj, marked_field) if marked_field else None
+                    if value and not value.startswith('[IMPORTED]'):
+                        setattr(obj, marked_field, f"[IMPORTED] {value}")
+                    if model is Annotation and row['file']:
+                        self.updated_annotation_files.setdefault(os.path.basename(row['file']), []).append(obj.id)
+                    changed.append(obj)
+                    updated_rows.append(row['id'])
+                
+                update_fields = fields + [column[:-len('_id')] for column in foreign_keys]
+                if model is ProtocolModel:
+                    # Saved one at a time: post_save recomputes the protocol hash
+                    for obj in changed:
+                        obj.save(update_fields=update_fields)
+                else:
+                    self._bulk_update(model, changed, update_fields)
+            
+            for start in range(0, len(updated_rows), self.batch_size):
+                batch = updated_rows[start:start + self.batch_size]
+                self.conn.execute(f"DELETE FROM {table} WHERE id IN ({','.join('?' * len(batch))})", batch)
+            self.conn.commit()
+            self.incremental_rows[table] = updated_rows
+            self.stats['objects_updated'] += len(updated_rows)
+        print(f"Updated {self.stats['objects_updated']} objects from earlier imports")
+    
+    def _apply_tombstones(self):
+        """Delete the objects of earlier imports that an incremental export recorded as deleted at the source"""
+        self.stats['objects_deleted'] = 0
+        if not self._table_exists('export_tombstones'):
+            return
+        tables = {table: (model, key, option) for table, model, key, option, _, _ in INCREMENTAL_TABLES}
+        for rows in self._iter_rows("SELECT table_name, original_id FROM export_tombstones"):
+            ids_by_table = {}
+            for row in rows:
+                if row['table_name'] not in tables:
+                    continue
+                model, key, option = tables[row['table_name']]
+                if not self.import_options.get(option, True):
+                    continue
+                object_id = self.id_mappings.get(key, {}).pop(row['original_id'], None)
+                if object_id is not None:
+                    ids_by_table.setdefault(row['table_name'], []).append(object_id)
+            for table, object_ids in ids_by_table.items():
+                model = tables[table][0]
+                _, deleted = model.objects.filter(id__in=object_ids).delete()
+                self.stats['objects_deleted'] += deleted.get(model._meta.label, 0)
+        print(f"Deleted {self.stats['objects_deleted']} objects removed at the source")
+    
     def _import_remote_hosts(self):
         """Import remote hosts (needed for foreign keys)"""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM export_remote_hosts")
-        
-        for row in cursor.fetchall():
-            # Create or get existing remote host
-            remote_host, created = RemoteHost.objects.get_or_create(
-                host_name=row['host_name'],
-                defaults={
-                    'host_port': row['host_port'],
-                    'host_protocol': row['host_protocol'],
-                    'host_description': row['host_description'],
-                    'host_token': row['host_token'],
-                }
-            )
+        for rows in self._iter_rows("SELECT * FROM export_remote_hosts"):
+            existing = {
+                host.host_name: host
+                for host in RemoteHost.objects.filter(host_name__in=[row['host_name'] for row in rows])
+            }
+            pending = {}
+            for row in rows:
+                if row['host_name'] not in existing and row['host_name'] not in pending:
+                    pending[row['host_name']] = RemoteHost(
+                        host_name=row['host_name'],
+                        host_port=row['host_port'],
+                        host_protocol=row['host_protocol'],
+                        host_description=row['host_description'],
+                        host_token=row['host_token'],
+                    )
+            self._bulk_create(RemoteHost, list(pending.values()))
+            existing.update(pending)
             
-            self.id_mappings['remote_hosts'][row['id']] = remote_host.id
+            for row in rows:
+                self.id_mappings['remote_hosts'][row['id']] = existing[row['host_name']].id
         
         print("Imported remote hosts")
         self.stats['models_imported'] += 1
     
     def _import_lab_groups(self):
         """Import lab groups"""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM export_lab_groups")
-        
-        for row in cursor.fetchall():
-            # Create lab group (admin privilege required)
-            lab_group = LabGroup.objects.create(
-                name=f"{row['name']}_imported_{self.target_user.username}",
-                description=row['description'],
-                can_perform_ms_analysis=bool(row['can_perform_ms_analysis']),
-                # Note: default_storage_id and service_storage_id will be set later
-            )
+        for rows in self._iter_rows("SELECT * FROM export_lab_groups"):
+            # Create lab groups (admin privilege required)
+            lab_groups = self._bulk_create(LabGroup, [
+                LabGroup(
+                    name=f"{row['name']}_imported_{self.target_user.username}",
+                    description=row['description'],
+                    can_perform_ms_analysis=bool(row['can_perform_ms_analysis']),
+                    # Note: default_storage_id and service_storage_id will be set later
+                )
+                for row in rows
+            ])
             
-            # Add target user to the lab group
-            lab_group.users.add(self.target_user)
+            # Add target user to the lab groups
+            self._bulk_add_m2m(LabGroup, 'users', [(lab_group.id, self.target_user.id) for lab_group in lab_groups])
             
-            self.id_mappings['lab_groups'][row['id']] = lab_group.id
+            for row, lab_group in zip(rows, lab_groups):
+                self.id_mappings['lab_groups'][row['id']] = lab_group.id
         
         print("Imported lab groups")
         self.stats['models_imported'] += 1
     
     def _import_storage_objects(self):
         """Import storage objects"""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM export_storage_objects")
-        
-        for row in cursor.fetchall():
-            # Create storage object with vaulting
-            storage_object_data = {
-                'object_type': row['object_type'],
-                'object_name': row['object_name'],
-                'object_description': row['object_description'],
-                'png_base64': row['png_base64'],
-                'user': self.target_user,
-                # stored_at_id will be handled later for self-references
-            }
-            
-            # Apply vaulting if enabled and not in bulk transfer mode
-            if self.vault_items and not self.bulk_transfer_mode:
-                storage_object_data['is_vaulted'] = True
-            
-            storage_object = StorageObject.objects.create(**storage_object_data)
+        for rows in self._iter_rows("SELECT * FROM export_storage_objects"):
+            storage_objects = []
+            for row in rows:
+                # Create storage object with vaulting
+                storage_object = StorageObject(
+                    object_type=row['object_type'],
+                    object_name=row['object_name'],
+                    object_description=row['object_description'],
+                    png_base64=row['png_base64'],
+                    user=self.target_user,
+                    # stored_at_id will be handled later for self-references
+                )
+                
+                # Apply vaulting if enabled and not in bulk transfer mode
+                if self.vault_items and not self.bulk_transfer_mode:
+                    storage_object.is_vaulted = True
+                storage_objects.append(storage_object)
             
-            self.id_mappings['storage_objects'][row['id']] = storage_object.id
+            for row, storage_object in zip(rows, self._bulk_create(StorageObject, storage_objects)):
+                self.id_mappings['storage_objects'][row['id']] = storage_object.id
         
         print("Imported storage objects")
         self.stats['models_imported'] += 1
     
     def _import_reagents(self):
         """Import reagents - behavior depends on bulk_transfer_mode"""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM export_reagents")
-        
         imported_count = 0
         skipped_count = 0
         
-        for row in cursor.fetchall():
-            if self.bulk_transfer_mode:
-                # In bulk transfer mode, always import reagents as-is
-                reagent_name = row['name'] or "Imported Reagent"
-                
-                reagent = Reagent.objects.create(
-                    name=reagent_name,
-                    unit=row['unit']
-                )
+        # Reagents created by this import, keyed by (name, unit), so later rows can reuse them like existing ones
+        created_reagents = {}
+        
+        for rows in self._iter_rows("SELECT * FROM export_reagents"):
+            existing = {}
+            if not self.bulk_transfer_mode:
+                for reagent in Reagent.objects.filter(name__in={row['name'] for row in rows}).order_by('-id'):
+                    existing[(reagent.name, reagent.unit)] = reagent
+            
+            new_reagents = []
+            new_original_ids = []
+            pending_mappings = []
+            for row in rows:
+                if self.bulk_transfer_mode:
+                    # In bulk transfer mode, always import reagents as-is
+                    reagent = Reagent(name=row['name'] or "Imported Reagent", unit=row['unit'])
+                    new_reagents.append(reagent)
+                    new_original_ids.append(row['id'])
+                    pending_mappings.append((row['id'], reagent))
+                    continue
                 
-                # Track created reagent
-                self._track_created_object(reagent, row['id'])
-                self.id_mappings['reagents'][row['id']] = reagent.id
-                imported_count += 1
-            else:
                 # User-centric mode: check if reagent already exists (by name and unit)
-                existing_reagent = Reagent.objects.filter(
-                    name=row['name'],
-                    unit=row['unit']
-                ).first()
-                
+                key = (row['name'], row['unit'])
+                existing_reagent = existing.get(key) or created_reagents.get(key)
                 if existing_reagent:
                     # Use existing reagent
-                    self.id_mappings['reagents'][row['id']] = existing_reagent.id
+                    pending_mappings.append((row['id'], existing_reagent))
                     skipped_count += 1
                     self.stats.setdefault('skipped_reagents', []).append(
                         f"Reagent '{row['name']}' ({row['unit']}) already exists - using existing"
                     )
-                else:
-                    # Create new reagent with import marking
-                    reagent_name = row['name']
-                    if reagent_name and not reagent_name.startswith('[IMPORTED]'):
-                        reagent_name = f"[IMPORTED] {reagent_name}"
-                    
-                    reagent = Reagent.objects.create(
-                        name=reagent_name,
-                        unit=row['unit']
-                    )
-                    
-                    # Track created reagent
-                    self._track_created_object(reagent, row['id'])
-                    self.id_mappings['reagents'][row['id']] = reagent.id
-                    imported_count += 1
+                    continue
+                
+                # Create new reagent with import marking
+                reagent_name = row['name']
+                if reagent_name and not reagent_name.startswith('[IMPORTED]'):
+                    reagent_name = f"[IMPORTED] {reagent_name}"
+                reagent = Reagent(name=reagent_name, unit=row['unit'])
+                created_reagents[(reagent_name, row['unit'])] = reagent
+                new_reagents.append(reagent)
+                new_original_ids.append(row['id'])
+                pending_mappings.append((row['id'], reagent))
+            
+            self._bulk_create(Reagent, new_reagents)
+            # Track created reagents
+            self._track_created_objects(new_reagents, new_original_ids)
+            for original_id, reagent in pending_mappings:
+                self.id_mappings['reagents'][original_id] = reagent.id
+            imported_count += len(new_reagents)
         
         print(f"Imported {imported_count} reagents, skipped {skipped_count} existing reagents")
         self.stats['models_imported'] += 1
     
     def _import_stored_reagents(self):
         """Import stored reagents - behavior depends on bulk_transfer_mode"""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM export_stored_reagents")
-        
         imported_count = 0
         skipped_count = 0
         
-        for row in cursor.fetchall():
-            reagent_id = row['reagent_id']
-            original_storage_id = row['storage_object_id']
-            
-            # Check if we have mappings for reagent
-            if reagent_id not in self.id_mappings.get('reagents', {}):
-                skipped_count += 1
-                self.stats.setdefault('skipped_stored_reagents', []).append(
-                    f"Stored reagent skipped - reagent ID {reagent_id} not found"
-                )
-                continue
-            
-            if self.bulk_transfer_mode:
-                # In bulk transfer mode, use original storage objects as-is
-                target_storage_id = self.id_mappings.get('storage_objects', {}).get(original_storage_id)
-                if not target_storage_id:
-                    skipped_count += 1
-                    self.stats.setdefault('skipped_stored_reagents', []).append(
-                        f"Stored reagent skipped - storage object {original_storage_id} not imported"
-                    )
-                    continue
+        # Access checks for nominated storage objects, resolved once per storage object
+        nominated_storage_access = {}
+        
+        for rows in self._iter_rows("SELECT * FROM export_stored_reagents"):
+            created_stored_reagents = []
+            created_original_ids = []
+            for row in rows:
+                reagent_id = row['reagent_id']
+                original_storage_id = row['storage_object_id']
                 
-                notes = row['notes'] or "Imported Stored Reagent"
-            else:
-                # User-centric mode: require storage object nomination
-                if not hasattr(self, 'storage_object_mappings') or not self.storage_object_mappings:
-                    # Don't return early, just skip this item and log the issue
-                    skipped_count += 1
-                    self.stats.setdefault('skipped_stored_reagents', []).append(
-                        f"Stored reagent skipped - no storage object mappings provided"
-                    )
-                    continue
-
-                # Get the user-nominated storage object for this original storage
-                nominated_storage_id = self.storage_object_mappings.get(str(original_storage_id))
-                if not nominated_storage_id:
+                # Check if we have mappings for reagent
+                if reagent_id not in self.id_mappings.get('reagents', {}):
                     skipped_count += 1
                     self.stats.setdefault('skipped_stored_reagents', []).append(
-                        f"Stored reagent skipped - no storage object nominated for original storage {original_storage_id}"
+                        f"Stored reagent skipped - reagent ID {reagent_id} not found"
                     )
                     continue
                 
-                # Verify the nominated storage object exists and user has access
-                try:
-                    storage_obj = StorageObject.objects.get(id=nominated_storage_id)
-                    # Check if user has access to this storage object (via ownership or lab group membership)
-                    has_access = (storage_obj.user == self.target_user or 
-                                storage_obj.access_lab_groups.filter(users=self.target_user).exists())
+                if self.bulk_transfer_mode:
+                    # In bulk transfer mode, use original storage objects as-is
+                    target_storage_id = self.id_mappings.get('storage_objects', {}).get(original_storage_id)
+                    if not target_storage_id:
+                        skipped_count += 1
+                        self.stats.setdefault('skipped_stored_reagents', []).append(
+                            f"Stored reagent skipped - storage object {original_storage_id} not imported"
+                        )
+                        continue
+                    
+                    notes = row['notes'] or "Imported Stored Reagent"
+                else:
+                    # User-centric mode: require storage object nomination
+                    if not hasattr(self, 'storage_object_mappings') or not self.storage_object_mappings:
+                        # Don't return early, just skip this item and log the issue
+                        skipped_count += 1
+                        self.stats.setdefault('skipped_stored_reagents', []).append(
+                            f"Stored reagent skipped - no storage object mappings provided"
+                        )
+                        continue
+                    
+                    # Get the user-nominated storage object for this original storage
+                    nominated_storage_id = self.storage_object_mappings.get(str(original_storage_id))
+                    if not nominated_storage_id:
+                        skipped_count += 1
+                        self.stats.setdefault('skipped_stored_reagents', []).append(
+                            f"Stored reagent skipped - no storage object nominated for original storage {original_storage_id}"
+                        )
+                        continue
+                    
+                    # Verify the nominated storage object exists and user has access
+                    if nominated_storage_id not in nominated_storage_access:
+                        try:
+                            storage_obj = StorageObject.objects.get(id=nominated_storage_id)
+                            # Check if user has access to this storage object (via ownership or lab group membership)
+                            nominated_storage_access[nominated_storage_id] = (
+                                storage_obj.user == self.target_user or
+                                storage_obj.access_lab_groups.filter(users=self.target_user).exists()
+                            )
+                        except StorageObject.DoesNotExist:
+                            nominated_storage_access[nominated_storage_id] = None
+                    
+                    has_access = nominated_storage_access[nominated_storage_id]
+                    if has_access is None:
+                        skipped_count += 1
+                        self.stats.setdefault('skipped_stored_reagents', []).append(
+                            f"Stored reagent skipped - nominated storage object {nominated_storage_id} does not exist"
+                        )
+                        continue
                     if not has_access:
                         skipped_count += 1
                         self.stats.setdefault('skipped_stored_reagents', []).append(
                             f"Stored reagent skipped - no access to nominated storage object {nominated_storage_id}"
                         )
                         continue
-                except StorageObject.DoesNotExist:
-                    skipped_count += 1
-                    self.stats.setdefault('skipped_stored_reagents', []).append(
-                        f"Stored reagent skipped - nominated storage object {nominated_storage_id} does not exist"
-                    )
-                    continue
+                    
+                    target_storage_id = nominated_storage_id
+                    notes = f"[IMPORTED] {row['notes']}" if row['notes'] else "[IMPORTED] Stored Reagent"
                 
-                target_storage_id = nominated_storage_id
-                notes = f"[IMPORTED] {row['notes']}" if row['notes'] else "[IMPORTED] Stored Reagent"
-            
-            # Create the stored reagent with vaulting
-            stored_reagent_data = {
-                'reagent_id': self.id_mappings['reagents'][reagent_id],
-                'storage_object_id': target_storage_id,
-                'quantity': row['quantity'],
-                'notes': notes,
-                'barcode': row['barcode'],
-                'png_base64': row['png_base64'],
-                'shareable': bool(row['shareable']) if row['shareable'] is not None else True,
-                'user': self.target_user,
-                # Add other fields as needed from the export schema
-            }
-            
-            # Apply vaulting if enabled and not in bulk transfer mode
-            if self.vault_items and not self.bulk_transfer_mode:
-                stored_reagent_data['is_vaulted'] = True
-                stored_reagent_data['shareable'] = False  # Vault items are not shareable by default
-                stored_reagent_data['access_all'] = False
-            
-            stored_reagent = StoredReagent.objects.create(**stored_reagent_data)
+                # Create the stored reagent with vaulting
+                stored_reagent_data = {
+                    'reagent_id': self.id_mappings['reagents'][reagent_id],
+                    'storage_object_id': target_storage_id,
+                    'quantity': row['quantity'],
+                    'notes': notes,
+                    'barcode': row['barcode'],
+                    'png_base64': row['png_base64'],
+                    'shareable': bool(row['shareable']) if row['shareable'] is not None else True,
+                    'user': self.target_user,
+                    # Add other fields as needed from the export schema
+                }
+                
+                # Apply vaulting if enabled and not in bulk transfer mode
+                if self.vault_items and not self.bulk_transfer_mode:
+                    stored_reagent_data['is_vaulted'] = True
+                    stored_reagent_data['shareable'] = False  # Vault items are not shareable by default
+                    stored_reagent_data['access_all'] = False
+                
+                # Created one at a time: post_save creates the default folders and the owner subscription
+                stored_reagent = StoredReagent.objects.create(**stored_reagent_data)
+                created_stored_reagents.append(stored_reagent)
+                created_original_ids.append(row['id'])
+                self.id_mappings.setdefault('stored_reagents', {})[row['id']] = stored_reagent.id
+                imported_count += 1
             
-            # Track created stored reagent
-            self._track_created_object(stored_reagent, row['id'])
-            self.id_mappings.setdefault('stored_reagents', {})[row['id']] = stored_reagent.id
-            imported_count += 1
+            # Track created stored reagents
+            self._track_created_objects(created_stored_reagents, created_original_ids)
         
         print(f"Imported {imported_count} stored reagents, skipped {skipped_count} stored reagents")
         self.stats['models_imported'] += 1
     
     def _import_reagent_actions(self):
         """Import reagent actions and assign to target user"""
-        cursor = self.conn.cursor()
-        
-        try:
-            cursor.execute("SELECT * FROM export_reagent_actions")
-        except sqlite3.OperationalError:
+        if not self._table_exists("export_reagent_actions"):
             print("No reagent actions table found, skipping reagent actions import")
             return
         
         imported_count = 0
-        for row in cursor.fetchall():
-            try:
+        affected_reagent_ids = set()
+        for rows in self._iter_rows("SELECT * FROM export_reagent_actions"):
+            reagent_actions = []
+            original_ids = []
+            for row in rows:
                 # Map foreign key relationships
                 reagent_id = self.id_mappings['stored_reagents'].get(row['reagent_id'])
                 step_reagent_id = self.id_mappings.get('step_reagents', {}).get(row['step_reagent_id']) if row['step_reagent_id'] else None
@@ -728,7 +1083,7 @@ class UserDataImporter:
                     continue
                 
                 # Create reagent action - ALWAYS assign to target user as requested
-                reagent_action = ReagentAction.objects.create(
+                reagent_actions.append(ReagentAction(
                     action_type=row['action_type'],
                     quantity=row['quantity'],
                     notes=row['notes'] if row['notes'] else '',
@@ -738,111 +1093,127 @@ class UserDataImporter:
                     session_id=session_id,
                     created_at=row['created_at'],
                     updated_at=row['updated_at']
-                )
-                
-                # Track created object for potential rollback
-                self._track_created_object(reagent_action, row['id'])
-                
-                # Map the ID for any future relationships
-                self.id_mappings['reagent_actions'][row['id']] = reagent_action.id
-                imported_count += 1
-                
+                ))
+                original_ids.append(row['id'])
+            
+            try:
+                self._bulk_create(ReagentAction, reagent_actions)
             except Exception as e:
-                print(f"Error importing reagent action {row['id']}: {e}")
+                print(f"Error importing reagent actions: {e}")
                 self.stats['errors'].append(f"ReagentAction import error: {e}")
+                continue
+            
+            # Track created objects for potential rollback
+            self._track_created_objects(reagent_actions, original_ids)
+            
+            # Map the IDs for any future relationships
+            for original_id, reagent_action in zip(original_ids, reagent_actions):
+                self.id_mappings['reagent_actions'][original_id] = reagent_action.id
+                affected_reagent_ids.add(reagent_action.reagent_id)
+            imported_count += len(reagent_actions)
+        
+        # Bulk inserts skip post_save, so run the stock and expiry checks once per affected reagent
+        for stored_reagent in StoredReagent.objects.filter(id__in=affected_reagent_ids):
+            stored_reagent.check_low_stock()
+            stored_reagent.check_expiration()
         
         print(f"Imported {imported_count} reagent actions")
         self.stats['models_imported'] += 1
     
     def _import_projects(self):
         """Import projects"""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM export_projects")
-        
-        for row in cursor.fetchall():
-            # Create project with vaulting
-            project_data = {
-                'project_name': row['project_name'],
-                'project_description': row['project_description'],
-                'owner': self.target_user,
-            }
-            
-            # Apply vaulting if enabled and not in bulk transfer mode
-            if self.vault_items and not self.bulk_transfer_mode:
-                project_data['is_vaulted'] = True
-            
-            project = Project.objects.create(**project_data)
+        for rows in self._iter_rows("SELECT * FROM export_projects"):
+            projects = []
+            for row in rows:
+                # Create project with vaulting
+                project = Project(
+                    project_name=row['project_name'],
+                    project_description=row['project_description'],
+                    owner=self.target_user,
+                )
+                
+                # Apply vaulting if enabled and not in bulk transfer mode
+                if self.vault_items and not self.bulk_transfer_mode:
+                    project.is_vaulted = True
+                projects.append(project)
             
-            self.id_mappings['projects'][row['id']] = project.id
+            for row, project in zip(rows, self._bulk_create(Project, projects)):
+                self.id_mappings['projects'][row['id']] = project.id
         
         print("Imported projects")
         self.stats['models_imported'] += 1
     
     def _import_protocols_accurate(self):
         """Import protocols with exact field mapping"""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM export_protocols")
-        
         print("Importing protocols...")
         
-        for row in cursor.fetchall():
-            # Add import marking to protocol title
-            protocol_title = row['protocol_title']
-            if protocol_title and not protocol_title.startswith('[IMPORTED]'):
-                protocol_title = f"[IMPORTED] {protocol_title}"
-            elif not protocol_title:
-                protocol_title = "[IMPORTED] Protocol"
-            
-            # Create protocol with exact field mapping and vaulting
-            protocol_data = {
-                'protocol_id': row['protocol_id'],
-                'protocol_title': protocol_title,  # Exact field name
-                'protocol_description': row['protocol_description'],
-                'protocol_url': row['protocol_url'],
-                'protocol_version_uri': row['protocol_version_uri'],
-                'protocol_created_on': datetime.fromisoformat(row['protocol_created_on']) if row['protocol_created_on'] else timezone.now(),
-                'protocol_doi': row['protocol_doi'],
-                'enabled': bool(row['enabled']),
-                'model_hash': row['model_hash'],
-                'user': self.target_user,
-                # remote_host will be set later if needed
-            }
-            
-            # Apply vaulting if enabled and not in bulk transfer mode
-            if self.vault_items and not self.bulk_transfer_mode:
-                protocol_data['is_vaulted'] = True
-            
-            protocol = ProtocolModel.objects.create(**protocol_data)
-            
-            # Track created object
-            self._track_created_object(protocol, row['id'])
+        for rows in self._iter_rows("SELECT * FROM export_protocols"):
+            protocols = []
+            original_ids = []
+            for row in rows:
+                # Add import marking to protocol title
+                protocol_title = row['protocol_title']
+                if protocol_title and not protocol_title.startswith('[IMPORTED]'):
+                    protocol_title = f"[IMPORTED] {protocol_title}"
+                elif not protocol_title:
+                    protocol_title = "[IMPORTED] Protocol"
+                
+                # Create protocol with exact field mapping and vaulting
+                protocol_data = {
+                    'protocol_id': row['protocol_id'],
+                    'protocol_title': protocol_title,  # Exact field name
+                    'protocol_description': row['protocol_description'],
+                    'protocol_url': row['protocol_url'],
+                    'protocol_version_uri': row['protocol_version_uri'],
+                    'protocol_created_on': datetime.fromisoformat(row['protocol_created_on']) if row['protocol_created_on'] else timezone.now(),
+                    'protocol_doi': row['protocol_doi'],
+                    'enabled': bool(row['enabled']),
+                    'model_hash': row['model_hash'],
+                    'user': self.target_user,
+                    # remote_host will be set later if needed
+                }
+                
+                # Apply vaulting if enabled and not in bulk transfer mode
+                if self.vault_items and not self.bulk_transfer_mode:
+                    protocol_data['is_vaulted'] = True
+                
+                # Created one at a time: post_save computes the protocol hash
+                protocol = ProtocolModel.objects.create(**protocol_data)
+                protocols.append(protocol)
+                original_ids.append(row['id'])
+                self.id_mappings['protocols'][row['id']] = protocol.id
             
-            self.id_mappings['protocols'][row['id']] = protocol.id
+            # Track created objects
+            self._track_created_objects(protocols, original_ids)
         
         # Import protocol sections
-        cursor.execute("SELECT * FROM export_protocol_sections")
-        for row in cursor.fetchall():
-            if row['protocol_id'] in self.id_mappings['protocols']:
-                section = ProtocolSection.objects.create(
+        for rows in self._iter_rows("SELECT * FROM export_protocol_sections"):
+            rows = [row for row in rows if row['protocol_id'] in self.id_mappings['protocols']]
+            sections = self._bulk_create(ProtocolSection, [
+                ProtocolSection(
                     section_description=row['section_description'],
                     section_duration=row['section_duration'],
                     protocol_id=self.id_mappings['protocols'][row['protocol_id']],
                 )
-                self._track_created_object(section, row['id'])
-                # Track section ID mapping for step references
+                for row in rows
+            ])
+            self._track_created_objects(sections, [row['id'] for row in rows])
+            # Track section ID mapping for step references
+            for row, section in zip(rows, sections):
                 self.id_mappings.setdefault('sections', {})[row['id']] = section.id
         
         # Import protocol steps
-        cursor.execute("SELECT * FROM export_protocol_steps")
-        step_mapping = {}
+        step_links = []
         
         # First pass: create steps without previous_step/branch_from references
-        for row in cursor.fetchall():
-            if row['protocol_id'] in self.id_mappings['protocols']:
+        for rows in self._iter_rows("SELECT * FROM export_protocol_steps"):
+            rows = [row for row in rows if row['protocol_id'] in self.id_mappings['protocols']]
+            steps = []
+            for row in rows:
                 # Map section reference if available (safely handle missing columns)
                 section_id = self.id_mappings.get('sections', {}).get(self._safe_get_row_value(row, 'step_section_id'))
                 
-                step = ProtocolStep.objects.create(
+                steps.append(ProtocolStep(
                     step_id=row['step_id'],
                     step_description=row['step_description'],
                     step_duration=row['step_duration'],
@@ -850,37 +1221,42 @@ class UserDataImporter:
                     protocol_id=self.id_mappings['protocols'][row['protocol_id']],
                     step_section_id=section_id,
                     # Will set previous_step_id, branch_from_id in second pass
-                )
-                step_mapping[row['id']] = step.id
+                ))
+            self._bulk_create(ProtocolStep, steps)
+            for row, step in zip(rows, steps):
                 self.id_mappings['steps'][row['id']] = step.id
-                self._track_created_object(step, row['id'])
+                if row['previous_step_id'] or row['branch_from_id']:
+                    step_links.append((step, row['previous_step_id'], row['branch_from_id']))
+            self._track_created_objects(steps, [row['id'] for row in rows])
         
         # Second pass: update foreign key references
-        cursor.execute("SELECT * FROM export_protocol_steps")
-        for row in cursor.fetchall():
-            if row['id'] in step_mapping:
-                step = ProtocolStep.objects.get(id=step_mapping[row['id']])
-                
-                # Update previous_step reference
-                if row['previous_step_id'] and row['previous_step_id'] in step_mapping:
-                    step.previous_step_id = step_mapping[row['previous_step_id']]
-                
-                # Update branch_from reference
-                if row['branch_from_id'] and row['branch_from_id'] in step_mapping:
-                    step.branch_from_id = step_mapping[row['branch_from_id']]
-                
-                step.save()
+        linked_steps = []
+        for step, previous_step_id, branch_from_id in step_links:
+            # Update previous_step reference, incremental imports can point at steps imported earlier
+            if previous_step_id and previous_step_id in self.id_mappings['steps']:
+                step.previous_step_id = self.id_mappings['steps'][previous_step_id]
+            
+            # Update branch_from reference
+            if branch_from_id and branch_from_id in self.id_mappings['steps']:
+                step.branch_from_id = self.id_mappings['steps'][branch_from_id]
+            linked_steps.append(step)
+        self._bulk_update(ProtocolStep, linked_steps, ['previous_step', 'branch_from'])
         
         # Import protocol ratings
-        cursor.execute("SELECT * FROM export_protocol_ratings")
-        for row in cursor.fetchall():
-            if row['protocol_id'] in self.id_mappings['protocols']:
-                ProtocolRating.objects.create(
-                    complexity_rating=row['complexity_rating'],
-                    duration_rating=row['duration_rating'],
-                    protocol_id=self.id_mappings['protocols'][row['protocol_id']],
-                    user=self.target_user,
-                )
+        for rows in self._iter_rows("SELECT * FROM export_protocol_ratings"):
+            ratings = []
+            for row in rows:
+                if row['protocol_id'] in self.id_mappings['protocols']:
+                    # Same bounds as ProtocolRating.save(), which bulk inserts bypass
+                    if not 0 <= row['complexity_rating'] <= 10 or not 0 <= row['duration_rating'] <= 10:
+                        raise ValueError("Rating must be between 0 and 10")
+                    ratings.append(ProtocolRating(
+                        complexity_rating=row['complexity_rating'],
+                        duration_rating=row['duration_rating'],
+                        protocol_id=self.id_mappings['protocols'][row['protocol_id']],
+                        user=self.target_user,
+                    ))
+            self._bulk_create(ProtocolRating, ratings)
         
         # Import many-to-many relationships
         self._import_protocol_relationships()
@@ -890,78 +1266,67 @@ class UserDataImporter:
     
     def _import_protocol_relationships(self):
         """Import protocol many-to-many relationships"""
-        cursor = self.conn.cursor()
-        
-        # Import protocol editors (but only add target user since we don't have other users)
-        cursor.execute("SELECT * FROM export_protocol_editors")
-        for row in cursor.fetchall():
-            if row['protocolmodel_id'] in self.id_mappings['protocols']:
-                protocol = ProtocolModel.objects.get(id=self.id_mappings['protocols'][row['protocolmodel_id']])
-                protocol.editors.add(self.target_user)
-                self._track_created_relationship(protocol, self.target_user, 'editors')
-        
-        # Import protocol viewers
-        cursor.execute("SELECT * FROM export_protocol_viewers")
-        for row in cursor.fetchall():
-            if row['protocolmodel_id'] in self.id_mappings['protocols']:
-                protocol = ProtocolModel.objects.get(id=self.id_mappings['protocols'][row['protocolmodel_id']])
-                protocol.viewers.add(self.target_user)
-                self._track_created_relationship(protocol, self.target_user, 'viewers')
+        # Import protocol editors and viewers (but only add target user since we don't have other users)
+        for table, field_name in (("export_protocol_editors", "editors"), ("export_protocol_viewers", "viewers")):
+            for rows in self._iter_rows(f"SELECT * FROM {table}"):
+                pairs = self._bulk_add_m2m(ProtocolModel, field_name, [
+                    (self.id_mappings['protocols'][row['protocolmodel_id']], self.target_user.id)
+                    for row in rows
+                    if row['protocolmodel_id'] in self.id_mappings['protocols']
+                ])
+                self._track_created_relationships('ProtocolModel', self.target_user.__class__.__name__, field_name, pairs)
         
         self.stats['relationships_imported'] += 2
     
     def _import_sessions_accurate(self):
         """Import sessions with exact field mapping"""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM export_sessions")
-        
         print("Importing sessions...")
         
-        for row in cursor.fetchall():
-            # Generate new UUID for unique_id to avoid conflicts
-            # Add import marking to session name
-            session_name = row['name']
-            if session_name and not session_name.startswith('[IMPORTED]'):
-                session_name = f"[IMPORTED] {session_name}"
-            elif not session_name:
-                session_name = "[IMPORTED] Session"
-            
-            session = Session.objects.create(
-                unique_id=uuid.uuid4(),  # Generate new UUID
-                name=session_name,
-                enabled=bool(row['enabled']),
-                processing=bool(row['processing']),
-                started_at=datetime.fromisoformat(row['started_at']) if row['started_at'] else None,
-                ended_at=datetime.fromisoformat(row['ended_at']) if row['ended_at'] else None,
-                user=self.target_user,
-            )
+        for rows in self._iter_rows("SELECT * FROM export_sessions"):
+            sessions = []
+            for row in rows:
+                # Generate new UUID for unique_id to avoid conflicts
+                # Add import marking to session name
+                session_name = row['name']
+                if session_name and not session_name.startswith('[IMPORTED]'):
+                    session_name = f"[IMPORTED] {session_name}"
+                elif not session_name:
+                    session_name = "[IMPORTED] Session"
+                
+                sessions.append(Session(
+                    unique_id=uuid.uuid4(),  # Generate new UUID
+                    name=session_name,
+                    enabled=bool(row['enabled']),
+                    processing=bool(row['processing']),
+                    started_at=datetime.fromisoformat(row['started_at']) if row['started_at'] else None,
+                    ended_at=datetime.fromisoformat(row['ended_at']) if row['ended_at'] else None,
+                    user=self.target_user,
+                ))
+            self._bulk_create(Session, sessions)
             
-            # Track created session
-            self._track_created_object(session, row['id'])
+            # Track created sessions
+            self._track_created_objects(sessions, [row['id'] for row in rows])
             
-            self.id_mappings['sessions'][row['id']] = session.id
+            for row, session in zip(rows, sessions):
+                self.id_mappings['sessions'][row['id']] = session.id
         
         # Import session-protocol relationships
-        cursor.execute("SELECT * FROM export_session_protocols")
-        for row in cursor.fetchall():
-            if (row['session_id'] in self.id_mappings['sessions'] and 
-                row['protocolmodel_id'] in self.id_mappings['protocols']):
-                session = Session.objects.get(id=self.id_mappings['sessions'][row['session_id']])
-                protocol = ProtocolModel.objects.get(id=self.id_mappings['protocols'][row['protocolmodel_id']])
-                session.protocols.add(protocol)
+        for rows in self._iter_rows("SELECT * FROM export_session_protocols"):
+            self._bulk_add_m2m(Session, 'protocols', [
+                (self.id_mappings['sessions'][row['session_id']], self.id_mappings['protocols'][row['protocolmodel_id']])
+                for row in rows
+                if row['session_id'] in self.id_mappings['sessions'] and
+                row['protocolmodel_id'] in self.id_mappings['protocols']
+            ])
         
         # Import session editors/viewers (add target user)
-        cursor.execute("SELECT * FROM export_session_editors")
-        for row in cursor.fetchall():
-            if row['session_id'] in self.id_mappings['sessions']:
-                session = Session.objects.get(id=self.id_mappings['sessions'][row['session_id']])
-                session.editors.add(self.target_user)
-        
-        cursor.execute("SELECT * FROM export_session_viewers")
-        for row in cursor.fetchall():
-            if row['session_id'] in self.id_mappings['sessions']:
-                session = Session.objects.get(id=self.id_mappings['sessions'][row['session_id']])
-                session.viewers.add(self.target_user)
+        for table, field_name in (("export_session_editors", "editors"), ("export_session_viewers", "viewers")):
+            for rows in self._iter_rows(f"SELECT * FROM {table}"):
+                self._bulk_add_m2m(Session, field_name, [
+                    (self.id_mappings['sessions'][row['session_id']], self.target_user.id)
+                    for row in rows
+                    if row['session_id'] in self.id_mappings['sessions']
+                ])
         
         print("Imported sessions with relationships")
         self.stats['models_imported'] += 1
@@ -969,139 +1334,112 @@ class UserDataImporter:
     
     def _import_annotations_accurate(self):
         """Import annotations and folders with exact field mapping"""
-        cursor = self.conn.cursor()
-        
         print("Importing annotation folders...")
         
         # Import annotation folders first
-        cursor.execute("SELECT * FROM export_annotation_folders")
-        folder_mapping = {}
+        folder_parents = []
         
         # First pass: create folders without parent references
-        for row in cursor.fetchall():
-            try:
+        for rows in self._iter_rows("SELECT * FROM export_annotation_folders"):
+            folders = []
+            for row in rows:
                 # Map all foreign key relationships (safely handle missing columns)
-                session_id = self.id_mappings['sessions'].get(self._safe_get_row_value(row, 'session_id'))
-                instrument_id = self.id_mappings['instruments'].get(self._safe_get_row_value(row, 'instrument_id'))
-                stored_reagent_id = self.id_mappings['stored_reagents'].get(self._safe_get_row_value(row, 'stored_reagent_id'))
-                
-                folder = AnnotationFolder.objects.create(
+                folders.append(AnnotationFolder(
                     folder_name=row['folder_name'],
-                    session_id=session_id,
-                    instrument_id=instrument_id,
-                    stored_reagent_id=stored_reagent_id,
+                    session_id=self.id_mappings['sessions'].get(self._safe_get_row_value(row, 'session_id')),
+                    instrument_id=self.id_mappings['instruments'].get(self._safe_get_row_value(row, 'instrument_id')),
+                    stored_reagent_id=self.id_mappings['stored_reagents'].get(self._safe_get_row_value(row, 'stored_reagent_id')),
                     is_shared_document_folder=bool(row['is_shared_document_folder']),
                     owner=self.target_user,
                     # parent_folder_id will be set in second pass
-                )
-                folder_mapping[row['id']] = folder.id
-                self.id_mappings['folders'][row['id']] = folder.id
+                ))
+            try:
+                self._bulk_create(AnnotationFolder, folders)
             except Exception as e:
-                folder_id = row['id'] if 'id' in row.keys() else 'unknown'
-                print(f"Failed to create annotation folder {folder_id}: {str(e)}")
-                print(f"Folder data: folder_name={row['folder_name']}, "
-                      f"session_id={session_id}, instrument_id={instrument_id}, stored_reagent_id={stored_reagent_id}")
-                raise Exception(f"Annotation folder creation failed for folder {folder_id}: {str(e)}")
+                folder_ids = [row['id'] for row in rows]
+                print(f"Failed to create annotation folders {folder_ids}: {str(e)}")
+                raise Exception(f"Annotation folder creation failed for folders {folder_ids}: {str(e)}")
+            
+            for row, folder in zip(rows, folders):
+                self.id_mappings['folders'][row['id']] = folder.id
+                if row['parent_folder_id']:
+                    folder_parents.append((folder, row['parent_folder_id']))
+            self._track_created_objects(folders, [row['id'] for row in rows])
         
         # Second pass: update parent folder references
-        cursor.execute("SELECT * FROM export_annotation_folders")
-        for row in cursor.fetchall():
-            if row['id'] in folder_mapping and row['parent_folder_id']:
-                if row['parent_folder_id'] in folder_mapping:
-                    try:
-                        folder = AnnotationFolder.objects.get(id=folder_mapping[row['id']])
-                        folder.parent_folder_id = folder_mapping[row['parent_folder_id']]
-                        folder.save()
-                    except Exception as e:
-                        folder_id = row['id'] if 'id' in row.keys() else 'unknown'
-                        print(f"Failed to update parent folder for folder {folder_id}: {str(e)}")
-                        raise Exception(f"Parent folder assignment failed for folder {folder_id}: {str(e)}")
+        parented_folders = []
+        for folder, parent_folder_id in folder_parents:
+            if parent_folder_id in self.id_mappings['folders']:
+                folder.parent_folder_id = self.id_mappings['folders'][parent_folder_id]
+                parented_folders.append(folder)
+        try:
+            self._bulk_update(AnnotationFolder, parented_folders, ['parent_folder'])
+        except Exception as e:
+            print(f"Failed to update parent folders: {str(e)}")
+            raise Exception(f"Parent folder assignment failed: {str(e)}")
         
         print("Importing annotations...")
         
         # Import annotations
-        cursor.execute("SELECT * FROM export_annotations")
-        for row in cursor.fetchall():
-            annotation_text = row['annotation']
-            annotation_type = row['annotation_type']
-            annotation_name = row['annotation_name']
-            converted_from_instrument = False
-            
-            # Handle instrument annotation conversion (only in user-centric mode)
-            if annotation_type == 'instrument' and not self.bulk_transfer_mode:
-                # Check if instruments are allowed to be imported
-                if not self.import_options.get('instruments', True):
-                    # Convert to text annotation with special marking
-                    converted_from_instrument = True
-                    annotation_type = 'text'
-                    
-                    # Get instrument usage details if available to include in text
-                    instrument_usage_text = self._get_instrument_usage_details(row['id'])
-                    if instrument_usage_text:
-                        annotation_text = f"[IMPORTED INSTRUMENT BOOKING]\n\n{instrument_usage_text}\n\nOriginal annotation: {annotation_text}"
-                    else:
-                        annotation_text = f"[IMPORTED INSTRUMENT BOOKING]\n\nThis was originally an instrument booking annotation.\n\nOriginal annotation: {annotation_text}"
-                    
-                    if annotation_name:
-                        annotation_name = f"[IMPORTED] {annotation_name}"
-                    else:
-                        annotation_name = "[IMPORTED] Converted Instrument Booking"
-                else:
-                    # Check if the referenced instrument exists
-                    referenced_instrument = self._get_annotation_referenced_instrument(row['id'])
-                    if referenced_instrument and not self._instrument_exists_or_importable(referenced_instrument):
-                        # Convert to text if instrument doesn't exist
+        for rows in self._iter_rows("SELECT * FROM export_annotations"):
+            annotations = []
+            original_ids = []
+            conversions = []
+            for row in rows:
+                annotation_text = row['annotation']
+                annotation_type = row['annotation_type']
+                annotation_name = row['annotation_name']
+                converted_from_instrument = False
+                
+                # Handle instrument annotation conversion (only in user-centric mode)
+                if annotation_type == 'instrument' and not self.bulk_transfer_mode:
+                    # Check if instruments are allowed to be imported
+                    if not self.import_options.get('instruments', True):
+                        # Convert to text annotation with special marking
                         converted_from_instrument = True
                         annotation_type = 'text'
                         
+                        # Get instrument usage details if available to include in text
                         instrument_usage_text = self._get_instrument_usage_details(row['id'])
-                        instrument_info = f"Instrument: {referenced_instrument.get('name', 'Unknown')}"
                         if instrument_usage_text:
-                            annotation_text = f"[IMPORTED INSTRUMENT BOOKING - INSTRUMENT NOT AVAILABLE]\n\n{instrument_info}\n\n{instrument_usage_text}\n\nOriginal annotation: {annotation_text}"
+                            annotation_text = f"[IMPORTED INSTRUMENT BOOKING]\n\n{instrument_usage_text}\n\nOriginal annotation: {annotation_text}"
                         else:
-                            annotation_text = f"[IMPORTED INSTRUMENT BOOKING - INSTRUMENT NOT AVAILABLE]\n\n{instrument_info}\n\nOriginal annotation: {annotation_text}"
+                            annotation_text = f"[IMPORTED INSTRUMENT BOOKING]\n\nThis was originally an instrument booking annotation.\n\nOriginal annotation: {annotation_text}"
                         
                         if annotation_name:
-                            annotation_name = f"[IMPORTED - NO INSTRUMENT] {annotation_name}"
+                            annotation_name = f"[IMPORTED] {annotation_name}"
                         else:
-                            annotation_name = "[IMPORTED - NO INSTRUMENT] Converted Instrument Booking"
-            
-            # Add import marking to annotation name for easy identification (only in user-centric mode)
-            if not self.bulk_transfer_mode:
-                if not converted_from_instrument and annotation_name and not annotation_name.startswith('[IMPORTED]'):
-                    annotation_name = f"[IMPORTED] {annotation_name}"
-                elif not converted_from_instrument and not annotation_name:
-                    annotation_name = "[IMPORTED] Annotation"
-            
-            try:
-                # Map all foreign key relationships (safely handle missing columns)
-                session_id = self.id_mappings['sessions'].get(self._safe_get_row_value(row, 'session_id'))
-                step_id = self.id_mappings['steps'].get(self._safe_get_row_value(row, 'step_id'))
-                stored_reagent_id = self.id_mappings['stored_reagents'].get(self._safe_get_row_value(row, 'stored_reagent_id'))
-                folder_id = self.id_mappings['folders'].get(self._safe_get_row_value(row, 'folder_id'))
-                
-                # Validate foreign key references before creation
-                if session_id is not None:
-                    if not Session.objects.filter(id=session_id).exists():
-                        print(f"ERROR: Session with id={session_id} does not exist")
-                        session_id = None  # Set to None to avoid FK constraint
-                
-                if step_id is not None:
-                    if not ProtocolStep.objects.filter(id=step_id).exists():
-                        print(f"ERROR: ProtocolStep with id={step_id} does not exist")
-                        step_id = None  # Set to None to avoid FK constraint
-                
-                if stored_reagent_id is not None:
-                    if not StoredReagent.objects.filter(id=stored_reagent_id).exists():
-                        print(f"ERROR: StoredReagent with id={stored_reagent_id} does not exist")
-                        stored_reagent_id = None  # Set to None to avoid FK constraint
+                            annotation_name = "[IMPORTED] Converted Instrument Booking"
+                    else:
+                        # Check if the referenced instrument exists
+                        referenced_instrument = self._get_annotation_referenced_instrument(row['id'])
+                        if referenced_instrument and not self._instrument_exists_or_importable(referenced_instrument):
+                            # Convert to text if instrument doesn't exist
+                            converted_from_instrument = True
+                            annotation_type = 'text'
+                            
+                            instrument_usage_text = self._get_instrument_usage_details(row['id'])
+                            instrument_info = f"Instrument: {referenced_instrument.get('name', 'Unknown')}"
+                            if instrument_usage_text:
+                                annotation_text = f"[IMPORTED INSTRUMENT BOOKING - INSTRUMENT NOT AVAILABLE]\n\n{instrument_info}\n\n{instrument_usage_text}\n\nOriginal annotation: {annotation_text}"
+                            else:
+                                annotation_text = f"[IMPORTED INSTRUMENT BOOKING - INSTRUMENT NOT AVAILABLE]\n\n{instrument_info}\n\nOriginal annotation: {annotation_text}"
+                            
+                            if annotation_name:
+                                annotation_name = f"[IMPORTED - NO INSTRUMENT] {annotation_name}"
+                            else:
+                                annotation_name = "[IMPORTED - NO INSTRUMENT] Converted Instrument Booking"
                 
-                if folder_id is not None:
-                    if not AnnotationFolder.objects.filter(id=folder_id).exists():
-                        print(f"ERROR: AnnotationFolder with id={folder_id} does not exist")
-                        folder_id = None  # Set to None to avoid FK constraint
+                # Add import marking to annotation name for easy identification (only in user-centric mode)
+                if not self.bulk_transfer_mode:
+                    if not converted_from_instrument and annotation_name and not annotation_name.startswith('[IMPORTED]'):
+                        annotation_name = f"[IMPORTED] {annotation_name}"
+                    elif not converted_from_instrument and not annotation_name:
+                        annotation_name = "[IMPORTED] Annotation"
                 
-                annotation = Annotation.objects.create(
+                # Map all foreign key relationships (safely handle missing columns). Mapped ids were created
+                # earlier in this transaction, unmapped references are left empty.
+                annotations.append(Annotation(
                     annotation=annotation_text,
                     annotation_type=annotation_type,
                     annotation_name=annotation_name,
@@ -1112,34 +1450,35 @@ class UserDataImporter:
                     scratched=bool(row['scratched']),
                     summary=row['summary'],
                     fixed=bool(row['fixed']),
-                    session_id=session_id,
-                    step_id=step_id,
-                    stored_reagent_id=stored_reagent_id,
-                    folder_id=folder_id,
+                    session_id=self.id_mappings['sessions'].get(self._safe_get_row_value(row, 'session_id')),
+                    step_id=self.id_mappings['steps'].get(self._safe_get_row_value(row, 'step_id')),
+                    stored_reagent_id=self.id_mappings['stored_reagents'].get(self._safe_get_row_value(row, 'stored_reagent_id')),
+                    folder_id=self.id_mappings['folders'].get(self._safe_get_row_value(row, 'folder_id')),
                     user=self.target_user,
                     # file will be handled during media import
-                )
+                ))
+                original_ids.append(row['id'])
+                
+                # Log conversion if it happened
+                if converted_from_instrument:
+                    conversions.append(f"Converted instrument annotation '{annotation_name}' to text annotation")
+            
+            try:
+                self._bulk_create(Annotation, annotations)
             except Exception as e:
-                annotation_id = row['id'] if 'id' in row.keys() else 'unknown'
-                print(f"Failed to create annotation {annotation_id}: {str(e)}")
-                print(f"Annotation data: session_id={session_id}, step_id={step_id}, "
-                      f"stored_reagent_id={stored_reagent_id}, folder_id={folder_id}")
-                # Print the actual exception type for better debugging
+                print(f"Failed to create annotations {original_ids}: {str(e)}")
                 print(f"Exception type: {type(e).__name__}")
                 import traceback
                 print(f"Traceback: {traceback.format_exc()}")
-                raise Exception(f"Annotation creation failed for annotation {annotation_id}: {str(e)}")
+                raise Exception(f"Annotation creation failed for annotations {original_ids}: {str(e)}")
             
-            # Track the created annotation
-            self._track_created_object(annotation, row['id'])
+            # Track the created annotations
+            self._track_created_objects(annotations, original_ids)
             
-            self.id_mappings['annotations'][row['id']] = annotation.id
-            
-            # Log conversion if it happened
-            if converted_from_instrument:
-                self.stats.setdefault('conversions', []).append(
-                    f"Converted instrument annotation '{annotation_name}' to text annotation"
-                )
+            for original_id, annotation in zip(original_ids, annotations):
+                self.id_mappings['annotations'][original_id] = annotation.id
+            if conversions:
+                self.stats.setdefault('conversions', []).extend(conversions)
         
         print("Imported annotations and folders")
         self.stats['models_imported'] += 2
@@ -1246,46 +1585,47 @@ class UserDataImporter:
         """Import instruments - behavior depends on bulk_transfer_mode"""
         # Import instruments if allowed by options
         if self.import_options.get('instruments', True):
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT * FROM export_instruments")
-            
-            for row in cursor.fetchall():
-                # Handle different possible name columns
-                instrument_name = None
-                for name_col in ['name', 'instrument_name', 'title']:
-                    if name_col in row.keys():
-                        instrument_name = row[name_col]
-                        break
-                
-                if not instrument_name:
-                    instrument_name = "Imported Instrument"
-                
-                if self.bulk_transfer_mode:
-                    # In bulk transfer mode, import instruments as-is
-                    pass  # instrument_name already set above
-                else:
-                    # User-centric mode: add import marking
-                    if instrument_name and not instrument_name.startswith('[IMPORTED]'):
-                        instrument_name = f"[IMPORTED] {instrument_name}"
-                    elif not instrument_name:
-                        instrument_name = "[IMPORTED] Instrument"
-                
-                # Create instrument with vaulting
-                instrument_data = {
-                    'name': instrument_name,
-                    'description': row['description'],
-                    'accepts_bookings': True,  # Default value since not exported in current schema
-                    'user': self.target_user,
-                    # Add other instrument fields as needed
-                }
-                
-                # Apply vaulting if enabled and not in bulk transfer mode
-                if self.vault_items and not self.bulk_transfer_mode:
-                    instrument_data['is_vaulted'] = True
-                
-                instrument = Instrument.objects.create(**instrument_data)
-                self._track_created_object(instrument, row['id'])
-                self.id_mappings['instruments'][row['id']] = instrument.id
+            for rows in self._iter_rows("SELECT * FROM export_instruments"):
+                instruments = []
+                for row in rows:
+                    # Handle different possible name columns
+                    instrument_name = None
+                    for name_col in ['name', 'instrument_name', 'title']:
+                        if name_col in row.keys():
+                            instrument_name = row[name_col]
+                            break
+                    
+                    if not instrument_name:
+                        instrument_name = "Imported Instrument"
+                    
+                    if self.bulk_transfer_mode:
+                        # In bulk transfer mode, import instruments as-is
+                        pass  # instrument_name already set above
+                    else:
+                        # User-centric mode: add import marking
+                        if instrument_name and not instrument_name.startswith('[IMPORTED]'):
+                            instrument_name = f"[IMPORTED] {instrument_name}"
+                        elif not instrument_name:
+                            instrument_name = "[IMPORTED] Instrument"
+                    
+                    # Create instrument with vaulting
+                    instrument_data = {
+                        'name': instrument_name,
+                        'description': row['description'],
+                        'accepts_bookings': True,  # Default value since not exported in current schema
+                        'user': self.target_user,
+                        # Add other instrument fields as needed
+                    }
+                    
+                    # Apply vaulting if enabled and not in bulk transfer mode
+                    if self.vault_items and not self.bulk_transfer_mode:
+                        instrument_data['is_vaulted'] = True
+                    
+                    # Created one at a time: post_save creates the default annotation folders
+                    instrument = Instrument.objects.create(**instrument_data)
+                    instruments.append(instrument)
+                    self.id_mappings['instruments'][row['id']] = instrument.id
+                self._track_created_objects(instruments, [row['id'] for row in rows])
             
             print(f"Imported {len(self.id_mappings['instruments'])} instruments")
         else:
@@ -1295,95 +1635,114 @@ class UserDataImporter:
     
     def _import_instrument_usage_and_jobs(self):
         """Import instrument usage records, converting to annotations if needed"""
-        cursor = self.conn.cursor()
-        
         # Import instrument usage - but only if we haven't converted these to text annotations
-        cursor.execute("SELECT * FROM export_instrument_usage")
-        for row in cursor.fetchall():
-            annotation_id = row['annotation_id']
-            instrument_id = row['instrument_id']
-            
-            # Check if this annotation still exists and is of type 'instrument'
-            if (annotation_id in self.id_mappings['annotations'] and 
-                instrument_id in self.id_mappings.get('instruments', {})):
-                
-                annotation = Annotation.objects.get(id=self.id_mappings['annotations'][annotation_id])
+        for rows in self._iter_rows("SELECT * FROM export_instrument_usage"):
+            instrument_annotation_ids = set(Annotation.objects.filter(
+                id__in=[
+                    self.id_mappings['annotations'][row['annotation_id']]
+                    for row in rows if row['annotation_id'] in self.id_mappings['annotations']
+                ],
+                annotation_type='instrument'
+            ).values_list('id', flat=True))
+            
+            usages = []
+            original_ids = []
+            for row in rows:
+                annotation_id = row['annotation_id']
+                instrument_id = row['instrument_id']
                 
-                if annotation.annotation_type == 'instrument':
-                    # Create the instrument usage
-                    usage = InstrumentUsage.objects.create(
-                        instrument_id=self.id_mappings['instruments'][instrument_id],
-                        annotation=annotation,
-                        time_started=datetime.fromisoformat(row['time_started']) if row['time_started'] else None,
-                        time_ended=datetime.fromisoformat(row['time_ended']) if row['time_ended'] else None,
-                        approved=bool(row['approved']),
-                        maintenance=bool(row['maintenance']),
-                        description=row['description'],
-                        user=self.target_user,
-                    )
-                    self._track_created_object(usage, row['id'])
+                # Check if this annotation still exists and is of type 'instrument'
+                if (annotation_id in self.id_mappings['annotations'] and 
+                    instrument_id in self.id_mappings.get('instruments', {})):
+                    
+                    if self.id_mappings['annotations'][annotation_id] in instrument_annotation_ids:
+                        # Create the instrument usage
+                        usages.append(InstrumentUsage(
+                            instrument_id=self.id_mappings['instruments'][instrument_id],
+                            annotation_id=self.id_mappings['annotations'][annotation_id],
+                            time_started=datetime.fromisoformat(row['time_started']) if row['time_started'] else None,
+                            time_ended=datetime.fromisoformat(row['time_ended']) if row['time_ended'] else None,
+                            approved=bool(row['approved']),
+                            maintenance=bool(row['maintenance']),
+                            description=row['description'],
+                            user=self.target_user,
+                        ))
+                        original_ids.append(row['id'])
+                    else:
+                        # This was converted to text, so we don't create usage
+                        self.stats.setdefault('skipped_usage', []).append(
+                            f"Skipped instrument usage for converted annotation {annotation_id}"
+                        )
                 else:
-                    # This was converted to text, so we don't create usage
+                    # Either annotation doesn't exist or instrument doesn't exist
                     self.stats.setdefault('skipped_usage', []).append(
-                        f"Skipped instrument usage for converted annotation {annotation_id}"
+                        f"Skipped instrument usage - annotation {annotation_id} or instrument {instrument_id} not found"
+                    )
+            
+            self._bulk_create(InstrumentUsage, usages)
+            self._track_created_objects(usages, original_ids)
+            # Bulk inserts skip the booking signals, availability is computed again when read
+            # and the utilization of the imported days is recomputed
+            for instrument_id in {usage.instrument_id for usage in usages}:
+                InstrumentAvailabilityDay.invalidate(instrument_id)
+                imported = [usage for usage in usages if usage.instrument_id == instrument_id and usage.time_started and usage.time_ended]
+                if imported:
+                    InstrumentUsageDay.refresh(
+                        instrument_id, min(usage.time_started for usage in imported), max(usage.time_ended for usage in imported)
                     )
-            else:
-                # Either annotation doesn't exist or instrument doesn't exist
-                self.stats.setdefault('skipped_usage', []).append(
-                    f"Skipped instrument usage - annotation {annotation_id} or instrument {instrument_id} not found"
-                )
         
         print("Imported instrument usage records")
         self.stats['models_imported'] += 1
     
     def _import_tags_and_relationships(self):
         """Import tags and tagging relationships"""
-        cursor = self.conn.cursor()
-        
         # Import tags
-        cursor.execute("SELECT * FROM export_tags")
-        for row in cursor.fetchall():
-            # For tags, apply vaulting if enabled and not in bulk transfer mode
-            defaults = {}
+        for rows in self._iter_rows("SELECT * FROM export_tags"):
             if self.vault_items and not self.bulk_transfer_mode:
-                defaults = {
-                    'is_vaulted': True,
-                    'user': self.target_user
-                }
                 # In vaulted mode, create new tags to avoid conflicts
-                tag = Tag.objects.create(
-                    tag=row['tag'],
-                    **defaults
-                )
-                created = True
-            else:
-                # In non-vaulted mode, use get_or_create to share tags
-                tag, created = Tag.objects.get_or_create(
-                    tag=row['tag'],
-                    defaults=defaults
-                )
+                tags = self._bulk_create(Tag, [
+                    Tag(tag=row['tag'], is_vaulted=True, user=self.target_user)
+                    for row in rows
+                ])
+                for row, tag in zip(rows, tags):
+                    self.id_mappings['tags'][row['id']] = tag.id
+                continue
+            
+            # In non-vaulted mode, reuse existing tags by name and only create the missing ones
+            existing = {}
+            for tag in Tag.objects.filter(tag__in={row['tag'] for row in rows}).order_by('-id'):
+                existing[tag.tag] = tag
+            missing = {}
+            for row in rows:
+                if row['tag'] not in existing and row['tag'] not in missing:
+                    missing[row['tag']] = Tag(tag=row['tag'])
+            self._bulk_create(Tag, list(missing.values()))
+            existing.update(missing)
             
-            self.id_mappings['tags'][row['id']] = tag.id
+            for row in rows:
+                self.id_mappings['tags'][row['id']] = existing[row['tag']].id
         
         # Import protocol tags
-        cursor.execute("SELECT * FROM export_protocol_tags")
-        for row in cursor.fetchall():
-            if (row['protocol_id'] in self.id_mappings['protocols'] and 
-                row['tag_id'] in self.id_mappings['tags']):
-                ProtocolTag.objects.create(
+        for rows in self._iter_rows("SELECT * FROM export_protocol_tags"):
+            self._bulk_create(ProtocolTag, [
+                ProtocolTag(
                     protocol_id=self.id_mappings['protocols'][row['protocol_id']],
                     tag_id=self.id_mappings['tags'][row['tag_id']],
                 )
+                for row in rows
+                if row['protocol_id'] in self.id_mappings['protocols'] and row['tag_id'] in self.id_mappings['tags']
+            ])
         
         # Import step tags
-        cursor.execute("SELECT * FROM export_step_tags")
-        for row in cursor.fetchall():
-            if (row['step_id'] in self.id_mappings['steps'] and 
-                row['tag_id'] in self.id_mappings['tags']):
-                StepTag.objects.create(
+        for rows in self._iter_rows("SELECT * FROM export_step_tags"):
+            self._bulk_create(StepTag, [
+                StepTag(
                     step_id=self.id_mappings['steps'][row['step_id']],
                     tag_id=self.id_mappings['tags'][row['tag_id']],
                 )
+                for row in rows
+                if row['step_id'] in self.id_mappings['steps'] and row['tag_id'] in self.id_mappings['tags']
+            ])
         
         print("Imported tags and relationships")
         self.stats['models_imported'] += 1
@@ -1391,87 +1750,120 @@ class UserDataImporter:
     
     def _import_metadata_and_support(self):
         """Import metadata columns and other support models"""
-        cursor = self.conn.cursor()
-        
         # Import metadata columns
-        cursor.execute("SELECT * FROM export_metadata_columns")
-        for row in cursor.fetchall():
-            MetadataColumn.objects.create(
-                name=row['name'],
-                type=row['type'],
-                column_position=row['column_position'],
-                value=row['value'],
-                not_applicable=bool(row['not_applicable']),
-                mandatory=bool(row['mandatory']),
-                modifiers=row['modifiers'],
-                auto_generated=bool(row['auto_generated']),
-                hidden=bool(row['hidden']),
-                readonly=bool(row['readonly']),
-                annotation_id=self.id_mappings['annotations'].get(row['annotation_id']),
-                protocol_id=self.id_mappings['protocols'].get(row['protocol_id']),
-                # instrument_id and stored_reagent_id handled if available
-            )
+        for rows in self._iter_rows("SELECT * FROM export_metadata_columns"):
+            self._bulk_create(MetadataColumn, [
+                MetadataColumn(
+                    name=row['name'],
+                    type=row['type'],
+                    column_position=row['column_position'],
+                    value=row['value'],
+                    not_applicable=bool(row['not_applicable']),
+                    mandatory=bool(row['mandatory']),
+                    modifiers=row['modifiers'],
+                    auto_generated=bool(row['auto_generated']),
+                    hidden=bool(row['hidden']),
+                    readonly=bool(row['readonly']),
+                    annotation_id=self.id_mappings['annotations'].get(row['annotation_id']),
+                    protocol_id=self.id_mappings['protocols'].get(row['protocol_id']),
+                    # instrument_id and stored_reagent_id handled if available
+                )
+                for row in rows
+            ])
         
         print("Imported metadata and support models")
         self.stats['models_imported'] += 1
     
     def _import_media_files(self):
-        """Import media files and link them to annotations"""
-        if not os.path.exists(self.media_dir):
-            print("No media directory found, skipping file import")
+        """
+        Stream the media files of imported annotations from the archive to MEDIA_ROOT
+        and link them to the annotation records. Members that no imported annotation
+        references are skipped without being read.
+        
+        Files are tracked and checkpointed batch_size at a time, a resumed job skips the
+        files it copied before. They are written to the same path, so copying again is harmless.
+        """
+        # Annotations imported or updated in this run that reference a file, keyed by file name
+        wanted_files = {name: list(ids) for name, ids in self.updated_annotation_files.items()}
+        for rows in self._iter_rows("SELECT id, file FROM export_annotations WHERE file IS NOT NULL AND file != ''"):
+            for row in rows:
+                new_id = self.id_mappings['annotations'].get(row['id'])
+                if new_id is not None:
+                    wanted_files.setdefault(os.path.basename(row['file']), []).append(new_id)
+        
+        if not wanted_files:
+            print("No imported annotations reference media files, skipping file import")
+            with transaction.atomic():
+                self._save_checkpoint('media_files')
             return
         
         print("Importing media files...")
         
-        # First, copy all media files to Django media root
-        copied_files = {}
-        for root, dirs, files in os.walk(self.media_dir):
-            for file in files:
-                src_path = os.path.join(root, file)
-                rel_path = os.path.relpath(src_path, self.media_dir)
-                dst_path = os.path.join(settings.MEDIA_ROOT, rel_path)
-
-                # Create destination directory
+        # Copy referenced members straight from the archive to their final path
+        copied_files = dict(self.checkpoint.state.get('copied_files', {})) if self.checkpoint else {}
+        resumed_files = set(copied_files)
+        tracked_files = []
+        skipped_members = 0
+        with ArchiveReader(self.import_path, self.archive_format) as archive:
+            for rel_path, size, stream in archive.iter_media():
+                filename = os.path.basename(rel_path)
+                if filename in resumed_files:
+                    continue
+                if filename not in wanted_files or filename in copied_files:
+                    skipped_members += 1
+                    continue
+                
+                dst_path = safe_destination(settings.MEDIA_ROOT, rel_path)
+                if dst_path is None:
+                    print(f"Warning: Skipping media member outside of media root: {rel_path}")
+                    skipped_members += 1
+                    continue
+                
                 os.makedirs(os.path.dirname(dst_path), exist_ok=True)
-
-                # Copy file
-                shutil.copy2(src_path, dst_path)
-
-                # Track copied files for linking
-                copied_files[file] = rel_path
+                with open(dst_path, 'wb') as out:
+                    shutil.copyfileobj(stream, out, COPY_BUFFER_SIZE)
+                
+                copied_files[filename] = rel_path
+                tracked_files.append((rel_path, filename))
                 self.stats['files_imported'] += 1
-
-                # Track file for rollback
-                self._track_created_file(rel_path, file)
-
+                if len(tracked_files) >= self.batch_size:
+                    self._commit_media_batch(tracked_files, copied_files)
+                    tracked_files = []
+        
+        # Track files for rollback
+        self._commit_media_batch(tracked_files, copied_files)
+        
         # Now link files to annotation records
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id, file FROM export_annotations WHERE file IS NOT NULL AND file != ''")
-
+        linked = {}
+        for filename, annotation_ids in wanted_files.items():
+            if filename not in copied_files:
+                print(f"Warning: File not found - annotation exists but file is missing: {filename}")
+                continue
+            for annotation_id in annotation_ids:
+                linked[annotation_id] = copied_files[filename]
+        
         files_linked = 0
-        for row in cursor.fetchall():
-            original_id = row['id']
-            original_file_path = row['file']
+        linked_ids = list(linked.keys())
+        with transaction.atomic():
+            for start in range(0, len(linked_ids), self.batch_size):
+                annotations = list(Annotation.objects.filter(id__in=linked_ids[start:start + self.batch_size]))
+                for annotation in annotations:
+                    annotation.file = linked[annotation.id]  # Use relative path from media root
+                self._bulk_update(Annotation, annotations, ['file'])
+                files_linked += len(annotations)
+            self._save_checkpoint('media_files', copied_files={})
 
-            if original_id in self.id_mappings['annotations']:
-                # Extract filename from original path
-                filename = os.path.basename(original_file_path)
-
-                if filename in copied_files:
-                    # Update annotation with correct file path
-                    try:
-                        annotation = Annotation.objects.get(id=self.id_mappings['annotations'][original_id])
-                        annotation.file = copied_files[filename]  # Use relative path from media root
-                        annotation.save()
-                        files_linked += 1
-                    except Annotation.DoesNotExist:
-                        print(f"Warning: Annotation not found for file {filename}")
-                else:
-                    print(f"Warning: File not found - annotation exists but file is missing: {filename}")
-
-        print(f"Imported {self.stats['files_imported']} media files")
+        print(f"Imported {self.stats['files_imported']} media files, skipped {skipped_members} unreferenced archive members")
         print(f"Linked {files_linked} files to annotation records")
     
+    def _commit_media_batch(self, tracked_files: List[Tuple[str, str]], copied_files: Dict[str, str]):
+        """Track a batch of copied files together with the checkpoint listing every file copied so far"""
+        with transaction.atomic():
+            self._track_created_files(tracked_files)
+            self._save_checkpoint(
+                'media_files', completed=False, table_name='media', offset=len(copied_files), copied_files=copied_files
+            )
+    
     def _import_remaining_relationships(self):
         """Import any remaining relationships"""
         print("Imported remaining relationships")
@@ -1493,12 +1885,13 @@ class UserDataImportDryRun:
     Dry run analyzer for user data imports - analyzes what would be imported without making changes
     """
     
-    def __init__(self, target_user: User, import_path: str, import_options: dict = None, progress_callback=None):
+    def __init__(self, target_user: User, import_path: str, import_options: dict = None, progress_callback=None, database_path: str = None):
         self.target_user = target_user
         self.import_path = import_path
+        self.database_path = database_path
         self.temp_dir = tempfile.mkdtemp(prefix=f'cupcake_dryrun_{target_user.username}_')
         self.sqlite_path = None
-        self.media_dir = None
+        self.media_sizes = []
         self.progress_callback = progress_callback
         
         # Import options for selective import
@@ -1536,8 +1929,8 @@ class UserDataImportDryRun:
         try:
             self._send_progress(0, "Starting dry run analysis...")
             
-            # Extract and validate archive
-            self._send_progress(10, "Extracting and validating archive...")
+            # Read the archive index and database
+            self._send_progress(10, "Reading archive index and database...")
             archive_format = self._extract_and_validate_archive()
             
             # Load metadata
@@ -1588,7 +1981,10 @@ class UserDataImportDryRun:
             self._cleanup()
     
     def _extract_and_validate_archive(self) -> str:
-        """Extract and validate archive without side effects"""
+        """
+        Extract only the SQLite database and metadata and read media sizes from the archive index.
+        Media is never extracted.
+        """
         if not os.path.exists(self.import_path):
             raise FileNotFoundError(f"Import file not found: {self.import_path}")
         
@@ -1600,56 +1996,38 @@ class UserDataImportDryRun:
             'file_size_mb': round(file_size / (1024 * 1024), 2)
         }
         
-        # Detect and extract
+        # Detect and read the index
         archive_format = self._detect_archive_format()
-        self._extract_archive_safe(archive_format)
+        self._read_archive_index(archive_format)
         
         # Validate structure
-        self.sqlite_path = os.path.join(self.temp_dir, 'user_data.sqlite')
-        self.media_dir = os.path.join(self.temp_dir, 'media')
+        self.sqlite_path = os.path.join(self.temp_dir, SQLITE_MEMBER)
         
         if not os.path.exists(self.sqlite_path):
             raise FileNotFoundError("user_data.sqlite not found in archive")
         
         self.analysis_report['archive_info']['format'] = archive_format
-        self.analysis_report['archive_info']['has_media'] = os.path.exists(self.media_dir)
+        self.analysis_report['archive_info']['has_media'] = bool(self.media_sizes)
         
         return archive_format
     
     def _detect_archive_format(self) -> str:
         """Detect archive format"""
-        import tarfile
-        
-        file_path_lower = self.import_path.lower()
-        
-        if file_path_lower.endswith('.zip'):
-            return 'zip'
-        elif file_path_lower.endswith(('.tar.gz', '.tgz')):
-            return 'tar.gz'
-        elif file_path_lower.endswith('.tar'):
-            return 'tar'
-        
-        # Detect by content
-        try:
-            if zipfile.is_zipfile(self.import_path):
-                return 'zip'
-            elif tarfile.is_tarfile(self.import_path):
-                return 'tar.gz'
-        except Exception:
-            pass
-        
-        raise ValueError(f"Cannot determine archive format for file: {self.import_path}")
-    
-    def _extract_archive_safe(self, archive_format: str):
-        """Extract archive safely"""
-        import tarfile
-        
-        if archive_format == 'zip':
-            with zipfile.ZipFile(self.import_path, 'r') as zip_ref:
-                zip_ref.extractall(self.temp_dir)
-        elif archive_format in ['tar.gz', 'tar']:
-            with tarfile.open(self.import_path, 'r:*') as tar_ref:
-                tar_ref.extractall(self.temp_dir)
+        return detect_archive_format(self.import_path)
+    
+    def _read_archive_index(self, archive_format: str):
+        """
+        Collect media sizes from the zip central directory or tar headers, then extract
+        the database and metadata members. Tar headers are read first so the archive is
+        scanned once before seeking back to the database.
+        """
+        with ArchiveReader(self.import_path, archive_format) as archive:
+            self.media_sizes = list(archive.media_sizes())
+            for member in (SQLITE_MEMBER, METADATA_MEMBER):
+                if member == SQLITE_MEMBER and self.database_path:
+                    shutil.copyfile(self.database_path, os.path.join(self.temp_dir, member))
+                else:
+                    archive.extract_member(member, os.path.join(self.temp_dir, member))
     
     def _load_metadata(self) -> Dict[str, Any]:
         """Load export metadata"""
@@ -1721,22 +2099,31 @@ class UserDataImportDryRun:
         
         return True  # Default to import if unclear
     
+    def _existing_values(self, queryset, field: str, values: List[Any]) -> set:
+        """Values of field present in queryset, looked up in batches of IMPORT_BATCH_SIZE"""
+        existing = set()
+        batch_size = settings.IMPORT_BATCH_SIZE
+        for start in range(0, len(values), batch_size):
+            existing.update(queryset.filter(
+                **{f'{field}__in': values[start:start + batch_size]}
+            ).values_list(field, flat=True))
+        return existing
+    
     def _check_conflicts(self):
-        """Check for potential conflicts with existing data"""
+        """Check for potential conflicts with existing data using set-based lookups"""
         cursor = self.conn.cursor()
         conflicts = []
         
         # Check for protocol title conflicts
         if self.import_options.get('protocols', True):
             try:
-                cursor.execute("SELECT protocol_title FROM export_protocols")
+                cursor.execute("SELECT DISTINCT protocol_title FROM export_protocols")
                 protocol_titles = [row['protocol_title'] for row in cursor.fetchall()]
                 
                 from cc.models import ProtocolModel
-                existing_titles = set(ProtocolModel.objects.filter(
-                    protocol_title__in=protocol_titles, 
-                    user=self.target_user
-                ).values_list('protocol_title', flat=True))
+                existing_titles = self._existing_values(
+                    ProtocolModel.objects.filter(user=self.target_user), 'protocol_title', protocol_titles
+                )
                 
                 if existing_titles:
                     conflicts.append({
@@ -1751,14 +2138,13 @@ class UserDataImportDryRun:
         # Check for project name conflicts
         if self.import_options.get('projects', True):
             try:
-                cursor.execute("SELECT project_name FROM export_projects")
+                cursor.execute("SELECT DISTINCT project_name FROM export_projects")
                 project_names = [row['project_name'] for row in cursor.fetchall()]
                 
                 from cc.models import Project
-                existing_projects = set(Project.objects.filter(
-                    project_name__in=project_names,
-                    owner=self.target_user
-                ).values_list('project_name', flat=True))
+                existing_projects = self._existing_values(
+                    Project.objects.filter(owner=self.target_user), 'project_name', project_names
+                )
                 
                 if existing_projects:
                     conflicts.append({
@@ -1774,14 +2160,21 @@ class UserDataImportDryRun:
         if self.import_options.get('reagents', True):
             try:
                 # Check for reagent name+unit duplicates
-                cursor.execute("SELECT name, unit FROM export_reagents")
+                cursor.execute("SELECT DISTINCT name, unit FROM export_reagents")
                 reagent_combinations = [(row['name'], row['unit']) for row in cursor.fetchall()]
                 
+                # Narrow by name in the database, then match the unit against the local pairs
                 from cc.models import Reagent
-                existing_reagents = []
-                for name, unit in reagent_combinations:
-                    if Reagent.objects.filter(name=name, unit=unit).exists():
-                        existing_reagents.append(f"{name} ({unit})")
+                reagent_names = list({name for name, _ in reagent_combinations})
+                local_pairs = set()
+                batch_size = settings.IMPORT_BATCH_SIZE
+                for start in range(0, len(reagent_names), batch_size):
+                    local_pairs.update(Reagent.objects.filter(
+                        name__in=reagent_names[start:start + batch_size]
+                    ).values_list('name', 'unit'))
+                existing_reagents = [
+                    f"{name} ({unit})" for name, unit in reagent_combinations if (name, unit) in local_pairs
+                ]
                 
                 if existing_reagents:
                     conflicts.append({
@@ -1833,7 +2226,7 @@ class UserDataImportDryRun:
         self.analysis_report['potential_conflicts'] = conflicts
     
     def _analyze_file_sizes(self):
-        """Analyze file sizes in media directory"""
+        """Analyze media file sizes recorded in the archive index"""
         size_analysis = {
             'total_media_files': 0,
             'total_media_size_bytes': 0,
@@ -1842,26 +2235,22 @@ class UserDataImportDryRun:
             'file_types': {}
         }
         
-        if os.path.exists(self.media_dir):
-            for root, dirs, files in os.walk(self.media_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    if os.path.exists(file_path):
-                        file_size = os.path.getsize(file_path)
-                        size_analysis['total_media_files'] += 1
-                        size_analysis['total_media_size_bytes'] += file_size
-                        
-                        # Track large files (>10MB)
-                        if file_size > 10 * 1024 * 1024:
-                            size_analysis['large_files'].append({
-                                'name': file,
-                                'size_mb': round(file_size / (1024 * 1024), 2)
-                            })
-                        
-                        # Track file types
-                        ext = os.path.splitext(file)[1].lower()
-                        if ext:
-                            size_analysis['file_types'][ext] = size_analysis['file_types'].get(ext, 0) + 1
+        for relative_path, file_size in self.media_sizes:
+            file = os.path.basename(relative_path)
+            size_analysis['total_media_files'] += 1
+            size_analysis['total_media_size_bytes'] += file_size
+            
+            # Track large files (>10MB)
+            if file_size > 10 * 1024 * 1024:
+                size_analysis['large_files'].append({
+                    'name': file,
+                    'size_mb': round(file_size / (1024 * 1024), 2)
+                })
+            
+            # Track file types
+            ext = os.path.splitext(file)[1].lower()
+            if ext:
+                size_analysis['file_types'][ext] = size_analysis['file_types'].get(ext, 0) + 1
         
         size_analysis['total_media_size_mb'] = round(size_analysis['total_media_size_bytes'] / (1024 * 1024), 2)
         self.analysis_report['size_analysis'] = size_analysis
@@ -1961,7 +2350,7 @@ class UserDataImportDryRun:
             shutil.rmtree(self.temp_dir)
 
 
-def dry_run_import_user_data(target_user: User, import_path: str, import_options: dict = None, progress_callback=None) -> Dict[str, Any]:
+def dry_run_import_user_data(target_user: User, import_path: str, import_options: dict = None, progress_callback=None, database_path: str = None) -> Dict[str, Any]:
     """
     Perform a dry run analysis of user data import without making any changes.
     
@@ -1970,20 +2359,50 @@ def dry_run_import_user_data(target_user: User, import_path: str, import_options
         import_path: Path to archive file (ZIP or TAR.GZ) containing exported data
         import_options: Optional dict specifying what to import
         progress_callback: Optional callback function for progress updates
+        database_path: Optional migrated database to read instead of the one in the archive
     
     Returns:
         Dict: Analysis results and import plan
     """
-    analyzer = UserDataImportDryRun(target_user, import_path, import_options, progress_callback)
+    analyzer = UserDataImportDryRun(target_user, import_path, import_options, progress_callback, database_path)
     return analyzer.analyze_import()
 
 
 class ImportReverter:
-    """Handles reverting user data imports"""
+    """
+    Handles reverting user data imports
     
-    def __init__(self, import_tracker: ImportTracker, reverting_user: User):
+    Objects are deleted model by model in dependency order, batch_size at a time, each batch
+    in its own transaction so a large revert never holds long table locks. The progress is
+    checkpointed in the tracker metadata after every batch and a revert that stopped half way
+    continues from the checkpoint when it is run again.
+    """
+    
+    # Models are deleted in this order, models not listed follow afterwards
+    DELETION_ORDER = [
+        'MetadataColumn',
+        'StepTag', 'ProtocolTag',
+        'ProtocolRating',
+        'Annotation', 'AnnotationFolder',
+        'Session',
+        'ProtocolStep', 'ProtocolSection',
+        'ProtocolModel',
+        'ReagentAction', 'StoredReagent',
+        'StorageObject',
+        'Project',
+        'LabGroup',
+        'RemoteHost',
+        'Tag', 'Reagent'
+    ]
+    
+    def __init__(self, import_tracker: ImportTracker, reverting_user: User, progress_callback=None,
+                 suppress_history: bool = False, batch_size: int = None):
         self.import_tracker = import_tracker
         self.reverting_user = reverting_user
+        self.progress_callback = progress_callback
+        # Skips the deletion rows of the history tables, see _history_disabled
+        self.suppress_history = suppress_history
+        self.batch_size = batch_size or settings.IMPORT_BATCH_SIZE
         
         self.stats = {
             'objects_deleted': 0,
@@ -1991,6 +2410,35 @@ class ImportReverter:
             'relationships_removed': 0,
             'errors': []
         }
+        self.checkpoint = {}
+        self._total_steps = 0
+        self._done_steps = 0
+    
+    def _send_progress(self, progress: int, message: str, status: str = "processing"):
+        """Send progress update via callback if available"""
+        if self.progress_callback:
+            self.progress_callback(progress, message, status)
+    
+    def _advance(self, steps: int, message: str):
+        """Count finished work and report it on a 0-99 scale"""
+        self._done_steps += steps
+        if self._total_steps:
+            self._send_progress(min(99, int(self._done_steps * 99 / self._total_steps)), message)
+    
+    def _save_checkpoint(self, **changes):
+        """Persist the revert progress in the tracker metadata"""
+        self.checkpoint.update(changes)
+        self.import_tracker.metadata['revert_progress'] = dict(self.checkpoint, stats=self.stats)
+        self.import_tracker.save(update_fields=['metadata'])
+    
+    @contextmanager
+    def _history_disabled(self):
+        """Skip the deletion history rows of this thread when suppress_history is set"""
+        if not self.suppress_history:
+            yield
+            return
+        with skip_deletion_history():
+            yield
     
     def revert_import(self) -> Dict[str, Any]:
         """
@@ -2013,158 +2461,197 @@ class ImportReverter:
                 'stats': self.stats
             }
         
+        # Continue a revert that stopped half way
+        self.checkpoint = dict(self.import_tracker.metadata.get('revert_progress') or {})
+        saved_stats = self.checkpoint.pop('stats', None)
+        if saved_stats:
+            self.stats.update(saved_stats)
+            self.stats['errors'] = list(saved_stats.get('errors', []))
+        self.checkpoint.setdefault('completed_models', [])
+        
         try:
-            with transaction.atomic():
-                print(f"Starting revert of import {self.import_tracker.import_id}")
-                
-                # Remove many-to-many relationships first
+            print(f"Starting revert of import {self.import_tracker.import_id}")
+            self._send_progress(0, "Starting revert..." if not saved_stats else "Resuming revert...")
+            self._count_remaining_work()
+            
+            # Remove many-to-many relationships first
+            if not self.checkpoint.get('relationships_done'):
                 self._revert_relationships()
-                
-                # Delete files
+            
+            # Delete objects in dependency order, then the files they referenced
+            self._revert_objects()
+            
+            if not self.checkpoint.get('files_done'):
                 self._revert_files()
-                
-                # Delete objects in reverse order of creation
-                self._revert_objects()
-                
-                # Update tracker status
+            
+            # Update tracker status
+            with transaction.atomic():
+                self.import_tracker.metadata.pop('revert_progress', None)
                 self.import_tracker.import_status = 'reverted'
+                self.import_tracker.can_revert = False
                 self.import_tracker.reverted_at = timezone.now()
                 self.import_tracker.reverted_by = self.reverting_user
                 self.import_tracker.save()
-                
-                print(f"Successfully reverted import {self.import_tracker.import_id}")
-                print(f"Revert stats: {self.stats}")
-                
-                return {
-                    'success': True,
-                    'stats': self.stats,
-                    'import_id': str(self.import_tracker.import_id)
-                }
-                
+            
+            print(f"Successfully reverted import {self.import_tracker.import_id}")
+            print(f"Revert stats: {self.stats}")
+            self._send_progress(100, "Revert completed", "completed")
+            
+            return {
+                'success': True,
+                'stats': self.stats,
+                'import_id': str(self.import_tracker.import_id)
+            }
+            
         except Exception as e:
             self.stats['errors'].append(f"Revert failed: {e}")
             return {
                 'success': False,
                 'error': str(e),
-                'stats': self.stats
+                'stats': self.stats,
+                # Everything up to the last finished batch stays reverted
+                'resumable': True
             }
     
+    def _count_remaining_work(self):
+        """Total the relationships, objects and files left so progress can be reported"""
+        total = 0
+        if not self.checkpoint.get('relationships_done'):
+            total += self.import_tracker.imported_relationships.filter(
+                id__gt=self.checkpoint.get('relationships_after', 0)
+            ).count()
+        total += self.import_tracker.imported_objects.exclude(
+            model_name__in=self.checkpoint['completed_models']
+        ).count()
+        if not self.checkpoint.get('files_done'):
+            total += self.import_tracker.imported_files.filter(
+                id__gt=self.checkpoint.get('files_after', 0)
+            ).count()
+        self._total_steps = total
+    
+    def _iter_record_batches(self, queryset, after_id: int = 0):
+        """Yield batch_size records at a time in id order, starting after after_id"""
+        while True:
+            batch = list(queryset.filter(id__gt=after_id).order_by('id')[:self.batch_size])
+            if not batch:
+                return
+            yield batch
+            after_id = batch[-1].id
+    
+    def _get_model(self, model_name: str):
+        if model_name == 'User':
+            return apps.get_model('auth', 'User')
+        return apps.get_model('cc', model_name)
+    
     def _revert_relationships(self):
-        """Remove many-to-many relationships created during import"""
-        relationships = self.import_tracker.imported_relationships.all().order_by('-created_at')
+        """Remove many-to-many relationships created during import, deleting through table rows in batches"""
+        records = self.import_tracker.imported_relationships.all()
+        for batch in self._iter_record_batches(records, self.checkpoint.get('relationships_after', 0)):
+            pairs_by_field = {}
+            for rel in batch:
+                key = (rel.from_model, rel.relationship_field)
+                pairs_by_field.setdefault(key, set()).add((rel.from_object_id, rel.to_object_id))
+            
+            with transaction.atomic():
+                for (from_model_name, field_name), pairs in pairs_by_field.items():
+                    try:
+                        field = self._get_model(from_model_name)._meta.get_field(field_name)
+                        through = field.remote_field.through
+                        source = f"{field.m2m_field_name()}_id"
+                        target = f"{field.m2m_reverse_field_name()}_id"
+                        rows = through.objects.filter(**{
+                            f"{source}__in": {from_id for from_id, _ in pairs},
+                            f"{target}__in": {to_id for _, to_id in pairs},
+                        }).values_list('id', source, target)
+                        row_ids = [row_id for row_id, from_id, to_id in rows if (from_id, to_id) in pairs]
+                        removed, _ = through.objects.filter(id__in=row_ids).delete()
+                        self.stats['relationships_removed'] += removed
+                    except Exception as e:
+                        self.stats['errors'].append(
+                            f"Failed to remove {from_model_name}.{field_name} relationships: {e}"
+                        )
+                self._save_checkpoint(relationships_after=batch[-1].id)
+            self._advance(len(batch), "Removing relationships...")
         
-        for rel in relationships:
-            try:
-                # Get the model classes - handle special cases
-                if rel.from_model == 'User':
-                    from_model = apps.get_model('auth', 'User')
-                else:
-                    from_model = apps.get_model('cc', rel.from_model)
-                
-                if rel.to_model == 'User':
-                    to_model = apps.get_model('auth', 'User')
-                else:
-                    to_model = apps.get_model('cc', rel.to_model)
-                
-                # Get the objects
-                from_obj = from_model.objects.get(pk=rel.from_object_id)
-                to_obj = to_model.objects.get(pk=rel.to_object_id)
-                
-                # Remove the relationship
-                relationship_field = getattr(from_obj, rel.relationship_field)
-                relationship_field.remove(to_obj)
-                
-                self.stats['relationships_removed'] += 1
-                
-            except Exception as e:
-                self.stats['errors'].append(f"Failed to remove relationship {rel}: {e}")
-                
+        self._save_checkpoint(relationships_done=True)
         print(f"Removed {self.stats['relationships_removed']} relationships")
     
     def _revert_files(self):
-        """Delete files created during import"""
-        files = self.import_tracker.imported_files.all()
-        
-        for file_record in files:
+        """Delete files created during import, removing each batch with a thread pool"""
+        def remove(file_record):
+            file_path = os.path.join(settings.MEDIA_ROOT, file_record.file_path)
             try:
-                file_path = os.path.join(settings.MEDIA_ROOT, file_record.file_path)
                 if os.path.exists(file_path):
                     os.remove(file_path)
-                    
-                    # Try to remove empty directories
-                    try:
-                        parent_dir = os.path.dirname(file_path)
-                        if os.path.exists(parent_dir) and not os.listdir(parent_dir):
-                            os.rmdir(parent_dir)
-                    except OSError:
-                        pass  # Directory not empty or can't be removed
-                
-                self.stats['files_deleted'] += 1
-                
+                return file_path, None
             except Exception as e:
-                self.stats['errors'].append(f"Failed to delete file {file_record.file_path}: {e}")
-                
+                return file_path, f"Failed to delete file {file_record.file_path}: {e}"
+        
+        parent_dirs = set()
+        records = self.import_tracker.imported_files.all()
+        with ThreadPoolExecutor(max_workers=settings.IMPORT_REVERT_FILE_WORKERS) as executor:
+            for batch in self._iter_record_batches(records, self.checkpoint.get('files_after', 0)):
+                for file_path, error in executor.map(remove, batch):
+                    if error:
+                        self.stats['errors'].append(error)
+                    else:
+                        self.stats['files_deleted'] += 1
+                        parent_dirs.add(os.path.dirname(file_path))
+                self._save_checkpoint(files_after=batch[-1].id)
+                self._advance(len(batch), "Deleting imported files...")
+        
+        # Try to remove directories left empty
+        for parent_dir in parent_dirs:
+            try:
+                if os.path.exists(parent_dir) and not os.listdir(parent_dir):
+                    os.rmdir(parent_dir)
+            except OSError:
+                pass  # Directory not empty or can't be removed
+        
+        self._save_checkpoint(files_done=True)
         print(f"Deleted {self.stats['files_deleted']} files")
     
     def _revert_objects(self):
-        """Delete objects created during import in reverse order"""
-        # Group objects by model and delete in dependency order
-        objects_by_model = {}
-        for obj_record in self.import_tracker.imported_objects.all().order_by('-created_at'):
-            model_name = obj_record.model_name
-            if model_name not in objects_by_model:
-                objects_by_model[model_name] = []
-            objects_by_model[model_name].append(obj_record)
-        
-        # Delete in reverse dependency order
-        deletion_order = [
-            'MetadataColumn',
-            'StepTag', 'ProtocolTag',
-            'ProtocolRating',
-            'Annotation', 'AnnotationFolder',
-            'Session',
-            'ProtocolStep', 'ProtocolSection',
-            'ProtocolModel',
-            'ReagentAction', 'StoredReagent',
-            'StorageObject',
-            'Project',
-            'LabGroup',
-            'RemoteHost',
-            'Tag', 'Reagent'
-        ]
+        """Delete objects created during import model by model in dependency order"""
+        model_names = set(
+            self.import_tracker.imported_objects.values_list('model_name', flat=True).distinct()
+        )
+        ordered = [name for name in self.DELETION_ORDER if name in model_names]
+        ordered += sorted(model_names - set(self.DELETION_ORDER))
         
-        # Delete objects in specified order, then any remaining
-        all_models = set(objects_by_model.keys())
-        for model_name in deletion_order:
-            if model_name in objects_by_model:
-                self._delete_objects_of_model(model_name, objects_by_model[model_name])
-                all_models.remove(model_name)
+        for model_name in ordered:
+            if model_name in self.checkpoint['completed_models']:
+                continue
+            after_id = self.checkpoint.get('objects_after', 0) if self.checkpoint.get('current_model') == model_name else 0
+            self._delete_objects_of_model(model_name, after_id)
+            self._save_checkpoint(
+                completed_models=self.checkpoint['completed_models'] + [model_name],
+                current_model=None, objects_after=0
+            )
         
-        # Delete any remaining models not in the explicit order
-        for model_name in all_models:
-            self._delete_objects_of_model(model_name, objects_by_model[model_name])
-            
         print(f"Deleted {self.stats['objects_deleted']} objects")
     
-    def _delete_objects_of_model(self, model_name: str, obj_records: List):
-        """Delete all objects of a specific model"""
+    def _delete_objects_of_model(self, model_name: str, after_id: int = 0):
+        """Delete the tracked objects of one model with one pk__in delete per batch"""
+        records = self.import_tracker.imported_objects.filter(model_name=model_name)
         try:
             model_class = apps.get_model('cc', model_name)
-            
-            for obj_record in obj_records:
-                try:
-                    obj = model_class.objects.get(pk=obj_record.object_id)
-                    obj.delete()
-                    self.stats['objects_deleted'] += 1
-                    
-                except model_class.DoesNotExist:
-                    # Object already deleted or doesn't exist
-                    pass
-                except Exception as e:
-                    self.stats['errors'].append(f"Failed to delete {model_name}({obj_record.object_id}): {e}")
-                    
         except LookupError:
             self.stats['errors'].append(f"Model {model_name} not found")
+            self._advance(records.count(), f"Skipped {model_name}")
+            return
+        
+        for batch in self._iter_record_batches(records, after_id):
+            object_ids = [record.object_id for record in batch]
+            try:
+                with transaction.atomic(), self._history_disabled():
+                    _, deleted = model_class.objects.filter(pk__in=object_ids).delete()
+                    self.stats['objects_deleted'] += deleted.get(model_class._meta.label, 0)
+                    self._save_checkpoint(current_model=model_name, objects_after=batch[-1].id)
+            except Exception as e:
+                self.stats['errors'].append(f"Failed to delete {model_name} objects {object_ids[:10]}: {e}")
+                raise
+            self._advance(len(batch), f"Deleting {model_name} objects...")
 
 
 def revert_user_data_import(import_id: str, reverting_user: User) -> Dict[str, Any]:
@@ -2233,7 +2720,7 @@ def list_user_imports(user: User, include_reverted: bool = False) -> List[Dict[s
     return imports
 
 
-def import_user_data_revised(target_user: User, import_path: str, import_options: dict = None, progress_callback=None, storage_object_mappings: dict = None, bulk_transfer_mode: bool = False, vault_items: bool = True) -> Dict[str, Any]:
+def import_user_data_revised(target_user: User, import_path: str, import_options: dict = None, progress_callback=None, storage_object_mappings: dict = None, bulk_transfer_mode: bool = False, vault_items: bool = True, database_path: str = None, checkpoint: JobCheckpointer = None) -> Dict[str, Any]:
     """
     REVISED comprehensive function to import user data with progress tracking and selective import.
     
@@ -2245,9 +2732,11 @@ def import_user_data_revised(target_user: User, import_path: str, import_options
         storage_object_mappings: Optional dict mapping original storage IDs to nominated storage IDs
         bulk_transfer_mode: If True, import everything as-is without user-centric modifications
         vault_items: If True, import items as vaulted (private to user). Default: True for security
+        database_path: Optional migrated database to import instead of the one in the archive
+        checkpoint: Optional job checkpoint to record and resume progress with
     
     Returns:
         Dict: Import results and statistics
     """
-    importer = UserDataImporter(target_user, import_path, import_options, progress_callback, storage_object_mappings, bulk_transfer_mode, vault_items)
+    importer = UserDataImporter(target_user, import_path, import_options, progress_callback, storage_object_mappings, bulk_transfer_mode, vault_items, database_path, checkpoint)
     return importer.import_user_data()
@@ -13,13 +13,14 @@ from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.db.models import Q, Max, Count, Sum
+from django.db.models import Q, Max, Count, Sum, Exists, F, OuterRef
 from django_rq import get_queue
 from django.core.signing import TimestampSigner, loads, dumps, BadSignature, SignatureExpired
 from django.db.models.expressions import result
 from django.http import HttpResponse
 from django.utils import timezone
-from django.utils.dateparse import parse_datetime
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_date, parse_datetime
 from django.views.decorators.csrf import ensure_csrf_cookie, csrf_protect
 from django_filters.views import FilterMixin
 from drf_chunked_upload.models import ChunkedUpload
@@ -47,11 +48,14 @@ from cc.models import ProtocolModel, ProtocolStep, Annotation, Session, StepVari
     FavouriteMetadataOption, Preset, MetadataTableTemplate, MaintenanceLog, SupportInformation, ExternalContact, \
     ExternalContactDetails, Message, MessageRecipient, MessageAttachment, MessageRecipient, MessageThread, \
     ReagentSubscription, SiteSettings, BackupLog, DocumentPermission, ImportTracker, ServiceTier, ServicePrice, \
-    BillingRecord, ProtocolStepSuggestionCache, SamplePool, RemoteHost
+    BillingRecord, ProtocolStepSuggestionCache, SamplePool, RemoteHost, InstrumentAvailabilityDay, BillingMonthlyTotal, \
+    InboxEntry
 from cc.permissions import OwnerOrReadOnly, InstrumentUsagePermission, InstrumentViewSetPermission, IsParticipantOrAdmin, IsCoreFacilityPermission
 from cc.rq_tasks import transcribe_audio_from_video, transcribe_audio, create_docx, llama_summary, remove_html_tags, \
     ocr_b64_image, export_data, import_data, dry_run_import_data, llama_summary_transcript, export_sqlite, export_instrument_job_metadata, \
-    import_sdrf_file, validate_sdrf_file, export_excel_template, export_instrument_usage, import_excel, sdrf_validate, export_reagent_actions, import_reagents_from_file, check_instrument_warranty_maintenance
+    import_sdrf_file, validate_sdrf_file, export_excel_template, export_instrument_usage, import_excel, sdrf_validate, export_reagent_actions, import_reagents_from_file, check_instrument_warranty_maintenance, \
+    enqueue_transcription, enqueue_ocr, enqueue_summary, ocr_annotations, revert_import_data, serve_cached_docx, \
+    serve_cached_export_data, serve_cached_instrument_job_metadata, serve_cached_excel_template
 from cc.serializers import ProtocolModelSerializer, ProtocolStepSerializer, AnnotationSerializer, \
     SessionSerializer, StepVariationSerializer, TimeKeeperSerializer, ProtocolSectionSerializer, UserSerializer, \
     ProtocolRatingSerializer, ReagentSerializer, StepReagentSerializer, ProtocolReagentSerializer, \
@@ -69,6 +73,8 @@ from cc.serializers import ProtocolModelSerializer, ProtocolStepSerializer, Anno
 from cc.rq_tasks import analyze_protocol_step_task, analyze_full_protocol_task
 from cc.utils import user_metadata, staff_metadata, send_slack_notification
 from cc.utils.user_data_import_revised import ImportReverter
+from cc.services import instrument_booking, instrument_availability, instrument_utilization, notifications, inbox, \
+    result_cache
 from mcp_server.tools.protocol_analyzer import ProtocolAnalyzer
 
 
@@ -370,7 +376,8 @@ class ProtocolViewSet(ModelViewSet, FilterMixin):
             session (int): Session ID for session-based exports
             
         Returns:
-            Response: 200 if export job queued successfully
+            Response: 200 if export job queued successfully, with the signed download
+            when an unchanged earlier export is reused
         """
         protocol = self.get_object()
         custom_id = self.request.META.get('HTTP_X_CUPCAKE_INSTANCE_ID', None)
@@ -380,17 +387,29 @@ class ProtocolViewSet(ModelViewSet, FilterMixin):
                     session_id = self.request.data['session']
                     if "format" in self.request.data:
                         if "docx" == self.request.data["format"]:
+                            signed_value = serve_cached_docx(protocol.id, session_id, self.request.user.id, custom_id)
+                            if signed_value:
+                                return Response({"signed_value": signed_value, "cached": True}, status=status.HTTP_200_OK)
                             create_docx.delay(protocol.id, session_id, self.request.user.id, custom_id)
                             return Response(status=status.HTTP_200_OK)
                         elif "tar.gz" == self.request.data["format"]:
+                            signed_value = serve_cached_export_data(self.request.user.id, session_ids=[session_id], instance_id=custom_id, export_type="session", format_type="tar.gz")
+                            if signed_value:
+                                return Response({"signed_value": signed_value, "cached": True}, status=status.HTTP_200_OK)
                             export_data.delay(self.request.user.id, session_ids=[session_id], instance_id=custom_id, export_type="session", format_type="tar.gz")
                             return Response(status=status.HTTP_200_OK)
             elif "protocol" == self.request.data["export_type"]:
                 if "format" in self.request.data:
                     if "docx" == self.request.data["format"]:
+                        signed_value = serve_cached_docx(protocol.id, None, self.request.user.id, custom_id)
+                        if signed_value:
+                            return Response({"signed_value": signed_value, "cached": True}, status=status.HTTP_200_OK)
                         create_docx.delay(protocol.id, None, self.request.user.id, custom_id)
                         return Response(status=status.HTTP_200_OK)
                     elif "tar.gz" == self.request.data["format"]:
+                        signed_value = serve_cached_export_data(self.request.user.id, protocol_ids=[protocol.id], instance_id=custom_id, export_type="protocol", format_type="tar.gz")
+                        if signed_value:
+                            return Response({"signed_value": signed_value, "cached": True}, status=status.HTTP_200_OK)
                         export_data.delay(self.request.user.id, protocol_ids=[protocol.id], instance_id=custom_id, export_type="protocol", format_type="tar.gz")
                         return Response(status=status.HTTP_200_OK)
             elif "session-sqlite" == self.request.data["export_type"]:
@@ -1520,12 +1539,11 @@ class AnnotationViewSet(ModelViewSet, FilterMixin):
             annotation.annotation_name = request.data['file'].name
             uploaded_file_extension = request.data['file'].name.split('.')[-1]
             annotation.file.save(uuid.uuid4().hex+"."+uploaded_file_extension, djangoFile(request.data['file']))
+            result_cache.annotation_content_hash(annotation)
         annotation.save()
         if settings.USE_WHISPER:
-            if annotation.annotation_type == "video":
-                transcribe_audio_from_video.delay(annotation.file.path, settings.WHISPERCPP_DEFAULT_MODEL, annotation.id, "auto", True, custom_id)
-            elif annotation.annotation_type == "audio":
-                transcribe_audio.delay(annotation.file.path, settings.WHISPERCPP_DEFAULT_MODEL, annotation.id, "auto", True, custom_id)
+            if annotation.annotation_type in ("video", "audio"):
+                enqueue_transcription(annotation, "auto", True, custom_id)
         if annotation.annotation_type == "instrument":
             usage = InstrumentUsage.objects.create(
                 instrument=instrument,
@@ -1587,6 +1605,7 @@ class AnnotationViewSet(ModelViewSet, FilterMixin):
             instance.annotation = request.data['annotation']
         if 'file' in request.data:
             instance.file = request.data['file']
+            instance.content_hash = None
         if 'translation' in request.data:
             instance.translation = request.data['translation']
         if 'transcription' in request.data:
@@ -1774,10 +1793,10 @@ class AnnotationViewSet(ModelViewSet, FilterMixin):
             return Response(status=status.HTTP_401_UNAUTHORIZED)
         if "language" in request.data:
             language = request.data['language']
-        if annotation.annotation_type == "video":
-            transcribe_audio_from_video.delay(annotation.file.path, settings.WHISPERCPP_DEFAULT_MODEL, annotation.id, language, True)
-        elif annotation.annotation_type == "audio":
-            transcribe_audio.delay(annotation.file.path, settings.WHISPERCPP_DEFAULT_MODEL, annotation.id, language, True)
+        # The cached transcription of the same media is reused unless the client forces a new run
+        force = request.query_params.get('force', 'false').lower() == 'true'
+        if annotation.annotation_type in ("video", "audio"):
+            enqueue_transcription(annotation, language, True, use_cache=not force)
         else:
             return Response(status=status.HTTP_400_BAD_REQUEST)
         return Response(status=status.HTTP_200_OK)
@@ -1790,12 +1809,34 @@ class AnnotationViewSet(ModelViewSet, FilterMixin):
         custom_id = self.request.META.get('HTTP_X_CUPCAKE_INSTANCE_ID', None)
         if not annotation.check_for_right(request.user, "edit"):
             return Response(status=status.HTTP_401_UNAUTHORIZED)
-        if annotation.annotation_type == "sketch":
-            with open(annotation.file.path, "rb") as f:
-                json_data = json.load(f)
-                ocr_b64_image.delay(json_data["png"], annotation.id, annotation.session.unique_id, custom_id)
+        if annotation.annotation_type in ("sketch", "image") and annotation.file:
+            enqueue_ocr(annotation, custom_id)
         return Response(status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['post'])
+    def ocr_batch(self, request):
+        """
+        Recognize the sketch and image annotations of a session, a folder or an explicit list as one OCR job.
+        Only annotations the user can edit are included.
+        """
+        if not settings.USE_OCR:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        custom_id = self.request.META.get('HTTP_X_CUPCAKE_INSTANCE_ID', None)
+        annotations = Annotation.objects.filter(annotation_type__in=["sketch", "image"]).exclude(file="").exclude(file__isnull=True)
+        if "session" in request.data:
+            annotations = annotations.filter(session__unique_id=request.data['session'])
+        elif "folder" in request.data:
+            annotations = annotations.filter(folder_id=request.data['folder'])
+        elif "annotations" in request.data:
+            annotations = annotations.filter(id__in=request.data['annotations'])
+        else:
+            return Response({"error": "session, folder or annotations is required"}, status=status.HTTP_400_BAD_REQUEST)
+        annotation_ids = [annotation.id for annotation in annotations if annotation.check_for_right(request.user, "edit")]
+        if not annotation_ids:
+            return Response({"annotations": 0}, status=status.HTTP_200_OK)
+        job = ocr_annotations.delay(annotation_ids, request.user.id, custom_id)
+        return Response({"annotations": len(annotation_ids), "job_id": job.id}, status=status.HTTP_202_ACCEPTED)
+
     @action(detail=True, methods=['post'])
     def scratch(self, request, pk=None):
         annotation: Annotation = self.get_object()
@@ -1905,6 +1946,7 @@ class SessionViewSet(ModelViewSet, FilterMixin):
         session.user = user
         session.unique_id = uuid.uuid4()
         session.save()
+        notifications.update_session_groups(session, [user.id])
         if "protocol_ids" in request.data:
             for protocol_id in request.data['protocol_ids']:
                 protocol = ProtocolModel.objects.get(id=protocol_id)
@@ -2180,6 +2222,7 @@ class SessionViewSet(ModelViewSet, FilterMixin):
             session.editors.add(user)
         else:
             return Response(status=status.HTTP_400_BAD_REQUEST)
+        notifications.update_session_groups(session, [user.id])
         return Response(status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['get'])
@@ -2207,6 +2250,8 @@ class SessionViewSet(ModelViewSet, FilterMixin):
             session.editors.remove(user)
         else:
             return Response(status=status.HTTP_400_BAD_REQUEST)
+        if not notifications.follows_session(session, user.id):
+            notifications.update_session_groups(session, [user.id], joined=False)
         return Response(status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['get'])
@@ -2630,7 +2675,7 @@ class UserViewSet(ModelViewSet, FilterMixin):
         prompt = request.data['prompt']
         prompt = f"System: You are a helpful laboratory assistant.\nUser: {prompt}"
         custom_id = self.request.META.get('HTTP_X_CUPCAKE_INSTANCE_ID', None)
-        llama_summary.delay(prompt, request.user.id, request.data['target'], custom_id)
+        enqueue_summary(prompt, request.user.id, request.data['target'], custom_id)
         return Response(status=status.HTTP_200_OK)
 
     @action(detail=False, methods=['post'])
@@ -2645,7 +2690,7 @@ class UserViewSet(ModelViewSet, FilterMixin):
         prompt += f"Please summarize the information above in 1 paragraph that is at most 3 sentences long without adding current step information or any other extra.<|im_end|>\n<|im_start|>assistant"
 
         custom_id = self.request.META.get('HTTP_X_CUPCAKE_INSTANCE_ID', None)
-        llama_summary.delay(prompt, request.user.id, request.data['target'], custom_id)
+        enqueue_summary(prompt, request.user.id, request.data['target'], custom_id)
         return Response(status=status.HTTP_200_OK)
 
     @action(detail=False, methods=['post'])
@@ -2658,7 +2703,7 @@ class UserViewSet(ModelViewSet, FilterMixin):
             wtt = annotation.translation
         prompt = f"<|im_start|>system\n You are a helpful laboratory assistant.\nBellow is the content of a webvtt transcription file.\n<|im_end|>\n<|im_start|>user\n{wtt}\n<|im_end|><|im_start|>user\nPlease provide a short summary list of the content above and do not mention that it is from a Webvtt file or any extra details about the file.\n<|im_end|>\n<|im_start|>assistant"
         custom_id = self.request.META.get('HTTP_X_CUPCAKE_INSTANCE_ID', None)
-        llama_summary_transcript.delay(prompt, request.user.id, request.data['target'], custom_id)
+        enqueue_summary(prompt, request.user.id, request.data['target'], custom_id, transcript=True)
         return Response(status=status.HTTP_200_OK)
 
 
@@ -2679,18 +2724,23 @@ class UserViewSet(ModelViewSet, FilterMixin):
         """
         Export user data in various formats and scopes.
 
-        Supports three export types:
+        Supports four export types:
         - Protocol-specific: Export data for specified protocols only
         - Session-specific: Export data for specified sessions only
+        - Incremental: Export protocols, sessions and annotations changed since the last export of a profile
         - Complete: Export all user data (default)
 
         Request Data:
             protocol_ids (list): Protocol IDs to export (optional)
             session_ids (list): Session IDs to export (optional)
-            format (str): Export format - 'zip' (default), 'tar.gz'
+            export_options (dict): Optional settings
+                format (str): Export format - 'zip' (default), 'tar.gz', 'tar', 'tar.zst'
+                incremental (bool): Make an incremental export
+                profile (str): Watermark profile of the incremental export, 'default' if omitted
 
         Returns:
-            Response: 200 OK when export task is queued
+            Response: 200 OK when export task is queued, with the signed download when an
+            unchanged earlier export of the same scope and format is reused
         """
         custom_id = self.request.META.get('HTTP_X_CUPCAKE_INSTANCE_ID', None)
 
@@ -2698,10 +2748,24 @@ class UserViewSet(ModelViewSet, FilterMixin):
         session_ids = request.data.get('session_ids', None)
         export_options = request.data.get('export_options', None)
         format_type = "zip"
+        incremental = False
+        export_profile = "default"
         if export_options:
             if "format" in export_options:
                 format_type = export_options.get('format', 'zip')
-
+            incremental = bool(export_options.get('incremental', False))
+            export_profile = export_options.get('profile') or "default"
+
+        signed_value = serve_cached_export_data(
+            request.user.id,
+            protocol_ids=protocol_ids,
+            session_ids=session_ids,
+            instance_id=custom_id,
+            export_type="protocol" if protocol_ids else "session" if session_ids else "incremental" if incremental else "complete",
+            format_type=format_type
+        )
+        if signed_value:
+            return Response({"signed_value": signed_value, "cached": True}, status=status.HTTP_200_OK)
 
         if protocol_ids:
             export_data.delay(
@@ -2719,6 +2783,14 @@ class UserViewSet(ModelViewSet, FilterMixin):
                 export_type="session",
                 format_type=format_type
             )
+        elif incremental:
+            export_data.delay(
+                request.user.id,
+                instance_id=custom_id,
+                export_type="incremental",
+                format_type=format_type,
+                export_profile=export_profile
+            )
         else:
             export_data.delay(
                 request.user.id,
@@ -4807,6 +4879,50 @@ class InstrumentViewSet(ModelViewSet, FilterMixin):
 
         return Response({'can_manage': has_manage_permission}, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['get'])
+    def utilization(self, request):
+        """
+        Booked, approved and maintenance hours of the instruments the user manages between the dates
+        time_started and time_ended, the last 30 days by default. Hours are summed per day, week or
+        month (period) and per instrument, user or lab_group (group_by).
+        """
+        instruments = Instrument.objects.all()
+        try:
+            instrument_ids = [int(i) for i in request.query_params.get('instruments', '').split(',') if i]
+        except ValueError:
+            return Response({"error": "Invalid instruments"}, status=status.HTTP_400_BAD_REQUEST)
+        if instrument_ids:
+            instruments = instruments.filter(id__in=instrument_ids)
+        if not request.user.is_staff:
+            instruments = instruments.filter(instrument_permissions__user=request.user, instrument_permissions__can_manage=True)
+        instrument_ids = list(instruments.values_list('id', flat=True).distinct())
+        if not instrument_ids:
+            return Response(status=status.HTTP_403_FORBIDDEN)
+
+        time_ended = request.query_params.get('time_ended', None)
+        time_started = request.query_params.get('time_started', None)
+        try:
+            time_ended = parse_date(time_ended) if time_ended else timezone.now().date()
+            time_started = parse_date(time_started) if time_started else time_ended - timedelta(days=30)
+        except (TypeError, ValueError):
+            return Response({"error": "Invalid time range"}, status=status.HTTP_400_BAD_REQUEST)
+        if not time_started or not time_ended or time_ended < time_started:
+            return Response({"error": "Invalid time range"}, status=status.HTTP_400_BAD_REQUEST)
+
+        period = request.query_params.get('period', 'day')
+        group_by = request.query_params.get('group_by', 'instrument')
+        try:
+            results = instrument_utilization.utilization(instrument_ids, time_started, time_ended, period, group_by)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            "time_started": time_started,
+            "time_ended": time_ended,
+            "period": period,
+            "group_by": group_by,
+            "results": results,
+        }, status=status.HTTP_200_OK)
+
 class InstrumentUsageViewSet(ModelViewSet, FilterMixin):
     permission_classes = [InstrumentUsagePermission]
     queryset = InstrumentUsage.objects.all()
@@ -4876,6 +4992,64 @@ class InstrumentUsageViewSet(ModelViewSet, FilterMixin):
         print(obj)
         return obj
 
+    @action(detail=False, methods=['get'])
+    def availability(self, request):
+        """
+        Free/busy slots of instruments between time_started and time_ended, the next 30 days by default.
+        With duration_hours the earliest free window of that length on each instrument is returned instead.
+        """
+        try:
+            instrument_ids = [int(i) for i in request.query_params.get('instruments', '').split(',') if i]
+        except ValueError:
+            return Response({"error": "Invalid instruments"}, status=status.HTTP_400_BAD_REQUEST)
+        if not instrument_ids:
+            return Response({"error": "instruments is required"}, status=status.HTTP_400_BAD_REQUEST)
+        if not request.user.is_staff:
+            instrument_ids = list(InstrumentPermission.objects.filter(
+                instrument__id__in=instrument_ids, user=request.user, can_view=True
+            ).values_list('instrument_id', flat=True))
+            if not instrument_ids:
+                return Response(status=status.HTTP_403_FORBIDDEN)
+        instrument_ids = list(Instrument.objects.filter(id__in=instrument_ids).values_list('id', flat=True))
+
+        time_started = request.query_params.get('time_started', None)
+        time_ended = request.query_params.get('time_ended', None)
+        try:
+            time_started = parse_datetime(time_started) if time_started else timezone.now()
+            time_ended = parse_datetime(time_ended) if time_ended else time_started + timedelta(days=30)
+        except (TypeError, ValueError):
+            return Response({"error": "Invalid time range"}, status=status.HTTP_400_BAD_REQUEST)
+        if not time_started or not time_ended:
+            return Response({"error": "Invalid time range"}, status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(time_started):
+            time_started = timezone.make_aware(time_started, timezone.get_current_timezone())
+        if timezone.is_naive(time_ended):
+            time_ended = timezone.make_aware(time_ended, timezone.get_current_timezone())
+        if time_ended <= time_started or time_ended - time_started > timedelta(days=366):
+            return Response({"error": "Invalid time range"}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = {
+            "slot_minutes": settings.INSTRUMENT_SLOT_MINUTES,
+            "time_started": time_started,
+            "time_ended": time_ended,
+        }
+        duration_hours = request.query_params.get('duration_hours', None)
+        if duration_hours:
+            try:
+                duration = timedelta(hours=float(duration_hours))
+            except ValueError:
+                return Response({"error": "Invalid duration_hours"}, status=status.HTTP_400_BAD_REQUEST)
+            data["windows"] = instrument_availability.first_free_windows(
+                instrument_ids, duration, time_started, time_ended
+            )
+        else:
+            data["instruments"] = instrument_availability.busy_days(
+                instrument_ids,
+                InstrumentAvailabilityDay.to_day(time_started),
+                InstrumentAvailabilityDay.to_day(time_ended),
+            )
+        return Response(data, status=status.HTTP_200_OK)
+
     @action(detail=False, methods=['get'])
     def get_user_instrument_usage(self, request):
         user = self.request.user
@@ -4892,8 +5066,12 @@ class InstrumentUsageViewSet(ModelViewSet, FilterMixin):
                 time_started = timezone.make_aware(time_started, timezone.get_current_timezone())
             if timezone.is_naive(time_ended):
                 time_ended = timezone.make_aware(time_ended, timezone.get_current_timezone())
-        if InstrumentUsage.objects.filter(time_started__range=[time_started,time_ended]).exists() or InstrumentUsage.objects.filter(time_ended__range=[time_started, time_ended]).exists():
-            return Response(status=status.HTTP_409_CONFLICT)
+        if not settings.ALLOW_OVERLAP_BOOKINGS:
+            conflicts = instrument_booking.find_conflicts(
+                instance.instrument_id, [(time_started, time_ended)], exclude_ids=[instance.id]
+            )
+            if conflicts:
+                return Response({"conflicts": [u.id for u in conflicts]}, status=status.HTTP_409_CONFLICT)
         if "time_started" in request.data:
             instance.time_started = time_started
         if "time_ended" in request.data:
@@ -4958,12 +5136,6 @@ class InstrumentUsageViewSet(ModelViewSet, FilterMixin):
             if timezone.is_naive(time_ended):
                 time_ended = timezone.make_aware(time_ended, timezone.get_current_timezone())
 
-        if (InstrumentUsage.objects.filter(time_started__range=[time_started,time_ended]).exists()
-                or
-                InstrumentUsage.objects.filter(time_ended__range=[time_started, time_ended]).exists()):
-            if not settings.ALLOW_OVERLAP_BOOKINGS:
-                return Response(status=status.HTTP_409_CONFLICT)
-
         usage.instrument = instrument
         usage.user = user
         usage.time_started = time_started
@@ -4995,20 +5167,29 @@ class InstrumentUsageViewSet(ModelViewSet, FilterMixin):
                     if not can_manage.exists():
                         return Response(status=status.HTTP_401_UNAUTHORIZED)
 
-        usage.save()
+        # Recurring maintenance is checked as one series and created with one insert
         if usage.maintenance and repeat and repeat_until:
-            while usage.time_ended < repeat_until:
-                # create a new usage object for each repeat
-                new_usage = InstrumentUsage()
-                new_usage.instrument = instrument
-                new_usage.user = user
-                new_usage.time_started = usage.time_started + timedelta(days=repeat)
-                new_usage.time_ended = usage.time_ended + timedelta(days=repeat)
-                new_usage.description = request.data['description']
-                new_usage.approved = True
-                new_usage.maintenance = True
-                new_usage.save()
-                usage = new_usage
+            try:
+                repeat = int(repeat)
+            except (TypeError, ValueError):
+                return Response({"error": "Invalid repeat"}, status=status.HTTP_400_BAD_REQUEST)
+            if timedelta(days=repeat) < duration:
+                return Response(
+                    {"error": "The repeat interval must be at least as long as the booking"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            intervals = instrument_booking.repeat_intervals(time_started, time_ended, repeat, repeat_until)
+        else:
+            intervals = [(time_started, time_ended)]
+        if not settings.ALLOW_OVERLAP_BOOKINGS:
+            conflicts = instrument_booking.find_conflicts(instrument.id, intervals)
+            if conflicts:
+                return Response({"conflicts": [u.id for u in conflicts]}, status=status.HTTP_409_CONFLICT)
+
+        if len(intervals) > 1:
+            usage = instrument_booking.create_usage_series(usage, intervals)[-1]
+        else:
+            usage.save()
         data = self.get_serializer(usage).data
         return Response(data, status=status.HTTP_201_CREATED)
 
@@ -6799,6 +6980,9 @@ class InstrumentJobViewSets(FilterMixin, ModelViewSet):
                     if instrument_job.user != self.request.user:
                         return Response(status=status.HTTP_403_FORBIDDEN)
 
+        signed_value = serve_cached_instrument_job_metadata(instrument_job.id, request.data["data_type"], request.user.id, request.data["instance_id"])
+        if signed_value:
+            return Response({"signed_value": signed_value, "cached": True}, status=status.HTTP_200_OK)
         job = export_instrument_job_metadata.delay(instrument_job.id, request.data["data_type"], request.user.id, request.data["instance_id"])
         return Response({"task_id": job.id}, status=status.HTTP_200_OK)
 
@@ -6865,6 +7049,9 @@ class InstrumentJobViewSets(FilterMixin, ModelViewSet):
                     else:
                         if request.data["export_type"] != 'user_metadata':
                             return Response(status=status.HTTP_403_FORBIDDEN)
+        signed_value = serve_cached_excel_template(request.user.id, request.data["instance_id"], instrument_job.id, request.data["export_type"])
+        if signed_value:
+            return Response({"signed_value": signed_value, "cached": True}, status=status.HTTP_200_OK)
         job = export_excel_template.delay(request.user.id, request.data["instance_id"], instrument_job.id, request.data["export_type"])
         return Response({"task_id": job.id}, status=status.HTTP_200_OK)
 
@@ -8336,19 +8523,18 @@ class MessageThreadViewSet(ModelViewSet):
         message_type = self.request.query_params.get('message_type', None)
         unread_only = self.request.query_params.get('unread', None) == 'true'
 
-        query = Q(participants=user) | Q(lab_group__in=user.lab_groups.all()) | Q(is_system_thread=True, messages__message_type="announcement") | Q(
-            creator=user)
-        if message_type:
-            query &= Q(messages__message_type=message_type)
+        # Threads the user can see are listed from their inbox entries, see InboxEntry
+        entries = {'inbox_entries__user': user}
         if unread_only:
-            thread_ids = MessageRecipient.objects.filter(
-                user=user,
-                is_read=False,
-                is_deleted=False
-            ).values_list('message__thread', flat=True).distinct()
-
-            query &= Q(id__in=thread_ids)
-        return MessageThread.objects.filter(query).distinct()
+            entries['inbox_entries__unread_count__gt'] = 0
+        threads = MessageThread.objects.filter(**entries).annotate(
+            inbox_unread_count=F('inbox_entries__unread_count')
+        ).order_by('-inbox_entries__thread_updated_at')
+        if message_type:
+            threads = threads.filter(
+                Exists(Message.objects.filter(thread=OuterRef('pk'), message_type=message_type))
+            )
+        return threads
 
     def get_serializer_class(self):
         if self.action == 'retrieve':
@@ -8434,15 +8620,13 @@ class MessageThreadViewSet(ModelViewSet):
             is_read=False
         )
         recipients.update(is_read=True, read_at=now)
+        inbox.apply_unread_changes(InboxEntry.refresh_unread(thread.id, [request.user.id]))
         return Response({'status': 'all messages marked as read'})
 
+    @action(detail=False, methods=['get'])
     def unread_thread_count(self, request):
-        user = request.user
-        unread_count = MessageRecipient.objects.filter(
-            user=user,
-            is_read=False
-        ).count()
-        return Response({'unread_count': unread_count})
+        """Unread messages of the user, from the cached counter of their inbox"""
+        return Response({'unread_count': inbox.unread_count(request.user.id)})
 
 
 class MessageViewSet(ModelViewSet):
@@ -8484,12 +8668,13 @@ class MessageViewSet(ModelViewSet):
         serializer.is_valid(raise_exception=True)
         message = serializer.save(thread=thread)
 
-        for participant in thread.participants.all():
-            MessageRecipient.objects.create(
-                message=message,
-                user=participant,
-                is_read=(participant == request.user)
-            )
+        # Staff announcements in system threads reach everyone, other messages the thread's participants and lab group
+        audience = notifications.build_audience(
+            users=thread.participants.values_list('id', flat=True),
+            lab_groups=[thread.lab_group_id] if thread.lab_group_id else [],
+            everyone=message.message_type == 'announcement' and thread.is_system_thread and request.user.is_staff,
+        )
+        notifications.notify(message, audience, read_by=request.user.id)
 
         files = request.FILES.getlist('attachments')
         for file in files:
@@ -10784,6 +10969,14 @@ class ImportTrackerViewSet(ModelViewSet):
         - Clearing all imported relationships
         - Marking the import as reverted
         
+        Objects are deleted in batches and a revert that stopped half way continues
+        where it left off when requested again.
+        
+        Request Data:
+            background (bool): Queue the revert and report progress over the websocket (optional)
+            suppress_history (bool): Do not write history rows for the deleted objects,
+                only honoured for background reverts (optional)
+        
         Returns:
             Response: Status of revert operation with detailed information
         """
@@ -10807,19 +11000,22 @@ class ImportTrackerViewSet(ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        if request.data.get('background', False):
+            custom_id = self.request.META.get('HTTP_X_CUPCAKE_INSTANCE_ID', None)
+            revert_import_data.delay(
+                str(import_tracker.import_id), user.id, custom_id, bool(request.data.get('suppress_history', False))
+            )
+            return Response({
+                'success': True,
+                'message': 'Import revert queued',
+                'instance_id': custom_id
+            }, status=status.HTTP_202_ACCEPTED)
+        
         try:
-
-
             reverter = ImportReverter(import_tracker, user)
             revert_result = reverter.revert_import()
             
             if revert_result['success']:
-                import_tracker.can_revert = False
-                import_tracker.reverted_at = timezone.now()
-                import_tracker.reverted_by = user
-                import_tracker.import_status = 'reverted'
-                import_tracker.save()
-                
                 return Response({
                     'success': True,
                     'message': 'Import successfully reverted',
@@ -11065,8 +11261,13 @@ class BillingRecordViewSet(ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def summary(self, request):
-        """Get billing summary statistics"""
-        queryset = self.get_queryset()
+        """
+        Get billing summary statistics, read from the monthly totals of the lab groups with one query.
+        The start and end dates select whole months.
+        """
+        totals = BillingMonthlyTotal.objects.filter(
+            lab_group__in=self.request.user.lab_groups.filter(is_core_facility=True)
+        )
         
         # Get query parameters for filtering
         start_date = request.query_params.get('start_date')
@@ -11074,115 +11275,115 @@ class BillingRecordViewSet(ModelViewSet):
         status = request.query_params.get('status')
         
         if start_date:
-            queryset = queryset.filter(billing_date__gte=start_date)
+            start_date = parse_date(start_date)
+            if not start_date:
+                return Response({'error': 'Invalid start_date'}, status=400)
+            totals = totals.filter(month__gte=BillingMonthlyTotal.month_of(start_date))
         if end_date:
-            queryset = queryset.filter(billing_date__lte=end_date)
+            end_date = parse_date(end_date)
+            if not end_date:
+                return Response({'error': 'Invalid end_date'}, status=400)
+            totals = totals.filter(month__lte=end_date)
         if status:
-            queryset = queryset.filter(status=status)
+            totals = totals.filter(status=status)
         
         summary_data = {
-            'total_records': queryset.count(),
-            'total_amount': queryset.aggregate(total=Sum('total_amount'))['total'] or Decimal('0.00'),
-            'by_status': {},
+            'total_records': 0,
+            'total_amount': Decimal('0.00'),
+            'by_status': {
+                status_key: {'count': 0, 'total_amount': Decimal('0.00')}
+                for status_key, _ in BillingRecord.STATUS_CHOICES
+            },
             'monthly_totals': {}
         }
         
-        # Group by status
-        for status_choice in BillingRecord.STATUS_CHOICES:
-            status_key = status_choice[0]
-            status_queryset = queryset.filter(status=status_key)
-            summary_data['by_status'][status_key] = {
-                'count': status_queryset.count(),
-                'total_amount': status_queryset.aggregate(total=Sum('total_amount'))['total'] or Decimal('0.00')
-            }
-        
         # Monthly totals for current year
         current_year = timezone.now().year
-        monthly_data = queryset.filter(
-            billing_date__year=current_year
-        ).extra(
-            select={'month': 'EXTRACT(month FROM billing_date)'}
-        ).values('month').annotate(
-            count=Count('id'),
-            total_amount=Sum('total_amount')
-        ).order_by('month')
-        
-        for month_data in monthly_data:
-            month = int(month_data['month'])
-            summary_data['monthly_totals'][month] = {
-                'count': month_data['count'],
-                'total_amount': month_data['total_amount'] or Decimal('0.00')
-            }
+        for month, status_key, count, amount in totals.order_by('month').values_list(
+            'month', 'status', 'record_count', 'total_amount'
+        ):
+            summary_data['total_records'] += count
+            summary_data['total_amount'] += amount
+            by_status = summary_data['by_status'].setdefault(status_key, {'count': 0, 'total_amount': Decimal('0.00')})
+            by_status['count'] += count
+            by_status['total_amount'] += amount
+            if month.year == current_year:
+                month_data = summary_data['monthly_totals'].setdefault(
+                    month.month, {'count': 0, 'total_amount': Decimal('0.00')}
+                )
+                month_data['count'] += count
+                month_data['total_amount'] += amount
         
         return Response(summary_data)
     
+    def _billing_service_tier(self, service_tier_id):
+        service_tier = ServiceTier.objects.get(id=service_tier_id)
+        
+        # Ensure user has access to this service tier
+        if not self.request.user.lab_groups.filter(id=service_tier.lab_group_id, is_core_facility=True).exists():
+            raise PermissionDenied("You don't have permission to bill for this service tier")
+        return service_tier
+    
     @action(detail=False, methods=['post'])
     def calculate_billing(self, request):
-        """Calculate billing for an instrument job"""
+        """
+        Calculate billing for an instrument job, or for a list of jobs given as job_ids, all priced
+        from one read of the prices of the service tier
+        """
+        from cc.billing_services import BillingEngine
+        
         job_id = request.data.get('job_id')
+        job_ids = request.data.get('job_ids')
         service_tier_id = request.data.get('service_tier_id')
         
-        if not job_id or not service_tier_id:
-            return Response({'error': 'job_id and service_tier_id are required'}, status=400)
+        if not (job_id or job_ids) or not service_tier_id:
+            return Response({'error': 'job_id or job_ids and service_tier_id are required'}, status=400)
         
         try:
-            job = InstrumentJob.objects.get(id=job_id)
-            service_tier = ServiceTier.objects.get(id=service_tier_id)
-            
-            # Ensure user has access to this service tier
-            if not self.request.user.lab_groups.filter(id=service_tier.lab_group.id, is_core_facility=True).exists():
-                raise PermissionDenied("You don't have permission to calculate billing for this service tier")
+            service_tier = self._billing_service_tier(service_tier_id)
+            engine = BillingEngine([service_tier])
             
-            # Get pricing for this instrument and service tier
-            try:
-                instrument_price = ServicePrice.objects.get(
-                    service_tier=service_tier,
-                    instrument=job.instrument,
-                    billing_unit='per_hour_instrument',
-                    is_active=True
-                )
-            except ServicePrice.DoesNotExist:
-                instrument_price = None
+            if job_ids:
+                jobs = InstrumentJob.objects.filter(id__in=job_ids).order_by('id')
+                return Response({'results': engine.price_jobs(jobs, service_tier)})
             
-            try:
-                personnel_price = ServicePrice.objects.get(
-                    service_tier=service_tier,
-                    instrument=job.instrument,
-                    billing_unit='per_hour_personnel',
-                    is_active=True
-                )
-            except ServicePrice.DoesNotExist:
-                personnel_price = None
-            
-            # Calculate costs
-            instrument_cost = Decimal('0.00')
-            personnel_cost = Decimal('0.00')
-            
-            if instrument_price and job.instrument_hours:
-                instrument_cost = Decimal(str(job.instrument_hours)) * instrument_price.price
-            
-            if personnel_price and job.personnel_hours:
-                personnel_cost = Decimal(str(job.personnel_hours)) * personnel_price.price
-            
-            total_amount = instrument_cost + personnel_cost
-            
-            return Response({
-                'instrument_hours': job.instrument_hours,
-                'instrument_rate': instrument_price.price if instrument_price else None,
-                'instrument_cost': instrument_cost,
-                'personnel_hours': job.personnel_hours,
-                'personnel_rate': personnel_price.price if personnel_price else None,
-                'personnel_cost': personnel_cost,
-                'total_amount': total_amount,
-                'currency': instrument_price.currency if instrument_price else (personnel_price.currency if personnel_price else 'USD')
-            })
+            job = InstrumentJob.objects.get(id=job_id)
+            return Response(engine.price_job(job, service_tier.id))
             
         except InstrumentJob.DoesNotExist:
             return Response({'error': 'Instrument job not found'}, status=404)
         except ServiceTier.DoesNotExist:
             return Response({'error': 'Service tier not found'}, status=404)
+        except PermissionDenied:
+            raise
         except Exception as e:
             return Response({'error': str(e)}, status=500)
+    
+    @action(detail=False, methods=['post'])
+    def generate_records(self, request):
+        """Create the billing records of the jobs completed within a billing period under a service tier"""
+        from cc.billing_services import BillingEngine
+        
+        service_tier_id = request.data.get('service_tier_id')
+        start_date = parse_date(request.data.get('start_date') or '')
+        end_date = parse_date(request.data.get('end_date') or '')
+        
+        if not service_tier_id or not start_date or not end_date:
+            return Response({'error': 'service_tier_id, start_date and end_date are required'}, status=400)
+        if start_date > end_date:
+            return Response({'error': 'start_date must be before end_date'}, status=400)
+        
+        try:
+            service_tier = self._billing_service_tier(service_tier_id)
+        except ServiceTier.DoesNotExist:
+            return Response({'error': 'Service tier not found'}, status=404)
+        
+        records = BillingEngine([service_tier]).generate_records(service_tier, start_date, end_date)
+        return Response({
+            'created': len(records),
+            'total_amount': sum((record.total_amount for record in records), Decimal('0.00')),
+            'record_ids': [record.id for record in records]
+        }, status=201)
 
 
 class PublicPricingViewSet(ReadOnlyModelViewSet):
@@ -11195,28 +11396,49 @@ class PublicPricingViewSet(ReadOnlyModelViewSet):
         # This viewset doesn't use a standard queryset
         return LabGroup.objects.filter(is_core_facility=True)
     
+    def _snapshot_lab_group_id(self, snapshot, lab_group_id):
+        """Id of a core facility lab group of the snapshot, raises LabGroup.DoesNotExist for others"""
+        try:
+            lab_group_id = int(lab_group_id)
+        except (TypeError, ValueError):
+            raise LabGroup.DoesNotExist
+        if lab_group_id not in snapshot.lab_groups:
+            raise LabGroup.DoesNotExist
+        return lab_group_id
+    
+    def _snapshot_response(self, request, snapshot, build):
+        """
+        Response built from the pricing snapshot, tagged with the snapshot version so that clients and
+        caches revalidate it, or a 304 response when the client already has it
+        """
+        etag = snapshot.etag(request.get_full_path())
+        if etag:
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                return not_modified
+        response = Response(build())
+        if etag:
+            response['ETag'] = etag
+            patch_cache_control(response, public=True, no_cache=True)
+        return response
+    
     @action(detail=False, methods=['get'])
     def pricing_display(self, request):
         """
-        Get public pricing display for all or specific lab groups
+        Get public pricing display for all or specific lab groups, from the pricing snapshot
         """
-        from cc.billing_services import PublicPricingService
+        from cc.billing_services import PricingSnapshot
         
         lab_group_id = request.query_params.get('lab_group_id')
         
         try:
+            snapshot = PricingSnapshot.current()
             if lab_group_id:
-                lab_group = LabGroup.objects.get(id=lab_group_id, is_core_facility=True)
-                pricing_service = PublicPricingService(lab_group)
-                pricing_display = pricing_service.get_public_pricing_display()
-            else:
-                # Show all core facility pricing
-                pricing_service = PublicPricingService()
-                pricing_display = pricing_service.get_public_pricing_display()
+                lab_group_id = self._snapshot_lab_group_id(snapshot, lab_group_id)
             
-            return Response({
+            return self._snapshot_response(request, snapshot, lambda: {
                 'success': True,
-                'pricing_display': pricing_display
+                'pricing_display': snapshot.pricing_display(lab_group_id or None)
             })
             
         except LabGroup.DoesNotExist:
@@ -11233,24 +11455,20 @@ class PublicPricingViewSet(ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def quote_form_config(self, request):
         """
-        Get configuration for quote request form
+        Get configuration for quote request form, from the pricing snapshot
         """
-        from cc.billing_services import PublicPricingService
+        from cc.billing_services import PricingSnapshot
         
         lab_group_id = request.query_params.get('lab_group_id')
         
         try:
+            snapshot = PricingSnapshot.current()
             if lab_group_id:
-                lab_group = LabGroup.objects.get(id=lab_group_id, is_core_facility=True)
-                pricing_service = PublicPricingService(lab_group)
-            else:
-                pricing_service = PublicPricingService()
+                lab_group_id = self._snapshot_lab_group_id(snapshot, lab_group_id)
             
-            form_config = pricing_service.generate_quote_form_config()
-            
-            return Response({
+            return self._snapshot_response(request, snapshot, lambda: {
                 'success': True,
-                'form_config': form_config
+                'form_config': snapshot.quote_form_config(lab_group_id or None)
             })
             
         except LabGroup.DoesNotExist:
@@ -11267,9 +11485,9 @@ class PublicPricingViewSet(ReadOnlyModelViewSet):
     @action(detail=False, methods=['post'])
     def generate_quote(self, request):
         """
-        Generate a quote based on the request parameters
+        Generate a quote based on the request parameters, computed against the pricing snapshot
         """
-        from cc.billing_services import QuoteCalculator
+        from cc.billing_services import PricingSnapshot
         
         service_tier_id = request.data.get('service_tier_id')
         
@@ -11280,13 +11498,15 @@ class PublicPricingViewSet(ReadOnlyModelViewSet):
             }, status=400)
         
         try:
-            service_tier = ServiceTier.objects.get(id=service_tier_id, is_active=True)
-            calculator = QuoteCalculator(service_tier)
-            quote_result = calculator.calculate_quote(request.data)
+            snapshot = PricingSnapshot.current()
+            service_tier_id = int(service_tier_id)
+            if service_tier_id not in snapshot.service_tiers:
+                raise ServiceTier.DoesNotExist
+            quote_result = snapshot.calculate_quote(service_tier_id, request.data)
             
             return Response(quote_result)
             
-        except ServiceTier.DoesNotExist:
+        except (ServiceTier.DoesNotExist, ValueError):
             return Response({
                 'success': False,
                 'error': 'Service tier not found'
@@ -11300,9 +11520,9 @@ class PublicPricingViewSet(ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def pricing_options(self, request):
         """
-        Get pricing options for a specific instrument and service tier
+        Get pricing options for a specific instrument and service tier, from the pricing snapshot
         """
-        from cc.billing_services import QuoteCalculator
+        from cc.billing_services import PricingSnapshot
         
         instrument_id = request.query_params.get('instrument_id')
         service_tier_id = request.query_params.get('service_tier_id')
@@ -11314,18 +11534,18 @@ class PublicPricingViewSet(ReadOnlyModelViewSet):
             }, status=400)
         
         try:
-            instrument = Instrument.objects.get(id=instrument_id, enabled=True)
-            service_tier = ServiceTier.objects.get(id=service_tier_id, is_active=True)
+            snapshot = PricingSnapshot.current()
+            instrument = snapshot.instruments.get(int(instrument_id))
+            service_tier_id = int(service_tier_id)
+            if not instrument or not instrument['enabled'] or service_tier_id not in snapshot.service_tiers:
+                raise Instrument.DoesNotExist
             
-            calculator = QuoteCalculator(service_tier)
-            pricing_options = calculator.get_pricing_options(instrument)
-            
-            return Response({
+            return self._snapshot_response(request, snapshot, lambda: {
                 'success': True,
-                'pricing_options': pricing_options
+                'pricing_options': snapshot.pricing_options(service_tier_id, instrument['id'])
             })
             
-        except (Instrument.DoesNotExist, ServiceTier.DoesNotExist):
+        except (Instrument.DoesNotExist, ValueError):
             return Response({
                 'success': False,
                 'error': 'Instrument or service tier not found'
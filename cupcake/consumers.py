@@ -7,8 +7,10 @@ import uuid
 from asgiref.sync import sync_to_async
 from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.db.models import Q
 
-from cc.models import Session, WebRTCUserChannel, WebRTCSession, WebRTCUserOffer
+from cc.models import Session, TimeKeeper, WebRTCUserChannel, WebRTCSession, WebRTCUserOffer
+from cc.services.notifications import EVERYONE_GROUP, lab_group_group, session_group, user_group
 
 
 @sync_to_async
@@ -44,6 +46,21 @@ def add_webrtc_user_channel(webrtc_session, webrtc_channel):
 def get_all_channels(webrtc_session):
     return list(webrtc_session.user_channels.all())
 
+@database_sync_to_async
+def get_notification_groups(user):
+    """
+    Websocket groups delivering messages to the user, see cc.services.notifications. Of the sessions
+    the user owns, edits or views only those with a running timer are joined, clients subscribe to
+    the sessions they open.
+    """
+    lab_group_ids = user.lab_groups.values_list("id", flat=True)
+    session_ids = TimeKeeper.objects.filter(
+        started=True, session__in=Session.objects.filter(Q(user=user) | Q(editors=user) | Q(viewers=user))
+    ).values_list("session__unique_id", flat=True).distinct()
+    return [user_group(user.id), EVERYONE_GROUP] + [lab_group_group(lab_group_id) for lab_group_id in lab_group_ids] + [
+        session_group(session_id) for session_id in session_ids
+    ]
+
 
 class TimerConsumer(AsyncJsonWebsocketConsumer):
     async def connect(self):
@@ -526,22 +543,28 @@ class NotificationConsumer(AsyncJsonWebsocketConsumer):
             return
 
         self.user_id = str(self.scope["user"].id)
+        self.notification_groups = await get_notification_groups(self.scope["user"])
 
-        await self.channel_layer.group_add(
-            f"user_{self.user_id}_notifications",
-            self.channel_name
-        )
+        for group in self.notification_groups:
+            await self.channel_layer.group_add(
+                group,
+                self.channel_name
+            )
 
         await self.accept()
         await self.send_json({"message": "Connected to notification channel"})
 
     async def disconnect(self, close_code):
-        await self.channel_layer.group_discard(
-            f"user_{self.user_id}_notifications",
-            self.channel_name
-        )
+        for group in getattr(self, "notification_groups", []):
+            await self.channel_layer.group_discard(
+                group,
+                self.channel_name
+            )
 
     async def receive_json(self, content):
+        if content.get("type") in ("subscribe_session", "unsubscribe_session"):
+            await self._handle_session_subscription(content)
+            return
         await self.channel_layer.group_send(
             f"user_{self.user_id}_notifications",
             {
@@ -555,6 +578,31 @@ class NotificationConsumer(AsyncJsonWebsocketConsumer):
         content = event["message"]
         await self.send_json(content)
 
+    async def _handle_session_subscription(self, content):
+        try:
+            session_id = str(uuid.UUID(str(content.get("session_id"))))
+        except ValueError:
+            await self.send_json({"error": "Invalid session_id"})
+            return
+        if content["type"] == "unsubscribe_session":
+            await self.session_group_leave({"group": session_group(session_id)})
+            return
+        if not await check_session(session_id, self.scope["user"]):
+            await self.send_json({"error": "Session not found"})
+            return
+        await self.session_group_join({"group": session_group(session_id)})
+
+    # Handlers for sessions shared with or unshared from the user while connected
+    async def session_group_join(self, event):
+        if event["group"] not in self.notification_groups:
+            await self.channel_layer.group_add(event["group"], self.channel_name)
+            self.notification_groups.append(event["group"])
+
+    async def session_group_leave(self, event):
+        if event["group"] in self.notification_groups:
+            await self.channel_layer.group_discard(event["group"], self.channel_name)
+            self.notification_groups.remove(event["group"])
+
     # Handlers for specific notification types
     async def alert_message(self, event):
         content = event["message"]
@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -359,16 +361,42 @@ STORAGES = {
 STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_ROOT = BASE_DIR / "media"
 MEDIA_URL = "/media/"
+# Tests write their files to a temporary MEDIA_ROOT
+TEST_RUNNER = "cupcake.test_runner.TempMediaTestRunner"
 SENDFILE_BACKEND = 'django_sendfile.backends.simple'
 SENDFILE_ROOT = MEDIA_ROOT
 
 WHISPERCPP_PATH = os.environ.get("WHISPERCPP_PATH", "/app/whisper.cpp/build/bin/whisper-cli")
 WHISPERCPP_DEFAULT_MODEL = os.environ.get("WHISPERCPP_DEFAULT_MODEL", "/app/whisper.cpp/models/ggml-medium.bin")
 WHISPERCPP_THREAD_COUNT = os.environ.get("WHISPERCPP_THREAD_COUNT", "6")
+# Persistent whisper.cpp server kept warm by the transcribe worker, falls back to WHISPERCPP_PATH when unavailable
+WHISPERCPP_USE_SERVER = os.environ.get("WHISPERCPP_USE_SERVER", "True") == "True"
+WHISPERCPP_SERVER_PATH = os.environ.get("WHISPERCPP_SERVER_PATH", "/app/whisper.cpp/build/bin/whisper-server")
+WHISPERCPP_SERVER_HOST = os.environ.get("WHISPERCPP_SERVER_HOST", "127.0.0.1")
+WHISPERCPP_SERVER_PORT = int(os.environ.get("WHISPERCPP_SERVER_PORT", "8178"))
+WHISPERCPP_SERVER_STARTUP_TIMEOUT = int(os.environ.get("WHISPERCPP_SERVER_STARTUP_TIMEOUT", "120"))
+WHISPERCPP_SERVER_REQUEST_TIMEOUT = int(os.environ.get("WHISPERCPP_SERVER_REQUEST_TIMEOUT", "3600"))
+# Audio is sent to the server in windows of this many seconds, partial text is streamed and checkpointed per window
+WHISPERCPP_SERVER_CHUNK_SECONDS = int(os.environ.get("WHISPERCPP_SERVER_CHUNK_SECONDS", "30"))
+# Minimum seconds between partial transcription pushes and checkpoint writes
+TRANSCRIPTION_STREAM_INTERVAL = float(os.environ.get("TRANSCRIPTION_STREAM_INTERVAL", "2"))
 
 # llama.cpp
 LLAMA_BIN_PATH = os.environ.get("LLAMA_BIN_PATH", "/llama.cpp/main")
 LLAMA_DEFAULT_MODEL = os.environ.get("LLAMA_DEFAULT_MODEL", "/llama.cpp/models/capybarahermes-2.5-mistral-7b.Q5_K_M.gguf")
+# Warm llama.cpp server kept by the llama worker, falls back to LLAMA_BIN_PATH when unavailable
+LLAMA_USE_SERVER = os.environ.get("LLAMA_USE_SERVER", "True") == "True"
+LLAMA_SERVER_PATH = os.environ.get("LLAMA_SERVER_PATH", "/llama.cpp/build/bin/llama-server")
+LLAMA_SERVER_HOST = os.environ.get("LLAMA_SERVER_HOST", "127.0.0.1")
+LLAMA_SERVER_PORT = int(os.environ.get("LLAMA_SERVER_PORT", "8179"))
+LLAMA_SERVER_THREAD_COUNT = int(os.environ.get("LLAMA_SERVER_THREAD_COUNT", "8"))
+LLAMA_SERVER_PARALLEL = int(os.environ.get("LLAMA_SERVER_PARALLEL", "2"))
+LLAMA_SERVER_CONTEXT = int(os.environ.get("LLAMA_SERVER_CONTEXT", "2048"))
+LLAMA_SERVER_STARTUP_TIMEOUT = int(os.environ.get("LLAMA_SERVER_STARTUP_TIMEOUT", "300"))
+LLAMA_SERVER_REQUEST_TIMEOUT = int(os.environ.get("LLAMA_SERVER_REQUEST_TIMEOUT", "3600"))
+# Generated text is sent to the summary channel in frames bounded by time and size
+LLAMA_STREAM_INTERVAL = float(os.environ.get("LLAMA_STREAM_INTERVAL", "0.5"))
+LLAMA_STREAM_MAX_CHARS = int(os.environ.get("LLAMA_STREAM_MAX_CHARS", "1024"))
 
 # COTURN settings
 COTURN_SERVER = os.environ.get("COTURN_SERVER", "localhost")
@@ -386,6 +414,48 @@ USE_LLM = os.environ.get("USE_LLM", "False") == "True"
 USE_WHISPER = os.environ.get("USE_WHISPER", "False") == "True"
 USE_COTURN = os.environ.get("USE_COTURN", "False") == "True"
 USE_OCR = os.environ.get("USE_OCR", "False") == "True"
+# Images are downsampled so the longest side is at most OCR_MAX_DIMENSION pixels and binarized before recognition
+OCR_MAX_DIMENSION = int(os.environ.get("OCR_MAX_DIMENSION", "2000"))
+OCR_BINARIZE = os.environ.get("OCR_BINARIZE", "True") == "True"
+# Size of the process pool used by an OCR worker to recognize a batch of images
+OCR_WORKERS = int(os.environ.get("OCR_WORKERS", "4"))
+
+# Content-hash cache for transcription, OCR and summary results
+PROCESSING_CACHE_ENABLED = os.environ.get("PROCESSING_CACHE_ENABLED", "True") == "True"
+PROCESSING_CACHE_MAX_BYTES = int(os.environ.get("PROCESSING_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+PROCESSING_CACHE_MAX_ENTRIES = int(os.environ.get("PROCESSING_CACHE_MAX_ENTRIES", "10000"))
+
+# Rows read from an import archive and written with bulk_create per batch
+IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", "1000"))
+# Threads used to resolve and stage the media files of an export
+EXPORT_MEDIA_WORKERS = int(os.environ.get("EXPORT_MEDIA_WORKERS", "8"))
+# Threads removing the files of an import that is being reverted
+IMPORT_REVERT_FILE_WORKERS = int(os.environ.get("IMPORT_REVERT_FILE_WORKERS", "8"))
+
+# Finished exports in MEDIA_ROOT/temp reused for repeated requests on unchanged data
+EXPORT_CACHE_ENABLED = os.environ.get("EXPORT_CACHE_ENABLED", "True") == "True"
+EXPORT_CACHE_MAX_BYTES = int(os.environ.get("EXPORT_CACHE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+EXPORT_CACHE_MAX_ENTRIES = int(os.environ.get("EXPORT_CACHE_MAX_ENTRIES", "500"))
+# Export files not tracked by the cache are removed from MEDIA_ROOT/temp after this many days
+EXPORT_TEMP_MAX_AGE_DAYS = int(os.environ.get("EXPORT_TEMP_MAX_AGE_DAYS", "7"))
+# Times a checkpointed export or import job is requeued after its worker stopped, and the delay in seconds
+JOB_RESUME_RETRIES = int(os.environ.get("JOB_RESUME_RETRIES", "3"))
+JOB_RESUME_INTERVAL = int(os.environ.get("JOB_RESUME_INTERVAL", "60"))
+# Rows a checkpointed job writes between two checkpoints
+JOB_CHECKPOINT_ROWS = int(os.environ.get("JOB_CHECKPOINT_ROWS", "1000"))
+
+# Message notifications: recipients are written by a job on the default queue in batches of this size
+NOTIFICATIONS_ASYNC = os.environ.get("NOTIFICATIONS_ASYNC", "True") == "True"
+NOTIFICATION_BATCH_SIZE = int(os.environ.get("NOTIFICATION_BATCH_SIZE", "1000"))
+
+# Unread message counters are cached for this many seconds before they are summed again from the inbox entries
+INBOX_UNREAD_TIMEOUT = int(os.environ.get("INBOX_UNREAD_TIMEOUT", "3600"))
+
+# Timer notifications are coalesced by timer and published by a thread of each process at most this many times a second
+TIMER_NOTIFICATIONS_ASYNC = os.environ.get("TIMER_NOTIFICATIONS_ASYNC", "True") == "True"
+TIMER_NOTIFICATIONS_PER_SECOND = int(os.environ.get("TIMER_NOTIFICATIONS_PER_SECOND", "2"))
+if TIMER_NOTIFICATIONS_PER_SECOND < 1:
+    raise ImproperlyConfigured("TIMER_NOTIFICATIONS_PER_SECOND must be at least 1")
 
 # Amazon SES SETTINGS
 
@@ -409,6 +479,8 @@ FRONTEND_URL = os.environ.get("FRONTEND_URL", "http://localhost:4200")
 
 # Instrument Booking Settings
 ALLOW_OVERLAP_BOOKINGS = os.environ.get("ALLOW_OVERLAP_BOOKINGS", "True") == "True"
+# Length of the slots of the availability bitmaps in minutes, must divide a day
+INSTRUMENT_SLOT_MINUTES = int(os.environ.get("INSTRUMENT_SLOT_MINUTES", "30"))
 DEFAULT_SERVICE_LAB_GROUP = os.environ.get("DEFAULT_SERVICE_LAB_GROUP", "MS Facility")
 
 # SLACK NOTIFICATIONS
@@ -143,7 +143,7 @@ PASSWORD_HASHERS = [
 ]
 
 # Test runner configuration
-TEST_RUNNER = 'django.test.runner.DiscoverRunner'
+TEST_RUNNER = 'cupcake.test_runner.TempMediaTestRunner'
 
 # Allowed hosts for testing
 ALLOWED_HOSTS = ['localhost', 'test-app', '127.0.0.1', 'testserver']
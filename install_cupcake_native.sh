@@ -675,7 +675,7 @@ User=$CUPCAKE_USER
 Group=$CUPCAKE_USER
 WorkingDirectory=$APP_DIR
 Environment=PATH=$VENV_DIR/bin
-ExecStart=$VENV_DIR/bin/python manage.py rqworker default
+ExecStart=$VENV_DIR/bin/python manage.py rqworker default maintenance
 Restart=always
 RestartSec=5
 